@@ -67,6 +67,10 @@ from .ws.objects.candles import Candles
 from .ws.objects.listinfodata import ListInfoData
 from .ws.objects.betinfo import Game_betinfo_data
 from . import global_value as global_value
+from . import metrics
+from .order_trace import OrderTracer
+from .order_store import OrderStore
+from .balance_cache import BalanceCache
 from collections import defaultdict
 
 
@@ -88,7 +92,6 @@ class IQOptionAPI(object):  # pylint: disable=too-many-instance-attributes
 
     # pylint: disable=too-many-public-methods
     socket_option_opened = {}
-    socket_option_closed = {}
     timesync = TimeSync()
     profile = Profile()
     candles = Candles()
@@ -105,7 +108,6 @@ class IQOptionAPI(object):  # pylint: disable=too-many-instance-attributes
     leaderboard_deals_client = None
     #position_changed_data = nested_dict(2, dict)
     # microserviceName_binary_options_name_option=nested_dict(2,dict)
-    order_async = nested_dict(2, dict)
     order_binary = {}
     game_betinfo = Game_betinfo_data()
     instruments = None
@@ -143,7 +145,6 @@ class IQOptionAPI(object):  # pylint: disable=too-many-instance-attributes
     get_options_v2_data = None
     # --for binary option multi buy
     buy_multi_result = None
-    buy_multi_option = {}
     #
     result = None
     training_balance_reset_request = None
@@ -178,6 +179,18 @@ class IQOptionAPI(object):  # pylint: disable=too-many-instance-attributes
         # If it is true, the last buy order was successful
         self.buy_successful = None
         self.__active_account_type = None
+        # latency traces of the orders sent through this connection
+        self.order_tracer = OrderTracer()
+        # request_id -> Future of the open-option answer, see IQ_Option._register_order
+        self.pending_orders = {}
+        # [request_id, limit, Future] waiting for an "options" answer, see
+        # IQ_Option.get_optioninfo_v2_async and ws/received/options.py
+        self.options_v2_waiters = []
+        self.options_v2_lock = threading.Lock()
+        # order/position events, see order_store.OrderStore
+        self.order_store = OrderStore()
+        # balances pushed by balance-changed, see balance_cache.BalanceCache
+        self.balance_cache = BalanceCache()
 
     def prepare_http_url(self, resource):
         """Construct http url from resource url.
@@ -266,15 +279,24 @@ class IQOptionAPI(object):  # pylint: disable=too-many-instance-attributes
         :param dict msg: The websocket request msg.
         """
 
-        logger = logging.getLogger(__name__)
-
         data = json.dumps(dict(name=name,
                                msg=msg, request_id=request_id))
+        self.send_websocket_raw(data, no_force_send)
+
+    def send_websocket_raw(self, data, no_force_send=True):
+        """Send an already serialized frame to IQ Option server websocket.
+
+        :param str data: The JSON encoded websocket frame.
+        """
+        logger = logging.getLogger(__name__)
 
+        metrics.ws_send_waiting.inc()
         while (global_value.ssl_Mutual_exclusion or global_value.ssl_Mutual_exclusion_write) and no_force_send:
             pass
+        metrics.ws_send_waiting.dec()
         global_value.ssl_Mutual_exclusion_write = True
         self.websocket.send(data)
+        metrics.ws_frames_sent.inc()
         logger.debug(data)
         global_value.ssl_Mutual_exclusion_write = False
 
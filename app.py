@@ -4,11 +4,18 @@ Interface moderna e responsiva para gerenciamento de trading
 """
 "ALTERADO: 11/11/2025"
 
+import io
 import os
 import sys
 import json
 import time
+import uuid
+import logging
+import hmac
+import atexit
+import threading
 from datetime import datetime
+from concurrent.futures import ThreadPoolExecutor
 
 # CRÍTICO: Configurar sys.path ANTES de importar Flask
 # O diretório local 'http/' interfere no módulo padrão 'http' do Python
@@ -27,7 +34,7 @@ if __package__ in (None, "", "__main__") and current_dir in sys.path:
     sys.path.remove(current_dir)
 
 # Agora podemos importar Flask sem conflito
-from flask import Flask, render_template, request, jsonify, session, redirect, url_for
+from flask import Flask, Response, g, render_template, request, jsonify, session, redirect, url_for
 from dotenv import load_dotenv
 
 # Importar módulos do projeto usando importlib para evitar conflitos
@@ -48,6 +55,52 @@ sinais_processor_module = importlib.util.module_from_spec(spec_sinais)
 spec_sinais.loader.exec_module(sinais_processor_module)
 SinaisProcessor = sinais_processor_module.SinaisProcessor
 Sinal = sinais_processor_module.Sinal
+obter_processador = sinais_processor_module.obter_processador
+importar_sinais = sinais_processor_module.importar_sinais
+
+# Importar signal_scheduler
+signal_scheduler_path = os.path.join(current_dir, "signal_scheduler.py")
+spec_scheduler = importlib.util.spec_from_file_location("signal_scheduler", signal_scheduler_path)
+signal_scheduler_module = importlib.util.module_from_spec(spec_scheduler)
+spec_scheduler.loader.exec_module(signal_scheduler_module)
+AgendadorSinais = signal_scheduler_module.AgendadorSinais
+
+# Importar canal_eventos
+canal_eventos_path = os.path.join(current_dir, "canal_eventos.py")
+spec_canal = importlib.util.spec_from_file_location("canal_eventos", canal_eventos_path)
+canal_eventos_module = importlib.util.module_from_spec(spec_canal)
+spec_canal.loader.exec_module(canal_eventos_module)
+CanalEventos = canal_eventos_module.CanalEventos
+
+# Importar broker
+broker_path = os.path.join(current_dir, "broker.py")
+spec_broker = importlib.util.spec_from_file_location("broker", broker_path)
+broker_module = importlib.util.module_from_spec(spec_broker)
+spec_broker.loader.exec_module(broker_module)
+ClienteBroker = broker_module.ClienteBroker
+ErroBroker = broker_module.ErroBroker
+ErroOperacao = broker_module.ErroOperacao
+
+# Importar diario_trades
+diario_trades_path = os.path.join(current_dir, "diario_trades.py")
+spec_diario = importlib.util.spec_from_file_location("diario_trades", diario_trades_path)
+diario_trades_module = importlib.util.module_from_spec(spec_diario)
+spec_diario.loader.exec_module(diario_trades_module)
+DiarioTrades = diario_trades_module.DiarioTrades
+
+# Importar registro_logs
+registro_logs_path = os.path.join(current_dir, "registro_logs.py")
+spec_registro = importlib.util.spec_from_file_location("registro_logs", registro_logs_path)
+registro_logs_module = importlib.util.module_from_spec(spec_registro)
+spec_registro.loader.exec_module(registro_logs_module)
+LogsSessao = registro_logs_module.LogsSessao
+
+# Importar gerenciador_conexoes
+gerenciador_conexoes_path = os.path.join(current_dir, "gerenciador_conexoes.py")
+spec_conexoes = importlib.util.spec_from_file_location("gerenciador_conexoes", gerenciador_conexoes_path)
+gerenciador_conexoes_module = importlib.util.module_from_spec(spec_conexoes)
+spec_conexoes.loader.exec_module(gerenciador_conexoes_module)
+GerenciadorConexoes = gerenciador_conexoes_module.GerenciadorConexoes
 
 # Importar IQ_Option
 # Tentar importar de diferentes formas para compatibilidade
@@ -74,6 +127,19 @@ if spec and spec.loader:
 else:
     raise ImportError("Não foi possível carregar stable_api.py")
 
+# Registro Prometheus da biblioteca (o mesmo módulo importado por stable_api)
+metrics_module = importlib.import_module(f"{package_name}.metrics")
+
+
+def criar_iq_option(email, password, account_type):
+    """IQ_Option real ou, com IQ_OPTION_PAPER=1, o PaperIQOption offline (relógio simulado)."""
+    if os.getenv('IQ_OPTION_PAPER', '').strip().lower() in ('1', 'true', 'sim', 'yes'):
+        # paper_api importa .stable_api: reutiliza o módulo já carregado
+        sys.modules.setdefault(module_name, stable_api_module)
+        paper_api_module = importlib.import_module(f"{package_name}.paper_api")
+        return paper_api_module.paper_from_env(email, password, account_type)
+    return IQ_Option(email, password, active_account_type=account_type)
+
 # Carregar variáveis de ambiente
 load_dotenv()
 
@@ -92,15 +158,51 @@ else:
 # Configurar sessão permanente
 app.config['PERMANENT_SESSION_LIFETIME'] = 86400  # 24 horas
 
-# Variáveis globais para gerenciar conexão
-api_instances = {}
+# Variáveis globais para gerenciar conexão (as conexões ficam em `conexoes`, criado junto de get_api_instance)
 stop_loss_protections = {}
 
-# Histórico de operações por sessão
-trade_history = {}  # {session_id: [lista de operações]}
-sinais_logs = {}  # {session_id: [lista de logs]}
+# Histórico de operações de todas as sessões (SQLite, gravação em lote fora das rotas)
+diario = DiarioTrades(os.getenv('IQ_OPTION_JOURNAL') or os.path.join(current_dir, 'logs', 'trades.db'))
+# Logs do bot: fila + escritor em segundo plano (terminal e logs/bot.jsonl com rotação)
+logger_bot = registro_logs_module.configurar_logs()
+logger_trades = logging.getLogger('bot.trades')
+logger_conexoes = logging.getLogger('bot.conexoes')
+sinais_logs = LogsSessao(logging.getLogger('bot.sinais'), limite=100)  # últimos 100 logs por sessão
 losses_consecutivas = {}  # {session_id: {'count': int, 'skip_count': int}} - Controle de perdas consecutivas
 
+# Eventos enviados às páginas abertas (Server-Sent Events em /api/eventos)
+canal_eventos = CanalEventos()
+saldos_iniciais = {}  # {session_id: saldo no login} - variação do evento de saldo
+assinaturas_eventos = {}  # {session_id: [(origem, token)]} - assinaturas do cache de saldo
+# Conexões SSE abertas ao mesmo tempo neste processo (WSGI): cada uma ocupa uma thread do
+# worker e outra no broker; acima disso a página volta ao polling. Padrão: metade das threads
+LIMITE_FLUXOS_SSE = int(os.getenv('IQ_OPTION_SSE_MAX') or max(1, int(os.getenv('GUNICORN_THREADS', 32)) // 2))
+vagas_fluxos_sse = threading.BoundedSemaphore(LIMITE_FLUXOS_SSE)
+
+# Resultados das operações chegam por push (socket-option-closed); o tratamento roda neste pool
+resultados_executor = ThreadPoolExecutor(max_workers=4, thread_name_prefix='resultados')
+# Margem (segundos) após a expiração antes de reconciliar um resultado não recebido
+RESULTADO_MARGEM = float(os.getenv('IQ_OPTION_RESULT_GRACE', 30))
+
+# Cliente do broker (gunicorn): criado no worker na primeira chamada, nunca no master
+_cliente_broker = None
+
+
+def chamar_bot(nome, *args, **kwargs):
+    """
+    Executa uma operação do bot (ver OPERACOES).
+
+    Com IQ_OPTION_BROKER_SOCKET a operação roda no processo broker, dono das
+    conexões e do estado; sem ele, neste próprio processo.
+    """
+    global _cliente_broker
+    endereco = broker_module.endereco_broker()
+    if not endereco:
+        return OPERACOES[nome](*args, **kwargs)
+    if _cliente_broker is None:
+        _cliente_broker = ClienteBroker(endereco, broker_module.chave_broker())
+    return _cliente_broker.chamar(nome, *args, **kwargs)
+
 
 def parse_float_value(value, default=None, field_name="valor"):
     """Converte entradas em float aceitando vírgula como separador decimal."""
@@ -161,7 +263,7 @@ def resolve_numeric_setting(session_key, env_key, default, field_name, parser=pa
     return parser(value, default=default, field_name=field_name)
 
 
-def add_sinais_log(session_id, message, log_type='info'):
+def add_sinais_log(session_id, message, log_type='info', **campos):
     """
     Adiciona um log de execução de sinais para a sessão.
     
@@ -169,24 +271,54 @@ def add_sinais_log(session_id, message, log_type='info'):
         session_id: ID da sessão
         message: Mensagem do log
         log_type: Tipo do log ('info', 'success', 'warning', 'error')
+        **campos: Campos do registro JSON (ex.: order_id, asset)
     """
-    if session_id not in sinais_logs:
-        sinais_logs[session_id] = []
-    
-    log_entry = {
-        'timestamp': datetime.now().isoformat(),
-        'message': message,
-        'type': log_type
-    }
-    
-    sinais_logs[session_id].insert(0, log_entry)
-    
-    # Limitar a 100 logs por sessão
-    if len(sinais_logs[session_id]) > 100:
-        sinais_logs[session_id] = sinais_logs[session_id][:100]
-    
-    # Também imprimir no terminal para debug
-    print(f"[SINAIS] {message}")
+    # Deque limitada da sessão + fila do logger: não espera terminal nem disco
+    log_entry = sinais_logs.adicionar(session_id, message, log_type, **campos)
+    canal_eventos.publicar(session_id, 'log', log_entry)
+
+
+def publicar_stop_loss(session_id):
+    """Publica o status do Stop Loss da sessão (exposição pendente, saldo mínimo)."""
+    protection = stop_loss_protections.get(session_id)
+    if protection:
+        canal_eventos.publicar(session_id, 'stop_loss', protection.get_status())
+
+
+def publicar_saldo(session_id, api, entry):
+    """Publica o saldo recebido pelo cache (balance-changed) no formato de /api/balance."""
+    if entry.amount is None or entry.id != api.get_balance_id():
+        return
+    balance = entry.amount
+    initial_balance = saldos_iniciais.get(session_id, balance)
+    variation = balance - initial_balance
+    canal_eventos.publicar(session_id, 'balance', {
+        'balance': balance,
+        'initial_balance': initial_balance,
+        'variation': variation,
+        'variation_percent': (variation / initial_balance * 100) if initial_balance > 0 else 0,
+        'balance_updated_at': entry.updated_at,
+        'balance_age': entry.age
+    })
+    protection = stop_loss_protections.get(session_id)
+    if protection:
+        # A proteção também assina o cache; atualizar aqui garante o status já com este saldo
+        protection.update_balance(balance)
+        canal_eventos.publicar(session_id, 'stop_loss', protection.get_status())
+
+
+def conectar_eventos(session_id, api):
+    """Assina o cache de saldo da API para publicar cada mudança às páginas da sessão."""
+    desconectar_eventos(session_id)
+    balance_cache = getattr(api, 'balance_cache', None)
+    if balance_cache is not None:
+        token = balance_cache.subscribe(lambda entry: publicar_saldo(session_id, api, entry))
+        assinaturas_eventos[session_id] = [(balance_cache, token)]
+
+
+def desconectar_eventos(session_id):
+    for origem, token in assinaturas_eventos.pop(session_id, []):
+        origem.unsubscribe(token)
 
 
 def verificar_loss_completo(session_id, trade_id, gale_level):
@@ -201,34 +333,12 @@ def verificar_loss_completo(session_id, trade_id, gale_level):
     Returns:
         bool: True se foi LOSS completo, False caso contrário
     """
-    history = trade_history.get(session_id, [])
-    
-    # Encontrar o trade principal
-    trade_principal = None
-    for trade in history:
-        if trade['id'] == trade_id:
-            trade_principal = trade
-            break
+    # Trade principal e cadeia completa de Martingales (já ordenada por nível), pelo índice do diário
+    trade_principal, martingales = diario.cadeia(session_id, trade_id)
     
     if not trade_principal:
         return False
     
-    # Encontrar todos os Martingales relacionados a este trade (cadeia completa)
-    def encontrar_martingales_cadeia(trade_id_base):
-        """Encontra todos os Martingales na cadeia, recursivamente."""
-        martingales_diretos = []
-        for trade in history:
-            if trade.get('is_martingale') and trade.get('parent_trade_id') == trade_id_base:
-                martingales_diretos.append(trade)
-                # Buscar Martingales deste Martingale também
-                martingales_diretos.extend(encontrar_martingales_cadeia(trade['id']))
-        return martingales_diretos
-    
-    martingales = encontrar_martingales_cadeia(trade_id)
-    
-    # Ordenar por nível de Martingale
-    martingales.sort(key=lambda x: x.get('martingale_level', 0))
-    
     # Verificar se foi LOSS completo baseado no nível de Gale
     if gale_level == 0:
         # Sem Gale: qualquer LOSS na primeira entrada já conta como perda
@@ -322,43 +432,363 @@ def verificar_e_atualizar_perdas_consecutivas(session_id, trade_id, gale_level):
             # Não resetar skip_count aqui, pois pode estar no meio de pular sinais
 
 
-def get_api_instance():
-    """Obtém ou cria instância da API para a sessão atual."""
-    session_id = session.get('session_id')
-    
-    if not session_id:
+def registrar_trade(session_id, trade_entry):
+    """Insere uma operação no diário da sessão (gravação em lote, não bloqueia)."""
+    diario.registrar(session_id, trade_entry)
+    canal_eventos.publicar(session_id, 'trade', trade_entry)
+    logger_trades.info("Operação registrada", extra=campos_trade(session_id, trade_entry))
+
+
+def atualizar_trade(session_id, order_id, win, profit):
+    """Aplica o resultado (win/loose/equal) ao trade do diário e o retorna."""
+    trade = diario.obter(session_id, order_id)
+    if trade is None:
         return None
+    if win == "win":
+        trade['status'] = 'win'
+        trade['profit'] = float(profit) if profit else 0
+    elif win == "loose":
+        trade['status'] = 'loss'
+        trade['profit'] = float(profit) if profit else 0
+    else:
+        trade['status'] = 'equal'
+    diario.registrar(session_id, trade)
+    canal_eventos.publicar(session_id, 'trade', trade)
+    logger_trades.info("Resultado da operação", extra=campos_trade(session_id, trade))
+    return trade
+
+
+def campos_trade(session_id, trade):
+    """Campos estruturados de uma operação para o log JSON."""
+    return {
+        'session_id': session_id,
+        'order_id': trade['id'],
+        'parent_trade_id': trade.get('parent_trade_id'),
+        'martingale_level': trade.get('martingale_level', 0),
+        'asset': trade.get('asset'),
+        'amount': trade.get('amount'),
+        'status': trade.get('status'),
+        'profit': trade.get('profit'),
+    }
+
+
+def acompanhar_resultado(session_id, api, trade_entry, callback=None):
+    """
+    Registra o tratamento do resultado de uma operação sem thread dormindo até a expiração.
+
+    O resultado é entregue pelo evento socket-option-closed; se não chegar até
+    a expiração + RESULTADO_MARGEM, a API reconcilia com o servidor.
+    `callback(trade)` roda no pool de resultados com o trade já atualizado.
+    """
+    future = api.check_win_async(trade_entry['id'], timeout=trade_entry['expiry'] * 60 + RESULTADO_MARGEM)
+    future.add_done_callback(
+        lambda concluido: resultados_executor.submit(_processar_resultado, session_id, trade_entry['id'], concluido, callback)
+    )
+
+
+def _processar_resultado(session_id, order_id, future, callback):
+    try:
+        win, profit = future.result()
+    except Exception as e:
+        add_sinais_log(session_id, f"Erro ao verificar resultado (ordem {order_id}): {e}", 'error', order_id=order_id)
+        return
+    protection = stop_loss_protections.get(session_id)
+    if protection:
+        protection.release_pending(order_id)
+        publicar_stop_loss(session_id)
+    trade = atualizar_trade(session_id, order_id, win, profit)
+    if trade and callback:
+        try:
+            callback(trade)
+        except Exception as e:
+            add_sinais_log(session_id, f"Erro ao tratar resultado (ordem {order_id}): {e}", 'error', order_id=order_id)
+
+
+def executar_martingale(session_id, api, trade_updated, protection):
+    """
+    Executa o próximo nível de Martingale (último valor × 2.15) de um trade perdido.
+
+    Returns:
+        dict do novo trade (já no histórico) ou None se a compra falhar
+    """
+    original_trade_id = trade_updated.get('parent_trade_id') or trade_updated['id']
+    martingale_amount = trade_updated['amount'] * 2.15
     
-    if session_id not in api_instances:
+    if protection and not protection.can_operate(martingale_amount):
+        add_sinais_log(session_id, "Stop Loss: Martingale bloqueado", 'warning')
         return None
-    
-    return api_instances[session_id]
 
+    new_result, new_order_id = api.buy(
+        martingale_amount,
+        trade_updated['asset'],
+        trade_updated['direction'].lower(),
+        trade_updated['expiry']
+    )
+    if not new_result:
+        return None
+
+    balance = api.get_balance()
+    if protection:
+        protection.add_pending(new_order_id, martingale_amount)
+        protection.update_balance(balance)
+        publicar_stop_loss(session_id)
+
+    new_trade_entry = {
+        'id': new_order_id,
+        'asset': trade_updated['asset'],
+        'direction': trade_updated['direction'],
+        'amount': martingale_amount,
+        'expiry': trade_updated['expiry'],
+        'timestamp': datetime.now().isoformat(),
+        'status': 'pending',
+        'profit': 0,
+        'is_martingale': True,
+        'martingale_level': trade_updated.get('martingale_level', 0) + 1,
+        'parent_trade_id': original_trade_id,
+        'sinal': trade_updated.get('sinal')
+    }
+    registrar_trade(session_id, new_trade_entry)
+    return new_trade_entry
+
+
+def chave_sinal(sinal):
+    """Chave estável de um sinal entre recargas do arquivo."""
+    return (sinal.linha_original, str(sinal))
+
+
+def armar_sinal(session_id, api, sinal, entry_type, entry_value, protection, target_timestamp=None):
+    """
+    Prepara um sinal antes do seu minuto: consulta saldo, calcula o valor de entrada,
+    valida o ativo/payout e pré-monta o frame de compra.
+
+    Returns:
+        dict com 'ordem', 'valor', 'minutos' e 'saldo', ou None se o sinal não puder ser armado
+    """
+    saldo_atual = api.get_balance()
+    if entry_type == "PERCENT":
+        valor_entrada = saldo_atual * (entry_value / 100.0)
+    else:
+        valor_entrada = entry_value
+
+    if protection:
+        if entry_type == "PERCENT":
+            valor_entrada = protection.calculate_safe_entry_value(entry_percent=entry_value)
+        else:
+            valor_entrada = protection.calculate_safe_entry_value(entry_fixed=entry_value)
+
+    if saldo_atual < valor_entrada:
+        add_sinais_log(session_id, f"Saldo insuficiente! Necessário: ${valor_entrada:.2f} | Disponível: ${saldo_atual:.2f}", 'error')
+        return None
 
-def create_api_instance(email, password, account_type="PRACTICE", session_id=None):
-    """Cria uma nova instância da API."""
-    if session_id is None:
-        session_id = session.get('session_id')
-        if not session_id:
-            # Criar session_id baseado no email e timestamp
-            session_id = f"{email}_{int(time.time())}"
-            session['session_id'] = session_id
-    
     try:
-        api = IQ_Option(email, password, active_account_type=account_type)
+        minutos = int(sinal.timeframe[1:]) if sinal.timeframe.startswith('M') else int(sinal.timeframe[1:]) * 60
+    except:
+        add_sinais_log(session_id, f"Erro ao converter timeframe: {sinal.timeframe}", 'error')
+        return None
+
+    check, ordem = api.arm_buy(valor_entrada, sinal.ativo, sinal.direcao.lower(), minutos, target_timestamp)
+    if not check:
+        add_sinais_log(session_id, f"Sinal {sinal.ativo} {sinal.direcao} não armado: {ordem}", 'error')
+        return None
+
+    return {'ordem': ordem, 'valor': valor_entrada, 'minutos': minutos, 'saldo': saldo_atual}
+
+
+def get_api_instance(session_id):
+    """Obtém a instância da API da sessão (None se não conectada)."""
+    return conexoes.obter(session_id)
+
+
+def abrir_conexao(email, password, account_type):
+    """Abre uma conexão com a IQ Option na conta escolhida: (api, None) ou (None, motivo)."""
+    try:
+        api = criar_iq_option(email, password, account_type)
         check, reason = api.connect()
         
         if not check:
             return None, reason
         
         api.change_balance(account_type)
-        api_instances[session_id] = api
-        
+        metrics_module.track_client(api, account=metrics_module.account_id(email), account_type=account_type)
         return api, None
     except Exception as e:
         return None, str(e)
 
 
+def create_api_instance(email, password, account_type, session_id):
+    """Associa a sessão a uma conexão da conta (reaproveita a já aberta, se houver)."""
+    api, error, reutilizada = conexoes.conectar(session_id, email, password, account_type)
+    if api is not None:
+        conectar_eventos(session_id, api)
+    return api, error, reutilizada
+
+
+def sessao_em_uso(session_id, api):
+    """Sessões executando sinais ou com ordens abertas não são despejadas por ociosidade ou limite."""
+    if sinais_execution['running'] and sinais_execution['session_id'] == session_id:
+        return True
+    return bool(api.order_store.open_orders())
+
+
+def descartar_estado_sessao(session_id):
+    """Estado do bot ligado à sessão (Stop Loss, eventos, logs); a conexão é do gerenciador."""
+    if session_id in stop_loss_protections:
+        stop_loss_protections.pop(session_id).stop_monitoring()
+    desconectar_eventos(session_id)
+    saldos_iniciais.pop(session_id, None)
+    losses_consecutivas.pop(session_id, None)
+    sinais_logs.remover(session_id)
+    if session_id:
+        canal_eventos.encerrar(session_id)
+
+
+# Conexões com a IQ Option: reaproveitadas por conta, descartadas por ociosidade e limite LRU
+conexoes = GerenciadorConexoes(
+    abrir_conexao,
+    ocioso=float(os.getenv('IQ_OPTION_POOL_IDLE', 1800)),
+    maximo=int(os.getenv('IQ_OPTION_POOL_MAX', 50)),
+    reserva=float(os.getenv('IQ_OPTION_POOL_WARM', 300)),
+    em_uso=sessao_em_uso,
+    ao_despejar=descartar_estado_sessao,
+    intervalo_memoria=float(os.getenv('IQ_OPTION_POOL_MEMORY_INTERVAL', 600)),
+)
+# Fecha websockets e threads das conexões ao sair (python app.py, broker, uvicorn)
+atexit.register(conexoes.fechar_todas)
+
+
+# ============================================================================
+# Operações do bot
+#
+# Toda a lógica que toca conexões e estado do bot fica em funções (aqui e junto
+# de cada rota) que recebem da rota o session_id e as configurações da sessão e
+# devolvem dados serializáveis, em geral `(corpo, status_http)`. Com gunicorn
+# elas rodam no processo broker (broker.py); as rotas só as chamam via
+# `chamar_bot`. Registro completo em OPERACOES, no fim do arquivo.
+# ============================================================================
+
+
+def sessao_conectada(session_id):
+    """True se a sessão tem uma conexão aberta com a IQ Option."""
+    return get_api_instance(session_id) is not None
+
+
+def conectar_sessao(session_id, email, password, account_type):
+    """Abre a conexão da sessão e registra o saldo inicial."""
+    print(f"DEBUG: Criando sessão com session_id: {session_id}")
+    api, error, reutilizada = create_api_instance(email, password, account_type, session_id)
+    
+    if api is None:
+        print(f"DEBUG: Erro ao criar instância da API: {error}")
+        return {'success': False, 'message': f'Erro ao conectar: {error}'}, 400
+    
+    logger_conexoes.debug("Sessão conectada", extra={
+        'session_id': session_id, 'reaproveitada': reutilizada,
+        'conexoes': conexoes.estatisticas()['connections']})
+    
+    # Obter saldo inicial
+    try:
+        balance = api.get_balance()
+    except Exception as e:
+        print(f"Erro ao obter saldo: {e}")
+        balance = 0
+    saldos_iniciais[session_id] = balance
+    
+    return {
+        'success': True,
+        'message': 'Login realizado com sucesso',
+        'balance': balance,
+        'reused': reutilizada
+    }, 200
+
+
+def encerrar_sessao(session_id):
+    """Libera a conexão da sessão (fica na reserva ou fecha) e descarta seu estado."""
+    conexoes.liberar(session_id)
+    descartar_estado_sessao(session_id)
+
+
+def consultar_saldo(session_id):
+    """Saldo atual, variação desde o login e status do Stop Loss."""
+    api = get_api_instance(session_id)
+    if not api:
+        return {'error': 'Não autenticado'}, 401
+    
+    try:
+        balance = api.get_balance()
+        initial_balance = saldos_iniciais.get(session_id, balance)
+        variation = balance - initial_balance
+        variation_percent = (variation / initial_balance * 100) if initial_balance > 0 else 0
+        
+        # Verificar stop loss se estiver ativo
+        stop_loss_status = None
+        if session_id in stop_loss_protections:
+            sl = stop_loss_protections[session_id]
+            sl.update_balance(balance)
+            stop_loss_status = sl.get_status()
+        
+        # Saldo vem do cache local (balance-changed); informar a idade do valor
+        balance_info = api.get_balance_info() or {}
+        
+        return {
+            'balance': balance,
+            'initial_balance': initial_balance,
+            'variation': variation,
+            'variation_percent': variation_percent,
+            'stop_loss': stop_loss_status,
+            'balance_updated_at': balance_info.get('updated_at'),
+            'balance_age': balance_info.get('age')
+        }, 200
+    except Exception as e:
+        return {'error': str(e)}, 500
+
+
+def status_stop_loss(session_id, stop_loss_percent=None):
+    """Status do Stop Loss da sessão; com `stop_loss_percent`, cria a proteção se ainda não existir."""
+    api = get_api_instance(session_id)
+    if stop_loss_percent is not None and api and session_id not in stop_loss_protections:
+        protection = create_stop_loss_protection(api, stop_loss_percent)
+        if protection:
+            protection.start_monitoring()
+            stop_loss_protections[session_id] = protection
+            publicar_stop_loss(session_id)
+    
+    protection = stop_loss_protections.get(session_id)
+    if protection is None:
+        return {'error': 'Stop Loss não inicializado'}, 400
+    
+    if api:
+        try:
+            balance = api.get_balance()
+            protection.update_balance(balance)
+        except:
+            pass
+    
+    return protection.get_status(), 200
+
+
+def catalogo_ativos(session_id):
+    """Catálogo de ativos da conta logada (None se não conectada)."""
+    api = get_api_instance(session_id)
+    return api.get_all_ACTIVES_OPCODE() if api else None
+
+
+def resposta_bot(nome, *args, **kwargs):
+    """Rota JSON: executa a operação e devolve seu `(corpo, status)` como resposta."""
+    corpo, status = chamar_bot(nome, *args, **kwargs)
+    return jsonify(corpo), status
+
+
+@app.errorhandler(ErroBroker)
+@app.errorhandler(ErroOperacao)
+def erro_bot(e):
+    """Broker inacessível ou falha numa operação do bot."""
+    status = 503 if isinstance(e, ErroBroker) else 500
+    mensagem = f"Serviço do bot indisponível: {e}" if status == 503 else str(e)
+    if request.path.startswith('/api/'):
+        return jsonify({'success': False, 'error': mensagem}), status
+    return render_template('error.html', error=mensagem), status
+
+
 @app.route('/')
 def index():
     """Página inicial."""
@@ -388,41 +818,26 @@ def login():
         # Criar session_id ANTES de criar a instância da API
         session_id = f"{email}_{int(time.time())}"
         session['session_id'] = session_id
-        print(f"DEBUG: Criando sessão com session_id: {session_id}")
         app.logger.info(f"Recebi login para {email} (conta {account_type})")
-        # Criar instância da API com o session_id
-        api, error = create_api_instance(email, password, account_type, session_id)
-        app.logger.info(f"Resultado login: api={'OK' if api else 'None'}, erro={error}")
+        # A conexão fica no broker: a senha não é guardada na sessão
+        corpo, status = chamar_bot('conectar_sessao', session_id, email, password, account_type)
+        app.logger.info(f"Resultado login: status={status}")
         
-        if api is None:
-            print(f"DEBUG: Erro ao criar instância da API: {error}")
-            return jsonify({'success': False, 'message': f'Erro ao conectar: {error}'}), 400
+        if not corpo.get('success'):
+            return jsonify(corpo), status
         
         # Salvar informações na sessão
         session['logged_in'] = True
         session['email'] = email
         session['account_type'] = account_type
-        session['password'] = password  # necessário para recriar conexão em outros workers
+        session['initial_balance'] = corpo['balance']
         
         print(f"DEBUG: Login bem-sucedido. Session: {dict(session)}")
-        print(f"DEBUG: api_instances keys após login: {list(api_instances.keys())}")
-        
-        # Obter saldo inicial
-        try:
-            balance = api.get_balance()
-            session['initial_balance'] = balance
-        except Exception as e:
-            print(f"Erro ao obter saldo: {e}")
-            session['initial_balance'] = 0
         
         # Forçar salvamento da sessão
         session.permanent = True
         
-        return jsonify({
-            'success': True,
-            'message': 'Login realizado com sucesso',
-            'balance': session['initial_balance']
-        })
+        return jsonify(corpo)
     except Exception as e:
         print(f"Erro no login: {e}")
         import traceback
@@ -433,18 +848,7 @@ def login():
 @app.route('/logout', methods=['POST'])
 def logout():
     """Endpoint de logout."""
-    api = get_api_instance()
-    if api:
-        try:
-            api.logout()
-        except:
-            pass
-    
-    session_id = session.get('session_id')
-    if session_id in api_instances:
-        del api_instances[session_id]
-    if session_id in stop_loss_protections:
-        del stop_loss_protections[session_id]
+    chamar_bot('encerrar_sessao', session.get('session_id'))
     
     session.clear()
     return jsonify({'success': True, 'message': 'Logout realizado com sucesso'})
@@ -466,81 +870,32 @@ def dashboard():
         session.clear()
         return redirect(url_for('index'))
     
-    print(f"DEBUG: session_id encontrado: {session_id}")
-    print(f"DEBUG: api_instances keys: {list(api_instances.keys())}")
-    
-    api = get_api_instance()
-    if not api:
-        print("DEBUG: Instância da API não encontrada, tentando recriar")
-        email = session.get('email')
-        password = session.get('password')
-        account_type = session.get('account_type', 'PRACTICE')
-        session_id = session.get('session_id')
-
-        if email and password and session_id:
-            api, error = create_api_instance(email, password, account_type, session_id)
-            if api is None:
-                print(f"DEBUG: Falha ao recriar instância: {error}")
-                session.clear()
-                return redirect(url_for('index'))
-        else:
-            print("DEBUG: Dados insuficientes para recriar API")
-            session.clear()
-            return redirect(url_for('index'))
+    saldo, status = chamar_bot('consultar_saldo', session_id)
+    if status == 401:
+        # Conexão encerrada no broker (reinício ou logout em outra aba): novo login
+        app.logger.info("Sessão sem conexão no broker, redirecionando para login")
+        session.clear()
+        return redirect(url_for('index'))
+    if status != 200:
+        print(f"DEBUG: Erro ao renderizar dashboard: {saldo.get('error')}")
+        return render_template('error.html', error=saldo.get('error'))
     
-    try:
-        balance = api.get_balance()
-        account_type = session.get('account_type', 'PRACTICE')
-        initial_balance = session.get('initial_balance', balance)
-        
-        # Calcular variação
-        variation = balance - initial_balance
-        variation_percent = (variation / initial_balance * 100) if initial_balance > 0 else 0
-        
-        print(f"DEBUG: Dashboard renderizado com sucesso. Balance: {balance}")
-        return render_template('dashboard.html', 
-                             balance=balance,
-                             initial_balance=initial_balance,
-                             variation=variation,
-                             variation_percent=variation_percent,
-                             account_type=account_type)
-    except Exception as e:
-        print(f"DEBUG: Erro ao renderizar dashboard: {e}")
-        import traceback
-        traceback.print_exc()
-        return render_template('error.html', error=str(e))
+    print(f"DEBUG: Dashboard renderizado com sucesso. Balance: {saldo['balance']}")
+    return render_template('dashboard.html', 
+                         balance=saldo['balance'],
+                         initial_balance=saldo['initial_balance'],
+                         variation=saldo['variation'],
+                         variation_percent=saldo['variation_percent'],
+                         account_type=session.get('account_type', 'PRACTICE'))
 
 
 @app.route('/api/balance')
 def api_balance():
     """API para obter saldo atual."""
-    api = get_api_instance()
-    if not api:
+    if 'logged_in' not in session or not session.get('logged_in'):
         return jsonify({'error': 'Não autenticado'}), 401
     
-    try:
-        balance = api.get_balance()
-        initial_balance = session.get('initial_balance', balance)
-        variation = balance - initial_balance
-        variation_percent = (variation / initial_balance * 100) if initial_balance > 0 else 0
-        
-        # Verificar stop loss se estiver ativo
-        session_id = session.get('session_id')
-        stop_loss_status = None
-        if session_id in stop_loss_protections:
-            sl = stop_loss_protections[session_id]
-            sl.update_balance(balance)
-            stop_loss_status = sl.get_status()
-        
-        return jsonify({
-            'balance': balance,
-            'initial_balance': initial_balance,
-            'variation': variation,
-            'variation_percent': variation_percent,
-            'stop_loss': stop_loss_status
-        })
-    except Exception as e:
-        return jsonify({'error': str(e)}), 500
+    return resposta_bot('consultar_saldo', session.get('session_id'))
 
 
 @app.route('/config')
@@ -621,8 +976,8 @@ def stop_loss_page():
     if 'logged_in' not in session or not session['logged_in']:
         return redirect(url_for('index'))
     
-    api = get_api_instance()
-    if not api:
+    session_id = session.get('session_id')
+    if not chamar_bot('sessao_conectada', session_id):
         return redirect(url_for('index'))
     
     try:
@@ -631,21 +986,12 @@ def stop_loss_page():
         return render_template('error.html', error=str(e))
     
     # Criar ou obter proteção de stop loss
-    session_id = session.get('session_id')
-    if session_id not in stop_loss_protections:
-        try:
-            initial_balance = session.get('initial_balance', api.get_balance())
-            protection = create_stop_loss_protection(api, stop_loss_percent)
-            if protection:
-                protection.start_monitoring()
-                stop_loss_protections[session_id] = protection
-        except Exception as e:
-            return render_template('error.html', error=f"Erro ao criar proteção: {e}")
-    
-    protection = stop_loss_protections.get(session_id)
-    status = protection.get_status() if protection else None
+    try:
+        status, codigo = chamar_bot('status_stop_loss', session_id, stop_loss_percent)
+    except ErroOperacao as e:
+        return render_template('error.html', error=f"Erro ao criar proteção: {e}")
     
-    return render_template('stop_loss.html', status=status, stop_loss_percent=stop_loss_percent)
+    return render_template('stop_loss.html', status=status if codigo == 200 else None, stop_loss_percent=stop_loss_percent)
 
 
 @app.route('/api/stop-loss/status')
@@ -654,21 +1000,7 @@ def api_stop_loss_status():
     if 'logged_in' not in session or not session['logged_in']:
         return jsonify({'error': 'Não autenticado'}), 401
     
-    session_id = session.get('session_id')
-    if session_id not in stop_loss_protections:
-        return jsonify({'error': 'Stop Loss não inicializado'}), 400
-    
-    protection = stop_loss_protections[session_id]
-    api = get_api_instance()
-    
-    if api:
-        try:
-            balance = api.get_balance()
-            protection.update_balance(balance)
-        except:
-            pass
-    
-    return jsonify(protection.get_status())
+    return resposta_bot('status_stop_loss', session.get('session_id'))
 
 
 @app.route('/sinais')
@@ -678,7 +1010,7 @@ def sinais_page():
         return redirect(url_for('index'))
     
     sinais_file = os.path.join(current_dir, 'sinais.txt')
-    processor = SinaisProcessor(sinais_file)
+    processor = obter_processador(sinais_file)
     
     sinais = []
     erros = []
@@ -698,8 +1030,9 @@ def api_sinais():
     
     sinais_file = os.path.join(current_dir, 'sinais.txt')
     
+    processor = obter_processador(sinais_file)
+    
     if request.method == 'GET':
-        processor = SinaisProcessor(sinais_file)
         if os.path.exists(sinais_file):
             processor.carregar_sinais()
             sinais = processor.obter_todos_sinais()
@@ -709,8 +1042,10 @@ def api_sinais():
                     'timeframe': s.timeframe,
                     'ativo': s.ativo,
                     'hora': s.hora,
+                    'data': s.data.isoformat() if s.data else None,
                     'direcao': s.direcao,
-                    'linha': s.linha_original
+                    'linha': s.linha_original,
+                    'texto': str(s)
                 } for s in sinais],
                 'erros': erros
             })
@@ -723,8 +1058,7 @@ def api_sinais():
         if action == 'save':
             content = data.get('content', '')
             try:
-                with open(sinais_file, 'w', encoding='utf-8') as f:
-                    f.write(content)
+                processor.salvar_conteudo(content)
                 return jsonify({'success': True, 'message': 'Sinais salvos com sucesso'})
             except Exception as e:
                 return jsonify({'success': False, 'error': str(e)}), 500
@@ -732,8 +1066,10 @@ def api_sinais():
         elif action == 'add':
             sinal = data.get('sinal')
             try:
-                with open(sinais_file, 'a', encoding='utf-8') as f:
-                    f.write(f"{sinal['timeframe']};{sinal['ativo']};{sinal['hora']};{sinal['direcao']}\n")
+                _, erro = processor.adicionar_sinal(sinal['timeframe'], sinal['ativo'], sinal['hora'], sinal['direcao'],
+                                                    sinal.get('data'))
+                if erro:
+                    return jsonify({'success': False, 'error': erro}), 400
                 return jsonify({'success': True, 'message': 'Sinal adicionado com sucesso'})
             except Exception as e:
                 return jsonify({'success': False, 'error': str(e)}), 500
@@ -741,20 +1077,9 @@ def api_sinais():
         elif action == 'delete':
             index = data.get('index')
             try:
-                processor = SinaisProcessor(sinais_file)
                 if os.path.exists(sinais_file):
-                    processor.carregar_sinais()
-                    sinais = processor.obter_todos_sinais()
-                    
-                    if 0 <= index < len(sinais):
-                        # Remover o sinal do índice especificado
-                        sinais.pop(index)
-                        
-                        # Reescrever o arquivo sem o sinal removido
-                        with open(sinais_file, 'w', encoding='utf-8') as f:
-                            for s in sinais:
-                                f.write(f"{s.timeframe};{s.ativo};{s.hora};{s.direcao}\n")
-                        
+                    # Remove só a linha do sinal (gravação atômica, comentários preservados)
+                    if processor.remover_sinal(index) is not None:
                         return jsonify({'success': True, 'message': 'Sinal removido com sucesso'})
                     else:
                         return jsonify({'success': False, 'error': 'Índice inválido'}), 400
@@ -786,26 +1111,31 @@ def api_upload_sinais():
     sinais_file = os.path.join(current_dir, 'sinais.txt')
     
     try:
-        # Salvar o arquivo enviado
-        file.save(sinais_file)
+        conteudo = file.read().decode('utf-8')
         
-        # Validar o arquivo usando SinaisProcessor
-        processor = SinaisProcessor(sinais_file)
-        processor.carregar_sinais()
+        # Validar em uma passada, conferindo os ativos com o catálogo da conta logada
+        catalogo = chamar_bot('catalogo_ativos', session.get('session_id'))
+        relatorio = importar_sinais(io.StringIO(conteudo), ativos_validos=catalogo or None)
+        
+        # Salvar o arquivo enviado (gravação atômica)
+        processor = obter_processador(sinais_file)
+        processor.salvar_conteudo(conteudo)
         
         # Verificar se há erros críticos
-        if processor.get_erros():
+        if relatorio.total_erros:
             # Ainda assim salvar o arquivo, mas avisar sobre erros
             return jsonify({
                 'success': True,
                 'message': 'Arquivo enviado com sucesso, mas alguns erros foram encontrados',
-                'errors': processor.get_erros()
+                'errors': [str(erro) for erro in relatorio.erros],
+                'relatorio': relatorio.to_dict()
             })
         
         return jsonify({
             'success': True,
             'message': 'Arquivo enviado e validado com sucesso',
-            'sinais_count': len(processor.obter_todos_sinais())
+            'sinais_count': len(relatorio.sinais),
+            'relatorio': relatorio.to_dict()
         })
     except Exception as e:
         return jsonify({'success': False, 'error': f'Erro ao processar arquivo: {str(e)}'}), 500
@@ -817,8 +1147,7 @@ def trading_page():
     if 'logged_in' not in session or not session['logged_in']:
         return redirect(url_for('index'))
     
-    api = get_api_instance()
-    if not api:
+    if not chamar_bot('sessao_conectada', session.get('session_id')):
         return redirect(url_for('index'))
     
     return render_template('trading.html')
@@ -830,10 +1159,6 @@ def api_trade():
     if 'logged_in' not in session or not session['logged_in']:
         return jsonify({'error': 'Não autenticado'}), 401
     
-    api = get_api_instance()
-    if not api:
-        return jsonify({'error': 'API não disponível'}), 400
-    
     data = request.json
     asset = data.get('asset', '')
     direction = data.get('direction', 'call').lower()
@@ -842,15 +1167,27 @@ def api_trade():
     is_martingale = data.get('is_martingale', False)
     parent_trade_id = data.get('parent_trade_id', None)
     
+    # Capturar configurações da sessão para o Martingale automático
+    gale_level = int(os.getenv('IQ_OPTION_GALE', session.get('gale', 0)))
+    
+    return resposta_bot('executar_trade', session.get('session_id'), asset, direction, amount, expiry,
+                        is_martingale, parent_trade_id, gale_level)
+
+
+def executar_trade(session_id, asset, direction, amount, expiry, is_martingale, parent_trade_id, gale_level):
+    """Executa uma operação manual e acompanha seu resultado (Martingale automático até `gale_level`)."""
+    api = get_api_instance(session_id)
+    if not api:
+        return {'error': 'API não disponível'}, 400
+    
     # Verificar stop loss
-    session_id = session.get('session_id')
     if session_id in stop_loss_protections:
         protection = stop_loss_protections[session_id]
-        if not protection.can_operate():
-            return jsonify({'success': False, 'error': 'Stop Loss acionado! Operação bloqueada.'}), 400
+        if not protection.can_operate(amount):
+            return {'success': False, 'error': 'Stop Loss acionado! Operação bloqueada.'}, 400
     
     if amount <= 0:
-        return jsonify({'success': False, 'error': 'Valor inválido'}), 400
+        return {'success': False, 'error': 'Valor inválido'}, 400
     
     try:
         result, order_id = api.buy(amount, asset, direction, expiry)
@@ -859,12 +1196,10 @@ def api_trade():
             # Atualizar saldo após operação
             balance = api.get_balance()
             if session_id in stop_loss_protections:
+                stop_loss_protections[session_id].add_pending(order_id, amount)
                 stop_loss_protections[session_id].update_balance(balance)
             
             # Adicionar ao histórico
-            if session_id not in trade_history:
-                trade_history[session_id] = []
-            
             trade_entry = {
                 'id': order_id,
                 'asset': asset.upper(),
@@ -882,209 +1217,40 @@ def api_trade():
             
             # Se for martingale, calcular o nível
             if is_martingale and parent_trade_id:
-                parent_trade = next((t for t in trade_history[session_id] if t['id'] == parent_trade_id), None)
+                parent_trade = diario.obter(session_id, parent_trade_id)
                 if parent_trade:
                     trade_entry['martingale_level'] = parent_trade.get('martingale_level', 0) + 1
             
-            trade_history[session_id].insert(0, trade_entry)
+            registrar_trade(session_id, trade_entry)
+            publicar_stop_loss(session_id)
             
-            # Limitar histórico a 50 operações
-            if len(trade_history[session_id]) > 50:
-                trade_history[session_id] = trade_history[session_id][:50]
-            
-            # Capturar configurações antes de criar thread
-            gale_level = int(os.getenv('IQ_OPTION_GALE', session.get('gale', 0)))
-            
-            # Iniciar verificação de resultado em background
-            import threading
-            def check_result():
-                time.sleep(expiry * 60 + 5)  # Aguardar expiração + 5 segundos
+            # Resultado chega por push; Martingale automático a cada LOSS enquanto houver nível
+            protection = stop_loss_protections.get(session_id)
+            def ao_resultado(trade_updated):
+                if trade_updated['status'] != 'loss' or trade_updated.get('martingale_level', 0) >= gale_level:
+                    return
                 try:
-                    win, profit = api.check_win_v4(order_id)
-                    trade_updated = None
-                    
-                    # Atualizar histórico
-                    for trade in trade_history.get(session_id, []):
-                        if trade['id'] == order_id:
-                            if win == "win":
-                                trade['status'] = 'win'
-                                trade['profit'] = float(profit) if profit else 0
-                            elif win == "loose":
-                                trade['status'] = 'loss'
-                                trade['profit'] = float(profit) if profit else 0
-                            else:
-                                trade['status'] = 'equal'
-                            
-                            trade_updated = trade
-                            break
-                    
-                    # Aplicar Martingale automático se configurado
-                    if trade_updated and trade_updated['status'] == 'loss' and gale_level > 0:
-                        # Verificar se ainda pode fazer retry
-                        current_martingale_level = trade_updated.get('martingale_level', 0)
-                        
-                        if current_martingale_level < gale_level:
-                            # Encontrar o trade original (não martingale) para calcular valor base
-                            original_trade_id = trade_updated.get('parent_trade_id') or trade_updated['id']
-                            
-                            # Buscar trade original
-                            original_trade = None
-                            for t in trade_history.get(session_id, []):
-                                if t['id'] == original_trade_id:
-                                    original_trade = t
-                                    break
-                            
-                            if not original_trade:
-                                original_trade = trade_updated
-                            
-                            # Calcular valor do Martingale (último valor × 2.15)
-                            martingale_amount = trade_updated['amount'] * 2.15
-                            
-                            # Executar Martingale automaticamente
-                            try:
-                                new_result, new_order_id = api.buy(
-                                    martingale_amount,
-                                    trade_updated['asset'],
-                                    trade_updated['direction'].lower(),
-                                    trade_updated['expiry']
-                                )
-                                
-                                if new_result:
-                                    # Atualizar saldo
-                                    balance = api.get_balance()
-                                    if session_id in stop_loss_protections:
-                                        stop_loss_protections[session_id].update_balance(balance)
-                                    
-                                    # Adicionar novo trade ao histórico
-                                    new_trade_entry = {
-                                        'id': new_order_id,
-                                        'asset': trade_updated['asset'],
-                                        'direction': trade_updated['direction'],
-                                        'amount': martingale_amount,
-                                        'expiry': trade_updated['expiry'],
-                                        'timestamp': datetime.now().isoformat(),
-                                        'status': 'pending',
-                                        'profit': 0,
-                                        'is_martingale': True,
-                                        'martingale_level': current_martingale_level + 1,
-                                        'parent_trade_id': original_trade['id'],
-                                        'sinal': trade_updated.get('sinal')
-                                    }
-                                    
-                                    trade_history[session_id].insert(0, new_trade_entry)
-                                    
-                                    # Limitar histórico
-                                    if len(trade_history[session_id]) > 50:
-                                        trade_history[session_id] = trade_history[session_id][:50]
-                                    
-                                    # Verificar resultado do novo trade também
-                                    def check_martingale_result():
-                                        time.sleep(new_trade_entry['expiry'] * 60 + 5)
-                                        try:
-                                            win, profit = api.check_win_v4(new_order_id)
-                                            trade_to_update = None
-                                            
-                                            for trade in trade_history.get(session_id, []):
-                                                if trade['id'] == new_order_id:
-                                                    if win == "win":
-                                                        trade['status'] = 'win'
-                                                        trade['profit'] = float(profit) if profit else 0
-                                                    elif win == "loose":
-                                                        trade['status'] = 'loss'
-                                                        trade['profit'] = float(profit) if profit else 0
-                                                    else:
-                                                        trade['status'] = 'equal'
-                                                    
-                                                    trade_to_update = trade
-                                                    break
-                                            
-                                            # Verificar se pode fazer mais um retry (Gale 2)
-                                            if trade_to_update and trade_to_update['status'] == 'loss':
-                                                if trade_to_update['martingale_level'] < gale_level:
-                                                    # Calcular próximo valor
-                                                    martingale_amount2 = trade_to_update['amount'] * 2.15
-                                                    
-                                                    # Executar mais um Martingale
-                                                    try:
-                                                        new_result2, new_order_id2 = api.buy(
-                                                            martingale_amount2,
-                                                            trade_to_update['asset'],
-                                                            trade_to_update['direction'].lower(),
-                                                            trade_to_update['expiry']
-                                                        )
-                                                        
-                                                        if new_result2:
-                                                            balance = api.get_balance()
-                                                            if session_id in stop_loss_protections:
-                                                                stop_loss_protections[session_id].update_balance(balance)
-                                                            
-                                                            new_trade_entry2 = {
-                                                                'id': new_order_id2,
-                                                                'asset': trade_to_update['asset'],
-                                                                'direction': trade_to_update['direction'],
-                                                                'amount': martingale_amount2,
-                                                                'expiry': trade_to_update['expiry'],
-                                                                'timestamp': datetime.now().isoformat(),
-                                                                'status': 'pending',
-                                                                'profit': 0,
-                                                                'is_martingale': True,
-                                                                'martingale_level': trade_to_update['martingale_level'] + 1,
-                                                                'parent_trade_id': original_trade['id'],
-                                                                'sinal': trade_to_update.get('sinal')
-                                                            }
-                                                            
-                                                            trade_history[session_id].insert(0, new_trade_entry2)
-                                                            
-                                                            if len(trade_history[session_id]) > 50:
-                                                                trade_history[session_id] = trade_history[session_id][:50]
-                                                            
-                                                            # Verificar resultado final (último nível)
-                                                            def check_final_result():
-                                                                time.sleep(new_trade_entry2['expiry'] * 60 + 5)
-                                                                try:
-                                                                    win, profit = api.check_win_v4(new_order_id2)
-                                                                    for trade in trade_history.get(session_id, []):
-                                                                        if trade['id'] == new_order_id2:
-                                                                            if win == "win":
-                                                                                trade['status'] = 'win'
-                                                                                trade['profit'] = float(profit) if profit else 0
-                                                                            elif win == "loose":
-                                                                                trade['status'] = 'loss'
-                                                                                trade['profit'] = float(profit) if profit else 0
-                                                                            else:
-                                                                                trade['status'] = 'equal'
-                                                                            break
-                                                                except:
-                                                                    pass
-                                                            
-                                                            final_thread = threading.Thread(target=check_final_result, daemon=True)
-                                                            final_thread.start()
-                                                    except Exception as e:
-                                                        print(f"Erro ao executar segundo Martingale: {e}")
-                                        except:
-                                            pass
-                                    
-                                    martingale_thread = threading.Thread(target=check_martingale_result, daemon=True)
-                                    martingale_thread.start()
-                            except Exception as e:
-                                print(f"Erro ao executar Martingale automático: {e}")
-                except:
-                    pass
+                    novo_trade = executar_martingale(session_id, api, trade_updated, protection)
+                except Exception:
+                    logger_trades.exception("Erro ao executar Martingale automático",
+                                            extra=campos_trade(session_id, trade_updated))
+                    return
+                if novo_trade:
+                    acompanhar_resultado(session_id, api, novo_trade, ao_resultado)
             
-            thread = threading.Thread(target=check_result, daemon=True)
-            thread.start()
+            acompanhar_resultado(session_id, api, trade_entry, ao_resultado)
             
-            return jsonify({
+            return {
                 'success': True,
                 'message': 'Operação executada com sucesso',
                 'order_id': order_id,
                 'balance': balance,
                 'trade': trade_entry
-            })
+            }, 200
         else:
-            return jsonify({'success': False, 'error': 'Falha ao executar operação'}), 400
+            return {'success': False, 'error': 'Falha ao executar operação'}, 400
     except Exception as e:
-        return jsonify({'success': False, 'error': str(e)}), 500
+        return {'success': False, 'error': str(e)}, 500
 
 
 @app.route('/api/config', methods=['GET'])
@@ -1117,26 +1283,34 @@ sinais_execution = {
     'thread': None,
     'processed': 0,
     'executed': 0,
-    'next_sinal': None
+    'next_sinal': None,
+    'agendador': None,
+    'session_id': None
 }
 
 
+def status_execucao():
+    """Campos da execução de sinais exibidos pela página."""
+    return {
+        'running': sinais_execution['running'],
+        'processed': sinais_execution['processed'],
+        'executed': sinais_execution['executed'],
+        'next_sinal': sinais_execution['next_sinal']
+    }
+
+
+def atualizar_execucao(**campos):
+    """Atualiza a execução de sinais e publica o novo status para a sessão que a iniciou."""
+    sinais_execution.update(campos)
+    canal_eventos.publicar(sinais_execution['session_id'], 'sinais_status', status_execucao())
+
+
 @app.route('/api/sinais/executar', methods=['POST'])
 def api_executar_sinais():
     """API para iniciar execução de sinais."""
     if 'logged_in' not in session or not session.get('logged_in'):
         return jsonify({'error': 'Não autenticado'}), 401
     
-    if sinais_execution['running']:
-        return jsonify({'success': False, 'error': 'Execução de sinais já está em andamento'}), 400
-    
-    api = get_api_instance()
-    if not api:
-        return jsonify({'success': False, 'error': 'API não disponível'}), 400
-    
-    # Importar threading para executar em background
-    import threading
-    
     # Obter valores da sessão ANTES de criar a thread
     session_id = session.get('session_id')
     entry_type = session.get('entry_type', os.getenv('IQ_OPTION_ENTRY_TYPE', 'PERCENT'))
@@ -1148,22 +1322,32 @@ def api_executar_sinais():
     except ValueError as e:
         return jsonify({'success': False, 'error': str(e)}), 400
     
+    return resposta_bot('iniciar_sinais', session_id, entry_type, entry_value, stop_loss_percent, gale_level)
+
+
+def iniciar_sinais(session_id, entry_type, entry_value, stop_loss_percent, gale_level):
+    """Inicia a execução do arquivo de sinais em background para a sessão."""
+    if sinais_execution['running']:
+        return {'success': False, 'error': 'Execução de sinais já está em andamento'}, 400
+    
+    api = get_api_instance(session_id)
+    if not api:
+        return {'success': False, 'error': 'API não disponível'}, 400
+    
     def executar_sinais_thread():
         try:
-            sinais_execution['running'] = True
-            sinais_execution['processed'] = 0
-            sinais_execution['executed'] = 0
+            atualizar_execucao(running=True, processed=0, executed=0, session_id=session_id)
             
             # Carregar sinais
             sinais_file = os.path.join(current_dir, 'sinais.txt')
-            processor = SinaisProcessor(sinais_file)
+            processor = obter_processador(sinais_file)
             
             if not os.path.exists(sinais_file):
-                sinais_execution['running'] = False
+                atualizar_execucao(running=False)
                 return
             
             if not processor.carregar_sinais():
-                sinais_execution['running'] = False
+                atualizar_execucao(running=False)
                 return
             
             sinais = processor.obter_todos_sinais()
@@ -1174,14 +1358,33 @@ def api_executar_sinais():
                 if protection:
                     protection.start_monitoring()
                     stop_loss_protections[session_id] = protection
+                    publicar_stop_loss(session_id)
             
             protection = stop_loss_protections.get(session_id)
             
+            def ao_resultado_sinal(trade_updated):
+                """Perdas consecutivas e Martingale automático ao receber o resultado de um sinal."""
+                current_martingale_level = trade_updated.get('martingale_level', 0)
+                original_trade_id = trade_updated.get('parent_trade_id') or trade_updated['id']
+                
+                # Só conta a perda/ganho quando não haverá mais Martingale na cadeia
+                if trade_updated['status'] != 'loss' or current_martingale_level >= gale_level:
+                    verificar_e_atualizar_perdas_consecutivas(session_id, original_trade_id, gale_level)
+                    return
+                
+                try:
+                    novo_trade = executar_martingale(session_id, api, trade_updated, protection)
+                except Exception as e:
+                    add_sinais_log(session_id, f"Erro ao executar Martingale automático de sinal: {e}", 'error',
+                                   order_id=trade_updated['id'])
+                    return
+                if novo_trade:
+                    acompanhar_resultado(session_id, api, novo_trade, ao_resultado_sinal)
+            
             # Variáveis para controle de execução
-            ultima_execucao_hora = None
-            ultima_recarga_sinais = datetime.now()
-            sinais_executados_hora = set()  # Para evitar execuções duplicadas na mesma hora
-            ultimo_minuto_verificado = None
+            arm_lead = parse_float_value(os.getenv('IQ_OPTION_ARM_LEAD'), default=10, field_name='Antecedência de armação')
+            deslocamento = parse_float_value(os.getenv('IQ_OPTION_TRIGGER_OFFSET'), default=0, field_name='Deslocamento de disparo')
+            prazo_envio = parse_float_value(os.getenv('IQ_OPTION_SIGNAL_DEADLINE'), default=2, field_name='Prazo de envio')
             
             # Resetar contador de perdas consecutivas ao iniciar execução
             if session_id not in losses_consecutivas:
@@ -1191,374 +1394,215 @@ def api_executar_sinais():
                 # losses_consecutivas[session_id]['count'] = 0
                 pass
             
-            add_sinais_log(session_id, f"Execução iniciada às {datetime.now().strftime('%H:%M:%S')}", 'info')
+            def parar_execucao():
+                atualizar_execucao(running=False)
+                agendador.parar()
             
-            # Loop de execução (simplificado - em produção use o código completo do executar_sinais.py)
-            while sinais_execution['running']:
-                hora_atual = datetime.now()
-                hora_str = hora_atual.strftime("%H:%M")
-                minuto_atual = hora_atual.minute
-                segundo = hora_atual.second
-                
-                # Recarregar sinais a cada minuto para pegar atualizações do arquivo
-                if (datetime.now() - ultima_recarga_sinais).total_seconds() >= 60:
+            def atualizar_proximo_sinal():
+                proximos = agendador.proximos(1)
+                if proximos and proximos[0].sinais:
+                    sinal = proximos[0].sinais[0]
+                    atualizar_execucao(next_sinal=f"{sinal.hora} - {sinal.ativo} ({sinal.direcao})")
+                else:
+                    atualizar_execucao(next_sinal="Nenhum sinal futuro")
+            
+            def armar_evento(evento, alvo):
+                """Arma com antecedência todos os sinais de um mesmo instante."""
+                for sinal in evento.sinais:
+                    if not sinais_execution['running']:
+                        return
                     try:
-                        processor.carregar_sinais()
-                        ultima_recarga_sinais = datetime.now()
-                        # Resetar controles para permitir nova verificação
-                        sinais_executados_hora = set()
-                        ultimo_minuto_verificado = None  # Resetar para permitir verificação do minuto atual
-                        # Log de sinais recarregados removido (não exibir)
-                        pass
+                        preparado = armar_sinal(session_id, api, sinal, entry_type, entry_value, protection, alvo)
                     except Exception as e:
-                        add_sinais_log(session_id, f"Erro ao recarregar sinais: {e}", 'error')
-                
-                # Verificar stop loss
-                if protection and not protection.can_operate():
-                    add_sinais_log(session_id, "Stop Loss acionado - parando execução", 'warning')
-                    sinais_execution['running'] = False
-                    break
+                        add_sinais_log(session_id, f"Erro ao armar sinal {sinal}: {e}", 'error')
+                        preparado = None
+                    if preparado:
+                        evento.preparados[chave_sinal(sinal)] = preparado
+                if evento.preparados:
+                    add_sinais_log(session_id, f"{len(evento.preparados)} sinal(is) armado(s) para {evento.hora}", 'info')
+            
+            def disparar_evento(evento, alvo):
+                """Dispara em lote os sinais de um mesmo instante (pipeline no mesmo socket)."""
+                add_sinais_log(session_id, f"{len(evento.sinais)} sinal(is) encontrado(s) para {evento.hora}", 'info')
                 
-                # Verificar flag antes de processar sinais
-                if not sinais_execution['running']:
-                    break
+                lote = []
+                exposicao = 0.0
+                for sinal in evento.sinais:
+                    if not sinais_execution['running']:
+                        break
                 
-                # Verificar se mudou de minuto para processar sinais
-                # Sempre verificar quando o minuto muda, mas executar apenas na janela segura (58s-02s)
-                if ultimo_minuto_verificado != minuto_atual:
-                    ultimo_minuto_verificado = minuto_atual
-                    sinais_agora = processor.obter_sinais_para_hora(hora_atual)
+                    # Verificar se deve pular sinais devido a perdas consecutivas
+                    if session_id in losses_consecutivas and losses_consecutivas[session_id]['skip_count'] > 0:
+                        losses_consecutivas[session_id]['skip_count'] -= 1
+                        restantes = losses_consecutivas[session_id]['skip_count']
+                        add_sinais_log(session_id, f"⏭️ Sinal pulado devido a perdas consecutivas: {sinal.timeframe};{sinal.ativo};{sinal.hora};{sinal.direcao} | Sinais restantes a pular: {restantes}", 'warning')
                     
-                    if sinais_agora:
-                        # Verificar flag antes de processar sinais encontrados
-                        if not sinais_execution['running']:
-                            break
-                        
-                        hora_atual_key = hora_str
-                        
-                        # Verificar se já executou sinais nesta hora
-                        if hora_atual_key not in sinais_executados_hora:
-                            # Executar sinais apenas na janela segura (58s a 02s do próximo minuto)
-                            # Isso garante que executamos no momento certo, mesmo com pequenos atrasos
-                            if segundo >= 58 or segundo <= 2:
-                                ultima_execucao_hora = hora_str
-                                sinais_executados_hora.add(hora_atual_key)
-                                
-                                add_sinais_log(session_id, f"{len(sinais_agora)} sinal(is) encontrado(s) para {hora_str} (segundo: {segundo})", 'info')
-                                
-                                for sinal in sinais_agora:
-                                    # Verificar flag antes de processar cada sinal
-                                    if not sinais_execution['running']:
-                                        break
-                                    
-                                    # Verificar se deve pular sinais devido a perdas consecutivas
-                                    if session_id in losses_consecutivas and losses_consecutivas[session_id]['skip_count'] > 0:
-                                        losses_consecutivas[session_id]['skip_count'] -= 1
-                                        restantes = losses_consecutivas[session_id]['skip_count']
-                                        add_sinais_log(session_id, f"⏭️ Sinal pulado devido a perdas consecutivas: {sinal.timeframe};{sinal.ativo};{sinal.hora};{sinal.direcao} | Sinais restantes a pular: {restantes}", 'warning')
-                                        
-                                        if restantes == 0:
-                                            add_sinais_log(session_id, "✅ Período de pular sinais finalizado. Retomando execução normal.", 'info')
-                                        continue
-                                    
-                                    add_sinais_log(session_id, f"Executando sinal: {sinal.timeframe};{sinal.ativo};{sinal.hora};{sinal.direcao}", 'info')
-                                    sinais_execution['processed'] += 1
-                                    
-                                    if protection and not protection.can_operate():
-                                        break
-                                    
-                                    # Verificar flag novamente antes de continuar
-                                    if not sinais_execution['running']:
-                                        break
-                                    
-                                    # Calcular valor de entrada
-                                    saldo_atual = api.get_balance()
-                                    if entry_type == "PERCENT":
-                                        valor_entrada = saldo_atual * (entry_value / 100.0)
-                                    else:
-                                        valor_entrada = entry_value
-                                    
-                                    if protection:
-                                        if entry_type == "PERCENT":
-                                            valor_entrada = protection.calculate_safe_entry_value(entry_percent=entry_value)
-                                        else:
-                                            valor_entrada = protection.calculate_safe_entry_value(entry_fixed=entry_value)
-                                    
-                                    # Verificar saldo antes de executar
-                                    if saldo_atual < valor_entrada:
-                                        add_sinais_log(session_id, f"Saldo insuficiente! Necessário: ${valor_entrada:.2f} | Disponível: ${saldo_atual:.2f}", 'error')
-                                        continue
-                                    
-                                    # Converter timeframe
-                                    try:
-                                        minutos = int(sinal.timeframe[1:]) if sinal.timeframe.startswith('M') else int(sinal.timeframe[1:]) * 60
-                                    except:
-                                        add_sinais_log(session_id, f"Erro ao converter timeframe: {sinal.timeframe}", 'error')
-                                        continue
-                                    
-                                    # Executar
-                                    try:
-                                        add_sinais_log(session_id, f"Tentando executar: {sinal.ativo} {sinal.direcao} | Valor: ${valor_entrada:.2f} | Expiração: {minutos}min | Saldo: ${saldo_atual:.2f}", 'info')
-                                        resultado, order_id = api.buy(valor_entrada, sinal.ativo, sinal.direcao.lower(), minutos)
-                                        
-                                        if resultado:
-                                            add_sinais_log(session_id, f"Sinal executado com sucesso! Order ID: {order_id} | {sinal.ativo} {sinal.direcao} | Valor: ${valor_entrada:.2f}", 'success')
-                                            sinais_execution['executed'] += 1
-                                            balance = api.get_balance()
-                                            if protection:
-                                                protection.update_balance(balance)
-                                            
-                                            # Adicionar ao histórico
-                                            if session_id not in trade_history:
-                                                trade_history[session_id] = []
-                                            
-                                            trade_entry = {
-                                                'id': order_id,
-                                                'asset': sinal.ativo,
-                                                'direction': sinal.direcao,
-                                                'amount': valor_entrada,
-                                                'expiry': minutos,
-                                                'timestamp': datetime.now().isoformat(),
-                                                'status': 'pending',
-                                                'profit': 0,
-                                                'is_martingale': False,
-                                                'martingale_level': 0,
-                                                'parent_trade_id': None,
-                                                'sinal': f"{sinal.timeframe};{sinal.ativo};{sinal.hora};{sinal.direcao}"
-                                            }
-                                            
-                                            trade_history[session_id].insert(0, trade_entry)
-                                            if len(trade_history[session_id]) > 50:
-                                                trade_history[session_id] = trade_history[session_id][:50]
-                                            
-                                            # Verificar resultado após expiração
-                                            def check_sinal_result():
-                                                time.sleep(minutos * 60 + 5)
-                                                try:
-                                                    win, profit = api.check_win_v4(order_id)
-                                                    trade_updated = None
-                                                    
-                                                    for trade in trade_history.get(session_id, []):
-                                                        if trade['id'] == order_id:
-                                                            if win == "win":
-                                                                trade['status'] = 'win'
-                                                                trade['profit'] = float(profit) if profit else 0
-                                                            elif win == "loose":
-                                                                trade['status'] = 'loss'
-                                                                trade['profit'] = float(profit) if profit else 0
-                                                            else:
-                                                                trade['status'] = 'equal'
-                                                            
-                                                            trade_updated = trade
-                                                            break
-                                                    
-                                                    # Verificar perdas consecutivas após resultado (fora do loop)
-                                                    if trade_updated:
-                                                        # Para Gale 0: verificar imediatamente
-                                                        # Para Gale 1 e 2: só verificar se não vai ter Martingale
-                                                        current_martingale_level = trade_updated.get('martingale_level', 0)
-                                                        
-                                                        if gale_level == 0:
-                                                            # Sem Gale: verificar imediatamente após resultado
-                                                            verificar_e_atualizar_perdas_consecutivas(session_id, trade_updated['id'], gale_level)
-                                                        elif trade_updated['status'] != 'loss' or current_martingale_level >= gale_level:
-                                                            # Gale 1 ou 2: só verificar se não vai ter mais Martingales
-                                                            verificar_e_atualizar_perdas_consecutivas(session_id, trade_updated['id'], gale_level)
-                                                        
-                                                        # Aplicar Martingale automático se configurado
-                                                        if trade_updated['status'] == 'loss' and gale_level > 0:
-                                                            if current_martingale_level < gale_level:
-                                                                original_trade_id = trade_updated.get('parent_trade_id') or trade_updated['id']
-                                                                original_trade = None
-                                                                
-                                                                for t in trade_history.get(session_id, []):
-                                                                    if t['id'] == original_trade_id:
-                                                                        original_trade = t
-                                                                        break
-                                                                
-                                                                if not original_trade:
-                                                                    original_trade = trade_updated
-                                                                
-                                                                martingale_amount = trade_updated['amount'] * 2.15
-                                                                
-                                                                try:
-                                                                    new_result, new_order_id = api.buy(
-                                                                        martingale_amount,
-                                                                        trade_updated['asset'],
-                                                                        trade_updated['direction'].lower(),
-                                                                        trade_updated['expiry']
-                                                                    )
-                                                                    
-                                                                    if new_result:
-                                                                        balance = api.get_balance()
-                                                                        if protection:
-                                                                            protection.update_balance(balance)
-                                                                        
-                                                                        new_trade_entry = {
-                                                                            'id': new_order_id,
-                                                                            'asset': trade_updated['asset'],
-                                                                            'direction': trade_updated['direction'],
-                                                                            'amount': martingale_amount,
-                                                                            'expiry': trade_updated['expiry'],
-                                                                            'timestamp': datetime.now().isoformat(),
-                                                                            'status': 'pending',
-                                                                            'profit': 0,
-                                                                            'is_martingale': True,
-                                                                            'martingale_level': current_martingale_level + 1,
-                                                                            'parent_trade_id': original_trade['id'],
-                                                                            'sinal': trade_updated.get('sinal')
-                                                                        }
-                                                                        
-                                                                        trade_history[session_id].insert(0, new_trade_entry)
-                                                                        if len(trade_history[session_id]) > 50:
-                                                                            trade_history[session_id] = trade_history[session_id][:50]
-                                                                        
-                                                                        # Verificar resultado do Martingale
-                                                                        def check_martingale_sinal():
-                                                                            time.sleep(new_trade_entry['expiry'] * 60 + 5)
-                                                                            try:
-                                                                                win, profit = api.check_win_v4(new_order_id)
-                                                                                trade_to_update = None
-                                                                                
-                                                                                for trade in trade_history.get(session_id, []):
-                                                                                    if trade['id'] == new_order_id:
-                                                                                        if win == "win":
-                                                                                            trade['status'] = 'win'
-                                                                                            trade['profit'] = float(profit) if profit else 0
-                                                                                        elif win == "loose":
-                                                                                            trade['status'] = 'loss'
-                                                                                            trade['profit'] = float(profit) if profit else 0
-                                                                                        else:
-                                                                                            trade['status'] = 'equal'
-                                                                                        
-                                                                                        trade_to_update = trade
-                                                                                        break
-                                                                                
-                                                                                # Verificar perdas consecutivas após resultado do primeiro Martingale (Gale 1 ou se não vai ter mais)
-                                                                                if trade_to_update:
-                                                                                    if gale_level == 1:
-                                                                                        # Para Gale 1: verificar se não vai ter mais Martingales
-                                                                                        if trade_to_update['martingale_level'] >= gale_level or trade_to_update['status'] != 'loss':
-                                                                                            verificar_e_atualizar_perdas_consecutivas(session_id, original_trade['id'], gale_level)
-                                                                                    elif gale_level == 2:
-                                                                                        # Para Gale 2: verificar se não vai ter mais Martingales (se WIN ou se não vai ter segundo Martingale)
-                                                                                        if trade_to_update['status'] != 'loss' or trade_to_update['martingale_level'] >= gale_level:
-                                                                                            verificar_e_atualizar_perdas_consecutivas(session_id, original_trade['id'], gale_level)
-                                                                                
-                                                                                # Verificar se pode fazer mais um retry (Gale 2)
-                                                                                if trade_to_update and trade_to_update['status'] == 'loss':
-                                                                                    if trade_to_update['martingale_level'] < gale_level:
-                                                                                        martingale_amount2 = trade_to_update['amount'] * 2.15
-                                                                                        
-                                                                                        try:
-                                                                                            new_result2, new_order_id2 = api.buy(
-                                                                                                martingale_amount2,
-                                                                                                trade_to_update['asset'],
-                                                                                                trade_to_update['direction'].lower(),
-                                                                                                trade_to_update['expiry']
-                                                                                            )
-                                                                                            
-                                                                                            if new_result2:
-                                                                                                balance = api.get_balance()
-                                                                                                if protection:
-                                                                                                    protection.update_balance(balance)
-                                                                                                
-                                                                                                new_trade_entry2 = {
-                                                                                                    'id': new_order_id2,
-                                                                                                    'asset': trade_to_update['asset'],
-                                                                                                    'direction': trade_to_update['direction'],
-                                                                                                    'amount': martingale_amount2,
-                                                                                                    'expiry': trade_to_update['expiry'],
-                                                                                                    'timestamp': datetime.now().isoformat(),
-                                                                                                    'status': 'pending',
-                                                                                                    'profit': 0,
-                                                                                                    'is_martingale': True,
-                                                                                                    'martingale_level': trade_to_update['martingale_level'] + 1,
-                                                                                                    'parent_trade_id': original_trade['id'],
-                                                                                                    'sinal': trade_to_update.get('sinal')
-                                                                                                }
-                                                                                                
-                                                                                                trade_history[session_id].insert(0, new_trade_entry2)
-                                                                                                if len(trade_history[session_id]) > 50:
-                                                                                                    trade_history[session_id] = trade_history[session_id][:50]
-                                                                                                
-                                                                                                # Verificar resultado final
-                                                                                                def check_final_sinal():
-                                                                                                    time.sleep(new_trade_entry2['expiry'] * 60 + 5)
-                                                                                                    try:
-                                                                                                        win, profit = api.check_win_v4(new_order_id2)
-                                                                                                        for trade in trade_history.get(session_id, []):
-                                                                                                            if trade['id'] == new_order_id2:
-                                                                                                                if win == "win":
-                                                                                                                    trade['status'] = 'win'
-                                                                                                                    trade['profit'] = float(profit) if profit else 0
-                                                                                                                elif win == "loose":
-                                                                                                                    trade['status'] = 'loss'
-                                                                                                                    trade['profit'] = float(profit) if profit else 0
-                                                                                                                else:
-                                                                                                                    trade['status'] = 'equal'
-                                                                                                                break
-                                                                                                        
-                                                                                                        # Verificar perdas consecutivas após resultado do segundo Martingale (Gale 2)
-                                                                                                        verificar_e_atualizar_perdas_consecutivas(session_id, original_trade['id'], gale_level)
-                                                                                                    except:
-                                                                                                        pass
-                                                                                                
-                                                                                                final_thread = threading.Thread(target=check_final_sinal, daemon=True)
-                                                                                                final_thread.start()
-                                                                                        except Exception as e:
-                                                                                            add_sinais_log(session_id, f"Erro ao executar segundo Martingale de sinal: {e}", 'error')
-                                                                            except Exception as e:
-                                                                                add_sinais_log(session_id, f"Erro ao verificar resultado do primeiro Martingale: {e}", 'error')
-                                                                        
-                                                                        martingale_thread = threading.Thread(target=check_martingale_sinal, daemon=True)
-                                                                        martingale_thread.start()
-                                                                except Exception as e:
-                                                                    add_sinais_log(session_id, f"Erro ao executar Martingale automático de sinal: {e}", 'error')
-                                                except Exception as e:
-                                                    add_sinais_log(session_id, f"Erro ao verificar resultado do sinal: {e}", 'error')
-                                            
-                                            thread_check = threading.Thread(target=check_sinal_result, daemon=True)
-                                            thread_check.start()
-                                        else:
-                                            # Tentar obter mais informações sobre o erro
-                                            error_msg = f"Falha ao executar sinal: {sinal.timeframe};{sinal.ativo};{sinal.hora};{sinal.direcao}"
-                                            if order_id:
-                                                error_msg += f" | Resposta da API: {order_id}"
-                                            else:
-                                                error_msg += " | A API retornou False (sem order_id)"
-                                            
-                                            # Verificar possíveis causas
-                                            if saldo_atual < valor_entrada:
-                                                error_msg += f" | Saldo insuficiente (${saldo_atual:.2f})"
-                                            
-                                            add_sinais_log(session_id, error_msg, 'error')
-                                    except Exception as e:
-                                        add_sinais_log(session_id, f"Erro ao executar sinal {sinal.timeframe};{sinal.ativo};{sinal.hora};{sinal.direcao}: {str(e)}", 'error')
+                        if restantes == 0:
+                            add_sinais_log(session_id, "✅ Período de pular sinais finalizado. Retomando execução normal.", 'info')
+                        continue
                 
-                # Verificar flag antes de atualizar próximo sinal
-                if not sinais_execution['running']:
-                    break
+                    atualizar_execucao(processed=sinais_execution['processed'] + 1)
                 
-                # Atualizar próximo sinal
-                proximos = processor.obter_proximos_sinais(1)
-                if proximos:
-                    sinais_execution['next_sinal'] = f"{proximos[0].hora} - {proximos[0].ativo} ({proximos[0].direcao})"
-                else:
-                    sinais_execution['next_sinal'] = "Nenhum sinal futuro"
+                    if protection and not protection.can_operate(exposicao):
+                        add_sinais_log(session_id, "Stop Loss acionado - parando execução", 'warning')
+                        parar_execucao()
+                        break
                 
-                # Sleep curto para permitir resposta rápida ao comando de parar
-                # Dividir em pequenos intervalos para verificar a flag mais frequentemente
-                for _ in range(10):  # 10 x 0.1s = 1s total
+                    # Verificar flag novamente antes de continuar
                     if not sinais_execution['running']:
                         break
-                    time.sleep(0.1)
                 
+                    # Usar a ordem armada antes do minuto; se não houver, armar agora
+                    preparado = evento.preparados.pop(chave_sinal(sinal), None)
+                    if preparado is None:
+                        preparado = armar_sinal(session_id, api, sinal, entry_type, entry_value, protection, alvo)
+                        if preparado is None:
+                            continue
+                
+                    # Saldo menos a exposição pendente (e a do próprio lote) não pode cruzar o Stop Loss
+                    if protection and not protection.can_operate(exposicao + preparado['valor']):
+                        add_sinais_log(session_id, f"Stop Loss: sinal {sinal.ativo} {sinal.direcao} bloqueado (exposição pendente ${protection.pending_exposure + exposicao:.2f})", 'warning')
+                        continue
+                    exposicao += preparado['valor']
+                    lote.append((sinal, preparado))
+                
+                if lote:
+                    enviar_lote(evento.hora, lote)
+                atualizar_proximo_sinal()
+            
+            def enviar_lote(rotulo, lote):
+                """Escreve todas as ordens no socket sem esperar respostas; cada resposta é tratada no pool."""
+                try:
+                    futures = api.fire_armed_batch(
+                        [preparado['ordem'] for _, preparado in lote],
+                        max_delay=prazo_envio,
+                        trigger_time=time.monotonic()
+                    )
+                except Exception as e:
+                    add_sinais_log(session_id, f"Erro ao enviar ordens: {e}", 'error')
+                    return
+                
+                relatorio = api.batch_report([preparado['ordem'] for _, preparado in lote])
+                mensagem = f"Lote {rotulo}: {relatorio['sent']}/{len(lote)} ordem(ns) enviada(s)"
+                if relatorio['sent']:
+                    mensagem += (f" | Defasagem primeira→última {relatorio['skew_ms']:.1f} ms"
+                                 f" | Envio {relatorio['delay_min_ms']:+.0f} a {relatorio['delay_max_ms']:+.0f} ms em relação ao alvo")
+                if relatorio['skipped']:
+                    mensagem += f" | {relatorio['skipped']} pulada(s) por atraso acima de {prazo_envio:.1f}s"
+                add_sinais_log(session_id, mensagem, 'warning' if relatorio['skipped'] else 'info')
+                
+                for (sinal, preparado), future in zip(lote, futures):
+                    future.add_done_callback(
+                        lambda f, sinal=sinal, preparado=preparado: resultados_executor.submit(ao_enviar_ordem, sinal, preparado, f)
+                    )
+            
+            def ao_enviar_ordem(sinal, preparado, future):
+                """Resposta do servidor a uma ordem do lote."""
+                valor_entrada = preparado['valor']
+                minutos = preparado['minutos']
+                saldo_atual = preparado['saldo']
+                try:
+                    resultado, order_id = future.result()
+                    if not resultado and order_id == 'late':
+                        add_sinais_log(session_id, f"Sinal {sinal.ativo} {sinal.direcao} pulado: prazo de envio de {prazo_envio:.1f}s excedido", 'warning')
+                        return
+                    
+                    atraso_ms = preparado['ordem'].send_delay * 1000
+                    alvo_str = datetime.fromtimestamp(preparado['ordem'].target_timestamp).strftime('%H:%M:%S')
+                    add_sinais_log(session_id, f"Ordem enviada: {sinal.ativo} {sinal.direcao} | Valor: ${valor_entrada:.2f} | Expiração: {minutos}min | Saldo: ${saldo_atual:.2f} | Envio {atraso_ms:+.0f} ms em relação ao alvo {alvo_str}", 'info')
+                    
+                    if resultado:
+                        add_sinais_log(session_id, f"Sinal executado com sucesso! Order ID: {order_id} | {sinal.ativo} {sinal.direcao} | Valor: ${valor_entrada:.2f}", 'success',
+                                       order_id=order_id, asset=sinal.ativo)
+                        atualizar_execucao(executed=sinais_execution['executed'] + 1)
+                        balance = api.get_balance()
+                        if protection:
+                            protection.add_pending(order_id, valor_entrada)
+                            protection.update_balance(balance)
+                    
+                        # Adicionar ao histórico
+                        trade_entry = {
+                            'id': order_id,
+                            'asset': sinal.ativo,
+                            'direction': sinal.direcao,
+                            'amount': valor_entrada,
+                            'expiry': minutos,
+                            'timestamp': datetime.now().isoformat(),
+                            'status': 'pending',
+                            'profit': 0,
+                            'is_martingale': False,
+                            'martingale_level': 0,
+                            'parent_trade_id': None,
+                            'sinal': f"{sinal.timeframe};{sinal.ativo};{sinal.hora};{sinal.direcao}"
+                        }
+                    
+                        registrar_trade(session_id, trade_entry)
+                        publicar_stop_loss(session_id)
+                    
+                        acompanhar_resultado(session_id, api, trade_entry, ao_resultado_sinal)
+                    else:
+                        # Tentar obter mais informações sobre o erro
+                        error_msg = f"Falha ao executar sinal: {sinal.timeframe};{sinal.ativo};{sinal.hora};{sinal.direcao}"
+                        if order_id:
+                            error_msg += f" | Resposta da API: {order_id}"
+                        else:
+                            error_msg += " | A API retornou False (sem order_id)"
+                    
+                        # Verificar possíveis causas
+                        if saldo_atual < valor_entrada:
+                            error_msg += f" | Saldo insuficiente (${saldo_atual:.2f})"
+                    
+                        add_sinais_log(session_id, error_msg, 'error')
+                except Exception as e:
+                    add_sinais_log(session_id, f"Erro ao executar sinal {sinal.timeframe};{sinal.ativo};{sinal.hora};{sinal.direcao}: {str(e)}", 'error')
+            
+            def evento_perdido(evento, atraso):
+                add_sinais_log(session_id, f"{len(evento.sinais)} sinal(is) de {evento.hora} não disparado(s): atraso de {atraso:.1f}s", 'warning')
+            
+            versao_agendada = processor.versao
+            
+            def recarregar():
+                # Verificar a cada minuto se o arquivo mudou (só relê as linhas alteradas)
+                nonlocal versao_agendada
+                try:
+                    processor.carregar_sinais()
+                except Exception as e:
+                    add_sinais_log(session_id, f"Erro ao recarregar sinais: {e}", 'error')
+                    return None
+                if processor.versao == versao_agendada:
+                    return None
+                versao_agendada = processor.versao
+                return processor.obter_todos_sinais()
+            
+            # Heap de eventos por instante: dorme até o próximo sinal em vez de acordar a cada 100 ms
+            agendador = AgendadorSinais(
+                armar_evento,
+                disparar_evento,
+                antecedencia=arm_lead,
+                deslocamento=deslocamento,
+                offset_servidor=api.get_server_offset,
+                relogio=getattr(api, 'clock', None),
+                chave=chave_sinal,
+                ao_perder=evento_perdido
+            )
+            agendador.carregar(sinais)
+            sinais_execution['agendador'] = agendador
+            atualizar_proximo_sinal()
+            
+            add_sinais_log(session_id, f"Execução iniciada às {datetime.now().strftime('%H:%M:%S')}", 'info')
+            
+            if protection and not protection.can_operate():
+                add_sinais_log(session_id, "Stop Loss acionado - parando execução", 'warning')
+                parar_execucao()
+            
+            if sinais_execution['running']:
+                agendador.executar(recarregar)
         except Exception as e:
             add_sinais_log(session_id, f"Erro na execução de sinais: {e}", 'error')
         finally:
             add_sinais_log(session_id, "Execução de sinais finalizada", 'info')
-            sinais_execution['running'] = False
+            sinais_execution['agendador'] = None
+            atualizar_execucao(running=False)
     
     thread = threading.Thread(target=executar_sinais_thread, daemon=True)
     thread.start()
@@ -1566,7 +1610,7 @@ def api_executar_sinais():
     
     add_sinais_log(session_id, "Solicitação de início de execução recebida", 'info')
     
-    return jsonify({'success': True, 'message': 'Execução de sinais iniciada'})
+    return {'success': True, 'message': 'Execução de sinais iniciada'}, 200
 
 
 @app.route('/api/sinais/stop', methods=['POST'])
@@ -1575,24 +1619,24 @@ def api_stop_sinais():
     if 'logged_in' not in session or not session.get('logged_in'):
         return jsonify({'error': 'Não autenticado'}), 401
     
-    session_id = session.get('session_id')
-    add_sinais_log(session_id, "Parando execução de sinais...", 'warning')
-    sinais_execution['running'] = False
+    chamar_bot('parar_sinais', session.get('session_id'))
     return jsonify({'success': True, 'message': 'Execução de sinais parada'})
 
 
+def parar_sinais(session_id):
+    add_sinais_log(session_id, "Parando execução de sinais...", 'warning')
+    atualizar_execucao(running=False)
+    if sinais_execution['agendador'] is not None:
+        sinais_execution['agendador'].parar()
+
+
 @app.route('/api/sinais/status', methods=['GET'])
 def api_sinais_status():
     """API para obter status da execução de sinais."""
     if 'logged_in' not in session or not session.get('logged_in'):
         return jsonify({'error': 'Não autenticado'}), 401
     
-    return jsonify({
-        'running': sinais_execution['running'],
-        'processed': sinais_execution['processed'],
-        'executed': sinais_execution['executed'],
-        'next_sinal': sinais_execution['next_sinal']
-    })
+    return jsonify(chamar_bot('status_execucao'))
 
 
 @app.route('/api/sinais/logs', methods=['GET'])
@@ -1601,10 +1645,11 @@ def api_sinais_logs():
     if 'logged_in' not in session or not session.get('logged_in'):
         return jsonify({'error': 'Não autenticado'}), 401
     
-    session_id = session.get('session_id')
-    logs = sinais_logs.get(session_id, [])
-    
-    return jsonify({'logs': logs})
+    return jsonify({'logs': chamar_bot('logs_sinais', session.get('session_id'))})
+
+
+def logs_sinais(session_id):
+    return sinais_logs.listar(session_id)
 
 
 @app.route('/api/trade/history', methods=['GET'])
@@ -1612,34 +1657,162 @@ def api_trade_history():
     if 'logged_in' not in session or not session.get('logged_in'):
         return jsonify({'error': 'Não autenticado'}), 401
     
+    filtros = {campo: request.args.get(campo) for campo in ('asset', 'status', 'inicio', 'fim')}
+    limite = parse_int_value(request.args.get('limite'), default=50, field_name='Limite')
+    offset = parse_int_value(request.args.get('offset'), default=0, field_name='Offset')
+    return jsonify(chamar_bot('historico_trades', session.get('session_id'), limite=limite, offset=offset, **filtros))
+
+
+def historico_trades(session_id, limite=50, offset=0, asset=None, status=None, inicio=None, fim=None):
+    """
+    Página do histórico de operações da sessão (mais recentes primeiro).
+
+    Filtros opcionais por ativo, status e intervalo de horário (ISO 8601);
+    `limite` até 500 operações por página.
+    """
+    # Só leitura: os resultados são gravados no diário por quem os recebe
+    # (push socket-option-closed ou reconciliação em lote da conta)
+    history, total = diario.listar(session_id, limite=limite, offset=offset, asset=asset,
+                                   status=status, inicio=inicio, fim=fim)
+    
+    return {
+        'history': history,
+        'total': total,
+        'limite': min(max(limite, 1), diario_trades_module.LIMITE_MAXIMO),
+        'offset': offset,
+    }
+
+
+@app.route('/api/eventos')
+def api_eventos():
+    """
+    Canal Server-Sent Events da sessão: saldo, operações, logs, status dos sinais e Stop Loss.
+
+    Substitui o polling das páginas; o navegador reconecta sozinho enviando
+    `Last-Event-ID` e recebe os eventos perdidos (ou `reset` para recarregar as listas).
+    """
+    if 'logged_in' not in session or not session.get('logged_in'):
+        return jsonify({'error': 'Não autenticado'}), 401
+    
     session_id = session.get('session_id')
-    history = trade_history.get(session_id, [])
+    ultimo_id = request.headers.get('Last-Event-ID') or request.args.get('ultimo_id')
+    try:
+        ultimo_id = int(ultimo_id) if ultimo_id else None
+    except ValueError:
+        ultimo_id = None
+    heartbeat = parse_float_value(os.getenv('IQ_OPTION_SSE_HEARTBEAT'), default=15, field_name='Heartbeat SSE')
+    
+    # Sem vaga: 503 fecha o EventSource e a página volta ao polling, deixando
+    # threads livres para as demais rotas
+    if not vagas_fluxos_sse.acquire(blocking=False):
+        return jsonify({'error': 'Limite de conexões de eventos atingido'}), 503
+    
+    resposta = Response(
+        transmitir_eventos(session_id, ultimo_id, heartbeat),
+        mimetype='text/event-stream',
+        headers={
+            'Cache-Control': 'no-cache',
+            'X-Accel-Buffering': 'no'  # nginx: entregar cada evento sem bufferizar
+        }
+    )
+    resposta.call_on_close(vagas_fluxos_sse.release)
+    return resposta
+
+
+def transmitir_eventos(session_id, ultimo_id, heartbeat):
+    """Corpo text/event-stream: cada trecho vem do canal de eventos (no broker, se houver)."""
+    token = chamar_bot('abrir_eventos', session_id, ultimo_id, heartbeat)
+    try:
+        while True:
+            trecho = chamar_bot('proximo_evento', token)
+            if trecho is None:
+                return
+            yield trecho
+    finally:
+        try:
+            chamar_bot('fechar_eventos', token)
+        except ErroBroker:
+            pass
+
+
+# Conexões SSE abertas: {token: [gerador de canal_eventos.transmitir, último acesso]}
+fluxos_eventos = {}
+fluxos_lock = threading.Lock()
+
+
+def abrir_eventos(session_id, ultimo_id, heartbeat):
+    """Abre um fluxo de eventos da sessão e devolve seu token."""
+    agora = time.time()
+    with fluxos_lock:
+        # Fluxos de workers que morreram sem fechar: parados há muito mais que um heartbeat
+        abandonados = [token for token, (_, acesso) in fluxos_eventos.items() if agora - acesso > heartbeat * 2 + 60]
+        fluxos = [fluxos_eventos.pop(token)[0] for token in abandonados]
+        token = uuid.uuid4().hex
+        fluxos_eventos[token] = [canal_eventos.transmitir(session_id, ultimo_id, heartbeat=heartbeat), agora]
+    for gerador in fluxos:
+        gerador.close()
+    return token
+
+
+def proximo_evento(token):
+    """Próximo trecho do fluxo (espera até um heartbeat); None quando o canal foi encerrado."""
+    fluxo = fluxos_eventos.get(token)
+    if fluxo is None:
+        return None
+    fluxo[1] = time.time()
+    try:
+        return next(fluxo[0])
+    except StopIteration:
+        return None
+    finally:
+        fluxo[1] = time.time()
+
+
+def fechar_eventos(token):
+    with fluxos_lock:
+        fluxo = fluxos_eventos.pop(token, None)
+    if fluxo is not None:
+        fluxo[0].close()
+
+
+@app.route('/api/latency', methods=['GET'])
+def api_latency():
+    """API para consultar histogramas de latência das ordens (por ativo e por instrumento)."""
+    if 'logged_in' not in session or not session.get('logged_in'):
+        return jsonify({'error': 'Não autenticado'}), 401
     
-    # Verificar resultados de trades pendentes
-    api = get_api_instance()
-    if api:
-        import threading
-        def update_pending_trades():
-            for trade in history:
-                if trade['status'] == 'pending':
-                    try:
-                        win, profit = api.check_win_v4(trade['id'])
-                        if win == "win":
-                            trade['status'] = 'win'
-                            trade['profit'] = float(profit) if profit else 0
-                        elif win == "loose":
-                            trade['status'] = 'loss'
-                            trade['profit'] = float(profit) if profit else 0
-                        elif win:
-                            trade['status'] = 'equal'
-                    except:
-                        pass
-        
-        # Executar em thread separada para não bloquear
-        thread = threading.Thread(target=update_pending_trades, daemon=True)
-        thread.start()
+    return resposta_bot(
+        'estatisticas_latencia',
+        session.get('session_id'),
+        asset=request.args.get('asset'),
+        instrument_type=request.args.get('instrument_type'),
+        recent=parse_int_value(request.args.get('recent'), default=20, field_name='recent')
+    )
+
+
+def estatisticas_latencia(session_id, asset=None, instrument_type=None, recent=20):
+    api = get_api_instance(session_id)
+    if not api:
+        return {'error': 'API não disponível'}, 400
+    
+    stats = api.order_tracer.snapshot(asset=asset, instrument_type=instrument_type)
+    stats['recent'] = api.order_tracer.recent(recent)
+    stats['batches'] = api.order_tracer.recent_batches()
+    return stats, 200
+
+
+@app.route('/api/connections', methods=['GET'])
+def api_connections():
+    """API para consultar o gerenciador de conexões (totais, memória estimada e a conexão da sessão)."""
+    if 'logged_in' not in session or not session.get('logged_in'):
+        return jsonify({'error': 'Não autenticado'}), 401
     
-    return jsonify({'history': history})
+    return resposta_bot('estatisticas_conexoes', session.get('session_id'))
+
+
+def estatisticas_conexoes(session_id):
+    """Totais do gerenciador de conexões e a conexão da sessão."""
+    return conexoes.estatisticas(session_id), 200
 
 
 @app.route('/api/trade/check', methods=['POST'])
@@ -1654,36 +1827,167 @@ def api_check_trade():
     if not order_id:
         return jsonify({'error': 'order_id é obrigatório'}), 400
     
-    api = get_api_instance()
+    return resposta_bot('verificar_trade', session.get('session_id'), order_id)
+
+
+def verificar_trade(session_id, order_id):
+    """
+    Estado do trade no diário (não espera o resultado).
+
+    Resultados chegam por push (socket-option-closed) ou pela reconciliação em
+    lote da conta; se o push já chegou e ainda não foi aplicado, aplica aqui.
+    """
+    api = get_api_instance(session_id)
     if not api:
-        return jsonify({'error': 'API não disponível'}), 400
-    
-    try:
-        win, profit = api.check_win_v4(order_id)
-        
-        session_id = session.get('session_id')
-        # Atualizar histórico
-        for trade in trade_history.get(session_id, []):
-            if trade['id'] == order_id:
-                if win == "win":
-                    trade['status'] = 'win'
-                    trade['profit'] = float(profit) if profit else 0
-                elif win == "loose":
-                    trade['status'] = 'loss'
-                    trade['profit'] = float(profit) if profit else 0
-                else:
-                    trade['status'] = 'equal'
-                
-                return jsonify({
-                    'success': True,
-                    'status': trade['status'],
-                    'profit': trade['profit'],
-                    'win': win
-                })
-        
-        return jsonify({'success': False, 'error': 'Trade não encontrado no histórico'}), 404
-    except Exception as e:
-        return jsonify({'success': False, 'error': str(e)}), 500
+        return {'error': 'API não disponível'}, 400
+    
+    trade = diario.obter(session_id, order_id)
+    if not trade:
+        return {'success': False, 'error': 'Trade não encontrado no histórico'}, 404
+    
+    win = None
+    if trade['status'] == 'pending':
+        resultado = api.get_option_result(order_id)
+        if resultado:
+            win = resultado[0]
+            trade = atualizar_trade(session_id, order_id, *resultado)
+    
+    return {
+        'success': True,
+        'status': trade['status'],
+        'profit': trade['profit'],
+        'win': win or {'loss': 'loose'}.get(trade['status'], trade['status'])
+    }, 200
+
+
+# ============================================================================
+# Métricas (Prometheus)
+#
+# /metrics junta o registro da biblioteca no processo dono das conexões
+# (websocket, clientes e o estado do bot abaixo; no broker com gunicorn) com
+# as métricas web deste processo (cada worker tem as suas, rótulo pid).
+# ============================================================================
+
+metricas_web = metrics_module.Registry()
+requisicoes_web = metrics_module.Counter(
+    'web_requests_total', 'Requisições atendidas, por rota, método e status.',
+    ('endpoint', 'method', 'status', 'pid'), registry=metricas_web)
+duracao_web = metrics_module.Histogram(
+    'web_request_seconds', 'Tempo até a resposta (em /api/eventos, só a abertura do fluxo).',
+    ('endpoint', 'pid'), buckets=(0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10), registry=metricas_web)
+andamento_web = metrics_module.Gauge(
+    'web_requests_in_progress', 'Requisições em andamento, incluindo fluxos SSE abertos.', ('pid',),
+    registry=metricas_web)
+
+
+def rota_metricas():
+    # Regra da rota (não o caminho) para não criar uma série por URL
+    return request.url_rule.rule if request.url_rule is not None else 'desconhecida'
+
+
+@app.before_request
+def iniciar_metricas_requisicao():
+    g.inicio_requisicao = time.perf_counter()
+    andamento_web.inc(os.getpid())
+
+
+@app.after_request
+def registrar_metricas_requisicao(response):
+    inicio = g.pop('inicio_requisicao', None)
+    if inicio is not None:
+        pid = os.getpid()
+        rota = rota_metricas()
+        requisicoes_web.inc(rota, request.method, response.status_code, pid)
+        duracao_web.observe(time.perf_counter() - inicio, rota, pid)
+    return response
+
+
+@app.teardown_request
+def encerrar_metricas_requisicao(exc=None):
+    andamento_web.dec(os.getpid())
+
+
+def coletar_metricas_bot():
+    """Estado do bot neste processo: conexões, sessões, execução de sinais, eventos e dicionários por sessão."""
+    MetricFamily = metrics_module.MetricFamily
+    totais = conexoes.estatisticas()
+    conexoes_abertas = MetricFamily('bot_connections', 'gauge', 'Conexões com a IQ Option, por estado.')
+    conexoes_abertas.add(totais['connections'] - totais['warm'], {'state': 'active'})
+    conexoes_abertas.add(totais['warm'], {'state': 'warm'})
+    sessoes = MetricFamily('bot_sessions', 'gauge', 'Sessões associadas a uma conexão.').add(totais['sessions'])
+    memoria = MetricFamily('bot_connection_memory_bytes', 'gauge', 'Memória estimada da conexão (última varredura).')
+    ociosa = MetricFamily('bot_connection_idle_seconds', 'gauge', 'Segundos desde o último uso da conexão.')
+    for (email, account_type), resumo in conexoes.listar():
+        rotulos = {'account': metrics_module.account_id(email), 'account_type': account_type}
+        memoria.add(resumo['memory_bytes'], rotulos)
+        ociosa.add(resumo['idle'], rotulos)
+
+    execucao = MetricFamily('bot_signals_running', 'gauge', '1 com a execução de sinais ativa.')
+    execucao.add(1 if sinais_execution['running'] else 0)
+    sinais = MetricFamily('bot_signals', 'gauge', 'Sinais da execução atual, por situação.')
+    sinais.add(sinais_execution['processed'], {'kind': 'processed'})
+    sinais.add(sinais_execution['executed'], {'kind': 'executed'})
+
+    sessoes_eventos, assinantes = canal_eventos.totais()
+    eventos = MetricFamily('bot_event_subscribers', 'gauge', 'Páginas conectadas a /api/eventos.').add(assinantes)
+    diario_pendentes = MetricFamily('bot_journal_pending', 'gauge', 'Operações no buffer do diário ainda não gravadas.')
+    diario_pendentes.add(diario.pendentes())
+    estado = MetricFamily('bot_state_entries', 'gauge', 'Entradas dos dicionários de estado por sessão.')
+    for nome, tamanho in (
+        ('stop_loss_protections', len(stop_loss_protections)),
+        ('saldos_iniciais', len(saldos_iniciais)),
+        ('losses_consecutivas', len(losses_consecutivas)),
+        ('assinaturas_eventos', len(assinaturas_eventos)),
+        ('sinais_logs', len(sinais_logs)),
+        ('canal_eventos', sessoes_eventos),
+        ('fluxos_eventos', len(fluxos_eventos)),
+    ):
+        estado.add(tamanho, {'dict': nome})
+    return [conexoes_abertas, sessoes, memoria, ociosa, execucao, sinais, eventos, diario_pendentes, estado]
+
+
+metrics_module.REGISTRY.register_collector(coletar_metricas_bot)
+
+
+def texto_metricas():
+    """Registro da biblioteca neste processo no formato de texto do Prometheus."""
+    return metrics_module.REGISTRY.render()
+
+
+def metricas_locais():
+    """True para requisições de loopback sem proxy na frente (o nginx acrescenta X-Forwarded-For)."""
+    if request.headers.get('X-Forwarded-For') or request.headers.get('X-Real-IP'):
+        return False
+    return request.remote_addr in ('127.0.0.1', '::1')
+
+
+@app.route('/metrics', methods=['GET'])
+def metrics():
+    """
+    Métricas Prometheus. Com IQ_OPTION_METRICS_TOKEN exige `Authorization: Bearer <token>`;
+    sem ele, só responde a acessos diretos da própria máquina (não via nginx).
+    """
+    token = os.getenv('IQ_OPTION_METRICS_TOKEN')
+    if token:
+        if not hmac.compare_digest(request.headers.get('Authorization', ''), f'Bearer {token}'):
+            return jsonify({'error': 'Não autorizado'}), 401
+    elif not metricas_locais():
+        return jsonify({'error': 'Defina IQ_OPTION_METRICS_TOKEN para acessar as métricas'}), 403
+    
+    texto = chamar_bot('texto_metricas') + metricas_web.render()
+    return Response(texto, mimetype='text/plain; version=0.0.4; charset=utf-8')
+
+
+# Operações que as rotas chamam via chamar_bot (executadas no broker com gunicorn)
+OPERACOES = {
+    operacao.__name__: operacao
+    for operacao in (
+        sessao_conectada, conectar_sessao, encerrar_sessao, consultar_saldo, status_stop_loss,
+        catalogo_ativos, executar_trade, iniciar_sinais, parar_sinais, status_execucao,
+        logs_sinais, historico_trades, abrir_eventos, proximo_evento, fechar_eventos,
+        estatisticas_latencia, verificar_trade, estatisticas_conexoes, texto_metricas,
+    )
+}
 
 
 if __name__ == '__main__':
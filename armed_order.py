@@ -0,0 +1,105 @@
+"""Module for IQ Option pre-armed binary option orders."""
+
+import json
+import time
+
+REQUEST_ID_PLACEHOLDER = "__REQUEST_ID__"
+
+
+class ArmedOrder(object):
+    """Binary option order resolved ahead of its trigger instant.
+
+    Everything that does not depend on the exact send time (asset id,
+    option type, expiration, stake and the serialized
+    ``binary-options.open-option`` frame) is computed when the order is
+    armed. Firing it only patches the request id into the frame and writes
+    it to the socket.
+    """
+
+    __slots__ = ("active", "active_id", "price", "direction", "duration",
+                 "option_type_id", "expired", "balance_id", "payout",
+                 "target_timestamp", "armed_at", "sent_at", "request_id",
+                 "_frame_head", "_frame_tail")
+
+    def __init__(self, active, active_id, price, direction, duration,
+                 option_type_id, expired, balance_id, target_timestamp,
+                 payout=None):
+        """
+        :param str active: The asset name (e.g. "EURUSD-OTC").
+        :param int active_id: The asset id from :mod:`constants`.
+        :param float price: The stake.
+        :param str direction: "call" or "put".
+        :param int duration: The expiration in minutes.
+        :param int option_type_id: 3 for turbo, 1 for binary.
+        :param int expired: The expiration timestamp sent to the server.
+        :param int balance_id: The user balance id.
+        :param float target_timestamp: Local instant the order should be sent at.
+        :param float payout: (optional) The payout (0-1) seen when arming.
+        """
+        self.active = active
+        self.active_id = int(active_id)
+        self.price = float(price)
+        self.direction = direction.lower()
+        self.duration = int(duration)
+        self.option_type_id = int(option_type_id)
+        self.expired = int(expired)
+        self.balance_id = int(balance_id)
+        self.payout = payout
+        self.target_timestamp = float(target_timestamp)
+        self.armed_at = time.time()
+        self.sent_at = None
+        self.request_id = None
+
+        frame = json.dumps({
+            "name": "sendMessage",
+            "msg": {
+                "body": {"price": self.price,
+                         "active_id": self.active_id,
+                         "expired": self.expired,
+                         "direction": self.direction,
+                         "option_type_id": self.option_type_id,
+                         "user_balance_id": self.balance_id
+                         },
+                "name": "binary-options.open-option",
+                "version": "1.0"
+            },
+            "request_id": REQUEST_ID_PLACEHOLDER
+        })
+        self._frame_head, self._frame_tail = frame.split(
+            '"' + REQUEST_ID_PLACEHOLDER + '"')
+
+    def frame(self, request_id):
+        """Return the serialized frame for ``request_id``."""
+        return self._frame_head + '"' + str(request_id) + '"' + self._frame_tail
+
+    @property
+    def send_delay(self):
+        """Seconds between the target instant and the socket write (None if not sent)."""
+        if self.sent_at is None:
+            return None
+        return self.sent_at - self.target_timestamp
+
+    def __repr__(self):
+        return "ArmedOrder({} {} {} {}m @ {})".format(
+            self.active, self.direction, self.price, self.duration,
+            int(self.target_timestamp))
+
+
+def batch_report(orders):
+    """Send skew of :class:`ArmedOrder` objects fired as one batch.
+
+    Returns a dict with ``sent``, ``skipped`` (never written), ``skew_ms``
+    (first to last socket write) and ``delay_min_ms`` / ``delay_max_ms``
+    (socket write relative to the target instant); timings are None when
+    nothing was sent.
+    """
+    sent = [order for order in orders if order.sent_at is not None]
+    report = {"sent": len(sent), "skipped": len(orders) - len(sent),
+              "skew_ms": None, "delay_min_ms": None, "delay_max_ms": None}
+    if sent:
+        writes = [order.sent_at for order in sent]
+        delays = [order.send_delay * 1000.0 for order in sent]
+        report["skew_ms"] = (max(writes) - min(writes)) * 1000.0
+        report["delay_min_ms"] = min(delays)
+        report["delay_max_ms"] = max(delays)
+    return report
@@ -0,0 +1,241 @@
+"""
+ASGI entry point (uvicorn) para muitas páginas abertas num só processo
+Alternativa ao `wsgi.py` + gunicorn gthread, onde cada página aberta prende
+uma thread (a conexão SSE de `/api/eventos`) no worker e outra no broker.
+
+Aqui um único processo asyncio:
+
+- atende `/api/eventos` de forma nativa: cada conexão é só uma tarefa
+  esperando o canal de eventos (`CanalEventos.transmitir_async`), sem thread;
+- executa as demais rotas do Flask, sem alterações, num pool limitado de
+  threads (`ASGI_THREADS`, padrão 32), então chamadas lentas à IQ Option
+  (login, saldo, compra) nunca bloqueiam o loop;
+- é ele mesmo o dono das conexões e do estado do bot (como o `broker.py`):
+  não há broker nem workers, e `IQ_OPTION_BROKER_SOCKET` é ignorado.
+
+Rode sempre com um único worker:
+    uvicorn asgi:app --host 127.0.0.1 --port 8000 --workers 1 --limit-concurrency 10000
+
+Comparação de carga com o modo WSGI: examples/teste_carga_web.py
+"""
+
+import asyncio
+import io
+import os
+import sys
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Callable, Dict, List, Optional, Tuple
+from urllib.parse import parse_qs
+
+# Mesmo cuidado do wsgi.py: o diretório http/ não pode sombrear o módulo http padrão
+current_dir = os.path.dirname(os.path.abspath(__file__))
+parent_dir = os.path.dirname(current_dir)
+if parent_dir not in sys.path:
+    sys.path.insert(0, parent_dir)
+while current_dir in sys.path:
+    sys.path.remove(current_dir)
+
+# Este processo executa as operações do bot localmente (ver chamar_bot em app.py)
+os.environ.pop('IQ_OPTION_BROKER_SOCKET', None)
+
+import importlib.util
+
+app_path = os.path.join(current_dir, 'app.py')
+spec = importlib.util.spec_from_file_location('app', app_path)
+app_module = importlib.util.module_from_spec(spec)
+sys.modules.setdefault('app', app_module)
+spec.loader.exec_module(app_module)
+
+from werkzeug.http import parse_cookie
+
+flask_app = app_module.app
+
+Mensagem = Dict[str, Any]
+Receber = Callable[[], Any]
+Enviar = Callable[[Mensagem], Any]
+
+
+class AdaptadorASGI:
+    """Aplicação ASGI: SSE nativo em asyncio, demais rotas do Flask num pool de threads."""
+
+    def __init__(self, flask_app, canal_eventos, threads: int = 32) -> None:
+        self.flask_app = flask_app
+        self.canal_eventos = canal_eventos
+        self.executor = ThreadPoolExecutor(max_workers=threads, thread_name_prefix='asgi-wsgi')
+
+    async def __call__(self, scope: Mensagem, receive: Receber, send: Enviar) -> None:
+        if scope['type'] == 'lifespan':
+            await self._ciclo_de_vida(receive, send)
+        elif scope['type'] == 'http':
+            if self._caminho(scope) == '/api/eventos' and scope['method'] == 'GET':
+                await self._eventos(scope, receive, send)
+            else:
+                await self._wsgi(scope, receive, send)
+
+    async def _ciclo_de_vida(self, receive: Receber, send: Enviar) -> None:
+        while True:
+            mensagem = await receive()
+            if mensagem['type'] == 'lifespan.startup':
+                await send({'type': 'lifespan.startup.complete'})
+            elif mensagem['type'] == 'lifespan.shutdown':
+                self.executor.shutdown(wait=False)
+                await send({'type': 'lifespan.shutdown.complete'})
+                return
+
+    @staticmethod
+    def _caminho(scope: Mensagem) -> str:
+        # Conforme o servidor, `path` inclui ou não o root_path (ex.: /bot atrás do nginx)
+        caminho, raiz = scope['path'], scope.get('root_path', '')
+        if raiz and caminho.startswith(raiz):
+            caminho = caminho[len(raiz):] or '/'
+        return caminho
+
+    # ------------------------------------------------------------------
+    # Rotas do Flask (WSGI num pool de threads)
+    # ------------------------------------------------------------------
+
+    async def _wsgi(self, scope: Mensagem, receive: Receber, send: Enviar) -> None:
+        corpo = bytearray()
+        while True:
+            mensagem = await receive()
+            if mensagem['type'] == 'http.disconnect':
+                return
+            corpo += mensagem.get('body', b'')
+            if not mensagem.get('more_body'):
+                break
+
+        environ = self._environ(scope, bytes(corpo))
+        loop = asyncio.get_running_loop()
+        status, cabecalhos, resposta = await loop.run_in_executor(self.executor, self._executar_wsgi, environ)
+        await send({
+            'type': 'http.response.start',
+            'status': status,
+            'headers': [(nome.lower().encode('latin-1'), valor.encode('latin-1')) for nome, valor in cabecalhos],
+        })
+        await send({'type': 'http.response.body', 'body': resposta})
+
+    def _environ(self, scope: Mensagem, corpo: bytes) -> Dict[str, Any]:
+        servidor = scope.get('server') or ('localhost', 80)
+        cliente = scope.get('client') or ('', 0)
+        environ = {
+            'REQUEST_METHOD': scope['method'],
+            'SCRIPT_NAME': scope.get('root_path', '').encode('utf-8').decode('latin-1'),
+            'PATH_INFO': self._caminho(scope).encode('utf-8').decode('latin-1'),
+            'QUERY_STRING': scope.get('query_string', b'').decode('latin-1'),
+            'SERVER_NAME': servidor[0],
+            'SERVER_PORT': str(servidor[1]),
+            'SERVER_PROTOCOL': f"HTTP/{scope.get('http_version', '1.1')}",
+            'REMOTE_ADDR': cliente[0],
+            'REMOTE_PORT': str(cliente[1]),
+            'wsgi.version': (1, 0),
+            'wsgi.url_scheme': scope.get('scheme', 'http'),
+            'wsgi.input': io.BytesIO(corpo),
+            'wsgi.errors': sys.stderr,
+            'wsgi.multithread': True,
+            'wsgi.multiprocess': False,
+            'wsgi.run_once': False,
+        }
+        for nome, valor in scope.get('headers', []):
+            nome = nome.decode('latin-1').upper().replace('-', '_')
+            valor = valor.decode('latin-1')
+            if nome == 'CONTENT_TYPE':
+                chave = 'CONTENT_TYPE'
+            elif nome == 'CONTENT_LENGTH':
+                chave = 'CONTENT_LENGTH'
+            else:
+                chave = f'HTTP_{nome}'
+            if chave in environ:
+                # Cabeçalhos repetidos: vírgula, exceto Cookie (HTTP/2 envia um por cookie)
+                separador = '; ' if chave == 'HTTP_COOKIE' else ','
+                valor = f"{environ[chave]}{separador}{valor}"
+            environ[chave] = valor
+        return environ
+
+    def _executar_wsgi(self, environ: Dict[str, Any]) -> Tuple[int, List[Tuple[str, str]], bytes]:
+        estado: Dict[str, Any] = {}
+        partes: List[bytes] = []
+
+        def start_response(status, cabecalhos, exc_info=None):
+            estado['status'] = int(status.split(' ', 1)[0])
+            estado['cabecalhos'] = cabecalhos
+            return partes.append
+
+        resultado = self.flask_app(environ, start_response)
+        try:
+            for parte in resultado:
+                partes.append(parte)
+        finally:
+            if hasattr(resultado, 'close'):
+                resultado.close()
+        return estado['status'], estado['cabecalhos'], b''.join(partes)
+
+    # ------------------------------------------------------------------
+    # /api/eventos (Server-Sent Events sem thread por conexão)
+    # ------------------------------------------------------------------
+
+    def _sessao(self, scope: Mensagem) -> Dict[str, Any]:
+        """Sessão do Flask lida do cookie assinado (sem passar pelo pool de threads)."""
+        cookies = b'; '.join(valor for nome, valor in scope.get('headers', []) if nome == b'cookie')
+        valor = parse_cookie(cookies.decode('latin-1')).get(self.flask_app.config['SESSION_COOKIE_NAME'])
+        if not valor:
+            return {}
+        serializador = self.flask_app.session_interface.get_signing_serializer(self.flask_app)
+        if serializador is None:
+            return {}
+        try:
+            return serializador.loads(valor, max_age=int(self.flask_app.permanent_session_lifetime.total_seconds()))
+        except Exception:
+            return {}
+
+    async def _eventos(self, scope: Mensagem, receive: Receber, send: Enviar) -> None:
+        dados = self._sessao(scope)
+        if not dados.get('logged_in') or not dados.get('session_id'):
+            await send({'type': 'http.response.start', 'status': 401,
+                        'headers': [(b'content-type', b'application/json')]})
+            await send({'type': 'http.response.body', 'body': '{"error": "Não autenticado"}'.encode('utf-8')})
+            return
+
+        cabecalhos = dict(scope.get('headers', []))
+        ultimo_id: Optional[str] = cabecalhos.get(b'last-event-id', b'').decode('latin-1') or None
+        if ultimo_id is None:
+            parametros = parse_qs(scope.get('query_string', b'').decode('latin-1'))
+            ultimo_id = (parametros.get('ultimo_id') or [None])[0]
+        try:
+            ultimo = int(ultimo_id) if ultimo_id else None
+        except ValueError:
+            ultimo = None
+        heartbeat = app_module.parse_float_value(
+            os.getenv('IQ_OPTION_SSE_HEARTBEAT'), default=15, field_name='Heartbeat SSE')
+
+        await send({'type': 'http.response.start', 'status': 200, 'headers': [
+            (b'content-type', b'text/event-stream; charset=utf-8'),
+            (b'cache-control', b'no-cache'),
+            (b'x-accel-buffering', b'no'),
+        ]})
+        fluxo = self.canal_eventos.transmitir_async(dados['session_id'], ultimo, heartbeat=heartbeat)
+
+        async def transmitir() -> None:
+            async for trecho in fluxo:
+                await send({'type': 'http.response.body', 'body': trecho.encode('utf-8'), 'more_body': True})
+
+        async def aguardar_desconexao() -> None:
+            while (await receive())['type'] != 'http.disconnect':
+                pass
+
+        envio = asyncio.ensure_future(transmitir())
+        desconexao = asyncio.ensure_future(aguardar_desconexao())
+        try:
+            await asyncio.wait({envio, desconexao}, return_when=asyncio.FIRST_COMPLETED)
+        finally:
+            encerrado_pelo_servidor = envio.done() and not desconexao.done()
+            for tarefa in (envio, desconexao):
+                tarefa.cancel()
+            # O cancelamento chega ao gerador dentro de `envio`, que cancela a assinatura
+            await asyncio.gather(envio, desconexao, return_exceptions=True)
+            await fluxo.aclose()
+        if encerrado_pelo_servidor:
+            # Canal encerrado (logout): fechar a resposta
+            await send({'type': 'http.response.body', 'body': b''})
+
+
+app = AdaptadorASGI(flask_app, app_module.canal_eventos, threads=int(os.getenv('ASGI_THREADS', 32)))
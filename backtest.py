@@ -0,0 +1,614 @@
+"""
+Backtest de Pacotes de Sinais
+Simula como um `sinais.txt` teria se saído antes de colocá-lo em produção.
+
+Os preços de entrada e expiração de todos os sinais (e de cada nível de Gale)
+são resolvidos de uma vez com NumPy sobre velas de 1 minuto, lidas de um cache
+local (`cache_candles/`) ou baixadas com `get_candles`. Depois a gestão de
+banca é simulada em ordem cronológica, com as mesmas regras do `BotService`:
+
+- Entrada PERCENT (porcentagem do saldo) ou FIXED, limitada pelo
+  `StopLossProtection.calculate_safe_entry_value` (80% da folga até o mínimo)
+- Martingale: após um LOSS, nova entrada de 2.15x o valor na expiração, até o
+  nível de Gale configurado
+- 2 LOSS completos consecutivos pulam os 2 sinais seguintes
+- Stop Loss: a execução para quando o saldo fica abaixo do mínimo
+- Stop Win (opcional): nenhum sinal novo é aberto depois que o saldo atinge a meta
+
+Aproximações: a entrada usa a abertura da vela do minuto do sinal e a saída o
+fechamento da vela que termina em entrada + expiração; o payout é fixo (ou por
+ativo) e a expiração real da corretora (virada do minuto) não é modelada.
+
+Uso:
+    python backtest.py sinais.txt --inicio 2024-05-20 --fim 2024-05-24 [--saldo 1000]
+
+Sinais sem data são repetidos em cada dia do intervalo.
+"""
+
+import argparse
+import heapq
+import os
+import sys
+import time
+from dataclasses import dataclass, field
+from datetime import date, datetime, timedelta
+from typing import Any, Dict, Iterable, List, Optional, Sequence, Tuple, Union
+
+try:
+    import numpy as np
+except ModuleNotFoundError as exc:  # pragma: no cover - feedback claro
+    raise ModuleNotFoundError(
+        "NumPy não está instalado. Execute 'pip install numpy' antes de usar o backtest.") from exc
+
+import importlib.util
+
+CURRENT_DIR = os.path.dirname(os.path.abspath(__file__))
+PARENT_DIR = os.path.dirname(CURRENT_DIR)
+
+# O diretório local "http/" esconde o módulo padrão (usado por requests em --baixar)
+if PARENT_DIR not in sys.path:
+    sys.path.insert(0, PARENT_DIR)
+if CURRENT_DIR in sys.path:
+    sys.path.remove(CURRENT_DIR)
+
+sinais_processor_path = os.path.join(CURRENT_DIR, "sinais_processor.py")
+spec_sinais = importlib.util.spec_from_file_location("sinais_processor", sinais_processor_path)
+sinais_processor_module = importlib.util.module_from_spec(spec_sinais)
+spec_sinais.loader.exec_module(sinais_processor_module)
+importar_sinais = sinais_processor_module.importar_sinais
+
+# Resultado de uma operação
+WIN = 1
+EQUAL = 0
+LOSS = -1
+SEM_DADOS = -2  # vela de entrada ou de saída ausente
+
+MULTIPLICADOR_GALE = 2.15  # mesmo fator de BotService._execute_martingale
+TAMANHO_VELA = 60
+
+
+# ---------------------------------------------------------------------------
+# Velas
+# ---------------------------------------------------------------------------
+
+
+class CacheCandles:
+    """
+    Velas de 1 minuto por ativo, um arquivo `.npz` por dia em `diretorio`.
+
+    Dias ausentes são baixados com `api.get_candles` (se houver API) e salvos
+    quando já terminaram; sem API, ficam sem velas.
+    """
+
+    def __init__(self, diretorio: Optional[str] = None, api=None):
+        self.diretorio = diretorio or os.path.join(CURRENT_DIR, "cache_candles")
+        self.api = api
+
+    def _arquivo(self, ativo: str, dia: date) -> str:
+        return os.path.join(self.diretorio, f"{ativo}_{TAMANHO_VELA}", f"{dia.isoformat()}.npz")
+
+    def _baixar(self, ativo: str, inicio: float, fim: float) -> np.ndarray:
+        """Velas [inicio, fim) em blocos de 1000 (limite do get_candles), do fim para o início."""
+        blocos = []
+        fim_bloco = fim
+        while fim_bloco > inicio:
+            velas = self.api.get_candles(ativo, TAMANHO_VELA, 1000, fim_bloco) or []
+            if not velas:
+                break
+            blocos.append(np.array(
+                [(v["from"], v["open"], v["close"]) for v in velas],
+                dtype=[("from", "i8"), ("open", "f8"), ("close", "f8")],
+            ))
+            primeiro = min(v["from"] for v in velas)
+            if primeiro >= fim_bloco:
+                break
+            fim_bloco = primeiro
+        if not blocos:
+            return np.empty(0, dtype=[("from", "i8"), ("open", "f8"), ("close", "f8")])
+        velas = np.concatenate(blocos)
+        velas = velas[(velas["from"] >= inicio) & (velas["from"] < fim)]
+        _, unicos = np.unique(velas["from"], return_index=True)
+        return velas[unicos]
+
+    def carregar_dia(self, ativo: str, dia: date) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+        arquivo = self._arquivo(ativo, dia)
+        if os.path.exists(arquivo):
+            with np.load(arquivo) as dados:
+                return dados["inicio"], dados["abertura"], dados["fechamento"]
+        vazio = (np.empty(0, "i8"), np.empty(0, "f8"), np.empty(0, "f8"))
+        if self.api is None:
+            return vazio
+        inicio = datetime(dia.year, dia.month, dia.day).timestamp()
+        fim = inicio + 86400
+        velas = self._baixar(ativo, inicio, min(fim, time.time()))
+        if len(velas) == 0:
+            return vazio
+        resultado = (velas["from"], velas["open"], velas["close"])
+        if fim <= time.time():
+            # Só dias completos vão para o cache
+            os.makedirs(os.path.dirname(arquivo), exist_ok=True)
+            np.savez_compressed(arquivo, inicio=resultado[0], abertura=resultado[1], fechamento=resultado[2])
+        return resultado
+
+    def carregar(self, ativo: str, dias: Iterable[date]) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+        """Velas de `ativo` nos `dias` pedidos, ordenadas pelo início."""
+        partes = [self.carregar_dia(ativo, dia) for dia in sorted(set(dias))]
+        if not partes:
+            return np.empty(0, "i8"), np.empty(0, "f8"), np.empty(0, "f8")
+        return tuple(np.concatenate(coluna) for coluna in zip(*partes))
+
+
+# ---------------------------------------------------------------------------
+# Sinais em colunas
+# ---------------------------------------------------------------------------
+
+
+@dataclass
+class SinaisVetorizados:
+    """Uma linha por ocorrência de sinal (sinais sem data repetidos por dia)."""
+
+    ativos: List[str]  # nomes; `ativo` guarda o índice nesta lista
+    ativo: np.ndarray  # int32
+    entrada: np.ndarray  # epoch (int64) do instante do sinal
+    expiracao: np.ndarray  # minutos (int32)
+    call: np.ndarray  # bool: CALL (True) ou PUT
+    hora: np.ndarray  # hora do dia (int8) para as estatísticas
+    texto: List[str]
+
+    def __len__(self) -> int:
+        return len(self.entrada)
+
+
+def vetorizar_sinais(sinais: Sequence[Any], dias: Sequence[date]) -> SinaisVetorizados:
+    """
+    Converte sinais em colunas NumPy ordenadas pelo instante de entrada.
+
+    Args:
+        sinais: Sinais do `sinais_processor`
+        dias: Dias em que os sinais sem data são aplicados
+    """
+    ativos: Dict[str, int] = {}
+    bases = {dia: int(datetime(dia.year, dia.month, dia.day).timestamp()) for dia in dias}
+    ativo, segundos, base, expiracao, call, texto = [], [], [], [], [], []
+    for sinal in sinais:
+        partes = sinal.hora.split(':')
+        seg = int(partes[0]) * 3600 + int(partes[1]) * 60 + (int(partes[2]) if len(partes) > 2 else 0)
+        indice = ativos.setdefault(sinal.ativo, len(ativos))
+        if sinal.data is not None:
+            if sinal.data not in bases:
+                bases[sinal.data] = int(datetime(sinal.data.year, sinal.data.month, sinal.data.day).timestamp())
+            ocorrencias = (bases[sinal.data],)
+        else:
+            ocorrencias = [bases[dia] for dia in dias]
+        for epoch_dia in ocorrencias:
+            ativo.append(indice)
+            segundos.append(seg)
+            base.append(epoch_dia)
+            expiracao.append(int(sinal.timeframe[1:]))
+            call.append(sinal.direcao == "CALL")
+            texto.append(str(sinal))
+
+    segundos_arr = np.asarray(segundos, dtype=np.int64)
+    entrada = np.asarray(base, dtype=np.int64) + segundos_arr
+    ordem = np.argsort(entrada, kind="stable")
+    return SinaisVetorizados(
+        ativos=list(ativos),
+        ativo=np.asarray(ativo, dtype=np.int32)[ordem],
+        entrada=entrada[ordem],
+        expiracao=np.asarray(expiracao, dtype=np.int32)[ordem],
+        call=np.asarray(call, dtype=bool)[ordem],
+        hora=(segundos_arr[ordem] // 3600).astype(np.int8),
+        texto=[texto[i] for i in ordem.tolist()],
+    )
+
+
+def resolver_resultados(sinais: SinaisVetorizados, cache: CacheCandles, gale: int = 0) -> np.ndarray:
+    """
+    Resultado (WIN/EQUAL/LOSS/SEM_DADOS) de cada sinal em cada nível de Gale.
+
+    O nível k entra em entrada + k * expiração (a expiração do nível anterior).
+
+    Returns:
+        np.ndarray: int8 de forma (sinais, gale + 1)
+    """
+    niveis = np.arange(gale + 1, dtype=np.int64)
+    duracao = sinais.expiracao.astype(np.int64) * 60
+    entrada = sinais.entrada[:, None] + niveis[None, :] * duracao[:, None]
+    vela_entrada = entrada - entrada % TAMANHO_VELA
+    vela_saida = vela_entrada + duracao[:, None] - TAMANHO_VELA
+    resultados = np.full(entrada.shape, SEM_DADOS, dtype=np.int8)
+
+    for indice, nome in enumerate(sinais.ativos):
+        linhas = np.nonzero(sinais.ativo == indice)[0]
+        if len(linhas) == 0:
+            continue
+        primeiro = int(vela_entrada[linhas].min())
+        ultimo = int(vela_saida[linhas].max())
+        dias = [date.fromtimestamp(primeiro) + timedelta(days=d)
+                for d in range((date.fromtimestamp(ultimo) - date.fromtimestamp(primeiro)).days + 1)]
+        inicio, abertura, fechamento = cache.carregar(nome, dias)
+        if len(inicio) == 0:
+            continue
+
+        def localizar(alvos):
+            posicao = np.minimum(np.searchsorted(inicio, alvos), len(inicio) - 1)
+            return posicao, inicio[posicao] == alvos
+
+        pos_entrada, achou_entrada = localizar(vela_entrada[linhas])
+        pos_saida, achou_saida = localizar(vela_saida[linhas])
+        preco_entrada = abertura[pos_entrada]
+        preco_saida = fechamento[pos_saida]
+        sentido = np.where(sinais.call[linhas], 1.0, -1.0)[:, None]
+        movimento = np.sign((preco_saida - preco_entrada) * sentido).astype(np.int8)
+        resultados[linhas] = np.where(achou_entrada & achou_saida, movimento, SEM_DADOS)
+    return resultados
+
+
+# ---------------------------------------------------------------------------
+# Simulação da banca
+# ---------------------------------------------------------------------------
+
+
+@dataclass
+class ConfigBacktest:
+    """Regras de entrada e proteção (mesmos campos do BotConfig)."""
+
+    saldo_inicial: float = 1000.0
+    entry_type: str = "PERCENT"  # PERCENT ou FIXED
+    entry_value: float = 1.0
+    gale: int = 0
+    stop_loss: float = 5.0  # % do saldo inicial; 0 desativa
+    stop_win: float = 0.0  # % de lucro sobre o saldo inicial que encerra a execução; 0 desativa
+    payout: Union[float, Dict[str, float]] = 0.8  # lucro por unidade apostada em caso de WIN
+    perdas_para_pular: int = 2
+    sinais_pulados: int = 2
+
+
+@dataclass
+class ResultadoBacktest:
+    config: ConfigBacktest
+    sinais: SinaisVetorizados
+    # Uma linha por operação executada (incluindo Gales)
+    operacao_sinal: np.ndarray  # índice em `sinais`
+    operacao_nivel: np.ndarray
+    operacao_fim: np.ndarray  # epoch da expiração
+    operacao_valor: np.ndarray
+    operacao_lucro: np.ndarray
+    operacao_resultado: np.ndarray
+    # Curva de capital: saldo mais valores em operações abertas, após cada encerramento
+    curva_tempo: np.ndarray
+    curva_saldo: np.ndarray
+    pulados_perdas: int = 0
+    sem_dados: int = 0
+    saldo_insuficiente: int = 0
+    stop_loss_em: Optional[float] = None  # epoch em que o Stop Loss foi acionado
+    stop_win_em: Optional[float] = None  # epoch em que o Stop Win foi atingido
+    duracao: float = 0.0
+    contadores: Dict[str, int] = field(default_factory=dict)
+
+    @property
+    def saldo_final(self) -> float:
+        # Ao fim da simulação não há operações abertas: capital == saldo
+        return float(self.curva_saldo[-1]) if len(self.curva_saldo) else self.config.saldo_inicial
+
+    def drawdown_maximo(self) -> Tuple[float, float]:
+        """(maior queda absoluta a partir de um topo, mesma queda em % do topo)."""
+        if len(self.curva_saldo) == 0:
+            return 0.0, 0.0
+        topo = np.maximum.accumulate(self.curva_saldo)
+        queda = topo - self.curva_saldo
+        indice = int(np.argmax(queda))
+        return float(queda[indice]), float(queda[indice] / topo[indice] * 100) if topo[indice] else 0.0
+
+    def _agrupar(self, chave: np.ndarray, tamanho: int) -> Dict[str, np.ndarray]:
+        resultado = self.operacao_resultado
+        return {
+            "operacoes": np.bincount(chave, minlength=tamanho),
+            "wins": np.bincount(chave, weights=resultado == WIN, minlength=tamanho).astype(np.int64),
+            "losses": np.bincount(chave, weights=resultado == LOSS, minlength=tamanho).astype(np.int64),
+            "equals": np.bincount(chave, weights=resultado == EQUAL, minlength=tamanho).astype(np.int64),
+            "lucro": np.bincount(chave, weights=self.operacao_lucro, minlength=tamanho),
+            "volume": np.bincount(chave, weights=self.operacao_valor, minlength=tamanho),
+        }
+
+    @staticmethod
+    def _linhas(nomes: Sequence[Any], grupos: Dict[str, np.ndarray]) -> List[Dict[str, Any]]:
+        linhas = []
+        for i, nome in enumerate(nomes):
+            operacoes = int(grupos["operacoes"][i])
+            if not operacoes:
+                continue
+            decididas = int(grupos["wins"][i] + grupos["losses"][i])
+            linhas.append({
+                "chave": nome,
+                "operacoes": operacoes,
+                "wins": int(grupos["wins"][i]),
+                "losses": int(grupos["losses"][i]),
+                "equals": int(grupos["equals"][i]),
+                "taxa_acerto": float(grupos["wins"][i] / decididas * 100) if decididas else None,
+                "lucro": round(float(grupos["lucro"][i]), 2),
+                "volume": round(float(grupos["volume"][i]), 2),
+            })
+        return linhas
+
+    def por_ativo(self) -> List[Dict[str, Any]]:
+        ativo = self.sinais.ativo[self.operacao_sinal]
+        return self._linhas(self.sinais.ativos, self._agrupar(ativo, len(self.sinais.ativos)))
+
+    def por_hora(self) -> List[Dict[str, Any]]:
+        hora = self.sinais.hora[self.operacao_sinal].astype(np.int64)
+        return self._linhas([f"{h:02d}h" for h in range(24)], self._agrupar(hora, 24))
+
+    def resumo(self) -> Dict[str, Any]:
+        resultado = self.operacao_resultado
+        wins, losses = int((resultado == WIN).sum()), int((resultado == LOSS).sum())
+        queda, queda_pct = self.drawdown_maximo()
+        return {
+            "sinais": len(self.sinais),
+            "operacoes": len(resultado),
+            "gales": int((self.operacao_nivel > 0).sum()),
+            "wins": wins,
+            "losses": losses,
+            "equals": int((resultado == EQUAL).sum()),
+            "taxa_acerto": wins / (wins + losses) * 100 if wins + losses else None,
+            "saldo_inicial": self.config.saldo_inicial,
+            "saldo_final": round(self.saldo_final, 2),
+            "lucro": round(self.saldo_final - self.config.saldo_inicial, 2),
+            "drawdown_maximo": round(queda, 2),
+            "drawdown_maximo_percent": round(queda_pct, 2),
+            "pulados_por_perdas": self.pulados_perdas,
+            "sem_dados": self.sem_dados,
+            "saldo_insuficiente": self.saldo_insuficiente,
+            "stop_loss_acionado": (datetime.fromtimestamp(self.stop_loss_em).isoformat()
+                                   if self.stop_loss_em is not None else None),
+            "stop_win_atingido": (datetime.fromtimestamp(self.stop_win_em).isoformat()
+                                  if self.stop_win_em is not None else None),
+            "duracao": round(self.duracao, 3),
+        }
+
+    def salvar_curva(self, caminho: str) -> None:
+        """Curva de capital em CSV (data/hora;saldo)."""
+        with open(caminho, "w", encoding="utf-8") as f:
+            f.write("tempo;saldo\n")
+            for tempo, saldo in zip(self.curva_tempo.tolist(), self.curva_saldo.tolist()):
+                f.write(f"{datetime.fromtimestamp(tempo).isoformat()};{saldo:.2f}\n")
+
+
+def simular(sinais: SinaisVetorizados, resultados: np.ndarray, config: ConfigBacktest) -> ResultadoBacktest:
+    """
+    Simula a banca em ordem cronológica.
+
+    Entradas, expirações e Gales são eventos de um heap; encerramentos no
+    mesmo segundo de uma entrada são processados antes dela. Sinais do mesmo
+    instante são armados juntos com o mesmo saldo, como no disparo em lote.
+    """
+    inicio_simulacao = time.perf_counter()
+    saldo = float(config.saldo_inicial)
+    minimo = saldo * (1 - config.stop_loss / 100.0) if config.stop_loss > 0 else float("-inf")
+    meta = saldo * (1 + config.stop_win / 100.0) if config.stop_win > 0 else float("inf")
+    percentual = config.entry_type.upper() == "PERCENT"
+    if isinstance(config.payout, dict):
+        payout = [float(config.payout.get(nome, 0.8)) for nome in sinais.ativos]
+    else:
+        payout = [float(config.payout)] * len(sinais.ativos)
+
+    entrada = sinais.entrada.tolist()
+    duracao = (sinais.expiracao.astype(np.int64) * 60).tolist()
+    ativo = sinais.ativo.tolist()
+    tabela = resultados.tolist()
+    gale = min(config.gale, resultados.shape[1] - 1)
+
+    op_sinal: List[int] = []
+    op_nivel: List[int] = []
+    op_fim: List[int] = []
+    op_valor: List[float] = []
+    op_lucro: List[float] = []
+    op_resultado: List[int] = []
+    curva_tempo: List[int] = []
+    curva_saldo: List[float] = []
+
+    abertas: List[Tuple[int, int, int, int, float]] = []  # (fim, seq, sinal, nivel, valor)
+    seq = 0
+    em_jogo = 0.0  # valores das operações abertas (já debitados do saldo)
+    perdas_seguidas = 0
+    pular = 0
+    pulados = sem_dados = insuficiente = 0
+    stop_em: Optional[float] = None
+    meta_em: Optional[float] = None
+
+    def valor_seguro(valor: float, saldo_atual: float) -> float:
+        # StopLossProtection.calculate_safe_entry_value
+        if saldo_atual < minimo:
+            return 0.0
+        return max(0.0, min(valor, (saldo_atual - minimo) * 0.8)) if minimo != float("-inf") else valor
+
+    def abrir(sinal: int, nivel: int, valor: float, instante: int) -> bool:
+        nonlocal saldo, seq, sem_dados, em_jogo
+        resultado = tabela[sinal][nivel]
+        if resultado == SEM_DADOS:
+            sem_dados += 1
+            return False
+        saldo -= valor  # o valor sai do saldo na abertura
+        em_jogo += valor
+        seq += 1
+        heapq.heappush(abertas, (instante + duracao[sinal], seq, sinal, nivel, valor))
+        return True
+
+    def encerrar() -> None:
+        nonlocal saldo, em_jogo, perdas_seguidas, pular, stop_em, insuficiente
+        fim, _, sinal, nivel, valor = heapq.heappop(abertas)
+        resultado = tabela[sinal][nivel]
+        lucro = valor * payout[ativo[sinal]] if resultado == WIN else (0.0 if resultado == EQUAL else -valor)
+        saldo += valor + lucro
+        em_jogo -= valor
+        op_sinal.append(sinal)
+        op_nivel.append(nivel)
+        op_fim.append(fim)
+        op_valor.append(valor)
+        op_lucro.append(lucro)
+        op_resultado.append(resultado)
+        curva_tempo.append(fim)
+        curva_saldo.append(saldo + em_jogo)
+        if stop_em is None and saldo < minimo:
+            stop_em = fim
+        if resultado == LOSS and nivel < gale and stop_em is None:
+            # BotService._execute_martingale
+            novo = valor * MULTIPLICADOR_GALE
+            if saldo < novo or saldo - novo < minimo:
+                insuficiente += 1
+            elif abrir(sinal, nivel + 1, novo, fim):
+                return
+        # Sequência encerrada: LOSS completo conta para a regra de pular sinais
+        if resultado == LOSS:
+            perdas_seguidas += 1
+            if config.perdas_para_pular and perdas_seguidas >= config.perdas_para_pular:
+                pular = config.sinais_pulados
+        else:
+            perdas_seguidas = 0
+
+    total = len(entrada)
+    i = 0
+    while i < total and stop_em is None:
+        instante = entrada[i]
+        while abertas and abertas[0][0] <= instante:
+            encerrar()
+        if stop_em is not None:
+            break
+        if saldo >= meta:
+            meta_em = instante  # Stop Win: novos sinais não são abertos
+            break
+        # Todos os sinais do instante são armados com o saldo atual; a exposição do lote se acumula
+        saldo_armado = saldo
+        exposicao = 0.0
+        j = i
+        while j < total and entrada[j] == instante:
+            j += 1
+        for sinal in range(i, j):
+            if pular > 0:
+                pular -= 1
+                pulados += 1
+                continue
+            valor = saldo_armado * config.entry_value / 100.0 if percentual else float(config.entry_value)
+            valor = valor_seguro(valor, saldo_armado)
+            if valor <= 0:
+                stop_em = instante  # StopLossProtection.can_operate() falso
+                break
+            if saldo_armado < valor:
+                insuficiente += 1
+                continue
+            if saldo_armado - exposicao - valor < minimo:
+                stop_em = instante  # _can_fire: lote excede o Stop Loss
+                break
+            if abrir(sinal, 0, valor, instante):
+                exposicao += valor
+        i = j
+    # Operações abertas ainda terminam depois do Stop Loss
+    while abertas:
+        encerrar()
+
+    return ResultadoBacktest(
+        config=config,
+        sinais=sinais,
+        operacao_sinal=np.asarray(op_sinal, dtype=np.int64),
+        operacao_nivel=np.asarray(op_nivel, dtype=np.int8),
+        operacao_fim=np.asarray(op_fim, dtype=np.int64),
+        operacao_valor=np.asarray(op_valor, dtype=np.float64),
+        operacao_lucro=np.asarray(op_lucro, dtype=np.float64),
+        operacao_resultado=np.asarray(op_resultado, dtype=np.int8),
+        curva_tempo=np.asarray([entrada[0] if entrada else 0] + curva_tempo, dtype=np.int64),
+        curva_saldo=np.asarray([config.saldo_inicial] + curva_saldo, dtype=np.float64),
+        pulados_perdas=pulados,
+        sem_dados=sem_dados,
+        saldo_insuficiente=insuficiente,
+        stop_loss_em=stop_em,
+        stop_win_em=meta_em,
+        duracao=time.perf_counter() - inicio_simulacao,
+    )
+
+
+def executar_backtest(
+    origem: Union[str, Iterable[str], Sequence[Any]],
+    dias: Sequence[date],
+    config: Optional[ConfigBacktest] = None,
+    cache: Optional[CacheCandles] = None,
+) -> ResultadoBacktest:
+    """
+    Backtest completo: sinais -> resultados vetorizados -> simulação da banca.
+
+    Args:
+        origem: Caminho do arquivo, linhas de sinais ou lista de `Sinal`
+        dias: Dias em que os sinais sem data são aplicados
+        config: Regras de entrada e proteção
+        cache: Fonte das velas (padrão: cache local sem API)
+    """
+    inicio = time.perf_counter()
+    config = config or ConfigBacktest()
+    cache = cache or CacheCandles()
+    if isinstance(origem, (list, tuple)) and origem and not isinstance(origem[0], str):
+        sinais = list(origem)
+    else:
+        sinais = importar_sinais(origem).sinais
+    vetorizados = vetorizar_sinais(sinais, dias)
+    resultados = resolver_resultados(vetorizados, cache, config.gale)
+    resultado = simular(vetorizados, resultados, config)
+    resultado.duracao = time.perf_counter() - inicio
+    return resultado
+
+
+def _dias(inicio: date, fim: date) -> List[date]:
+    return [inicio + timedelta(days=d) for d in range((fim - inicio).days + 1)]
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Backtest de um pacote de sinais")
+    parser.add_argument("sinais", help="Arquivo de sinais")
+    parser.add_argument("--inicio", type=date.fromisoformat, default=date.today() - timedelta(days=1))
+    parser.add_argument("--fim", type=date.fromisoformat, default=None)
+    parser.add_argument("--saldo", type=float, default=1000.0)
+    parser.add_argument("--entry-type", default="PERCENT", choices=("PERCENT", "FIXED"))
+    parser.add_argument("--entry-value", type=float, default=1.0)
+    parser.add_argument("--gale", type=int, default=0)
+    parser.add_argument("--stop-loss", type=float, default=5.0)
+    parser.add_argument("--stop-win", type=float, default=0.0, help="%% de lucro que encerra a execução (0 desativa)")
+    parser.add_argument("--payout", type=float, default=0.8)
+    parser.add_argument("--cache", default=None, help="Diretório do cache de velas")
+    parser.add_argument("--baixar", action="store_true",
+                        help="Baixa as velas ausentes (usa IQ_OPTION_EMAIL/IQ_OPTION_PASSWORD do ambiente)")
+    parser.add_argument("--curva", default=None, help="Salva a curva de capital em CSV")
+    args = parser.parse_args()
+
+    api = None
+    if args.baixar:
+        from iqoptionapi import IQ_Option  # type: ignore
+        api = IQ_Option(os.getenv("IQ_OPTION_EMAIL"), os.getenv("IQ_OPTION_PASSWORD"))
+        check, reason = api.connect()
+        if not check:
+            print(f"Falha no login: {reason}")
+            sys.exit(1)
+
+    config = ConfigBacktest(
+        saldo_inicial=args.saldo,
+        entry_type=args.entry_type,
+        entry_value=args.entry_value,
+        gale=args.gale,
+        stop_loss=args.stop_loss,
+        stop_win=args.stop_win,
+        payout=args.payout,
+    )
+    resultado = executar_backtest(args.sinais, _dias(args.inicio, args.fim or args.inicio), config,
+                                  CacheCandles(args.cache, api))
+
+    for chave, valor in resultado.resumo().items():
+        print(f"{chave:<26} {valor}")
+    for titulo, linhas in (("Por ativo", resultado.por_ativo()), ("Por hora", resultado.por_hora())):
+        print(f"\n{titulo}:")
+        for linha in linhas:
+            taxa = f"{linha['taxa_acerto']:.1f}%" if linha["taxa_acerto"] is not None else "-"
+            print(f"  {linha['chave']:<14} {linha['operacoes']:>7} ops  {taxa:>6}  lucro {linha['lucro']:>10.2f}")
+    if args.curva:
+        resultado.salvar_curva(args.curva)
+        print(f"\nCurva de capital salva em {args.curva}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,200 @@
+"""Module for IQ Option local balance cache."""
+
+import logging
+import threading
+import time
+
+
+class BalanceEntry(object):
+    """Last known state of one user balance."""
+
+    __slots__ = ("id", "type", "amount", "currency", "updated_at", "source")
+
+    def __init__(self, balance_id):
+        self.id = balance_id
+        self.type = None
+        self.amount = None
+        self.currency = None
+        self.updated_at = None
+        self.source = None
+
+    @property
+    def age(self):
+        """Seconds since the last update (None if never updated)."""
+        if self.updated_at is None:
+            return None
+        return time.time() - self.updated_at
+
+    def to_dict(self):
+        return {
+            "id": self.id,
+            "type": self.type,
+            "amount": self.amount,
+            "currency": self.currency,
+            "updated_at": self.updated_at,
+            "age": self.age,
+            "source": self.source,
+        }
+
+
+class BalanceCache(object):
+    """Per-account balances kept up to date by push events.
+
+    Seeded from a ``get-balances`` answer, then updated by
+    ``balance-changed``. Position events of a balance mark it as dirty:
+    if no ``balance-changed`` follows within ``dirty_delay`` seconds the
+    reconcile thread refreshes it. The thread also reconciles every
+    ``reconcile_interval`` seconds.
+    """
+
+    def __init__(self, reconcile_interval=60, dirty_delay=2):
+        self.reconcile_interval = reconcile_interval
+        self.dirty_delay = dirty_delay
+        self._entries = {}
+        self._dirty_since = None
+        self._last_reconcile = None
+        self._lock = threading.Lock()
+        self._wakeup = threading.Event()
+        self._thread = None
+        self._stopped = False
+        self._refresh = None
+        self._subscribers = {}  # token -> callback(entry)
+        self._next_token = 0
+
+    def __contains__(self, balance_id):
+        return balance_id in self._entries
+
+    def _entry(self, balance_id):
+        entry = self._entries.get(balance_id)
+        if entry is None:
+            entry = self._entries[balance_id] = BalanceEntry(balance_id)
+        return entry
+
+    def seed(self, balances, source="seed"):
+        """Load the ``msg`` list of a ``get-balances`` answer."""
+        now = time.time()
+        updated = []
+        with self._lock:
+            for balance in balances or ():
+                entry = self._entry(balance["id"])
+                entry.type = balance.get("type")
+                entry.amount = balance.get("amount")
+                entry.currency = balance.get("currency", entry.currency)
+                entry.updated_at = now
+                entry.source = source
+                updated.append(entry)
+            self._dirty_since = None
+            self._last_reconcile = now
+        self._notify(updated)
+
+    def apply_balance_changed(self, balance):
+        """Apply ``msg["current_balance"]`` of a ``balance-changed`` event."""
+        with self._lock:
+            entry = self._entry(balance["id"])
+            entry.amount = balance.get("amount", entry.amount)
+            entry.type = balance.get("type", entry.type)
+            entry.currency = balance.get("currency", entry.currency)
+            entry.updated_at = time.time()
+            entry.source = "push"
+            self._dirty_since = None
+        self._notify([entry])
+
+    def mark_dirty(self, balance_id=None):
+        """A position of ``balance_id`` changed: its amount may be outdated."""
+        if balance_id is not None and balance_id not in self._entries:
+            return
+        with self._lock:
+            if self._dirty_since is None:
+                self._dirty_since = time.time()
+        self._wakeup.set()
+
+    def get(self, balance_id):
+        """:class:`BalanceEntry` of ``balance_id`` (None until seeded)."""
+        entry = self._entries.get(balance_id)
+        if entry is None or entry.updated_at is None:
+            return None
+        return entry
+
+    def amount(self, balance_id):
+        """``(amount, age_seconds)`` or ``(None, None)`` until seeded."""
+        entry = self.get(balance_id)
+        if entry is None:
+            return None, None
+        return entry.amount, entry.age
+
+    def all(self):
+        with self._lock:
+            return [entry.to_dict() for entry in self._entries.values()]
+
+    # ____________________________SUBSCRIBE_________________________
+
+    def subscribe(self, callback):
+        """Call ``callback(entry)`` on every balance update; returns a token for :meth:`unsubscribe`.
+
+        Callbacks run on the websocket thread and must not block.
+        """
+        with self._lock:
+            self._next_token += 1
+            self._subscribers[self._next_token] = callback
+            return self._next_token
+
+    def unsubscribe(self, token):
+        with self._lock:
+            self._subscribers.pop(token, None)
+
+    def _notify(self, entries):
+        callbacks = list(self._subscribers.values())
+        for entry in entries:
+            for callback in callbacks:
+                try:
+                    callback(entry)
+                except Exception:
+                    logging.getLogger(__name__).exception('**error** balance cache subscriber')
+
+    # ____________________________RECONCILE_________________________
+
+    def start(self, refresh):
+        """Start the reconcile thread; ``refresh()`` must fetch the balances and :meth:`seed` them."""
+        self._refresh = refresh
+        self._stopped = False
+        if self._thread is None or not self._thread.is_alive():
+            self._thread = threading.Thread(
+                target=self._run, name="iqoption-balance-reconcile")
+            self._thread.daemon = True
+            self._thread.start()
+
+    def stop(self, timeout=None):
+        """Stop the reconcile thread (cached balances are kept)."""
+        self._stopped = True
+        self._wakeup.set()
+        thread = self._thread
+        if thread is not None and thread is not threading.current_thread():
+            thread.join(timeout)
+
+    def _next_wait(self, now):
+        waits = []
+        if self._last_reconcile is not None:
+            waits.append(self._last_reconcile + self.reconcile_interval - now)
+        else:
+            waits.append(0)
+        if self._dirty_since is not None:
+            waits.append(self._dirty_since + self.dirty_delay - now)
+        return max(0.0, min(waits))
+
+    def _run(self):
+        while not self._stopped:
+            wait = self._next_wait(time.time())
+            if wait > 0:
+                self._wakeup.wait(wait)
+                self._wakeup.clear()
+                continue
+            started = time.time()
+            try:
+                self._refresh()
+            except Exception:
+                logging.getLogger(__name__).exception('**warning** balance reconcile')
+            with self._lock:
+                # also on failure: do not retry in a tight loop
+                self._last_reconcile = max(self._last_reconcile or 0, started)
+                if self._dirty_since is not None and self._dirty_since <= started:
+                    self._dirty_since = None
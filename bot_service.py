@@ -24,10 +24,14 @@ import os
 import sys
 import time
 import json
+import logging
 import threading
-from dataclasses import dataclass, field
+from collections import deque
+from contextlib import contextmanager
+from concurrent.futures import Future, ThreadPoolExecutor
+from dataclasses import asdict, dataclass, field
 from datetime import datetime
-from typing import Any, Callable, Dict, List, Optional, Tuple
+from typing import Any, Callable, Deque, Dict, List, Optional, Tuple
 
 from dotenv import load_dotenv
 
@@ -61,6 +65,21 @@ sinais_processor_module = importlib.util.module_from_spec(spec_sinais)
 spec_sinais.loader.exec_module(sinais_processor_module)
 SinaisProcessor = sinais_processor_module.SinaisProcessor
 Sinal = sinais_processor_module.Sinal
+obter_processador = sinais_processor_module.obter_processador
+
+signal_scheduler_path = os.path.join(CURRENT_DIR, "signal_scheduler.py")
+spec_scheduler = importlib.util.spec_from_file_location("signal_scheduler", signal_scheduler_path)
+signal_scheduler_module = importlib.util.module_from_spec(spec_scheduler)
+spec_scheduler.loader.exec_module(signal_scheduler_module)
+AgendadorSinais = signal_scheduler_module.AgendadorSinais
+EventoSinais = signal_scheduler_module.EventoSinais
+chave_padrao = signal_scheduler_module.chave_padrao
+
+registro_logs_path = os.path.join(CURRENT_DIR, "registro_logs.py")
+spec_registro = importlib.util.spec_from_file_location("registro_logs", registro_logs_path)
+registro_logs_module = importlib.util.module_from_spec(spec_registro)
+spec_registro.loader.exec_module(registro_logs_module)
+configurar_logs = registro_logs_module.configurar_logs
 
 
 # Importar IQ_Option com a mesma estratégia utilizada no app Flask
@@ -77,6 +96,16 @@ except ImportError:
         raise
 
 
+def criar_iq_option(email: str, password: str, account_type: str = "PRACTICE") -> IQ_Option:
+    """IQ_Option real ou, com IQ_OPTION_PAPER=1, o PaperIQOption offline (mercado gravado/sintético)."""
+
+    if os.getenv("IQ_OPTION_PAPER", "").strip().lower() in ("1", "true", "sim", "yes"):
+        from iqoptionapi.paper_api import paper_from_env  # type: ignore
+
+        return paper_from_env(email, password, account_type)
+    return IQ_Option(email, password, active_account_type=account_type)
+
+
 # ---------------------------------------------------------------------------
 # Utilitários
 # ---------------------------------------------------------------------------
@@ -163,6 +192,17 @@ class BotConfig:
     account_type: str = "PRACTICE"
 
 
+@dataclass
+class ArmedSignal:
+    """Sinal com ordem pré-montada aguardando o instante de disparo."""
+
+    sinal: Sinal
+    order: Any  # ArmedOrder de stable_api.IQ_Option.arm_buy
+    amount: float
+    expiry: int
+    balance: float
+
+
 @dataclass
 class BotStatus:
     running: bool
@@ -176,6 +216,7 @@ class BotStatus:
     variation: Optional[float] = None
     variation_percent: Optional[float] = None
     stop_loss_status: Optional[Dict[str, Any]] = None
+    balance_age: Optional[float] = None  # segundos desde a última atualização do saldo em cache
 
 
 # ---------------------------------------------------------------------------
@@ -183,35 +224,219 @@ class BotStatus:
 # ---------------------------------------------------------------------------
 
 
+# Classes de operação do ThreadSafeIQOption
+OP_LEITURA = "leitura"  # estado local (caches, relógio): sem trava; sem saldo em cache, uma consulta com timeout
+OP_ESPERA = "espera"  # aguardam eventos do websocket por id: sem trava
+OP_ORDEM = "ordem"  # correlacionadas por request id: concorrentes entre si
+OP_SESSAO = "sessao"  # conexão e conta: exclusivas, ordens aguardam o término
+OP_LEGADO = "legado"  # resposta em campo único da API: serializadas entre si
+
+CLASSES_OPERACAO: Dict[str, str] = {
+    **dict.fromkeys((
+        "get_balance", "get_balance_info", "get_balance_id", "get_currency",
+        "get_server_timestamp", "get_server_offset", "check_connect",
+        "get_all_ACTIVES_OPCODE", "get_name_by_activeId", "opcode_to_name",
+        "get_order_record", "get_async_order", "get_option_result", "batch_report",
+    ), OP_LEITURA),
+    **dict.fromkeys((
+        "check_win", "check_win_v4", "check_win_async", "wait_order_state",
+        "check_binary_order",
+    ), OP_ESPERA),
+    **dict.fromkeys((
+        "buy", "arm_buy", "fire_armed", "fire_armed_batch", "buy_multi_async",
+    ), OP_ORDEM),
+    **dict.fromkeys((
+        "connect", "connect_2fa", "set_session", "logout", "change_balance",
+        "reset_practice_balance",
+    ), OP_SESSAO),
+}
+
+
+@dataclass
+class ContencaoTrava:
+    """Métricas de contenção de uma classe de operação."""
+
+    chamadas: int = 0
+    contendidas: int = 0  # chamadas que não obtiveram a trava de imediato
+    espera_total: float = 0.0
+    espera_max: float = 0.0
+    retencao_total: float = 0.0
+    retencao_max: float = 0.0
+
+    def registrar(self, espera: Optional[float], retencao: float) -> None:
+        self.chamadas += 1
+        if espera is not None:
+            self.contendidas += 1
+            self.espera_total += espera
+            self.espera_max = max(self.espera_max, espera)
+        self.retencao_total += retencao
+        self.retencao_max = max(self.retencao_max, retencao)
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            "chamadas": self.chamadas,
+            "contendidas": self.contendidas,
+            "taxa_contencao": self.contendidas / self.chamadas if self.chamadas else 0.0,
+            "espera_media_ms": self.espera_total / self.contendidas * 1000 if self.contendidas else 0.0,
+            "espera_max_ms": self.espera_max * 1000,
+            "retencao_media_ms": self.retencao_total / self.chamadas * 1000 if self.chamadas else 0.0,
+            "retencao_max_ms": self.retencao_max * 1000,
+        }
+
+
+class TravaSessao:
+    """Trava compartilhada/exclusiva com preferência para a sessão.
+
+    Ordens e métodos legados entram compartilhados; operações de sessão
+    (reconexão, troca de conta) esperam as que estão em andamento e
+    bloqueiam as novas. A entrada compartilhada é reentrante por thread.
+    """
+
+    def __init__(self) -> None:
+        self._cond = threading.Condition(threading.Lock())
+        self._compartilhadas = 0
+        self._exclusiva: Optional[int] = None
+        self._exclusiva_niveis = 0
+        self._aguardando_exclusiva = 0
+        self._local = threading.local()
+
+    def _niveis(self) -> int:
+        return getattr(self._local, "niveis", 0)
+
+    def adquirir_compartilhada(self, bloquear: bool = True) -> bool:
+        eu = threading.get_ident()
+        niveis = self._niveis()
+        with self._cond:
+            if niveis == 0 and self._exclusiva != eu:
+                while self._exclusiva is not None or self._aguardando_exclusiva:
+                    if not bloquear:
+                        return False
+                    self._cond.wait()
+            self._compartilhadas += 1
+        self._local.niveis = niveis + 1
+        return True
+
+    def liberar_compartilhada(self) -> None:
+        self._local.niveis = self._niveis() - 1
+        with self._cond:
+            self._compartilhadas -= 1
+            if self._compartilhadas == 0:
+                self._cond.notify_all()
+
+    def adquirir_exclusiva(self, bloquear: bool = True) -> bool:
+        eu = threading.get_ident()
+        with self._cond:
+            if self._exclusiva == eu:
+                self._exclusiva_niveis += 1
+                return True
+            # compartilhadas da própria thread não impedem (evita autotravamento)
+            proprias = self._niveis()
+            if not bloquear and (self._exclusiva is not None or self._compartilhadas > proprias):
+                return False
+            self._aguardando_exclusiva += 1
+            try:
+                while self._exclusiva is not None or self._compartilhadas > proprias:
+                    self._cond.wait()
+            finally:
+                self._aguardando_exclusiva -= 1
+            self._exclusiva = eu
+            self._exclusiva_niveis = 1
+            return True
+
+    def liberar_exclusiva(self) -> None:
+        with self._cond:
+            self._exclusiva_niveis -= 1
+            if self._exclusiva_niveis == 0:
+                self._exclusiva = None
+                self._cond.notify_all()
+
+
 class ThreadSafeIQOption:
-    """Wrapper que serializa chamadas à API original em múltiplas threads."""
+    """Wrapper que coordena chamadas à API original em múltiplas threads.
+
+    Cada método pertence a uma classe de operação (`CLASSES_OPERACAO`):
+    leituras de estado e esperas por id não usam trava, ordens correm em
+    paralelo (respostas correlacionadas por request id), operações de sessão
+    são exclusivas e métodos legados, cuja resposta chega num campo único da
+    API, são serializados entre si. Métodos não listados são legados.
+    """
 
     def __init__(self, api: IQ_Option) -> None:
         super().__setattr__("_api", api)
-        super().__setattr__("_lock", threading.RLock())
+        super().__setattr__("_sessao", TravaSessao())
+        super().__setattr__("_lock", threading.RLock())  # métodos legados
+        super().__setattr__("_metricas", {classe: ContencaoTrava() for classe in (OP_ORDEM, OP_SESSAO, OP_LEGADO)})
+        super().__setattr__("_metricas_lock", threading.Lock())
+        super().__setattr__("_metodos", {})
 
     def __getattr__(self, name: str) -> Any:
-        with self._lock:
-            attr = getattr(self._api, name)
-            if callable(attr):
-                def _locked_call(*args: Any, **kwargs: Any) -> Any:
-                    with self._lock:
-                        return attr(*args, **kwargs)
-
-                return _locked_call
+        metodo = self._metodos.get(name)
+        if metodo is not None:
+            return metodo
+        attr = getattr(self._api, name)
+        if not callable(attr):
             return attr
+        classe = CLASSES_OPERACAO.get(name, OP_LEGADO)
+        if classe in (OP_LEITURA, OP_ESPERA):
+            metodo = attr
+        else:
+            def metodo(*args: Any, **kwargs: Any) -> Any:
+                with self._travar(classe):
+                    return attr(*args, **kwargs)
+        self._metodos[name] = metodo
+        return metodo
 
     def __setattr__(self, name: str, value: Any) -> None:
         if name in {"_api", "_lock"}:
             super().__setattr__(name, value)
         else:
-            with self._lock:
+            with self._travar(OP_SESSAO):
                 setattr(self._api, name, value)
 
+    def _adquirir(self, classe: str, bloquear: bool) -> bool:
+        if classe == OP_SESSAO:
+            return self._sessao.adquirir_exclusiva(bloquear)
+        if not self._sessao.adquirir_compartilhada(bloquear):
+            return False
+        if classe == OP_LEGADO and not self._lock.acquire(bloquear):
+            self._sessao.liberar_compartilhada()
+            return False
+        return True
+
+    def _liberar(self, classe: str) -> None:
+        if classe == OP_SESSAO:
+            self._sessao.liberar_exclusiva()
+            return
+        if classe == OP_LEGADO:
+            self._lock.release()
+        self._sessao.liberar_compartilhada()
+
+    @contextmanager
+    def _travar(self, classe: str):
+        espera: Optional[float] = None
+        if not self._adquirir(classe, False):
+            inicio = time.perf_counter()
+            self._adquirir(classe, True)
+            espera = time.perf_counter() - inicio
+        obtida = time.perf_counter()
+        try:
+            yield
+        finally:
+            retencao = time.perf_counter() - obtida
+            self._liberar(classe)
+            with self._metricas_lock:
+                self._metricas[classe].registrar(espera, retencao)
+
     def run_locked(self, func: Callable[..., Any], *args: Any, **kwargs: Any) -> Any:
-        with self._lock:
+        """Executa `func` serializada com os métodos legados."""
+        with self._travar(OP_LEGADO):
             return func(*args, **kwargs)
 
+    def lock_stats(self) -> Dict[str, Dict[str, Any]]:
+        """Contenção por classe de operação (leituras e esperas não travam)."""
+        with self._metricas_lock:
+            return {classe: metricas.to_dict() for classe, metricas in self._metricas.items()}
+
     @property
     def raw(self) -> IQ_Option:
         return self._api
@@ -220,9 +445,17 @@ class ThreadSafeIQOption:
 class BotService:
     """Gerencia ciclo de vida do bot IQ Option de forma independente de UI."""
 
-    def __init__(self, base_dir: Optional[str] = None, env_path: Optional[str] = None) -> None:
+    def __init__(
+        self,
+        base_dir: Optional[str] = None,
+        env_path: Optional[str] = None,
+        api_factory: Optional[Callable[[str, str, str], Any]] = None,
+        diario: Optional[Any] = None,
+    ) -> None:
         self.base_dir = base_dir or CURRENT_DIR
         self.env_path = env_path or os.path.join(self.base_dir, ".env")
+        # Cria o cliente no login: (email, senha, tipo de conta) -> IQ_Option ou PaperIQOption
+        self.api_factory = api_factory or criar_iq_option
 
         load_dotenv(self.env_path)
 
@@ -239,8 +472,12 @@ class BotService:
         self.api: Optional[ThreadSafeIQOption] = None
         self.stop_loss_protection: Optional[StopLossProtection] = None
 
-        self.trade_history: List[TradeEntry] = []
-        self.logs: List[LogEntry] = []
+        # Últimas 50 operações em memória; o histórico completo fica no diário (DiarioTrades), se informado
+        self.trade_history: Deque[TradeEntry] = deque(maxlen=50)
+        self.diario = diario
+        self.logs: Deque[LogEntry] = deque(maxlen=100)
+        # Registros vão para a fila do logger `bot`; o escritor roda em segundo plano
+        self.logger = configurar_logs().getChild("service")
         self.processed_signals: int = 0
         self.executed_signals: int = 0
         self.next_signal: Optional[str] = None
@@ -251,6 +488,28 @@ class BotService:
         self.initial_balance: Optional[float] = None
         self.last_balance: Optional[float] = None
 
+        # Antecedência (segundos) com que os sinais do próximo minuto são armados
+        self.arm_lead_seconds: float = parse_float_value(
+            os.getenv("IQ_OPTION_ARM_LEAD"), default=10, field_name="Antecedência de armação"
+        )
+
+        # Margem (segundos) após a expiração antes de reconciliar um resultado não recebido
+        self.result_grace_seconds: float = parse_float_value(
+            os.getenv("IQ_OPTION_RESULT_GRACE"), default=30, field_name="Margem de resultado"
+        )
+        # Resultados chegam por push; o tratamento (saldo, Martingale) roda neste pool
+        self._result_executor = ThreadPoolExecutor(max_workers=4, thread_name_prefix="resultados")
+
+        # Deslocamento (segundos) aplicado ao instante de todos os sinais, ex: -1 dispara 1s antes
+        self.trigger_offset_seconds: float = parse_float_value(
+            os.getenv("IQ_OPTION_TRIGGER_OFFSET"), default=0, field_name="Deslocamento de disparo"
+        )
+        self._scheduler: Optional[AgendadorSinais] = None
+        # Prazo (segundos) após o instante do sinal: ordens mais atrasadas que isso não são enviadas
+        self.signal_deadline_seconds: float = parse_float_value(
+            os.getenv("IQ_OPTION_SIGNAL_DEADLINE"), default=2, field_name="Prazo de envio"
+        )
+
         self._execution_thread: Optional[threading.Thread] = None
         self._stop_event = threading.Event()
         self._lock = threading.Lock()
@@ -259,15 +518,25 @@ class BotService:
     # Registro de logs e histórico
     # ------------------------------------------------------------------
 
-    def add_log(self, message: str, log_type: str = "info") -> None:
+    def add_log(self, message: str, log_type: str = "info", **fields: Any) -> None:
         entry = LogEntry(timestamp=datetime.now().isoformat(), message=message, type=log_type)
-        self.logs.insert(0, entry)
-        self.logs = self.logs[:100]
-        print(f"[SINAIS] {message}")  # mantém comportamento para debug
+        self.logs.appendleft(entry)
+        level = {"warning": logging.WARNING, "error": logging.ERROR}.get(log_type, logging.INFO)
+        self.logger.log(level, message, extra={"email": self.email, "tipo": log_type, **fields})
 
     def _append_trade(self, trade: TradeEntry) -> None:
-        self.trade_history.insert(0, trade)
-        self.trade_history = self.trade_history[:50]
+        with self._lock:
+            self.trade_history.appendleft(trade)
+        self._journal_trade(trade, "Operação registrada")
+
+    def _journal_trade(self, trade: TradeEntry, message: str) -> None:
+        if self.diario is not None:
+            self.diario.registrar(self.email or "bot-service", asdict(trade))
+        self.logger.info(message, extra={
+            "email": self.email, "order_id": trade.id, "parent_trade_id": trade.parent_trade_id,
+            "martingale_level": trade.martingale_level, "asset": trade.asset, "amount": trade.amount,
+            "status": trade.status, "profit": trade.profit,
+        })
 
     # ------------------------------------------------------------------
     # Autenticação
@@ -277,7 +546,7 @@ class BotService:
         """Autentica e prepara a instância da API."""
 
         try:
-            raw_api = IQ_Option(email, password, active_account_type=account_type)
+            raw_api = self.api_factory(email, password, account_type)
             check, reason = raw_api.connect()
 
             if not check:
@@ -286,6 +555,9 @@ class BotService:
 
             raw_api.change_balance(account_type)
             api = ThreadSafeIQOption(raw_api)
+            from iqoptionapi import metrics  # type: ignore
+
+            metrics.track_client(raw_api, account=metrics.account_id(email), account_type=account_type)
             balance = float(api.get_balance())
 
             self.email = email
@@ -301,6 +573,8 @@ class BotService:
                 auto_fetch_balance=False,
                 initial_balance=balance,
             )
+            if self.stop_loss_protection:
+                self.stop_loss_protection.start_monitoring()
             self.add_log("Login realizado com sucesso", "success")
             return True, None
 
@@ -310,6 +584,9 @@ class BotService:
 
     def logout(self) -> None:
         if self.api:
+            from iqoptionapi import metrics  # type: ignore
+
+            metrics.untrack_client(self.api.raw)
             try:
                 self.api.logout()
             except Exception:
@@ -329,7 +606,7 @@ class BotService:
     def get_config(self) -> BotConfig:
         return self.config
 
-    def update_config(self, **kwargs: Any) -> BotConfig:
+    def update_config(self, persist: bool = True, **kwargs: Any) -> BotConfig:
         if "stop_loss" in kwargs:
             self.config.stop_loss = parse_float_value(kwargs["stop_loss"], field_name="Stop Loss")
         if "stop_win" in kwargs:
@@ -341,7 +618,8 @@ class BotService:
         if "gale" in kwargs:
             self.config.gale = parse_int_value(kwargs["gale"], field_name="Gale")
 
-        self._persist_config()
+        if persist:
+            self._persist_config()
         self.add_log("Configurações atualizadas", "success")
         return self.config
 
@@ -404,6 +682,8 @@ class BotService:
 
     def stop_signal_execution(self) -> None:
         self._stop_event.set()
+        if self._scheduler:
+            self._scheduler.parar()
         self.running = False
         self.add_log("Execução de sinais interrompida manualmente", "warning")
 
@@ -413,11 +693,17 @@ class BotService:
 
     def get_status(self, *, fresh: bool = False) -> BotStatus:
         balance = self.last_balance
+        balance_age = None
         stop_loss_status = None
 
         if (fresh or self.last_balance is None) and self.api:
+            # Leitura do cache local de saldo (atualizado por push), sem ida ao servidor
             try:
-                balance = float(self.api.get_balance())
+                info = self.api.get_balance_info() or {}
+                if info.get("amount") is None:
+                    info = {"amount": self.api.get_balance(), "age": 0.0}
+                balance = float(info["amount"])
+                balance_age = info.get("age")
                 self.last_balance = balance
             except Exception:
                 balance = self.last_balance
@@ -445,15 +731,68 @@ class BotService:
             variation=variation,
             variation_percent=variation_percent,
             stop_loss_status=stop_loss_status,
+            balance_age=balance_age,
         )
 
+    def get_latency_stats(
+        self, *, asset: Optional[str] = None, instrument_type: Optional[str] = None, recent: int = 20
+    ) -> Dict[str, Any]:
+        """Histogramas de latência das ordens (sinal → envio → ack → abertura → fechamento) e contenção do wrapper."""
+
+        if not self.api:
+            return {"by_asset": {}, "by_instrument": {}, "recent": [], "locks": {}}
+        tracer = self.api.raw.order_tracer
+        stats = tracer.snapshot(asset=asset, instrument_type=instrument_type)
+        stats["recent"] = tracer.recent(recent)
+        stats["locks"] = self.api.lock_stats()
+        return stats
+
+    def registrar_metricas(self, registry: Optional[Any] = None) -> Any:
+        """Exporta `coletar_metricas` no registro Prometheus (padrão: o da biblioteca) e o devolve."""
+
+        from iqoptionapi import metrics  # type: ignore
+
+        registry = registry or metrics.REGISTRY
+        registry.register_collector(self.coletar_metricas)
+        return registry
+
+    def coletar_metricas(self) -> List[Any]:
+        """Estado do serviço (get_status, sem consultar a corretora) e contenção do wrapper como métricas."""
+
+        from iqoptionapi.metrics import MetricFamily  # type: ignore
+
+        status = self.get_status()
+        running = MetricFamily("bot_service_running", "gauge", "1 com a execução de sinais ativa.")
+        running.add(1 if status.running else 0)
+        sinais = MetricFamily("bot_service_signals", "gauge", "Sinais da execução atual, por situação.")
+        sinais.add(status.processed_signals, {"kind": "processed"})
+        sinais.add(status.executed_signals, {"kind": "executed"})
+        saldo = MetricFamily("bot_service_balance", "gauge", "Último saldo conhecido.")
+        idade = MetricFamily("bot_service_balance_age_seconds", "gauge", "Idade do saldo em cache.")
+        if status.balance is not None:
+            saldo.add(status.balance)
+        if status.balance_age is not None:
+            idade.add(status.balance_age)
+        buffers = MetricFamily("bot_service_buffer_entries", "gauge", "Entradas guardadas em memória.")
+        buffers.add(len(status.logs), {"buffer": "logs"})
+        buffers.add(len(status.trades), {"buffer": "trades"})
+        chamadas = MetricFamily("bot_service_api_calls_total", "counter",
+                                "Chamadas à API pelo wrapper, por classe de operação.")
+        contendidas = MetricFamily("bot_service_api_calls_contended_total", "counter",
+                                   "Chamadas que esperaram a trava da sessão.")
+        if self.api:
+            for classe, metricas in self.api.lock_stats().items():
+                chamadas.add(metricas["chamadas"], {"class": classe})
+                contendidas.add(metricas["contendidas"], {"class": classe})
+        return [running, sinais, saldo, idade, buffers, chamadas, contendidas]
+
     # ------------------------------------------------------------------
     # Implementação interna da execução de sinais
     # ------------------------------------------------------------------
 
     def _signal_worker(self, *, sinais_path: str) -> None:
         try:
-            processor = SinaisProcessor(sinais_path)
+            processor = obter_processador(sinais_path)
             if not processor.carregar_sinais():
                 self.add_log("Nenhum sinal válido encontrado", "warning")
                 self.running = False
@@ -463,61 +802,117 @@ class BotService:
             self.executed_signals = 0
             self.losses_state = {"count": 0, "skip_count": 0}
 
-            ultima_recarga = datetime.now()
-            sinais_executados = set()
+            # Heap de eventos por instante: o worker dorme até o próximo sinal (ou recarga)
+            agendador = AgendadorSinais(
+                self._arm_event,
+                self._fire_event,
+                antecedencia=self.arm_lead_seconds,
+                deslocamento=self.trigger_offset_seconds,
+                offset_servidor=self._server_offset,
+                relogio=getattr(self.api.raw, "clock", None),
+                ao_perder=lambda evento, atraso: self.add_log(
+                    f"{len(evento.sinais)} sinal(is) de {evento.hora} não disparado(s): atraso de {atraso:.1f}s", "warning"
+                ),
+            )
+            self._scheduler = agendador
+            agendador.carregar(processor.obter_todos_sinais())
+            self._update_next_signal()
 
             self.add_log(f"Execução iniciada às {datetime.now().strftime('%H:%M:%S')}", "info")
 
-            while not self._stop_event.is_set():
-                hora_atual = datetime.now()
-                hora_str = hora_atual.strftime("%H:%M")
-
-                if (datetime.now() - ultima_recarga).total_seconds() >= 60:
-                    try:
-                        processor.carregar_sinais()
-                        ultima_recarga = datetime.now()
-                        sinais_executados.clear()
-                    except Exception as exc:
-                        self.add_log(f"Erro ao recarregar sinais: {exc}", "error")
-
-                if self._stop_event.is_set():
-                    break
-
-                if hora_str not in sinais_executados:
-                    sinais_para_hora = processor.obter_sinais_para_hora(hora_atual)
-                    if sinais_para_hora:
-                        segundos = hora_atual.second
-                        if segundos >= 58 or segundos <= 2:
-                            sinais_executados.add(hora_str)
-                            for sinal in sinais_para_hora:
-                                if self._stop_event.is_set():
-                                    break
-                                self._process_signal(sinal)
-
-                proximos = processor.obter_proximos_sinais(1)
-                self.next_signal = (
-                    f"{proximos[0].hora} - {proximos[0].ativo} ({proximos[0].direcao})"
-                    if proximos else "Nenhum sinal futuro"
-                )
-
-                time.sleep(0.1)
+            versao_agendada = processor.versao
+
+            def recarregar() -> Optional[List[Sinal]]:
+                # Só reagenda se o arquivo mudou (o processador relê apenas as linhas alteradas)
+                nonlocal versao_agendada
+                try:
+                    processor.carregar_sinais()
+                except Exception as exc:
+                    self.add_log(f"Erro ao recarregar sinais: {exc}", "error")
+                    return None
+                if processor.versao == versao_agendada:
+                    return None
+                versao_agendada = processor.versao
+                return processor.obter_todos_sinais()
+
+            if not self._stop_event.is_set():
+                agendador.executar(recarregar)
 
         except Exception as exc:  # pragma: no cover - manter debug consistente
             self.add_log(f"Erro na execução de sinais: {exc}", "error")
         finally:
+            self._scheduler = None
             self.running = False
             self.add_log("Execução de sinais finalizada", "info")
 
+    def _server_offset(self) -> float:
+        if not self.api:
+            return 0.0
+        try:
+            return float(self.api.get_server_offset())
+        except Exception:
+            return 0.0
+
+    def _update_next_signal(self) -> None:
+        proximos = self._scheduler.proximos(1) if self._scheduler else []
+        if proximos and proximos[0].sinais:
+            sinal = proximos[0].sinais[0]
+            self.next_signal = f"{sinal.hora} - {sinal.ativo} ({sinal.direcao})"
+        else:
+            self.next_signal = "Nenhum sinal futuro"
+
+    def _arm_event(self, evento: EventoSinais, alvo: float) -> None:
+        """Arma todos os sinais de um instante antes do disparo."""
+        for sinal in evento.sinais:
+            if self._stop_event.is_set():
+                return
+            armado = self._arm_signal(sinal, alvo)
+            if armado is not None:
+                evento.preparados[chave_padrao(sinal)] = armado
+
+    def _fire_event(self, evento: EventoSinais, alvo: float) -> None:
+        """Dispara em lote os sinais de um mesmo instante (armando na hora os que faltarem)."""
+        lote = self._collect_batch(evento.sinais, evento.preparados, alvo)
+        if lote:
+            self._fire_batch(evento.hora, lote)
+        self._update_next_signal()
+
+    def _collect_batch(
+        self, sinais: List[Sinal], preparados: Dict[Any, ArmedSignal], alvo: Optional[float] = None
+    ) -> List[ArmedSignal]:
+        """Monta o lote de um instante: usa as ordens armadas (`preparados`) e arma as que faltarem."""
+        lote: List[ArmedSignal] = []
+        exposicao = 0.0
+        for sinal in sinais:
+            if self._stop_event.is_set():
+                break
+            armado = preparados.pop(chave_padrao(sinal), None) or self._arm_signal(sinal, alvo)
+            if armado is None:
+                continue
+            # O lote inteiro conta para a exposição: cada ordem só sai se couber no Stop Loss
+            if not self._can_fire(armado, exposicao):
+                break
+            exposicao += armado.amount
+            lote.append(armado)
+        return lote
+
     def _process_signal(self, sinal: Sinal) -> None:
+        armado = self._arm_signal(sinal)
+        if armado is not None and self._can_fire(armado):
+            self._fire_batch(sinal.hora, [armado])
+
+    def _arm_signal(self, sinal: Sinal, target_timestamp: Optional[float] = None) -> Optional[ArmedSignal]:
+        """Resolve saldo, valor, ativo e expiração antes do instante do sinal."""
+
         if not self.api:
             self.add_log("API indisponível ao processar sinal", "error")
             self.stop_signal_execution()
-            return
+            return None
 
         if self.stop_loss_protection and not self.stop_loss_protection.can_operate():
             self.add_log("Stop Loss acionado - execução interrompida", "warning")
             self.stop_signal_execution()
-            return
+            return None
 
         saldo_atual = self.api.get_balance()
         if self.config.entry_type == "PERCENT":
@@ -536,34 +931,119 @@ class BotService:
                 f"Saldo insuficiente para {sinal.ativo} {sinal.direcao} - necessário ${valor_entrada:.2f}, disponível ${saldo_atual:.2f}",
                 "error",
             )
-            return
+            return None
 
         try:
             minutos = int(sinal.timeframe[1:]) if sinal.timeframe.startswith("M") else int(sinal.timeframe[1:]) * 60
         except Exception:
             self.add_log(f"Timeframe inválido para sinal: {sinal.timeframe}", "error")
-            return
+            return None
+
+        try:
+            check, order = self.api.arm_buy(
+                valor_entrada, sinal.ativo, sinal.direcao.lower(), minutos, target_timestamp
+            )
+        except Exception as exc:
+            self.add_log(f"Erro ao preparar ordem: {exc}", "error")
+            return None
+
+        if not check:
+            self.add_log(f"Sinal {sinal.ativo} {sinal.direcao} não armado: {order}", "error")
+            return None
 
         self.add_log(
-            f"Executando sinal: {sinal.timeframe};{sinal.ativo};{sinal.hora};{sinal.direcao} | Valor ${valor_entrada:.2f}",
+            f"Sinal armado: {sinal.timeframe};{sinal.ativo};{sinal.hora};{sinal.direcao} | Valor ${valor_entrada:.2f}",
             "info",
         )
-        self.processed_signals += 1
+        return ArmedSignal(sinal=sinal, order=order, amount=valor_entrada, expiry=minutos, balance=saldo_atual)
+
+    def _can_fire(self, armado: ArmedSignal, exposicao_lote: float = 0.0) -> bool:
+        if not self.api:
+            self.add_log("API indisponível ao processar sinal", "error")
+            self.stop_signal_execution()
+            return False
+
+        if self.stop_loss_protection and not self.stop_loss_protection.can_operate(exposicao_lote + armado.amount):
+            self.add_log("Stop Loss acionado - execução interrompida", "warning")
+            self.stop_signal_execution()
+            return False
+        return True
 
+    def _fire_batch(self, rotulo: str, lote: List[ArmedSignal]) -> None:
+        """
+        Envia as ordens pré-armadas em pipeline no mesmo socket, sem esperar respostas.
+
+        As respostas chegam por request id e são tratadas no pool de resultados;
+        ordens que passaram do prazo (`signal_deadline_seconds`) não são enviadas.
+        """
+        trigger_time = time.monotonic()
+        self.processed_signals += len(lote)
+
+        try:
+            # Classe "ordem": não espera buys nem métodos legados de outras threads
+            futures = self.api.fire_armed_batch(
+                [armado.order for armado in lote],
+                max_delay=self.signal_deadline_seconds,
+                trigger_time=trigger_time,
+            )
+        except Exception as exc:
+            self.add_log(f"Erro ao enviar ordens: {exc}", "error")
+            return
+
+        self._log_batch(rotulo, lote)
+        for armado, future in zip(lote, futures):
+            future.add_done_callback(
+                lambda done, armado=armado: self._result_executor.submit(self._on_order_answer, armado, done)
+            )
+
+    def _log_batch(self, rotulo: str, lote: List[ArmedSignal]) -> None:
+        """Resumo do lote: defasagem entre a primeira e a última ordem e atraso em relação ao alvo."""
+        relatorio = IQ_Option.batch_report([armado.order for armado in lote])
+        mensagem = f"Lote {rotulo}: {relatorio['sent']}/{len(lote)} ordem(ns) enviada(s)"
+        if relatorio["sent"]:
+            mensagem += (
+                f" | Defasagem primeira→última {relatorio['skew_ms']:.1f} ms"
+                f" | Envio {relatorio['delay_min_ms']:+.0f} a {relatorio['delay_max_ms']:+.0f} ms em relação ao alvo"
+            )
+        if relatorio["skipped"]:
+            mensagem += f" | {relatorio['skipped']} pulada(s) por atraso acima de {self.signal_deadline_seconds:.1f}s"
+        self.add_log(mensagem, "warning" if relatorio["skipped"] else "info")
+
+    def _on_order_answer(self, armado: ArmedSignal, future: Future) -> None:
+        sinal = armado.sinal
         try:
-            resultado, order_id = self.api.buy(valor_entrada, sinal.ativo, sinal.direcao.lower(), minutos)
+            resultado, order_id = future.result()
         except Exception as exc:
-            self.add_log(f"Erro ao enviar ordem: {exc}", "error")
+            self.add_log(f"Erro ao enviar ordem {sinal.ativo} {sinal.direcao}: {exc}", "error")
             return
 
         if not resultado:
-            self.add_log(f"Falha ao executar sinal {sinal.ativo} {sinal.direcao}", "error")
+            if order_id == "late":
+                self.add_log(f"Sinal {sinal.ativo} {sinal.direcao} pulado: prazo de envio excedido", "warning")
+            else:
+                self.add_log(f"Falha ao executar sinal {sinal.ativo} {sinal.direcao}: {order_id}", "error")
             return
 
-        self.executed_signals += 1
-        balance = self.api.get_balance()
+        self._register_trade(armado, order_id)
+
+    def _register_trade(self, armado: ArmedSignal, order_id: Any) -> None:
+        sinal = armado.sinal
+        valor_entrada = armado.amount
+        minutos = armado.expiry
+
+        alvo_str = datetime.fromtimestamp(armado.order.target_timestamp).strftime("%H:%M:%S")
+        self.add_log(
+            f"Executando sinal: {sinal.timeframe};{sinal.ativo};{sinal.hora};{sinal.direcao} | Valor ${valor_entrada:.2f} | "
+            f"Envio {armado.order.send_delay * 1000:+.0f} ms em relação ao alvo {alvo_str}",
+            "info",
+        )
+
+        with self._lock:
+            self.executed_signals += 1
         if self.stop_loss_protection:
-            self.stop_loss_protection.update_balance(balance)
+            self.stop_loss_protection.add_pending(order_id, valor_entrada)
+            if self.api:
+                self.stop_loss_protection.update_balance(self.api.get_balance())
 
         trade = TradeEntry(
             id=order_id,
@@ -576,65 +1056,58 @@ class BotService:
         )
         self._append_trade(trade)
 
-        threading.Thread(
-            target=self._check_trade_result,
-            args=(trade, sinal, self.config.gale),
-            daemon=True,
-        ).start()
+        self._watch_trade(trade, sinal, self.config.gale)
+
+    def _watch_trade(self, trade: TradeEntry, sinal: Sinal, gale_level: int) -> None:
+        """Registra o tratamento do resultado; nenhuma thread fica dormindo até a expiração."""
 
-    def _check_trade_result(self, trade: TradeEntry, sinal: Sinal, gale_level: int) -> None:
         if not self.api:
             return
 
-        time.sleep(trade.expiry * 60 + 5)
+        future = self.api.check_win_async(trade.id, timeout=trade.expiry * 60 + self.result_grace_seconds)
+        future.add_done_callback(
+            lambda done: self._result_executor.submit(self._on_trade_result, trade, sinal, gale_level, done)
+        )
 
+    def _on_trade_result(self, trade: TradeEntry, sinal: Sinal, gale_level: int, future: Future) -> None:
         try:
-            win, profit = self.api.check_win_v4(trade.id)
+            win, profit = future.result()
         except Exception as exc:
-            self.add_log(f"Erro ao verificar resultado (ordem {trade.id}): {exc}", "error")
+            self.add_log(f"Erro ao verificar resultado (ordem {trade.id}): {exc}", "error", order_id=trade.id)
             return
 
-        for stored_trade in self.trade_history:
-            if stored_trade.id == trade.id:
-                if win == "win":
-                    stored_trade.status = "win"
-                    stored_trade.profit = float(profit) if profit else 0.0
-                elif win == "loose":
-                    stored_trade.status = "loss"
-                    stored_trade.profit = float(profit) if profit else 0.0
-                else:
-                    stored_trade.status = "equal"
-                    stored_trade.profit = float(profit) if profit else 0.0
-                break
+        if win == "win":
+            trade.status = "win"
+        elif win == "loose":
+            trade.status = "loss"
+        else:
+            trade.status = "equal"
+        trade.profit = float(profit) if profit else 0.0
+        self._journal_trade(trade, "Resultado da operação")
 
         # Atualiza stop loss e perdas consecutivas
-        balance = self.api.get_balance()
-        if self.stop_loss_protection:
-            self.stop_loss_protection.update_balance(balance)
+        if self.api and self.stop_loss_protection:
+            self.stop_loss_protection.release_pending(trade.id)
+            self.stop_loss_protection.update_balance(self.api.get_balance())
 
         self._update_losses(trade, gale_level)
 
-        if stored_trade.status == "loss" and gale_level > 0:
-            threading.Thread(
-                target=self._execute_martingale,
-                args=(stored_trade, sinal, gale_level),
-                daemon=True,
-            ).start()
+        if trade.status == "loss" and trade.martingale_level < gale_level:
+            self._execute_martingale(trade, sinal, gale_level)
 
     def _execute_martingale(self, trade: TradeEntry, sinal: Sinal, gale_level: int) -> None:
         if not self.api:
             return
 
-        current_level = trade.martingale_level
-        if current_level >= gale_level:
-            return
-
         valor = trade.amount * 2.15
         if self.stop_loss_protection:
             saldo = self.api.get_balance()
             if saldo < valor:
                 self.add_log("Saldo insuficiente para Martingale", "warning")
                 return
+            if not self.stop_loss_protection.can_operate(valor):
+                self.add_log("Stop Loss: Martingale bloqueado", "warning")
+                return
         try:
             resultado, order_id = self.api.buy(valor, trade.asset, trade.direction.lower(), trade.expiry)
         except Exception as exc:
@@ -644,6 +1117,8 @@ class BotService:
         if not resultado:
             self.add_log("Falha ao executar Martingale", "error")
             return
+        if self.stop_loss_protection:
+            self.stop_loss_protection.add_pending(order_id, valor)
 
         martingale_trade = TradeEntry(
             id=order_id,
@@ -659,36 +1134,7 @@ class BotService:
             sinal=trade.sinal,
         )
         self._append_trade(martingale_trade)
-
-        time.sleep(martingale_trade.expiry * 60 + 5)
-        try:
-            win, profit = self.api.check_win_v4(order_id)
-        except Exception as exc:
-            self.add_log(f"Erro ao verificar Martingale: {exc}", "error")
-            return
-
-        for stored_trade in self.trade_history:
-            if stored_trade.id == order_id:
-                if win == "win":
-                    stored_trade.status = "win"
-                    stored_trade.profit = float(profit) if profit else 0.0
-                elif win == "loose":
-                    stored_trade.status = "loss"
-                    stored_trade.profit = float(profit) if profit else 0.0
-                else:
-                    stored_trade.status = "equal"
-                    stored_trade.profit = float(profit) if profit else 0.0
-                break
-
-        balance = self.api.get_balance()
-        if self.stop_loss_protection:
-            self.stop_loss_protection.update_balance(balance)
-
-        self._update_losses(trade, gale_level)
-
-        if stored_trade.status == "loss" and stored_trade.martingale_level < gale_level:
-            stored_trade.martingale_level += 1
-            self._execute_martingale(stored_trade, sinal, gale_level)
+        self._watch_trade(martingale_trade, sinal, gale_level)
 
     def _update_losses(self, trade: TradeEntry, gale_level: int) -> None:
         if trade.status != "loss":
@@ -730,6 +1176,7 @@ class BotService:
 
 
 __all__ = [
+    "ArmedSignal",
     "BotService",
     "BotStatus",
     "BotConfig",
@@ -0,0 +1,239 @@
+"""
+Broker do Bot (processo único de conexões)
+Processo dedicado que mantém as conexões com a IQ Option e todo o estado do
+bot (instâncias da API, histórico, logs, Stop Loss, execução de sinais e
+canal de eventos) para todos os workers do gunicorn.
+
+Os workers não abrem conexões: cada rota do Flask chama uma operação do
+broker por RPC num socket Unix (`multiprocessing.connection`, autenticado com
+`IQ_OPTION_BROKER_KEY`, obrigatória; o socket tem permissão 0600). Cada
+thread de um worker mantém sua própria conexão com o broker, e o broker
+atende cada conexão numa thread. Assim há uma única
+conexão por usuário, o estado é o mesmo em qualquer worker e a senha não
+precisa ficar na sessão do navegador.
+
+O gunicorn inicia o broker em `on_starting` e o encerra em `on_exit`
+(gunicorn.conf.py). Sem `IQ_OPTION_BROKER_SOCKET` (ex.: `python app.py`) as
+rotas executam as operações no próprio processo.
+
+Uso direto:
+    IQ_OPTION_BROKER_SOCKET=/tmp/bot.sock IQ_OPTION_BROKER_KEY=segredo python broker.py
+"""
+
+import logging
+import os
+import signal
+import sys
+import threading
+import time
+from multiprocessing import AuthenticationError
+from multiprocessing.connection import Client, Listener
+from typing import Any, Callable, Dict, Optional
+
+CURRENT_DIR = os.path.dirname(os.path.abspath(__file__))
+
+logger = logging.getLogger("bot.broker")
+
+
+class ErroBroker(Exception):
+    """Broker inacessível (não iniciado, reiniciando ou conexão perdida)."""
+
+
+class ErroOperacao(Exception):
+    """Exceção levantada por uma operação executada no broker."""
+
+
+def endereco_broker() -> Optional[str]:
+    """Socket do broker configurado no ambiente (None: operações no próprio processo)."""
+    return os.getenv('IQ_OPTION_BROKER_SOCKET') or None
+
+
+def chave_broker() -> bytes:
+    """Chave do RPC (IQ_OPTION_BROKER_KEY), obrigatória: as operações abrem sessões e enviam ordens."""
+    chave = os.getenv('IQ_OPTION_BROKER_KEY')
+    if not chave:
+        raise ErroBroker("Defina IQ_OPTION_BROKER_KEY (o gunicorn.conf.py gera uma)")
+    return chave.encode()
+
+
+class ServidorBroker:
+    """Atende as operações registradas, uma thread por conexão de worker."""
+
+    def __init__(self, operacoes: Dict[str, Callable[..., Any]], endereco: str, chave: bytes) -> None:
+        if not chave:
+            raise ErroBroker("O broker exige uma chave de autenticação")
+        self.operacoes = operacoes
+        self.endereco = endereco
+        self.chave = chave
+        self._listener: Optional[Listener] = None
+        self._ativo = False
+
+    def servir(self) -> None:
+        """Aceita conexões até `parar()` (bloqueia)."""
+        if os.path.exists(self.endereco):
+            os.unlink(self.endereco)  # socket de uma execução anterior
+        # Só o dono do processo acessa o socket (0600)
+        umask = os.umask(0o177)
+        try:
+            self._listener = Listener(self.endereco, family='AF_UNIX', authkey=self.chave)
+        finally:
+            os.umask(umask)
+        os.chmod(self.endereco, 0o600)
+        self._ativo = True
+        logger.info(f"Atendendo em {self.endereco}", extra={"pid": os.getpid()})
+        try:
+            while self._ativo:
+                try:
+                    conexao = self._listener.accept()
+                except OSError:
+                    if not self._ativo:
+                        break
+                    continue
+                except Exception as e:
+                    # Falha de autenticação de um cliente: não derruba o broker
+                    logger.warning(f"Conexão recusada: {e}")
+                    continue
+                threading.Thread(target=self._atender, args=(conexao,), daemon=True,
+                                 name='broker-conexao').start()
+        finally:
+            self.parar()
+
+    def parar(self) -> None:
+        self._ativo = False
+        if self._listener is not None:
+            try:
+                self._listener.close()
+            except OSError:
+                pass
+            self._listener = None
+
+    def _atender(self, conexao) -> None:
+        with conexao:
+            while True:
+                try:
+                    nome, args, kwargs = conexao.recv()
+                except (EOFError, OSError):
+                    return
+                operacao = self.operacoes.get(nome)
+                if operacao is None:
+                    resposta = (False, f"Operação desconhecida: {nome}")
+                else:
+                    try:
+                        resposta = (True, operacao(*args, **kwargs))
+                    except Exception as e:
+                        logger.exception(f"Erro na operação {nome}")
+                        resposta = (False, f"{type(e).__name__}: {e}")
+                try:
+                    conexao.send(resposta)
+                except (EOFError, OSError):
+                    return
+
+
+class ClienteBroker:
+    """Conexão de um worker com o broker (uma por thread)."""
+
+    def __init__(self, endereco: str, chave: bytes) -> None:
+        self.endereco = endereco
+        self.chave = chave
+        self._local = threading.local()
+
+    def _conexao(self):
+        conexao = getattr(self._local, 'conexao', None)
+        if conexao is None:
+            try:
+                conexao = Client(self.endereco, family='AF_UNIX', authkey=self.chave)
+            except (OSError, EOFError, AuthenticationError) as e:
+                raise ErroBroker(f"Broker indisponível em {self.endereco}: {e}") from e
+            self._local.conexao = conexao
+        return conexao
+
+    def _descartar(self) -> None:
+        conexao = getattr(self._local, 'conexao', None)
+        self._local.conexao = None
+        if conexao is not None:
+            try:
+                conexao.close()
+            except OSError:
+                pass
+
+    def chamar(self, nome: str, *args: Any, **kwargs: Any) -> Any:
+        """
+        Executa uma operação no broker e devolve seu resultado.
+
+        Uma conexão perdida (broker reiniciado) é refeita uma vez antes do envio;
+        depois do envio não há nova tentativa, para não repetir uma ordem.
+        """
+        for tentativa in range(2):
+            conexao = self._conexao()
+            try:
+                conexao.send((nome, args, kwargs))
+            except (OSError, EOFError) as e:
+                self._descartar()
+                if tentativa:
+                    raise ErroBroker(f"Conexão com o broker perdida: {e}") from e
+                continue
+            try:
+                sucesso, resultado = conexao.recv()
+            except (OSError, EOFError) as e:
+                self._descartar()
+                raise ErroBroker(f"Conexão com o broker perdida durante '{nome}': {e}") from e
+            if not sucesso:
+                raise ErroOperacao(resultado)
+            return resultado
+
+    def fechar(self) -> None:
+        self._descartar()
+
+
+def aguardar_broker(endereco: str, chave: bytes, timeout: float = 60.0) -> bool:
+    """Espera o broker aceitar conexões."""
+    limite = time.time() + timeout
+    while time.time() < limite:
+        try:
+            Client(endereco, family='AF_UNIX', authkey=chave).close()
+            return True
+        except (OSError, EOFError):
+            time.sleep(0.2)
+    return False
+
+
+def _interromper(signum, frame) -> None:
+    raise KeyboardInterrupt
+
+
+def main() -> int:
+    endereco = endereco_broker()
+    if not endereco:
+        print("Defina IQ_OPTION_BROKER_SOCKET com o caminho do socket do broker.")
+        return 1
+    try:
+        chave = chave_broker()
+    except ErroBroker as e:
+        print(e)
+        return 1
+
+    # app.py ajusta o sys.path (conflito do diretório http/) e registra as operações.
+    # O próprio broker executa as operações localmente: remover o endereço do ambiente.
+    os.environ.pop('IQ_OPTION_BROKER_SOCKET', None)
+    import importlib.util
+    app_path = os.path.join(CURRENT_DIR, 'app.py')
+    spec = importlib.util.spec_from_file_location('app', app_path)
+    app_module = importlib.util.module_from_spec(spec)
+    sys.modules.setdefault('app', app_module)
+    spec.loader.exec_module(app_module)
+
+    servidor = ServidorBroker(app_module.OPERACOES, endereco, chave)
+    # SIGTERM do gunicorn (on_exit): sair normalmente para o atexit fechar as conexões
+    signal.signal(signal.SIGTERM, _interromper)
+    try:
+        servidor.servir()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        if os.path.exists(endereco):
+            os.unlink(endereco)
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,264 @@
+"""
+Canal de Eventos por Sessão (Server-Sent Events)
+Leva ao navegador as mudanças de saldo, operações, logs, status da execução de
+sinais e Stop Loss no momento em que acontecem, no lugar do polling das páginas.
+
+Dois tipos de evento:
+
+- Estado (`balance`, `stop_loss`, `sinais_status`): só o último valor importa.
+  O canal guarda o último de cada tipo e o envia a quem se conecta; numa fila
+  com um evento do mesmo tipo ainda não entregue, o novo substitui o antigo.
+- Delta (`trade`, `log`): cada evento conta. Os últimos ficam num histórico
+  para o navegador que reconecta com `Last-Event-ID` receber o que perdeu; se
+  eles já saíram do histórico (ou o assinante ficou lento demais e sua fila
+  transbordou), o canal envia `reset` e a página recarrega a lista completa.
+
+Publicar nunca bloqueia: o evento é anexado às filas dos assinantes da sessão
+sob um lock curto. Sem mudanças, uma conexão aberta custa uma thread dormindo
+(`transmitir`, WSGI) ou só uma tarefa asyncio (`transmitir_async`, ASGI) e
+um comentário de heartbeat a cada `heartbeat` segundos.
+"""
+
+import asyncio
+import json
+import threading
+from collections import deque
+from typing import Any, AsyncIterator, Callable, Deque, Dict, Iterator, List, Optional, Set, Tuple
+
+# Tipos cujo último valor substitui os anteriores
+TIPOS_ESTADO = ("balance", "stop_loss", "sinais_status")
+
+
+class Evento:
+    """Evento numerado pela sessão."""
+
+    __slots__ = ("id", "tipo", "dados")
+
+    def __init__(self, id: int, tipo: str, dados: Any) -> None:
+        self.id = id
+        self.tipo = tipo
+        self.dados = dados
+
+    def formatar(self) -> str:
+        """Texto do evento no formato text/event-stream."""
+        return f"id: {self.id}\nevent: {self.tipo}\ndata: {json.dumps(self.dados, default=str)}\n\n"
+
+
+class Assinatura:
+    """Fila de eventos de uma conexão SSE."""
+
+    def __init__(self, session_id: str, limite: int) -> None:
+        self.session_id = session_id
+        self.limite = limite
+        self._fila: Deque[Evento] = deque()
+        self._condicao = threading.Condition()
+        self._reset = False
+        self.encerrada = False
+        # Chamado (fora do lock) a cada entrega/encerramento: acorda um leitor asyncio
+        self.notificar: Optional[Callable[[], None]] = None
+
+    def _entregar(self, evento: Evento) -> None:
+        with self._condicao:
+            if evento.tipo in TIPOS_ESTADO:
+                for i, pendente in enumerate(self._fila):
+                    if pendente.tipo == evento.tipo:
+                        del self._fila[i]
+                        break
+            self._fila.append(evento)
+            if len(self._fila) > self.limite:
+                # Assinante lento: descarta a fila e pede que a página recarregue tudo
+                self._fila.clear()
+                self._reset = True
+            self._condicao.notify()
+        if self.notificar is not None:
+            self.notificar()
+
+    def _encerrar(self) -> None:
+        with self._condicao:
+            self.encerrada = True
+            self._condicao.notify()
+        if self.notificar is not None:
+            self.notificar()
+
+    def aguardar(self, timeout: float) -> Tuple[List[Evento], bool]:
+        """
+        Espera até `timeout` segundos por eventos.
+
+        Returns:
+            (eventos pendentes, True se a fila transbordou e a página deve recarregar)
+        """
+        with self._condicao:
+            if timeout > 0 and not self._fila and not self._reset and not self.encerrada:
+                self._condicao.wait(timeout)
+            eventos = list(self._fila)
+            self._fila.clear()
+            reset, self._reset = self._reset, False
+        return eventos, reset
+
+
+class _Sessao:
+    def __init__(self, historico: int) -> None:
+        self.sequencia = 0
+        self.estado: Dict[str, Evento] = {}
+        self.historico: Deque[Evento] = deque(maxlen=historico)
+        self.descartado_ate = 0  # id do último delta que saiu do histórico
+        self.assinaturas: Set[Assinatura] = set()
+
+
+class CanalEventos:
+    """Publica eventos por sessão para as conexões SSE abertas."""
+
+    def __init__(self, historico: int = 200, limite_fila: int = 500) -> None:
+        """
+        Args:
+            historico: Eventos delta guardados por sessão para reconexões
+            limite_fila: Eventos pendentes por conexão antes de pedir `reset`
+        """
+        self.historico = historico
+        self.limite_fila = limite_fila
+        self._sessoes: Dict[str, _Sessao] = {}
+        self._lock = threading.Lock()
+
+    def _sessao(self, session_id: str) -> _Sessao:
+        sessao = self._sessoes.get(session_id)
+        if sessao is None:
+            sessao = self._sessoes[session_id] = _Sessao(self.historico)
+        return sessao
+
+    def publicar(self, session_id: Optional[str], tipo: str, dados: Any) -> Optional[Evento]:
+        """Registra e entrega um evento aos assinantes da sessão (nunca bloqueia)."""
+        if session_id is None:
+            return None
+        with self._lock:
+            sessao = self._sessao(session_id)
+            sessao.sequencia += 1
+            evento = Evento(sessao.sequencia, tipo, dados)
+            if tipo in TIPOS_ESTADO:
+                sessao.estado[tipo] = evento
+            else:
+                if len(sessao.historico) == sessao.historico.maxlen:
+                    sessao.descartado_ate = sessao.historico[0].id
+                sessao.historico.append(evento)
+            assinaturas = list(sessao.assinaturas)
+        for assinatura in assinaturas:
+            assinatura._entregar(evento)
+        return evento
+
+    def assinar(self, session_id: str, ultimo_id: Optional[int] = None) -> Tuple[Assinatura, List[Evento], bool]:
+        """
+        Abre uma assinatura.
+
+        Args:
+            session_id: Sessão cujos eventos serão recebidos
+            ultimo_id: `Last-Event-ID` enviado pelo navegador ao reconectar
+
+        Returns:
+            (assinatura, eventos iniciais, True se a página deve recarregar as listas)
+        """
+        assinatura = Assinatura(session_id, self.limite_fila)
+        with self._lock:
+            sessao = self._sessao(session_id)
+            iniciais = sorted(sessao.estado.values(), key=lambda evento: evento.id)
+            reset = False
+            if ultimo_id is not None:
+                if ultimo_id > sessao.sequencia or ultimo_id < sessao.descartado_ate:
+                    reset = True  # servidor reiniciado ou eventos perdidos
+                else:
+                    iniciais += [evento for evento in sessao.historico if evento.id > ultimo_id]
+            sessao.assinaturas.add(assinatura)
+        return assinatura, iniciais, reset
+
+    def cancelar(self, assinatura: Assinatura) -> None:
+        with self._lock:
+            sessao = self._sessoes.get(assinatura.session_id)
+            if sessao is not None:
+                sessao.assinaturas.discard(assinatura)
+
+    def encerrar(self, session_id: str) -> None:
+        """Fecha as conexões da sessão e descarta seus eventos (logout)."""
+        with self._lock:
+            sessao = self._sessoes.pop(session_id, None)
+        if sessao is not None:
+            for assinatura in sessao.assinaturas:
+                assinatura._encerrar()
+
+    def estado_atual(self, session_id: str) -> List[Evento]:
+        """Último evento de cada tipo de estado da sessão."""
+        with self._lock:
+            sessao = self._sessoes.get(session_id)
+            return sorted(sessao.estado.values(), key=lambda evento: evento.id) if sessao else []
+
+    def assinantes(self, session_id: str) -> int:
+        sessao = self._sessoes.get(session_id)
+        return len(sessao.assinaturas) if sessao is not None else 0
+
+    def totais(self) -> Tuple[int, int]:
+        """(sessões com eventos guardados, conexões assinadas) de todas as sessões."""
+        with self._lock:
+            return len(self._sessoes), sum(len(sessao.assinaturas) for sessao in self._sessoes.values())
+
+    def transmitir(self, session_id: str, ultimo_id: Optional[int] = None,
+                   heartbeat: float = 15.0, retry_ms: int = 3000) -> Iterator[str]:
+        """
+        Gerador do corpo text/event-stream de uma conexão.
+
+        Envia o estado atual (e os deltas perdidos desde `ultimo_id`), depois
+        os eventos conforme são publicados; um comentário a cada `heartbeat`
+        segundos mantém a conexão aberta através de proxies.
+        """
+        assinatura, iniciais, reset = self.assinar(session_id, ultimo_id)
+        try:
+            yield self._abertura(iniciais, reset, retry_ms)
+            while not assinatura.encerrada:
+                eventos, reset = assinatura.aguardar(heartbeat)
+                yield self._trecho(session_id, eventos, reset)
+        finally:
+            self.cancelar(assinatura)
+
+    async def transmitir_async(self, session_id: str, ultimo_id: Optional[int] = None,
+                               heartbeat: float = 15.0, retry_ms: int = 3000) -> AsyncIterator[str]:
+        """
+        Versão asyncio de `transmitir`: nenhuma thread fica presa por conexão.
+
+        A publicação (em qualquer thread) acorda a tarefa pelo loop com
+        `call_soon_threadsafe`; a fila é lida sem esperar.
+        """
+        loop = asyncio.get_running_loop()
+        aviso = asyncio.Event()
+        assinatura, iniciais, reset = self.assinar(session_id, ultimo_id)
+        assinatura.notificar = lambda: loop.call_soon_threadsafe(aviso.set)
+        try:
+            yield self._abertura(iniciais, reset, retry_ms)
+            while True:
+                # Limpar o aviso antes de ler a fila: uma entrega depois disso o liga de novo
+                aviso.clear()
+                eventos, reset = assinatura.aguardar(0)
+                if eventos or reset:
+                    yield self._trecho(session_id, eventos, reset)
+                elif assinatura.encerrada:
+                    break
+                else:
+                    try:
+                        await asyncio.wait_for(aviso.wait(), heartbeat)
+                    except asyncio.TimeoutError:
+                        yield ": ping\n\n"
+        finally:
+            assinatura.notificar = None
+            self.cancelar(assinatura)
+
+    @staticmethod
+    def _abertura(iniciais: List[Evento], reset: bool, retry_ms: int) -> str:
+        trecho = f"retry: {retry_ms}\n\n"
+        if reset:
+            trecho += "event: reset\ndata: {}\n\n"
+        return trecho + "".join(evento.formatar() for evento in iniciais)
+
+    def _trecho(self, session_id: str, eventos: List[Evento], reset: bool) -> str:
+        if reset:
+            # A fila transbordou: a página recarrega as listas (que já incluem os
+            # deltas pendentes) e recebe o estado atual
+            return "event: reset\ndata: {}\n\n" + "".join(
+                evento.formatar() for evento in self.estado_atual(session_id))
+        if eventos:
+            return "".join(evento.formatar() for evento in eventos)
+        return ": ping\n\n"
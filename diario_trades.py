@@ -0,0 +1,285 @@
+"""
+Diário de Operações (SQLite)
+Guarda todas as operações do bot num banco SQLite com índices por sessão,
+order id, operação pai (cadeia de Martingale), ativo e horário, no lugar das
+listas em memória truncadas em 50.
+
+Gravações não bloqueiam quem envia ordens: `registrar` só guarda o estado
+mais recente da operação num buffer, e uma thread grava o buffer em lote
+(uma transação, upsert por sessão + order id) a cada `intervalo` segundos ou
+quando ele atinge `tamanho_lote` operações. `obter` consulta o buffer antes
+do banco; as consultas (`listar`, `cadeia`) descarregam o buffer antes de ler.
+
+O banco usa WAL, então leituras (uma conexão por thread) não esperam a
+gravação e vários processos podem abrir o mesmo arquivo.
+"""
+
+import logging
+import os
+import sqlite3
+import threading
+import time
+from typing import Any, Dict, List, Optional, Tuple
+
+# Campos de uma operação (mesmas chaves do dicionário usado pela aplicação)
+CAMPOS = (
+    "id", "asset", "direction", "amount", "expiry", "timestamp", "status", "profit",
+    "is_martingale", "martingale_level", "parent_trade_id", "sinal",
+)
+
+# order_id e parent_trade_id sem tipo declarado: inteiros e textos voltam como foram gravados
+ESQUEMA = """
+CREATE TABLE IF NOT EXISTS trades (
+    session_id TEXT NOT NULL,
+    order_id NOT NULL,
+    asset TEXT,
+    direction TEXT,
+    amount REAL,
+    expiry INTEGER,
+    timestamp TEXT,
+    status TEXT,
+    profit REAL,
+    is_martingale INTEGER,
+    martingale_level INTEGER,
+    parent_trade_id,
+    sinal TEXT,
+    atualizado_em REAL,
+    PRIMARY KEY (session_id, order_id)
+);
+CREATE INDEX IF NOT EXISTS trades_sessao_horario ON trades (session_id, timestamp DESC);
+CREATE INDEX IF NOT EXISTS trades_order_id ON trades (order_id);
+CREATE INDEX IF NOT EXISTS trades_cadeia ON trades (session_id, parent_trade_id, martingale_level);
+CREATE INDEX IF NOT EXISTS trades_ativo_horario ON trades (session_id, asset, timestamp DESC);
+"""
+
+UPSERT = """
+INSERT INTO trades (session_id, order_id, asset, direction, amount, expiry, timestamp, status, profit,
+                    is_martingale, martingale_level, parent_trade_id, sinal, atualizado_em)
+VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+ON CONFLICT (session_id, order_id) DO UPDATE SET
+    asset = excluded.asset, direction = excluded.direction, amount = excluded.amount,
+    expiry = excluded.expiry, timestamp = excluded.timestamp, status = excluded.status,
+    profit = excluded.profit, is_martingale = excluded.is_martingale,
+    martingale_level = excluded.martingale_level, parent_trade_id = excluded.parent_trade_id,
+    sinal = excluded.sinal, atualizado_em = excluded.atualizado_em
+"""
+
+COLUNAS = ("order_id", "asset", "direction", "amount", "expiry", "timestamp", "status", "profit",
+           "is_martingale", "martingale_level", "parent_trade_id", "sinal")
+
+logger = logging.getLogger("bot.diario")
+
+# Limite de linhas por página em `listar`
+LIMITE_MAXIMO = 500
+
+
+def _linha_para_trade(linha: Tuple) -> Dict[str, Any]:
+    trade = dict(zip(CAMPOS, linha))
+    trade["is_martingale"] = bool(trade["is_martingale"])
+    return trade
+
+
+class DiarioTrades:
+    """Diário persistente das operações de todas as sessões."""
+
+    def __init__(self, caminho: str, intervalo: float = 0.5, tamanho_lote: int = 500) -> None:
+        """
+        Args:
+            caminho: Arquivo SQLite (criado se não existir)
+            intervalo: Segundos máximos entre gravações do buffer
+            tamanho_lote: Operações no buffer que disparam uma gravação imediata
+        """
+        self.caminho = caminho
+        self.intervalo = intervalo
+        self.tamanho_lote = tamanho_lote
+        pasta = os.path.dirname(os.path.abspath(caminho))
+        os.makedirs(pasta, exist_ok=True)
+
+        self._local = threading.local()
+        self._condicao = threading.Condition()
+        self._pendentes: Dict[Tuple[str, Any], Dict[str, Any]] = {}
+        self._gravando: Dict[Tuple[str, Any], Dict[str, Any]] = {}
+        self._lotes_iniciados = 0
+        self._lotes_concluidos = 0
+        self._encerrado = False
+
+        conexao = self._conexao()
+        conexao.execute("PRAGMA journal_mode=WAL")
+        conexao.executescript(ESQUEMA)
+        conexao.commit()
+
+        self._thread = threading.Thread(target=self._gravar_continuamente, daemon=True, name="diario-trades")
+        self._thread.start()
+
+    def _conexao(self) -> sqlite3.Connection:
+        conexao = getattr(self._local, "conexao", None)
+        if conexao is None:
+            conexao = sqlite3.connect(self.caminho, timeout=30)
+            conexao.execute("PRAGMA synchronous=NORMAL")
+            self._local.conexao = conexao
+        return conexao
+
+    # ------------------------------------------------------------------
+    # Gravação
+    # ------------------------------------------------------------------
+
+    def registrar(self, session_id: str, trade: Dict[str, Any]) -> None:
+        """Insere ou atualiza uma operação (estado atual do dicionário). Não bloqueia."""
+        copia = {campo: trade.get(campo) for campo in CAMPOS}
+        with self._condicao:
+            self._pendentes[(session_id, copia["id"])] = copia
+            if len(self._pendentes) >= self.tamanho_lote:
+                self._condicao.notify_all()
+
+    def _gravar_continuamente(self) -> None:
+        while True:
+            with self._condicao:
+                if len(self._pendentes) < self.tamanho_lote and not self._encerrado:
+                    self._condicao.wait(self.intervalo)
+                lote, self._pendentes = self._pendentes, {}
+                self._gravando = lote
+                self._lotes_iniciados += 1
+                encerrar = self._encerrado
+            if lote:
+                try:
+                    self._gravar(lote)
+                except sqlite3.Error:
+                    logger.exception(f"Erro ao gravar {len(lote)} operação(ões) no diário")
+                    with self._condicao:
+                        # Recolocar o lote sem sobrescrever versões mais novas
+                        for chave, trade in lote.items():
+                            self._pendentes.setdefault(chave, trade)
+            with self._condicao:
+                self._gravando = {}
+                self._lotes_concluidos += 1
+                self._condicao.notify_all()
+            if encerrar:
+                return
+
+    def _gravar(self, lote: Dict[Tuple[str, Any], Dict[str, Any]]) -> None:
+        agora = time.time()
+        conexao = self._conexao()
+        with conexao:
+            conexao.executemany(UPSERT, [
+                (session_id, trade["id"], trade["asset"], trade["direction"], trade["amount"], trade["expiry"],
+                 trade["timestamp"], trade["status"], trade["profit"], int(bool(trade["is_martingale"])),
+                 trade["martingale_level"] or 0, trade["parent_trade_id"], trade["sinal"], agora)
+                for (session_id, _), trade in lote.items()
+            ])
+
+    def descarregar(self, timeout: float = 10.0) -> None:
+        """Espera o buffer atual ser gravado no banco."""
+        with self._condicao:
+            if self._pendentes:
+                alvo = self._lotes_iniciados + 1  # o próximo lote leva o buffer atual
+            elif self._gravando:
+                alvo = self._lotes_iniciados
+            else:
+                return
+            self._condicao.notify_all()
+            limite = time.time() + timeout
+            while self._lotes_concluidos < alvo:
+                restante = limite - time.time()
+                if restante <= 0:
+                    break
+                self._condicao.wait(restante)
+
+    def pendentes(self) -> int:
+        """Operações no buffer ainda não gravadas."""
+        with self._condicao:
+            return len(self._pendentes) + len(self._gravando)
+
+    def fechar(self) -> None:
+        """Grava o buffer e encerra a thread de gravação."""
+        with self._condicao:
+            self._encerrado = True
+            self._condicao.notify_all()
+        self._thread.join(10)
+
+    # ------------------------------------------------------------------
+    # Consultas
+    # ------------------------------------------------------------------
+
+    def obter(self, session_id: str, order_id: Any) -> Optional[Dict[str, Any]]:
+        """Operação pelo order id (buffer primeiro, depois índice da chave primária)."""
+        chave = (session_id, order_id)
+        with self._condicao:
+            trade = self._pendentes.get(chave) or self._gravando.get(chave)
+            if trade is not None:
+                return dict(trade)
+        linha = self._conexao().execute(
+            f"SELECT {', '.join(COLUNAS)} FROM trades WHERE session_id = ? AND order_id = ?",
+            (session_id, order_id),
+        ).fetchone()
+        return _linha_para_trade(linha) if linha else None
+
+    def listar(self, session_id: str, limite: int = 50, offset: int = 0, asset: Optional[str] = None,
+               status: Optional[str] = None, inicio: Optional[str] = None,
+               fim: Optional[str] = None) -> Tuple[List[Dict[str, Any]], int]:
+        """
+        Página de operações da sessão, mais recentes primeiro.
+
+        Args:
+            limite: Operações por página (até LIMITE_MAXIMO)
+            offset: Operações a pular
+            asset: Filtrar por ativo
+            status: Filtrar por status (pending, win, loss, equal)
+            inicio, fim: Intervalo de horário (ISO 8601, comparado ao `timestamp`)
+
+        Returns:
+            (operações da página, total de operações que atendem aos filtros)
+        """
+        self.descarregar()
+        condicoes = ["session_id = ?"]
+        parametros: List[Any] = [session_id]
+        if asset:
+            condicoes.append("asset = ?")
+            parametros.append(asset.upper())
+        if status:
+            condicoes.append("status = ?")
+            parametros.append(status)
+        if inicio:
+            condicoes.append("timestamp >= ?")
+            parametros.append(inicio)
+        if fim:
+            condicoes.append("timestamp <= ?")
+            parametros.append(fim)
+        where = " AND ".join(condicoes)
+        limite = max(1, min(int(limite), LIMITE_MAXIMO))
+        conexao = self._conexao()
+        total = conexao.execute(f"SELECT COUNT(*) FROM trades WHERE {where}", parametros).fetchone()[0]
+        linhas = conexao.execute(
+            f"SELECT {', '.join(COLUNAS)} FROM trades WHERE {where} ORDER BY timestamp DESC LIMIT ? OFFSET ?",
+            parametros + [limite, max(0, int(offset))],
+        ).fetchall()
+        return [_linha_para_trade(linha) for linha in linhas], total
+
+    def cadeia(self, session_id: str, trade_id: Any) -> Tuple[Optional[Dict[str, Any]], List[Dict[str, Any]]]:
+        """
+        Operação principal e todos os seus Martingales (diretos e indiretos).
+
+        Cada nível da cadeia é uma busca no índice (session_id, parent_trade_id):
+        O(log n) por nível, independente do tamanho do histórico.
+
+        Returns:
+            (operação principal ou None, Martingales ordenados por nível)
+        """
+        self.descarregar()
+        principal = self.obter(session_id, trade_id)
+        if principal is None:
+            return None, []
+        conexao = self._conexao()
+        martingales: List[Dict[str, Any]] = []
+        pais = [trade_id]
+        while pais:
+            marcadores = ", ".join("?" for _ in pais)
+            linhas = conexao.execute(
+                f"SELECT {', '.join(COLUNAS)} FROM trades "
+                f"WHERE session_id = ? AND parent_trade_id IN ({marcadores}) AND is_martingale = 1",
+                [session_id] + pais,
+            ).fetchall()
+            filhos = [_linha_para_trade(linha) for linha in linhas]
+            martingales.extend(filhos)
+            pais = [filho["id"] for filho in filhos]
+        martingales.sort(key=lambda trade: trade.get("martingale_level") or 0)
+        return principal, martingales
@@ -0,0 +1,99 @@
+"""
+Benchmark do processamento de sinais
+Gera um pacote de sinais (por padrão 1.000.000 de linhas, vários dias, com
+segundos e ~1% de linhas inválidas) e mede:
+
+- importar_sinais: validação em uma passada (streaming) com relatório de erros
+- SinaisProcessor.carregar_sinais: carga completa, recarga sem mudança e
+  recarga com uma linha alterada
+
+Uso:
+    python benchmark_sinais.py [linhas]
+"""
+
+import os
+import random
+import sys
+import tempfile
+import time
+from datetime import date, timedelta
+
+# Importar sinais_processor direto do arquivo (mesma estratégia de executar_sinais.py)
+import importlib.util
+
+script_dir = os.path.dirname(os.path.abspath(__file__))
+project_dir = os.path.dirname(script_dir)
+
+sinais_processor_path = os.path.join(project_dir, "sinais_processor.py")
+spec_sinais = importlib.util.spec_from_file_location("sinais_processor", sinais_processor_path)
+sinais_processor_module = importlib.util.module_from_spec(spec_sinais)
+spec_sinais.loader.exec_module(sinais_processor_module)
+SinaisProcessor = sinais_processor_module.SinaisProcessor
+importar_sinais = sinais_processor_module.importar_sinais
+
+try:
+    import resource
+except ImportError:  # Windows
+    resource = None
+
+ATIVOS = ["EURUSD", "EURUSD-OTC", "GBPUSD", "GBPUSD-OTC", "USDJPY", "AUDCAD-OTC", "EURJPY", "NZDUSD"]
+
+
+def gerar_pacote(caminho: str, linhas: int, seed: int = 42):
+    """Grava um pacote de sinais sintético."""
+    rnd = random.Random(seed)
+    inicio = date.today()
+    with open(caminho, 'w', encoding='utf-8') as f:
+        f.write("# Pacote de sinais gerado para benchmark\n")
+        for i in range(linhas):
+            dia = inicio + timedelta(days=i * 30 // max(linhas, 1))
+            hora = f"{rnd.randrange(24):02d}:{rnd.randrange(60):02d}:{rnd.randrange(60):02d}"
+            direcao = "CALL" if rnd.random() < 0.5 else "PUT"
+            if rnd.random() < 0.01:
+                direcao = "BUY"  # linha inválida
+            f.write(f"{dia.isoformat()};M{rnd.choice((1, 5, 15))};{rnd.choice(ATIVOS)};{hora};{direcao}\n")
+
+
+def memoria_pico_mb() -> float:
+    if resource is None:
+        return float('nan')
+    pico = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # Linux reporta em KB, macOS em bytes
+    return pico / (1024 * 1024) if sys.platform == 'darwin' else pico / 1024
+
+
+def medir(descricao: str, funcao):
+    inicio = time.perf_counter()
+    resultado = funcao()
+    duracao = time.perf_counter() - inicio
+    print(f"{descricao:<40} {duracao:8.3f}s   pico de memoria {memoria_pico_mb():8.1f} MB")
+    return resultado, duracao
+
+
+def main():
+    linhas = int(sys.argv[1]) if len(sys.argv) > 1 else 1_000_000
+
+    with tempfile.TemporaryDirectory() as diretorio:
+        caminho = os.path.join(diretorio, "sinais.txt")
+        print(f"Gerando {linhas:,} linhas...")
+        gerar_pacote(caminho, linhas)
+        print(f"Arquivo: {os.path.getsize(caminho) / (1024 * 1024):.1f} MB\n")
+
+        relatorio, duracao = medir("importar_sinais (catalogo)", lambda: importar_sinais(caminho, ativos_validos=ATIVOS))
+        print(f"  {relatorio.validos:,} validos, {relatorio.total_erros:,} erros {relatorio.erros_por_campo}, "
+              f"{relatorio.datas} dias, {linhas / duracao:,.0f} linhas/s")
+        del relatorio
+
+        processor = SinaisProcessor(caminho)
+        medir("carregar_sinais (carga completa)", processor.carregar_sinais)
+        medir("carregar_sinais (sem mudanca)", processor.carregar_sinais)
+
+        with open(caminho, 'a', encoding='utf-8') as f:
+            f.write(f"{date.today().isoformat()};M1;EURUSD;23:59:59;CALL\n")
+        medir("carregar_sinais (uma linha nova)", processor.carregar_sinais)
+        print(f"  {len(processor.obter_todos_sinais()):,} sinais carregados, "
+              f"proximos: {processor.obter_proximos_sinais(3)}")
+
+
+if __name__ == "__main__":
+    main()
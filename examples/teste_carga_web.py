@@ -0,0 +1,190 @@
+"""
+Teste de carga da interface web (WSGI x ASGI)
+Abre muitas páginas "paradas" ao mesmo tempo (conexões SSE em /api/eventos,
+como cada dashboard aberto) e, com elas abertas, mede a latência das rotas
+que as páginas chamam (/api/balance, /api/trade/history).
+
+Sem dependências: cliente HTTP/1.1 mínimo sobre asyncio.
+
+Rode o servidor em modo paper (sem conta real) e aponte o teste para ele:
+
+    # WSGI (gunicorn + broker)
+    IQ_OPTION_PAPER=1 gunicorn --config gunicorn.conf.py wsgi:app
+    # ASGI (uvicorn, processo único)
+    IQ_OPTION_PAPER=1 uvicorn asgi:app --port 8000 --workers 1 --limit-concurrency 10000
+
+    python examples/teste_carga_web.py --url http://127.0.0.1:8000 --conexoes 2000
+
+Resultado: conexões SSE abertas/recusadas, tempo até o primeiro evento,
+latência (p50/p95/p99/máx) e erros das requisições feitas durante a carga.
+"""
+
+import argparse
+import asyncio
+import json
+import statistics
+import time
+from typing import Dict, List, Optional, Tuple
+from urllib.parse import urlsplit
+
+try:
+    import resource
+except ImportError:  # Windows
+    resource = None
+
+
+def percentil(valores: List[float], p: float) -> float:
+    if not valores:
+        return float('nan')
+    ordenados = sorted(valores)
+    return ordenados[min(len(ordenados) - 1, int(round(p / 100.0 * (len(ordenados) - 1))))]
+
+
+def aumentar_limite_arquivos() -> None:
+    """Cada conexão é um descritor de arquivo: subir o limite suave até o máximo."""
+    if resource is None:
+        return
+    suave, maximo = resource.getrlimit(resource.RLIMIT_NOFILE)
+    if maximo == resource.RLIM_INFINITY or maximo > suave:
+        resource.setrlimit(resource.RLIMIT_NOFILE, (maximo if maximo != resource.RLIM_INFINITY else 65536, maximo))
+
+
+class Cliente:
+    def __init__(self, url: str) -> None:
+        partes = urlsplit(url)
+        self.host = partes.hostname or '127.0.0.1'
+        self.porta = partes.port or 80
+        self.prefixo = partes.path.rstrip('/')
+        self.cookie: Optional[str] = None
+
+    def _requisicao(self, metodo: str, caminho: str, corpo: bytes = b'', extras: Tuple[str, ...] = ()) -> bytes:
+        linhas = [f"{metodo} {self.prefixo}{caminho} HTTP/1.1", f"Host: {self.host}:{self.porta}", "Connection: close"]
+        if self.cookie:
+            linhas.append(f"Cookie: {self.cookie}")
+        if corpo:
+            linhas += ["Content-Type: application/json", f"Content-Length: {len(corpo)}"]
+        linhas += list(extras)
+        return ("\r\n".join(linhas) + "\r\n\r\n").encode('latin-1') + corpo
+
+    async def chamar(self, metodo: str, caminho: str, dados: Optional[dict] = None,
+                     timeout: float = 30.0) -> Tuple[int, Dict[str, str], bytes]:
+        """Requisição completa (lida até o servidor fechar a conexão)."""
+        corpo = json.dumps(dados).encode('utf-8') if dados is not None else b''
+        leitor, escritor = await asyncio.wait_for(asyncio.open_connection(self.host, self.porta), timeout)
+        try:
+            escritor.write(self._requisicao(metodo, caminho, corpo))
+            await escritor.drain()
+            resposta = await asyncio.wait_for(leitor.read(), timeout)
+        finally:
+            escritor.close()
+        cabeca, _, conteudo = resposta.partition(b"\r\n\r\n")
+        linhas = cabeca.decode('latin-1').split("\r\n")
+        status = int(linhas[0].split()[1])
+        cabecalhos: Dict[str, str] = {}
+        for linha in linhas[1:]:
+            nome, _, valor = linha.partition(':')
+            cabecalhos[nome.strip().lower()] = valor.strip()
+        return status, cabecalhos, conteudo
+
+    async def login(self, email: str, senha: str) -> None:
+        status, cabecalhos, conteudo = await self.chamar(
+            'POST', '/login', {'email': email, 'password': senha, 'account_type': 'PRACTICE'})
+        if status != 200 or 'set-cookie' not in cabecalhos:
+            raise SystemExit(f"Login falhou ({status}): {conteudo[:200]!r}")
+        self.cookie = cabecalhos['set-cookie'].split(';', 1)[0]
+
+    async def abrir_eventos(self, abertas: List[asyncio.StreamWriter], tempos: List[float],
+                            timeout: float) -> bool:
+        """Abre uma conexão SSE e a mantém aberta; True se o primeiro evento chegou."""
+        inicio = time.perf_counter()
+        try:
+            leitor, escritor = await asyncio.wait_for(asyncio.open_connection(self.host, self.porta), timeout)
+            escritor.write(self._requisicao('GET', '/api/eventos', extras=("Accept: text/event-stream",)))
+            await escritor.drain()
+            recebido = b''
+            while b'retry:' not in recebido:
+                trecho = await asyncio.wait_for(leitor.read(4096), timeout - (time.perf_counter() - inicio))
+                if not trecho:
+                    escritor.close()
+                    return False
+                recebido += trecho
+        except (OSError, asyncio.TimeoutError):
+            return False
+        tempos.append(time.perf_counter() - inicio)
+        abertas.append(escritor)
+        asyncio.ensure_future(self._drenar(leitor))
+        return True
+
+    @staticmethod
+    async def _drenar(leitor: asyncio.StreamReader) -> None:
+        try:
+            while await leitor.read(65536):
+                pass
+        except (OSError, asyncio.CancelledError):
+            pass
+
+
+async def executar(args: argparse.Namespace) -> None:
+    cliente = Cliente(args.url)
+    await cliente.login(args.email, args.senha)
+    print(f"Login ok em {args.url}")
+
+    abertas: List[asyncio.StreamWriter] = []
+    tempos_sse: List[float] = []
+    inicio = time.perf_counter()
+    falhas = 0
+    for lote in range(0, args.conexoes, args.lote):
+        tarefas = [cliente.abrir_eventos(abertas, tempos_sse, args.timeout)
+                   for _ in range(min(args.lote, args.conexoes - lote))]
+        falhas += sum(1 for ok in await asyncio.gather(*tarefas) if not ok)
+    print(f"SSE: {len(abertas)} abertas, {falhas} recusadas/sem resposta em {time.perf_counter() - inicio:.1f}s "
+          f"| primeiro evento p50 {percentil(tempos_sse, 50) * 1000:.0f} ms, p99 {percentil(tempos_sse, 99) * 1000:.0f} ms")
+
+    latencias: Dict[str, List[float]] = {'/api/balance': [], '/api/trade/history': []}
+    erros: Dict[str, int] = {caminho: 0 for caminho in latencias}
+    limite = time.perf_counter() + args.duracao
+
+    async def sondar(caminho: str) -> None:
+        while time.perf_counter() < limite:
+            t0 = time.perf_counter()
+            try:
+                status, _, _ = await cliente.chamar('GET', caminho, timeout=args.timeout)
+                if status != 200:
+                    erros[caminho] += 1
+                else:
+                    latencias[caminho].append(time.perf_counter() - t0)
+            except (OSError, asyncio.TimeoutError, ValueError, IndexError):
+                erros[caminho] += 1
+
+    await asyncio.gather(*[sondar(caminho) for caminho in latencias for _ in range(args.concorrencia)])
+
+    for caminho, valores in latencias.items():
+        if valores:
+            print(f"{caminho:20s} {len(valores):6d} ok {erros[caminho]:5d} erros | "
+                  f"p50 {percentil(valores, 50) * 1000:7.1f} ms  p95 {percentil(valores, 95) * 1000:7.1f} ms  "
+                  f"p99 {percentil(valores, 99) * 1000:7.1f} ms  máx {max(valores) * 1000:7.1f} ms  "
+                  f"média {statistics.mean(valores) * 1000:7.1f} ms")
+        else:
+            print(f"{caminho:20s}      0 ok {erros[caminho]:5d} erros")
+
+    for escritor in abertas:
+        escritor.close()
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.split("\n")[1])
+    parser.add_argument('--url', default='http://127.0.0.1:8000')
+    parser.add_argument('--conexoes', type=int, default=1000, help='Conexões SSE abertas ao mesmo tempo')
+    parser.add_argument('--lote', type=int, default=200, help='Conexões abertas por vez')
+    parser.add_argument('--concorrencia', type=int, default=4, help='Requisições simultâneas por rota sondada')
+    parser.add_argument('--duracao', type=float, default=15, help='Segundos de sondagem com as conexões abertas')
+    parser.add_argument('--timeout', type=float, default=10)
+    parser.add_argument('--email', default='carga@example.com')
+    parser.add_argument('--senha', default='paper')
+    args = parser.parse_args()
+    aumentar_limite_arquivos()
+    asyncio.run(executar(args))
+
+
+if __name__ == '__main__':
+    main()
@@ -6,8 +6,10 @@ def date_to_timestamp(dt):
     # local timezone to timestamp support python2 pytohn3
     return time.mktime(dt.timetuple())
 
-def get_expiration_time(timestamp, duration):
-    #
+def get_expiration_time(timestamp, duration, now=None):
+    # now: reference instant used to pick the closest expiration (default: local clock)
+    if now is None:
+        now = time.time()
     now_date = datetime.fromtimestamp(timestamp)
     exp_date = now_date.replace(second=0, microsecond=0)
     if (int(date_to_timestamp(exp_date+timedelta(minutes=1)))-timestamp) > 30:
@@ -32,7 +34,7 @@ def get_expiration_time(timestamp, duration):
 
     remaning = []
     for t in exp:
-        remaning.append(int(t)-int(time.time()))
+        remaning.append(int(t)-int(now))
     close = [abs(x-60*duration) for x in remaning]
     return int(exp[close.index(min(close))]), int(close.index(min(close)))
 
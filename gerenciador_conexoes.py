@@ -0,0 +1,425 @@
+"""
+Gerenciador de Conexões com a IQ Option
+Guarda as conexões abertas (uma instância IQ_Option por conta) e as sessões
+do navegador que as usam, no lugar do dicionário `api_instances` que só
+perdia uma entrada no logout.
+
+- Reaproveitamento: um novo login na mesma conta (email + tipo de conta, com
+  a mesma senha) usa a conexão já aberta, sem novo handshake.
+- Reserva morna: a conexão cuja última sessão saiu (logout) fica aberta por
+  `reserva` segundos para um novo login instantâneo, e então é fechada.
+- Ociosidade: sessões sem uso há mais de `ocioso` segundos são descartadas
+  (o estado delas é limpo por `ao_despejar`); conexões sem sessões fecham.
+- Limite LRU: com mais de `maximo` conexões, fecha as usadas há mais tempo
+  (primeiro as da reserva). Sessões com `em_uso` verdadeiro (sinais em
+  execução, ordens abertas) nunca são despejadas.
+- Memória: a cada `intervalo_memoria` segundos a varredura estima o tamanho
+  de cada conexão (objetos alcançáveis a partir da instância da API, até
+  `limite_memoria` objetos), exibido em `estatisticas()`.
+- Encerramento: `fechar_todas()` fecha os websockets e para as threads de
+  cada conexão (`IQ_Option.close`).
+
+A senha não é guardada: só um resumo SHA-256 com sal, para conferir o
+reaproveitamento.
+"""
+
+import hashlib
+import hmac
+import logging
+import os
+import sys
+import threading
+import time
+import types
+from collections import OrderedDict, deque
+from typing import Any, Callable, Dict, Iterable, List, Optional, Tuple
+
+logger = logging.getLogger("bot.conexoes")
+
+# Objetos que não pertencem a uma conexão (compartilhados ou do interpretador)
+TIPOS_IGNORADOS = (
+    type, types.ModuleType, types.FunctionType, types.BuiltinFunctionType, types.MethodType,
+    types.CodeType, types.FrameType, threading.Thread, logging.Logger,
+    type(threading.Lock()), type(threading.RLock()), threading.Condition, threading.Event,
+)
+
+
+def tamanho_aproximado(objeto: Any, ignorar: Iterable[Any] = (), limite: int = 200000) -> int:
+    """
+    Bytes aproximados de `objeto` e de tudo que ele alcança (dicts, listas,
+    atributos), sem contar funções, módulos, threads, locks e os objetos em
+    `ignorar`. Para após visitar `limite` objetos.
+    """
+    vistos = {id(item) for item in ignorar}
+    pendentes = [objeto]
+    total = 0
+    while pendentes and len(vistos) < limite:
+        atual = pendentes.pop()
+        if id(atual) in vistos or isinstance(atual, TIPOS_IGNORADOS):
+            continue
+        vistos.add(id(atual))
+        total += sys.getsizeof(atual, 0)
+        try:
+            if isinstance(atual, dict):
+                itens = list(atual.items())
+                pendentes.extend(chave for chave, _ in itens)
+                pendentes.extend(valor for _, valor in itens)
+            elif isinstance(atual, (list, tuple, set, frozenset, deque)):
+                pendentes.extend(list(atual))
+            elif not isinstance(atual, (str, bytes, bytearray, int, float, bool)):
+                atributos = getattr(atual, "__dict__", None)
+                if isinstance(atributos, dict):
+                    pendentes.append(atributos)
+                for classe in type(atual).__mro__:
+                    for nome in getattr(classe, "__slots__", ()):
+                        if hasattr(atual, nome):
+                            pendentes.append(getattr(atual, nome))
+        except (RuntimeError, ReferenceError):
+            # Contêiner alterado por outra thread durante a leitura: fica só o tamanho dele
+            continue
+    return total
+
+
+class Conexao:
+    """Uma conexão aberta com a IQ Option e as sessões que a usam."""
+
+    def __init__(self, chave: Tuple[str, str], api: Any, senha: str) -> None:
+        self.chave = chave  # (email, tipo de conta)
+        self.api = api
+        self._sal = os.urandom(16)
+        self._senha = self._resumo(senha)
+        self.sessoes: Dict[str, float] = {}  # session_id -> último uso
+        self.criada_em = time.time()
+        self.ultimo_uso = self.criada_em
+        self.reservada_em: Optional[float] = None  # sem sessões desde (reserva morna)
+        self.reaproveitamentos = 0
+        self.memoria = 0
+
+    def _resumo(self, senha: str) -> bytes:
+        return hashlib.sha256(self._sal + senha.encode("utf-8")).digest()
+
+    def confere(self, senha: str) -> bool:
+        return hmac.compare_digest(self._resumo(senha), self._senha)
+
+    def viva(self) -> bool:
+        try:
+            return bool(self.api.check_connect())
+        except Exception:
+            return False
+
+    def resumo(self, agora: float) -> Dict[str, Any]:
+        return {
+            "account_type": self.chave[1],
+            "sessions": len(self.sessoes),
+            "age": round(agora - self.criada_em, 1),
+            "idle": round(agora - self.ultimo_uso, 1),
+            "warm": self.reservada_em is not None,
+            "reused": self.reaproveitamentos,
+            "memory_bytes": self.memoria,
+            "connected": self.viva(),
+        }
+
+
+class GerenciadorConexoes:
+    """Conexões por conta, sessões por conexão, com despejo por ociosidade e LRU."""
+
+    def __init__(self, criar: Callable[[str, str, str], Tuple[Any, Optional[str]]],
+                 ocioso: float = 1800, maximo: int = 50, reserva: float = 300, intervalo: float = 30,
+                 em_uso: Optional[Callable[[str, Any], bool]] = None,
+                 ao_despejar: Optional[Callable[[str], None]] = None,
+                 intervalo_memoria: float = 600, limite_memoria: int = 50000) -> None:
+        """
+        Args:
+            criar: (email, senha, tipo de conta) -> (api conectada, None) ou (None, motivo)
+            ocioso: Segundos sem uso até uma sessão ser descartada
+            maximo: Conexões abertas ao mesmo tempo (LRU acima disso)
+            reserva: Segundos que uma conexão sem sessões fica aberta (0: fecha no logout)
+            intervalo: Segundos entre varreduras (ociosidade e reserva)
+            em_uso: (session_id, api) -> True se a sessão não pode ser despejada
+            ao_despejar: Chamado com o session_id de cada sessão descartada pelo gerenciador
+            intervalo_memoria: Segundos entre estimativas de memória (percorrem o estado
+                de cada conexão, no mesmo processo dos websockets; 0 desliga)
+            limite_memoria: Objetos visitados por conexão em cada estimativa
+        """
+        self.criar = criar
+        self.ocioso = ocioso
+        self.maximo = max(1, maximo)
+        self.reserva = reserva
+        self.intervalo = intervalo
+        self.em_uso = em_uso or (lambda session_id, api: False)
+        self.ao_despejar = ao_despejar
+        self.intervalo_memoria = intervalo_memoria
+        self.limite_memoria = limite_memoria
+        self._memoria_em = 0.0  # última estimativa de memória
+
+        self._lock = threading.RLock()
+        self._conexoes: "OrderedDict[Tuple[str, str], Conexao]" = OrderedDict()  # menos usada primeiro
+        self._sessoes: Dict[str, Conexao] = {}
+        # Trava de login por conta e logins esperando por ela; sai do dicionário com o último
+        self._criando: Dict[Tuple[str, str], List[Any]] = {}  # chave -> [trava, logins]
+        self._parar = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+
+    @staticmethod
+    def _chave(email: str, account_type: str) -> Tuple[str, str]:
+        return email.strip().lower(), account_type
+
+    # ------------------------------------------------------------------
+    # Sessões
+    # ------------------------------------------------------------------
+
+    def conectar(self, session_id: str, email: str, senha: str, account_type: str) -> Tuple[Any, Optional[str], bool]:
+        """
+        Associa a sessão a uma conexão da conta, reaproveitando a aberta se houver.
+
+        Returns:
+            (api ou None, motivo do erro, True se a conexão foi reaproveitada)
+        """
+        self._iniciar_varredura()
+        chave = self._chave(email, account_type)
+        with self._lock:
+            criando = self._criando.setdefault(chave, [threading.Lock(), 0])
+            criando[1] += 1
+        try:
+            return self._conectar(chave, criando[0], session_id, email, senha, account_type)
+        finally:
+            with self._lock:
+                criando[1] -= 1
+                if criando[1] == 0:
+                    del self._criando[chave]
+
+    def _conectar(self, chave: Tuple[str, str], criando: threading.Lock, session_id: str,
+                  email: str, senha: str, account_type: str) -> Tuple[Any, Optional[str], bool]:
+        # Logins simultâneos da mesma conta: o segundo espera e reaproveita a conexão do primeiro
+        with criando:
+            substituida = None
+            with self._lock:
+                existente = self._conexoes.get(chave)
+                if existente is not None and existente.confere(senha) and existente.viva():
+                    existente.reaproveitamentos += 1
+                    self._associar(session_id, existente)
+                    logger.info("Conexão reaproveitada", extra=self._campos(existente, session_id))
+                    return existente.api, None, True
+
+            api, erro = self.criar(email, senha, account_type)
+            if api is None:
+                return None, erro, False
+
+            nova = Conexao(chave, api, senha)
+            with self._lock:
+                # Conexão anterior da conta (caiu ou a senha mudou) é substituída
+                substituida = self._conexoes.pop(chave, None)
+                self._conexoes[chave] = nova
+                self._associar(session_id, nova)
+                despejadas = [substituida] if substituida is not None else []
+                despejadas += self._excedentes()
+                despejos = [(conexao, self._desassociar_todas(conexao)) for conexao in despejadas]
+            logger.info("Conexão aberta", extra=dict(self._campos(nova, session_id),
+                                                           conexoes=len(self._conexoes)))
+        self._despejar(despejos, "substituída" if substituida is not None else "limite de conexões")
+        return api, None, False
+
+    def obter(self, session_id: Optional[str]) -> Any:
+        """API da sessão (None se não conectada); marca a sessão e a conexão como usadas."""
+        if not session_id:
+            return None
+        with self._lock:
+            conexao = self._sessoes.get(session_id)
+            if conexao is None:
+                return None
+            agora = time.time()
+            conexao.sessoes[session_id] = agora
+            conexao.ultimo_uso = agora
+            self._conexoes.move_to_end(conexao.chave)
+            return conexao.api
+
+    def liberar(self, session_id: Optional[str]) -> None:
+        """Desassocia a sessão (logout); sem outras sessões a conexão vai para a reserva ou fecha."""
+        if not session_id:
+            return
+        with self._lock:
+            conexao = self._sessoes.pop(session_id, None)
+            if conexao is None:
+                return
+            conexao.sessoes.pop(session_id, None)
+            if conexao.sessoes:
+                return
+            if self.reserva > 0 and conexao.viva():
+                conexao.reservada_em = time.time()
+                logger.info("Conexão na reserva", extra=self._campos(conexao, session_id))
+                return
+            self._conexoes.pop(conexao.chave, None)
+        self._fechar(conexao, "logout")
+
+    def _associar(self, session_id: str, conexao: Conexao) -> None:
+        anterior = self._sessoes.get(session_id)
+        if anterior is not None and anterior is not conexao:
+            anterior.sessoes.pop(session_id, None)
+        agora = time.time()
+        self._sessoes[session_id] = conexao
+        conexao.sessoes[session_id] = agora
+        conexao.ultimo_uso = agora
+        conexao.reservada_em = None
+        self._conexoes.move_to_end(conexao.chave)
+
+    def _desassociar_todas(self, conexao: Conexao) -> List[str]:
+        sessoes = list(conexao.sessoes)
+        for session_id in sessoes:
+            if self._sessoes.get(session_id) is conexao:
+                del self._sessoes[session_id]
+        conexao.sessoes.clear()
+        return sessoes
+
+    # ------------------------------------------------------------------
+    # Despejo
+    # ------------------------------------------------------------------
+
+    def _protegida(self, conexao: Conexao) -> bool:
+        try:
+            return any(self.em_uso(session_id, conexao.api) for session_id in conexao.sessoes)
+        except Exception:
+            logger.exception("Erro ao verificar uso da conexão")
+            return True
+
+    def _excedentes(self) -> List[Conexao]:
+        """Conexões a fechar para voltar ao `maximo` (chamar com o lock)."""
+        excedente = len(self._conexoes) - self.maximo
+        if excedente <= 0:
+            return []
+        ordem = list(self._conexoes.values())[:-1]  # a última é a que acabou de ser usada
+        candidatas = [c for c in ordem if not c.sessoes] + [c for c in ordem if c.sessoes and not self._protegida(c)]
+        escolhidas = candidatas[:excedente]
+        for conexao in escolhidas:
+            del self._conexoes[conexao.chave]
+        if len(escolhidas) < excedente:
+            logger.warning(f"Limite de {self.maximo} conexões excedido: todas as demais estão em uso",
+                           extra={"conexoes": len(self._conexoes)})
+        return escolhidas
+
+    def _despejar(self, despejos: List[Tuple[Conexao, List[str]]], motivo: str) -> None:
+        for conexao, sessoes in despejos:
+            for session_id in sessoes:
+                self._descartar_sessao(session_id)
+            self._fechar(conexao, motivo)
+
+    def _descartar_sessao(self, session_id: str) -> None:
+        if self.ao_despejar is None:
+            return
+        try:
+            self.ao_despejar(session_id)
+        except Exception:
+            logger.exception(f"Erro ao descartar o estado da sessão {session_id}")
+
+    def _fechar(self, conexao: Conexao, motivo: str) -> None:
+        logger.info(f"Fechando conexão ({motivo})", extra=self._campos(conexao))
+        try:
+            conexao.api.close()
+        except Exception:
+            logger.exception("Erro ao fechar conexão")
+
+    @staticmethod
+    def _campos(conexao: Conexao, session_id: Optional[str] = None) -> Dict[str, Any]:
+        campos = {"email": conexao.chave[0], "account_type": conexao.chave[1], "sessoes": len(conexao.sessoes)}
+        if session_id:
+            campos["session_id"] = session_id
+        return campos
+
+    # ------------------------------------------------------------------
+    # Varredura periódica
+    # ------------------------------------------------------------------
+
+    def _iniciar_varredura(self) -> None:
+        # Só no processo dono das conexões (broker ou processo único), no primeiro login
+        with self._lock:
+            if self._thread is None or not self._thread.is_alive():
+                self._parar.clear()
+                self._thread = threading.Thread(target=self._varrer_continuamente, daemon=True,
+                                                name="conexoes-varredura")
+                self._thread.start()
+
+    def _varrer_continuamente(self) -> None:
+        while not self._parar.wait(self.intervalo):
+            try:
+                self.varrer()
+            except Exception:
+                logger.exception("Erro na varredura de conexões")
+
+    def varrer(self) -> None:
+        """Descarta sessões ociosas, fecha conexões vencidas e, no intervalo dela, estima a memória."""
+        agora = time.time()
+        sessoes_ociosas: List[str] = []
+        fechar: List[Conexao] = []
+        with self._lock:
+            for conexao in list(self._conexoes.values()):
+                for session_id, uso in list(conexao.sessoes.items()):
+                    if agora - uso > self.ocioso and not self.em_uso(session_id, conexao.api):
+                        del conexao.sessoes[session_id]
+                        self._sessoes.pop(session_id, None)
+                        sessoes_ociosas.append(session_id)
+                if conexao.sessoes:
+                    continue
+                if conexao.reservada_em is None:
+                    conexao.reservada_em = agora
+                if agora - conexao.reservada_em >= self.reserva or not conexao.viva():
+                    del self._conexoes[conexao.chave]
+                    fechar.append(conexao)
+            conexoes = list(self._conexoes.values())
+
+        for session_id in sessoes_ociosas:
+            logger.info("Sessão ociosa descartada", extra={"session_id": session_id})
+            self._descartar_sessao(session_id)
+        for conexao in fechar:
+            self._fechar(conexao, "ociosa")
+
+        if not conexoes or self.intervalo_memoria <= 0 or agora - self._memoria_em < self.intervalo_memoria:
+            return
+        self._memoria_em = agora
+        # Fora do lock: a estimativa percorre o estado da conexão
+        for conexao in conexoes:
+            compartilhados = [getattr(conexao.api, "timer_wheel", None)]
+            conexao.memoria = tamanho_aproximado(conexao.api, ignorar=compartilhados, limite=self.limite_memoria)
+        logger.debug("Conexões abertas", extra={
+            "conexoes": len(conexoes), "memoria_bytes": sum(c.memoria for c in conexoes)})
+
+    # ------------------------------------------------------------------
+    # Consulta e encerramento
+    # ------------------------------------------------------------------
+
+    def estatisticas(self, session_id: Optional[str] = None) -> Dict[str, Any]:
+        """Totais do gerenciador e, com `session_id`, o resumo da conexão dessa sessão."""
+        agora = time.time()
+        with self._lock:
+            conexoes = list(self._conexoes.values())
+            propria = self._sessoes.get(session_id) if session_id else None
+        return {
+            "connections": len(conexoes),
+            "warm": sum(1 for c in conexoes if not c.sessoes),
+            "sessions": sum(len(c.sessoes) for c in conexoes),
+            "max_connections": self.maximo,
+            "idle_timeout": self.ocioso,
+            "warm_timeout": self.reserva,
+            "memory_bytes": sum(c.memoria for c in conexoes),
+            "connection": propria.resumo(agora) if propria is not None else None,
+        }
+
+    def listar(self) -> List[Tuple[Tuple[str, str], Dict[str, Any]]]:
+        """(email, tipo de conta) e resumo de cada conexão aberta (métricas)."""
+        agora = time.time()
+        with self._lock:
+            conexoes = list(self._conexoes.values())
+        return [(conexao.chave, conexao.resumo(agora)) for conexao in conexoes]
+
+    def fechar_todas(self, timeout: float = 10.0) -> None:
+        """Para a varredura e fecha todas as conexões em paralelo (websockets e threads)."""
+        self._parar.set()
+        with self._lock:
+            conexoes = list(self._conexoes.values())
+            self._conexoes.clear()
+            self._sessoes.clear()
+        threads = [threading.Thread(target=self._fechar, args=(conexao, "encerramento"), daemon=True)
+                   for conexao in conexoes]
+        for thread in threads:
+            thread.start()
+        limite = time.time() + timeout
+        for thread in threads:
+            thread.join(max(0.0, limite - time.time()))
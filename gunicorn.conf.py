@@ -1,16 +1,30 @@
 # Configuração do Gunicorn para produção
 import multiprocessing
 import os
+import secrets
+import subprocess
+import sys
+import threading
+import time
 
 # Diretório base da aplicação
 basedir = os.path.abspath(os.path.dirname(__file__))
 
+# Broker: processo único dono das conexões com a IQ Option e do estado do bot
+# (broker.py). Os workers só encaminham as requisições a ele por este socket.
+os.environ.setdefault('IQ_OPTION_BROKER_SOCKET', os.path.join(basedir, 'logs', 'broker.sock'))
+os.environ.setdefault('IQ_OPTION_BROKER_KEY', secrets.token_hex(16))
+
 # Número de workers (processos)
 # Recomendado: (2 x CPU cores) + 1
 workers = multiprocessing.cpu_count() * 2 + 1
 
 # Número de threads por worker
-threads = 2
+# Cada página aberta mantém uma conexão SSE (/api/eventos) ocupando uma thread
+# dormindo; as demais requisições precisam de threads livres além delas, por isso
+# cada worker aceita no máximo IQ_OPTION_SSE_MAX conexões SSE (padrão: metade das
+# threads) e as páginas além disso voltam ao polling. Para muitas abas, use o asgi.py
+threads = int(os.getenv('GUNICORN_THREADS', 32))
 
 # Endereço e porta (será usado pelo nginx via socket)
 bind = "127.0.0.1:8000"
@@ -18,8 +32,9 @@ bind = "127.0.0.1:8000"
 # Timeout em segundos
 timeout = 120
 
-# Modo de trabalho (sync, gevent, eventlet, etc)
-worker_class = "sync"
+# Modo de trabalho (sync, gthread, gevent, eventlet, etc)
+# gthread: uma thread por requisição, necessário para as conexões SSE longas
+worker_class = "gthread"
 
 # Máximo de requisições por worker antes de reciclar
 max_requests = 1000
@@ -44,3 +59,46 @@ worker_tmp_dir = "/dev/shm"
 keepalive = 5
 graceful_timeout = 30
 
+
+# ---------------------------------------------------------------------------
+# Ciclo de vida do broker
+# ---------------------------------------------------------------------------
+
+_broker = None
+_encerrando = threading.Event()
+
+
+def _iniciar_broker(server):
+    global _broker
+    socket_broker = os.environ['IQ_OPTION_BROKER_SOCKET']
+    os.makedirs(os.path.dirname(socket_broker), exist_ok=True)
+    if os.path.exists(socket_broker):
+        os.unlink(socket_broker)  # socket de uma execução anterior: esperar o novo
+    _broker = subprocess.Popen([sys.executable, os.path.join(basedir, 'broker.py')], cwd=basedir)
+    limite = time.time() + 60
+    while not os.path.exists(socket_broker) and _broker.poll() is None and time.time() < limite:
+        time.sleep(0.2)
+    server.log.info("Broker iniciado (pid %s) em %s", _broker.pid, socket_broker)
+
+
+def _vigiar_broker(server):
+    """Reinicia o broker se ele morrer (as sessões precisarão de novo login)."""
+    while not _encerrando.wait(5):
+        if _broker is not None and _broker.poll() is not None:
+            server.log.error("Broker encerrado (código %s); reiniciando", _broker.returncode)
+            _iniciar_broker(server)
+
+
+def on_starting(server):
+    _iniciar_broker(server)
+    threading.Thread(target=_vigiar_broker, args=(server,), daemon=True).start()
+
+
+def on_exit(server):
+    _encerrando.set()
+    if _broker is not None and _broker.poll() is None:
+        _broker.terminate()
+        try:
+            _broker.wait(graceful_timeout)
+        except subprocess.TimeoutExpired:
+            _broker.kill()
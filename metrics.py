@@ -0,0 +1,336 @@
+"""Module for IQ Option client metrics in the Prometheus text format.
+
+A small dependency-free registry: counters, gauges and histograms updated
+in place, plus collectors called at scrape time. ``REGISTRY`` holds the
+process-wide client metrics (websocket frames, handler latency, outbound
+writes, reconnects, threads) and the per-client state of every client
+passed to :func:`track_client`. ``REGISTRY.render()`` returns the text
+exposition format, so any HTTP server can expose it.
+
+Accounts are labelled with :func:`account_id`, never with the email.
+"""
+
+import hashlib
+import hmac
+import logging
+import math
+import os
+import re
+import threading
+import time
+import weakref
+
+# websocket handler latency buckets (seconds)
+HANDLER_BUCKETS = (0.0001, 0.00025, 0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 1.0)
+
+
+def _format_value(value):
+    if value is None:
+        return "NaN"
+    value = float(value)
+    if math.isinf(value):
+        return "+Inf" if value > 0 else "-Inf"
+    if math.isnan(value):
+        return "NaN"
+    return repr(int(value)) if value.is_integer() and abs(value) < 1e15 else repr(value)
+
+
+def _escape(value):
+    return str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+class MetricFamily(object):
+    """Samples of one metric name, as produced by a collector."""
+
+    def __init__(self, name, kind, documentation):
+        self.name = name
+        self.kind = kind  # counter, gauge or histogram
+        self.documentation = documentation
+        self.samples = []  # (suffix, labels, value)
+
+    def add(self, value, labels=None, suffix=""):
+        self.samples.append((suffix, labels or {}, value))
+        return self
+
+    def add_histogram(self, buckets, counts, total, labels=None):
+        """``counts[i]`` observations in ``(buckets[i-1], buckets[i]]``; the last bucket is +Inf."""
+        labels = labels or {}
+        cumulative = 0
+        for bound, count in zip(buckets, counts):
+            cumulative += count
+            self.add(cumulative, dict(labels, le=_format_value(bound)), "_bucket")
+        if not buckets or not math.isinf(buckets[-1]):
+            self.add(cumulative, dict(labels, le="+Inf"), "_bucket")
+        self.add(total, labels, "_sum")
+        self.add(cumulative, labels, "_count")
+        return self
+
+    def render(self):
+        lines = ["# HELP {} {}".format(self.name, self.documentation.replace("\n", " ")),
+                 "# TYPE {} {}".format(self.name, self.kind)]
+        for suffix, labels, value in self.samples:
+            if labels:
+                text = ",".join('{}="{}"'.format(key, _escape(val)) for key, val in labels.items())
+                lines.append("{}{}{{{}}} {}".format(self.name, suffix, text, _format_value(value)))
+            else:
+                lines.append("{}{} {}".format(self.name, suffix, _format_value(value)))
+        return "\n".join(lines)
+
+
+class _Metric(object):
+    kind = None
+
+    def __init__(self, name, documentation, labelnames=(), registry=None):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self._values = {}  # label values -> value
+        self._lock = threading.Lock()
+        if registry is not None:
+            registry.register(self)
+
+    def _key(self, labelvalues):
+        if len(labelvalues) != len(self.labelnames):
+            raise ValueError("{} expects labels {}".format(self.name, self.labelnames))
+        return tuple(str(value) for value in labelvalues)
+
+    def _labels(self, key):
+        return dict(zip(self.labelnames, key))
+
+    def collect(self):
+        family = MetricFamily(self.name, self.kind, self.documentation)
+        with self._lock:
+            items = sorted(self._values.items())
+        for key, value in items:
+            family.add(value, self._labels(key))
+        return [family]
+
+
+class Counter(_Metric):
+    """Monotonic counter, ``name`` should end in ``_total``."""
+
+    kind = "counter"
+
+    def inc(self, *labelvalues, **kwargs):
+        key = self._key(labelvalues)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + kwargs.get("amount", 1)
+
+
+class Gauge(_Metric):
+    """Value that goes up and down."""
+
+    kind = "gauge"
+
+    def set(self, value, *labelvalues):
+        key = self._key(labelvalues)
+        with self._lock:
+            self._values[key] = value
+
+    def inc(self, *labelvalues, **kwargs):
+        key = self._key(labelvalues)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + kwargs.get("amount", 1)
+
+    def dec(self, *labelvalues, **kwargs):
+        self.inc(*labelvalues, amount=-kwargs.get("amount", 1))
+
+
+class Histogram(_Metric):
+    """Fixed-bucket histogram."""
+
+    kind = "histogram"
+
+    def __init__(self, name, documentation, labelnames=(), buckets=HANDLER_BUCKETS, registry=None):
+        super(Histogram, self).__init__(name, documentation, labelnames, registry)
+        self.buckets = tuple(buckets)
+
+    def observe(self, value, *labelvalues):
+        key = self._key(labelvalues)
+        with self._lock:
+            state = self._values.get(key)
+            if state is None:
+                state = self._values[key] = [[0] * (len(self.buckets) + 1), 0.0]
+            counts = state[0]
+            for idx, bound in enumerate(self.buckets):
+                if value <= bound:
+                    counts[idx] += 1
+                    break
+            else:
+                counts[-1] += 1
+            state[1] += value
+
+    def collect(self):
+        family = MetricFamily(self.name, self.kind, self.documentation)
+        with self._lock:
+            items = sorted((key, (list(counts), total)) for key, (counts, total) in self._values.items())
+        for key, (counts, total) in items:
+            family.add_histogram(self.buckets + (float("inf"),), counts, total, self._labels(key))
+        return [family]
+
+
+class Registry(object):
+    """Metrics and scrape-time collectors rendered together."""
+
+    def __init__(self):
+        self._metrics = []
+        self._collectors = []
+        self._lock = threading.Lock()
+
+    def register(self, metric):
+        with self._lock:
+            self._metrics.append(metric)
+        return metric
+
+    def register_collector(self, collector):
+        """``collector()`` returns a list of :class:`MetricFamily`; called on every scrape."""
+        with self._lock:
+            self._collectors.append(collector)
+        return collector
+
+    def unregister_collector(self, collector):
+        with self._lock:
+            if collector in self._collectors:
+                self._collectors.remove(collector)
+
+    def collect(self):
+        with self._lock:
+            sources = [metric.collect for metric in self._metrics] + list(self._collectors)
+        families = []
+        for source in sources:
+            try:
+                families.extend(source())
+            except Exception:
+                logging.getLogger(__name__).exception('**error** metrics collector')
+        return families
+
+    def render(self):
+        """Text exposition format (version 0.0.4)."""
+        return "".join(family.render() + "\n" for family in self.collect())
+
+
+REGISTRY = Registry()
+
+# ____________________________WEBSOCKET____________________________
+
+ws_frames_received = Counter(
+    "iqoption_ws_frames_received_total", "Websocket frames received, by message name.",
+    ("name",), registry=REGISTRY)
+ws_handler_seconds = Histogram(
+    "iqoption_ws_handler_seconds", "Time spent dispatching one received frame to the handlers.",
+    ("name",), registry=REGISTRY)
+ws_frames_sent = Counter(
+    "iqoption_ws_frames_sent_total", "Websocket frames written.", registry=REGISTRY)
+ws_send_waiting = Gauge(
+    "iqoption_ws_send_waiting", "Threads waiting for the websocket write lock (outbound queue depth).",
+    registry=REGISTRY)
+ws_connects = Counter(
+    "iqoption_connects_total", "Successful client connect() calls.", registry=REGISTRY)
+ws_reconnects = Counter(
+    "iqoption_reconnects_total", "Successful connect() calls on a client that was connected before.",
+    registry=REGISTRY)
+ws_disconnects = Counter(
+    "iqoption_ws_disconnects_total", "Websocket connections closed.", registry=REGISTRY)
+ws_errors = Counter(
+    "iqoption_ws_errors_total", "Websocket errors.", registry=REGISTRY)
+
+
+def _thread_group(name):
+    # "Thread-3 (run)" -> "Thread", "resultados_2" -> "resultados"
+    return re.sub(r"[\s_-]*\d+(\s*\(.*\))?$", "", name) or name
+
+
+def collect_threads():
+    family = MetricFamily("process_threads", "gauge", "Live threads, by name without the numeric suffix.")
+    groups = {}
+    for thread in threading.enumerate():
+        group = _thread_group(thread.name)
+        groups[group] = groups.get(group, 0) + 1
+    for group, count in sorted(groups.items()):
+        family.add(count, {"name": group})
+    return [family]
+
+
+REGISTRY.register_collector(collect_threads)
+
+# ____________________________CLIENTS______________________________
+
+_clients = weakref.WeakKeyDictionary()  # IQ_Option -> labels
+_clients_lock = threading.Lock()
+
+# IQ_OPTION_METRICS_SALT keeps account ids stable across restarts
+_account_salt = os.getenv("IQ_OPTION_METRICS_SALT", "").encode("utf-8") or os.urandom(16)
+
+
+def account_id(email):
+    """Opaque ``account`` label: keyed hash of the email, it cannot be listed from a scrape."""
+    digest = hmac.new(_account_salt, email.strip().lower().encode("utf-8"), hashlib.sha256)
+    return digest.hexdigest()[:12]
+
+
+def track_client(client, **labels):
+    """Export the state of ``client`` (an IQ_Option) with ``labels`` until :func:`untrack_client`.
+
+    Do not pass personal data as labels: use ``account=account_id(email)``.
+    """
+    with _clients_lock:
+        _clients[client] = dict(labels)
+
+
+def untrack_client(client):
+    with _clients_lock:
+        _clients.pop(client, None)
+
+
+def _leaf_count(value, depth):
+    """Entries at ``depth`` levels of nested dicts (the candles of ``real_time_candles``)."""
+    if depth <= 1 or not isinstance(value, dict):
+        return len(value)
+    return sum(_leaf_count(child, depth - 1) for child in list(value.values()))
+
+
+def client_families(clients):
+    """Families for ``clients``, an iterable of ``(labels, IQ_Option)``."""
+    now = time.time()
+    connected = MetricFamily("iqoption_client_connected", "gauge", "1 if the client websocket is connected.")
+    open_orders = MetricFamily("iqoption_open_orders", "gauge", "Orders opened and not closed yet.")
+    pending = MetricFamily("iqoption_pending_results", "gauge",
+                           "Requests waiting for the server: open answers, result waiters, overdue options.")
+    balance_age = MetricFamily("iqoption_balance_age_seconds", "gauge",
+                               "Age of the cached balance of the current account.")
+    dict_sizes = MetricFamily("iqoption_dict_entries", "gauge", "Entries kept in client state dicts.")
+    latency = MetricFamily("iqoption_order_latency_seconds", "histogram",
+                           "Order latency by instrument type and stage (see order_trace.STAGES).")
+    for labels, client in clients:
+        connected.add(1 if client.check_connect() else 0, labels)
+        store = client.order_store
+        open_orders.add(len(store.open_orders()), labels)
+        api = client.api
+        pending.add(len(getattr(api, "pending_orders", {})), dict(labels, kind="open_answer"))
+        pending.add(store.waiting(), dict(labels, kind="order_waiter"))
+        pending.add(client.overdue_count(), dict(labels, kind="overdue"))
+        entry = client.balance_cache.get(client.get_balance_id())
+        if entry is not None and entry.updated_at is not None:
+            balance_age.add(now - entry.updated_at, labels)
+        sizes = {"orders": len(store)}
+        for name, depth in (("real_time_candles", 3), ("socket_option_opened", 1)):
+            try:
+                sizes[name] = _leaf_count(getattr(api, name), depth)
+            except (AttributeError, NotImplementedError):
+                pass  # not kept by this client (paper trading)
+        for name, size in sizes.items():
+            dict_sizes.add(size, dict(labels, dict=name))
+        for instrument, stages in client.order_tracer.histograms().items():
+            for stage, (buckets_ms, counts, total_ms) in stages.items():
+                latency.add_histogram([bound / 1000.0 for bound in buckets_ms], counts, total_ms / 1000.0,
+                                      dict(labels, instrument_type=instrument, stage=stage))
+    return [connected, open_orders, pending, balance_age, dict_sizes, latency]
+
+
+def collect_clients():
+    with _clients_lock:
+        clients = [(labels, client) for client, labels in _clients.items()]
+    return client_families(clients)
+
+
+REGISTRY.register_collector(collect_clients)
@@ -0,0 +1,289 @@
+"""
+Simulador Monte Carlo de Risco de Ruína
+Estima a probabilidade de ruína e a distribuição do drawdown de uma
+configuração de entrada/Martingale antes de usá-la numa conta real.
+
+Milhões de sequências de operações são simuladas em paralelo com NumPy (um
+array por variável de estado, um passo por sinal) com as mesmas regras do
+`BotService`:
+
+- Entrada PERCENT ou FIXED limitada pelo
+  `StopLossProtection.calculate_safe_entry_value` (80% da folga até o mínimo)
+- Martingale: após um LOSS, nova entrada de 2.15x até o nível de Gale, só se
+  houver saldo e `can_operate(valor)` permitir
+- 2 LOSS completos consecutivos pulam os 2 sinais seguintes
+- Stop Loss (saldo abaixo do mínimo) e Stop Win (saldo na meta) encerram o caminho
+
+Com o limite de 80% a entrada encolhe à medida que o saldo se aproxima do
+mínimo e o Stop Loss quase nunca é cruzado: o caminho fica "preso" quando a
+entrada segura cai abaixo do valor mínimo aceito pela corretora. Os dois casos
+contam como ruína.
+
+Cada caminho sorteia sua taxa de acerto (normal em torno de `taxa_acerto`,
+modelando a incerteza sobre o pacote de sinais) e cada operação sorteia o
+payout (uniforme entre `payout` e `payout_max`).
+
+Uso:
+    python monte_carlo.py --taxa-acerto 0.58 --gale 2 --entry-value 2 --sinais 500 --caminhos 1000000
+"""
+
+import argparse
+import time
+from dataclasses import asdict, dataclass
+from typing import Any, Dict, Optional
+
+try:
+    import numpy as np
+except ModuleNotFoundError as exc:  # pragma: no cover - feedback claro
+    raise ModuleNotFoundError(
+        "NumPy não está instalado. Execute 'pip install numpy' antes de usar o simulador.") from exc
+
+MULTIPLICADOR_GALE = 2.15  # mesmo fator de BotService._execute_martingale
+QUANTIS = (0.5, 0.9, 0.95, 0.99)
+
+# Estado final de cada caminho
+ATIVO = 0  # chegou ao fim dos sinais
+RUINA_STOP_LOSS = 1  # saldo abaixo do mínimo do Stop Loss
+RUINA_BLOQUEIO = 2  # entrada segura abaixo do valor mínimo ou saldo insuficiente
+STOP_WIN = 3
+
+
+@dataclass
+class ConfigMonteCarlo:
+    """Regras de entrada e proteção (campos do BotConfig) e distribuições do mercado."""
+
+    saldo_inicial: float = 1000.0
+    entry_type: str = "PERCENT"  # PERCENT ou FIXED
+    entry_value: float = 1.0
+    gale: int = 0
+    stop_loss: float = 5.0  # % do saldo inicial; 0 desativa
+    stop_win: float = 0.0  # % de lucro que encerra o caminho; 0 desativa
+    perdas_para_pular: int = 2
+    sinais_pulados: int = 2
+    valor_minimo: float = 1.0  # menor entrada aceita pela corretora
+    taxa_acerto: float = 0.55  # probabilidade de WIN por operação
+    desvio_taxa: float = 0.0  # desvio-padrão da taxa de acerto entre caminhos
+    taxa_empate: float = 0.0  # probabilidade de EQUAL
+    payout: float = 0.8  # lucro por unidade apostada em caso de WIN
+    payout_max: Optional[float] = None  # payout uniforme em [payout, payout_max]
+    sinais: int = 500  # sinais por caminho
+    caminhos: int = 1_000_000
+    semente: Optional[int] = None
+
+
+@dataclass
+class ResultadoMonteCarlo:
+    config: ConfigMonteCarlo
+    estado: np.ndarray  # int8 por caminho (ATIVO, RUINA_*, STOP_WIN)
+    saldo_final: np.ndarray
+    drawdown: np.ndarray  # maior queda a partir de um topo
+    drawdown_percent: np.ndarray
+    sinal_final: np.ndarray  # índice do sinal em que o caminho parou (sinais se chegou ao fim)
+    operacoes: int = 0
+    duracao: float = 0.0
+
+    def probabilidade(self, estado: int) -> float:
+        return float((self.estado == estado).mean())
+
+    @property
+    def probabilidade_ruina(self) -> float:
+        return float((self.estado == RUINA_STOP_LOSS).mean() + (self.estado == RUINA_BLOQUEIO).mean())
+
+    @staticmethod
+    def _quantis(valores: np.ndarray) -> Dict[str, float]:
+        if len(valores) == 0:
+            return {}
+        return {f"p{int(q * 100)}": round(float(v), 2) for q, v in zip(QUANTIS, np.quantile(valores, QUANTIS))}
+
+    def resumo(self) -> Dict[str, Any]:
+        ruina = (self.estado == RUINA_STOP_LOSS) | (self.estado == RUINA_BLOQUEIO)
+        return {
+            "caminhos": len(self.estado),
+            "operacoes": self.operacoes,
+            "probabilidade_ruina": round(self.probabilidade_ruina, 5),
+            "ruina_stop_loss": round(self.probabilidade(RUINA_STOP_LOSS), 5),
+            "ruina_bloqueio": round(self.probabilidade(RUINA_BLOQUEIO), 5),
+            "probabilidade_stop_win": round(self.probabilidade(STOP_WIN), 5),
+            "sinais_ate_ruina": self._quantis(self.sinal_final[ruina]),
+            "drawdown": self._quantis(self.drawdown),
+            "drawdown_percent": self._quantis(self.drawdown_percent),
+            "saldo_final": self._quantis(self.saldo_final),
+            "saldo_final_medio": round(float(self.saldo_final.mean()), 2),
+            "duracao": round(self.duracao, 3),
+        }
+
+
+def _simular_bloco(config: ConfigMonteCarlo, caminhos: int, rng: np.random.Generator) -> Dict[str, Any]:
+    # Saídas por caminho
+    estado = np.zeros(caminhos, dtype=np.int8)
+    saldo_final = np.empty(caminhos)
+    queda_final = np.empty(caminhos)
+    queda_pct_final = np.empty(caminhos)
+    sinal_final = np.full(caminhos, config.sinais, dtype=np.int32)
+
+    # Estado dos caminhos ainda vivos, compactado quando algum para
+    origem = np.arange(caminhos)
+    saldo = np.full(caminhos, float(config.saldo_inicial))
+    topo = saldo.copy()
+    queda = np.zeros(caminhos)
+    queda_pct = np.zeros(caminhos)
+    perdas = np.zeros(caminhos, dtype=np.int32)
+    pular = np.zeros(caminhos, dtype=np.int32)
+    taxa = np.clip(rng.normal(config.taxa_acerto, config.desvio_taxa, caminhos), 1e-9, 1.0) \
+        if config.desvio_taxa > 0 else np.full(caminhos, config.taxa_acerto)
+    limite_empate = taxa + config.taxa_empate
+
+    com_stop = config.stop_loss > 0
+    minimo = config.saldo_inicial * (1 - config.stop_loss / 100.0) if com_stop else -np.inf
+    meta = config.saldo_inicial * (1 + config.stop_win / 100.0) if config.stop_win > 0 else np.inf
+    percentual = config.entry_type.upper() == "PERCENT"
+    payout_max = config.payout if config.payout_max is None else config.payout_max
+    operacoes = 0
+
+    for sinal in range(config.sinais):
+        if len(saldo) == 0:
+            break
+        # Sinais pulados após 2 LOSS consecutivos
+        pulando = pular > 0
+        pular -= pulando
+        opera = ~pulando
+
+        valor = saldo * (config.entry_value / 100.0) if percentual else np.full(len(saldo), float(config.entry_value))
+        if com_stop:
+            # calculate_safe_entry_value: 0 com o Stop Loss acionado, no máximo 80% da folga
+            valor = np.where(saldo >= minimo, np.clip((saldo - minimo) * 0.8, 0.0, valor), 0.0)
+        bloqueado = opera & ((valor < config.valor_minimo) | (saldo < valor))
+        opera &= ~bloqueado
+
+        # Sequência de Martingale do sinal: um nível por iteração, só os caminhos com LOSS seguem
+        em_jogo = opera
+        perdeu = np.zeros(len(saldo), dtype=bool)
+        for nivel in range(config.gale + 1):
+            operacoes += int(np.count_nonzero(em_jogo))
+            sorteio = rng.random(len(saldo))
+            win = em_jogo & (sorteio < taxa)
+            loss = em_jogo & (sorteio >= limite_empate)
+            if payout_max > config.payout:
+                # Dado o WIN, sorteio / taxa é uniforme em [0, 1): sorteia o payout sem outro array aleatório
+                ganho = config.payout + (payout_max - config.payout) * (sorteio / taxa)
+                ganho *= win
+            else:
+                ganho = win * config.payout
+            ganho -= loss
+            ganho *= valor
+            saldo += ganho
+            # Drawdown após cada encerramento (sem operações abertas: capital == saldo)
+            np.maximum(topo, saldo, out=topo)
+            atual = topo - saldo
+            np.maximum(queda, atual, out=queda)
+            atual /= topo
+            np.maximum(queda_pct, atual, out=queda_pct)
+            perdeu = np.where(em_jogo, loss, perdeu)
+            if nivel == config.gale or not loss.any():
+                break
+            # BotService._execute_martingale: saldo suficiente e can_operate(valor)
+            valor = valor * MULTIPLICADOR_GALE
+            em_jogo = loss & (saldo >= valor) & (saldo - valor >= minimo)
+
+        # LOSS completo conta para a regra de pular sinais; WIN/EQUAL zera a contagem
+        perdas = np.where(opera, np.where(perdeu, perdas + 1, 0), perdas)
+        if config.perdas_para_pular:
+            pular = np.where(opera & (perdas >= config.perdas_para_pular), config.sinais_pulados, pular)
+
+        motivo = np.where(bloqueado, RUINA_BLOQUEIO,
+                          np.where(saldo < minimo, RUINA_STOP_LOSS,
+                                   np.where(saldo >= meta, STOP_WIN, ATIVO))).astype(np.int8)
+        parados = motivo != ATIVO
+        if parados.any():
+            destino = origem[parados]
+            estado[destino] = motivo[parados]
+            sinal_final[destino] = sinal
+            saldo_final[destino] = saldo[parados]
+            queda_final[destino] = queda[parados]
+            queda_pct_final[destino] = queda_pct[parados]
+            vivos = ~parados
+            origem, saldo, topo, queda, queda_pct = origem[vivos], saldo[vivos], topo[vivos], queda[vivos], queda_pct[vivos]
+            perdas, pular, taxa, limite_empate = perdas[vivos], pular[vivos], taxa[vivos], limite_empate[vivos]
+
+    saldo_final[origem] = saldo
+    queda_final[origem] = queda
+    queda_pct_final[origem] = queda_pct
+    queda_pct_final *= 100
+    return {"estado": estado, "saldo_final": saldo_final, "drawdown": queda_final,
+            "drawdown_percent": queda_pct_final, "sinal_final": sinal_final, "operacoes": operacoes}
+
+
+def simular_monte_carlo(config: Optional[ConfigMonteCarlo] = None, bloco: int = 250_000) -> ResultadoMonteCarlo:
+    """
+    Simula `config.caminhos` sequências de `config.sinais` sinais.
+
+    Args:
+        config: Regras e distribuições
+        bloco: Caminhos simulados por vez (limita a memória)
+    """
+    inicio = time.perf_counter()
+    config = config or ConfigMonteCarlo()
+    rng = np.random.default_rng(config.semente)
+    partes = []
+    restante = config.caminhos
+    while restante > 0:
+        tamanho = min(bloco, restante)
+        partes.append(_simular_bloco(config, tamanho, rng))
+        restante -= tamanho
+    return ResultadoMonteCarlo(
+        config=config,
+        estado=np.concatenate([p["estado"] for p in partes]),
+        saldo_final=np.concatenate([p["saldo_final"] for p in partes]),
+        drawdown=np.concatenate([p["drawdown"] for p in partes]),
+        drawdown_percent=np.concatenate([p["drawdown_percent"] for p in partes]),
+        sinal_final=np.concatenate([p["sinal_final"] for p in partes]),
+        operacoes=sum(p["operacoes"] for p in partes),
+        duracao=time.perf_counter() - inicio,
+    )
+
+
+def main() -> None:
+    padrao = ConfigMonteCarlo()
+    parser = argparse.ArgumentParser(description="Risco de ruína de uma configuração de entrada/Martingale")
+    parser.add_argument("--saldo", type=float, default=padrao.saldo_inicial)
+    parser.add_argument("--entry-type", default=padrao.entry_type, choices=("PERCENT", "FIXED"))
+    parser.add_argument("--entry-value", type=float, default=padrao.entry_value)
+    parser.add_argument("--gale", type=int, default=padrao.gale)
+    parser.add_argument("--stop-loss", type=float, default=padrao.stop_loss)
+    parser.add_argument("--stop-win", type=float, default=padrao.stop_win)
+    parser.add_argument("--valor-minimo", type=float, default=padrao.valor_minimo)
+    parser.add_argument("--taxa-acerto", type=float, default=padrao.taxa_acerto)
+    parser.add_argument("--desvio-taxa", type=float, default=padrao.desvio_taxa)
+    parser.add_argument("--taxa-empate", type=float, default=padrao.taxa_empate)
+    parser.add_argument("--payout", type=float, default=padrao.payout)
+    parser.add_argument("--payout-max", type=float, default=None)
+    parser.add_argument("--sinais", type=int, default=padrao.sinais)
+    parser.add_argument("--caminhos", type=int, default=padrao.caminhos)
+    parser.add_argument("--semente", type=int, default=None)
+    args = parser.parse_args()
+
+    config = ConfigMonteCarlo(
+        saldo_inicial=args.saldo,
+        entry_type=args.entry_type,
+        entry_value=args.entry_value,
+        gale=args.gale,
+        stop_loss=args.stop_loss,
+        stop_win=args.stop_win,
+        valor_minimo=args.valor_minimo,
+        taxa_acerto=args.taxa_acerto,
+        desvio_taxa=args.desvio_taxa,
+        taxa_empate=args.taxa_empate,
+        payout=args.payout,
+        payout_max=args.payout_max,
+        sinais=args.sinais,
+        caminhos=args.caminhos,
+        semente=args.semente,
+    )
+    resultado = simular_monte_carlo(config)
+    print("Configuração:", ", ".join(f"{k}={v}" for k, v in asdict(config).items() if v is not None))
+    for chave, valor in resultado.resumo().items():
+        print(f"{chave:<24} {valor}")
+
+
+if __name__ == "__main__":
+    main()
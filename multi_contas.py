@@ -0,0 +1,544 @@
+"""
+Orquestrador Multi-Contas (copy-trading)
+Executa o mesmo arquivo de sinais em várias contas, disparando cada sinal em
+todas elas no mesmo instante.
+
+A biblioteca guarda a sessão (SSID, conta ativa, trava do socket) em
+`global_value`, estado do processo: por isso cada conta roda num processo
+próprio, com seu `BotService`, regras de entrada e Stop Loss. O processo
+principal lê e agenda os sinais uma única vez; `antecedencia` segundos antes
+de cada instante envia o evento a todas as contas, que pré-montam os frames
+das ordens e dormem até o mesmo instante alvo (relógio local, comum a todos
+os processos) para escrevê-los em paralelo, cada uma no seu socket. Cada
+conta devolve os horários de envio e o orquestrador calcula a defasagem
+entre contas de cada sinal.
+
+Uso:
+    python multi_contas.py contas.json [sinais.txt]
+
+contas.json:
+    [
+        {"nome": "conta1", "email": "...", "password": "...", "account_type": "PRACTICE",
+         "entry_type": "FIXED", "entry_value": 2, "stop_loss": 5, "gale": 0},
+        ...
+    ]
+Campos de configuração ausentes usam os valores do `.env`.
+"""
+
+import json
+import os
+import subprocess
+import sys
+import threading
+import time
+from collections import deque
+from dataclasses import dataclass, field
+from datetime import datetime
+from statistics import median
+from typing import Any, Dict, List, Optional
+
+import importlib.util
+
+CURRENT_DIR = os.path.dirname(os.path.abspath(__file__))
+
+# bot_service ajusta o sys.path (conflito do diretório http/) ao ser importado
+bot_service_path = os.path.join(CURRENT_DIR, "bot_service.py")
+spec_bot = importlib.util.spec_from_file_location("bot_service", bot_service_path)
+bot_service_module = importlib.util.module_from_spec(spec_bot)
+sys.modules.setdefault("bot_service", bot_service_module)  # dataclasses resolvem anotações pelo módulo
+spec_bot.loader.exec_module(bot_service_module)
+BotService = bot_service_module.BotService
+AgendadorSinais = bot_service_module.AgendadorSinais
+obter_processador = bot_service_module.obter_processador
+chave_padrao = bot_service_module.chave_padrao
+interpretar_linha = bot_service_module.sinais_processor_module.interpretar_linha
+
+order_trace_path = os.path.join(CURRENT_DIR, "order_trace.py")
+spec_trace = importlib.util.spec_from_file_location("order_trace", order_trace_path)
+order_trace_module = importlib.util.module_from_spec(spec_trace)
+spec_trace.loader.exec_module(order_trace_module)
+LatencyHistogram = order_trace_module.LatencyHistogram
+arquivo_do_processo = bot_service_module.registro_logs_module.arquivo_do_processo
+
+# Campos de contas.json aplicados à configuração de cada conta
+CAMPOS_CONFIG = ("stop_loss", "stop_win", "entry_type", "entry_value", "gale")
+
+
+# ---------------------------------------------------------------------------
+# Processo de cada conta
+# ---------------------------------------------------------------------------
+
+
+class ServicoConta(BotService):
+    """BotService de uma conta do orquestrador (logs identificados pelo nome)."""
+
+    def __init__(self, nome: str) -> None:
+        self.nome = nome
+        super().__init__()
+
+    def add_log(self, message: str, log_type: str = "info") -> None:
+        super().add_log(f"[{self.nome}] {message}", log_type)
+
+
+def _esperar_ate(alvo: float) -> None:
+    """Dorme até `alvo` (epoch local) e gira no último milissegundo para acordar no instante exato."""
+    restante = alvo - time.time()
+    if restante > 0.002:
+        time.sleep(restante - 0.002)
+    while time.time() < alvo:
+        pass
+
+
+class ProcessoConta:
+    """Lado da conta: recebe comandos JSON (uma linha por comando) e responde no mesmo formato."""
+
+    def __init__(self, entrada, saida) -> None:
+        self.entrada = entrada
+        self.saida = saida
+        self.servico: Optional[ServicoConta] = None
+        self._saida_lock = threading.Lock()
+        self._eventos: Dict[float, Dict[str, Any]] = {}  # instante -> sinais e ordens armadas
+        self._eventos_lock = threading.Lock()
+
+    def responder(self, tipo: str, **dados: Any) -> None:
+        with self._saida_lock:
+            self.saida.write(json.dumps({"tipo": tipo, **dados}) + "\n")
+            self.saida.flush()
+
+    def executar(self) -> None:
+        for linha in self.entrada:
+            if not linha.strip():
+                continue
+            comando = json.loads(linha)
+            cmd = comando.pop("cmd")
+            if cmd == "sair":
+                break
+            try:
+                getattr(self, f"_cmd_{cmd}")(**comando)
+            except Exception as exc:
+                self.responder("erro", cmd=cmd, erro=str(exc))
+        if self.servico:
+            self.servico.logout()
+
+    def _parado(self) -> bool:
+        return self.servico is None or self.servico._stop_event.is_set()
+
+    def _cmd_login(self, nome: str, email: str, password: str, account_type: str = "PRACTICE", **config: Any) -> None:
+        servico = ServicoConta(nome)
+        ajustes = {campo: config[campo] for campo in CAMPOS_CONFIG if config.get(campo) is not None}
+        if ajustes:
+            servico.update_config(persist=False, **ajustes)
+        ok, erro = servico.login(email, password, account_type)
+        if ok:
+            self.servico = servico
+        self.responder("login", ok=ok, erro=erro, saldo=servico.initial_balance, offset=servico._server_offset())
+
+    def _sinais(self, textos: List[str]) -> List[Any]:
+        sinais = []
+        for indice, texto in enumerate(textos):
+            sinal, _ = interpretar_linha(texto, indice)
+            if sinal is not None:
+                sinais.append(sinal)
+        return sinais
+
+    def _cmd_armar(self, instante: float, alvo: float, sinais: List[str]) -> None:
+        """Pré-monta as ordens do evento e agenda o disparo no instante alvo."""
+        if self._parado():
+            self.responder("enviado", instante=instante, envios={}, parado=True)
+            return
+        lista = self._sinais(sinais)
+        preparados = {}
+        for sinal in lista:
+            armado = self.servico._arm_signal(sinal, alvo)
+            if armado is not None:
+                preparados[chave_padrao(sinal)] = armado
+        with self._eventos_lock:
+            self._eventos[instante] = {"sinais": lista, "preparados": preparados}
+        self.responder("armado", instante=instante, armados=len(preparados), offset=self.servico._server_offset())
+        threading.Thread(
+            target=self._disparar, args=(instante, alvo), name=f"disparo-{instante:.0f}", daemon=True
+        ).start()
+
+    def _cmd_disparar(self, instante: float, alvo: float, sinais: List[str]) -> None:
+        """Evento que não foi armado a tempo: arma e dispara agora."""
+        if self._parado():
+            self.responder("enviado", instante=instante, envios={}, parado=True)
+            return
+        with self._eventos_lock:
+            self._eventos[instante] = {"sinais": self._sinais(sinais), "preparados": {}}
+        self._disparar(instante, alvo)
+
+    def _disparar(self, instante: float, alvo: float) -> None:
+        _esperar_ate(alvo)
+        with self._eventos_lock:
+            evento = self._eventos.pop(instante, None)
+        if evento is None or self._parado():
+            self.responder("enviado", instante=instante, envios={}, parado=self._parado())
+            return
+        lote = self.servico._collect_batch(evento["sinais"], evento["preparados"], alvo)
+        if lote:
+            self.servico._fire_batch(datetime.fromtimestamp(alvo).strftime("%H:%M:%S"), lote)
+        # índice do sinal no evento -> epoch de envio (None = não enviado)
+        envios = {str(armado.sinal.linha_original): armado.order.sent_at for armado in lote}
+        self.responder("enviado", instante=instante, envios=envios, parado=self._parado())
+
+    def _cmd_status(self) -> None:
+        if self.servico is None:
+            self.responder("status", conectado=False)
+            return
+        status = self.servico.get_status()
+        self.responder(
+            "status",
+            conectado=True,
+            saldo=status.balance,
+            variacao=status.variation,
+            processados=status.processed_signals,
+            executados=status.executed_signals,
+            parado=self._parado(),
+            stop_loss=status.stop_loss_status,
+            offset=self.servico._server_offset(),
+        )
+
+
+def _main_conta() -> None:
+    # stdout é o canal de respostas: prints e logs do serviço vão para stderr
+    canal = sys.stdout
+    sys.stdout = sys.stderr
+    ProcessoConta(sys.stdin, canal).executar()
+
+
+# ---------------------------------------------------------------------------
+# Orquestrador
+# ---------------------------------------------------------------------------
+
+
+@dataclass
+class ContaRemota:
+    """Processo de uma conta visto pelo orquestrador."""
+
+    nome: str
+    processo: subprocess.Popen
+    conectado: bool = False
+    erro: Optional[str] = None
+    saldo: Optional[float] = None
+    offset: Optional[float] = None
+    status: Dict[str, Any] = field(default_factory=dict)
+    login_ok: threading.Event = field(default_factory=threading.Event)
+
+
+@dataclass
+class DisparoPendente:
+    """Evento enviado às contas, aguardando os horários de envio de cada uma."""
+
+    instante: float
+    alvo: float
+    sinais: List[str]
+    aguardando: set
+    envios: Dict[str, Dict[str, Optional[float]]] = field(default_factory=dict)  # conta -> índice -> envio
+
+
+class OrquestradorContas:
+    """Executa um arquivo de sinais em várias contas com disparo simultâneo."""
+
+    def __init__(
+        self,
+        contas: List[Dict[str, Any]],
+        sinais_path: Optional[str] = None,
+        *,
+        antecedencia: float = 10.0,
+        deslocamento: float = 0.0,
+        tolerancia: float = 2.0,
+        historico: int = 200,
+    ) -> None:
+        """
+        Args:
+            contas: Lista de contas (nome, email, password, account_type e campos de `CAMPOS_CONFIG`)
+            sinais_path: Arquivo de sinais (padrão: sinais.txt do projeto)
+            antecedencia: Segundos antes do sinal em que as contas armam as ordens
+            deslocamento: Segundos somados ao instante de todos os sinais
+            tolerancia: Atraso máximo (s) para ainda disparar um evento que já passou
+            historico: Quantidade de relatórios de defasagem mantidos
+        """
+        self.contas_config = [dict(conta, nome=conta.get("nome") or conta["email"]) for conta in contas]
+        self.sinais_path = sinais_path or os.path.join(CURRENT_DIR, "sinais.txt")
+        self.antecedencia = antecedencia
+        self.deslocamento = deslocamento
+        self.tolerancia = tolerancia
+
+        self.contas: Dict[str, ContaRemota] = {}
+        self._pendentes: Dict[float, DisparoPendente] = {}
+        self._armados: set = set()
+        self._lock = threading.Lock()
+        self._relatorios: deque = deque(maxlen=historico)
+        self._defasagem = LatencyHistogram()
+        self._atraso = LatencyHistogram()
+        self._agendador: Optional[AgendadorSinais] = None
+        self._thread: Optional[threading.Thread] = None
+
+    # ------------------------------------------------------------------
+    # Processos das contas
+    # ------------------------------------------------------------------
+
+    def conectar(self, timeout: float = 60.0) -> Dict[str, Optional[str]]:
+        """
+        Inicia um processo por conta e faz o login em todas em paralelo.
+
+        Returns:
+            Dict[str, Optional[str]]: Erro de login por conta (None = conectada)
+        """
+        for config in self.contas_config:
+            # Um arquivo de log por conta: a rotação não pode ser compartilhada entre processos
+            ambiente = dict(os.environ, IQ_OPTION_LOG_FILE=arquivo_do_processo(config["nome"]))
+            processo = subprocess.Popen(
+                [sys.executable, os.path.abspath(__file__), "--conta"],
+                stdin=subprocess.PIPE,
+                stdout=subprocess.PIPE,
+                text=True,
+                bufsize=1,
+                cwd=CURRENT_DIR,
+                env=ambiente,
+            )
+            conta = ContaRemota(nome=config["nome"], processo=processo)
+            self.contas[conta.nome] = conta
+            threading.Thread(target=self._ler_respostas, args=(conta,), name=f"conta-{conta.nome}", daemon=True).start()
+            self._enviar(conta, {"cmd": "login", **config})
+
+        limite = time.time() + timeout
+        for conta in self.contas.values():
+            if not conta.login_ok.wait(max(0.0, limite - time.time())):
+                conta.erro = conta.erro or "Tempo de login esgotado"
+        return {nome: (None if conta.conectado else conta.erro) for nome, conta in self.contas.items()}
+
+    def _enviar(self, conta: ContaRemota, comando: Dict[str, Any]) -> bool:
+        try:
+            conta.processo.stdin.write(json.dumps(comando) + "\n")
+            conta.processo.stdin.flush()
+            return True
+        except (BrokenPipeError, OSError, ValueError):
+            conta.conectado = False
+            conta.erro = "Processo da conta encerrado"
+            return False
+
+    def _ler_respostas(self, conta: ContaRemota) -> None:
+        for linha in conta.processo.stdout:
+            try:
+                resposta = json.loads(linha)
+            except ValueError:
+                continue
+            tipo = resposta.pop("tipo", None)
+            if resposta.get("offset") is not None:
+                conta.offset = resposta["offset"]
+            if tipo == "login":
+                conta.conectado = bool(resposta.get("ok"))
+                conta.erro = resposta.get("erro")
+                conta.saldo = resposta.get("saldo")
+                conta.login_ok.set()
+            elif tipo == "enviado":
+                if resposta.get("parado"):
+                    conta.status["parado"] = True
+                self._registrar_envios(conta.nome, resposta["instante"], resposta.get("envios") or {})
+            elif tipo == "status":
+                conta.status = resposta
+                conta.saldo = resposta.get("saldo", conta.saldo)
+            elif tipo == "erro":
+                print(f"[MULTI] {conta.nome}: erro em {resposta.get('cmd')}: {resposta.get('erro')}")
+        # processo terminou
+        conta.conectado = False
+        conta.login_ok.set()
+        self._registrar_envios(conta.nome, None, {})
+
+    def _ativas(self) -> List[ContaRemota]:
+        return [conta for conta in self.contas.values() if conta.conectado and not conta.status.get("parado")]
+
+    def _offset_servidor(self) -> float:
+        # Todas as contas falam com o mesmo servidor: mediana dos deslocamentos medidos
+        offsets = [conta.offset for conta in self.contas.values() if conta.offset is not None]
+        return median(offsets) if offsets else 0.0
+
+    # ------------------------------------------------------------------
+    # Agendamento e disparo
+    # ------------------------------------------------------------------
+
+    def iniciar(self) -> bool:
+        """Carrega os sinais e inicia o agendamento em segundo plano."""
+        if not self._ativas():
+            return False
+        processor = obter_processador(self.sinais_path)
+        if not processor.carregar_sinais():
+            print("[MULTI] Nenhum sinal válido encontrado")
+            return False
+
+        self._agendador = AgendadorSinais(
+            self._armar_evento,
+            self._disparar_evento,
+            antecedencia=self.antecedencia,
+            deslocamento=self.deslocamento,
+            tolerancia=self.tolerancia,
+            offset_servidor=self._offset_servidor,
+            ao_perder=lambda evento, atraso: print(
+                f"[MULTI] {len(evento.sinais)} sinal(is) de {evento.hora} não disparado(s): atraso de {atraso:.1f}s"
+            ),
+        )
+        self._agendador.carregar(processor.obter_todos_sinais())
+        versao_agendada = processor.versao
+
+        def recarregar():
+            nonlocal versao_agendada
+            processor.carregar_sinais()
+            if processor.versao == versao_agendada:
+                return None
+            versao_agendada = processor.versao
+            return processor.obter_todos_sinais()
+
+        self._thread = threading.Thread(
+            target=self._agendador.executar, args=(recarregar,), name="multi-contas", daemon=True
+        )
+        self._thread.start()
+        return True
+
+    def _distribuir(self, cmd: str, evento, alvo: float) -> None:
+        textos = [str(sinal) for sinal in evento.sinais]
+        contas = self._ativas()
+        if not contas:
+            return
+        with self._lock:
+            self._pendentes[evento.instante] = DisparoPendente(
+                instante=evento.instante, alvo=alvo, sinais=textos, aguardando={conta.nome for conta in contas}
+            )
+        comando = {"cmd": cmd, "instante": evento.instante, "alvo": alvo, "sinais": textos}
+        for conta in contas:
+            if not self._enviar(conta, comando):
+                self._registrar_envios(conta.nome, evento.instante, {})
+
+    def _armar_evento(self, evento, alvo: float) -> None:
+        # Cada conta arma e dispara sozinha no alvo: o comando não fica no caminho crítico
+        self._armados.add(evento.instante)
+        self._distribuir("armar", evento, alvo)
+
+    def _disparar_evento(self, evento, alvo: float) -> None:
+        if evento.instante in self._armados:
+            self._armados.discard(evento.instante)
+            return
+        self._distribuir("disparar", evento, alvo)
+
+    def _registrar_envios(self, nome: str, instante: Optional[float], envios: Dict[str, Optional[float]]) -> None:
+        """Junta os horários de envio de cada conta; com todas as respostas, gera o relatório do evento."""
+        concluidos = []
+        with self._lock:
+            pendentes = [self._pendentes.get(instante)] if instante is not None else list(self._pendentes.values())
+            for pendente in pendentes:
+                if pendente is None or nome not in pendente.aguardando:
+                    continue
+                pendente.aguardando.discard(nome)
+                pendente.envios[nome] = envios
+                if not pendente.aguardando:
+                    concluidos.append(self._pendentes.pop(pendente.instante))
+        for pendente in concluidos:
+            self._relatar(pendente)
+
+    def _relatar(self, pendente: DisparoPendente) -> None:
+        hora = datetime.fromtimestamp(pendente.alvo).strftime("%H:%M:%S")
+        for indice, texto in enumerate(pendente.sinais):
+            enviados = {
+                nome: envios[str(indice)]
+                for nome, envios in pendente.envios.items()
+                if envios.get(str(indice)) is not None
+            }
+            relatorio = {
+                "instante": pendente.instante,
+                "hora": hora,
+                "sinal": texto,
+                "contas": len(pendente.envios),
+                "enviados": len(enviados),
+                "defasagem_ms": None,
+                "atraso_min_ms": None,
+                "atraso_max_ms": None,
+                "por_conta_ms": {nome: (envio - pendente.alvo) * 1000 for nome, envio in enviados.items()},
+            }
+            if enviados:
+                primeiro, ultimo = min(enviados.values()), max(enviados.values())
+                relatorio["defasagem_ms"] = (ultimo - primeiro) * 1000
+                relatorio["atraso_min_ms"] = (primeiro - pendente.alvo) * 1000
+                relatorio["atraso_max_ms"] = (ultimo - pendente.alvo) * 1000
+                with self._lock:
+                    self._defasagem.observe(relatorio["defasagem_ms"])
+                    for envio in enviados.values():
+                        self._atraso.observe(max(0.0, (envio - pendente.alvo) * 1000))
+                print(
+                    f"[MULTI] {hora} {texto}: {len(enviados)}/{len(pendente.envios)} conta(s) | "
+                    f"defasagem entre contas {relatorio['defasagem_ms']:.2f} ms | "
+                    f"envio {relatorio['atraso_min_ms']:+.1f} a {relatorio['atraso_max_ms']:+.1f} ms do alvo"
+                )
+            self._relatorios.append(relatorio)
+
+    # ------------------------------------------------------------------
+    # Consulta e encerramento
+    # ------------------------------------------------------------------
+
+    def estatisticas(self, recentes: int = 20) -> Dict[str, Any]:
+        """Defasagem entre contas por sinal (histograma) e relatórios recentes."""
+        with self._lock:
+            return {
+                "defasagem_entre_contas": self._defasagem.to_dict(),
+                "atraso_envio": self._atraso.to_dict(),
+                "recentes": list(self._relatorios)[-recentes:],
+            }
+
+    def status(self, timeout: float = 2.0) -> Dict[str, Dict[str, Any]]:
+        """Pede o status de cada conta e devolve o último conhecido."""
+        for conta in self._ativas():
+            self._enviar(conta, {"cmd": "status"})
+        time.sleep(timeout)
+        return {
+            nome: {"conectado": conta.conectado, "erro": conta.erro, "saldo": conta.saldo, **conta.status}
+            for nome, conta in self.contas.items()
+        }
+
+    def parar(self, timeout: float = 10.0) -> None:
+        if self._agendador:
+            self._agendador.parar()
+        for conta in self.contas.values():
+            self._enviar(conta, {"cmd": "sair"})
+        for conta in self.contas.values():
+            try:
+                conta.processo.wait(timeout)
+            except subprocess.TimeoutExpired:
+                conta.processo.kill()
+
+
+def main() -> None:
+    if len(sys.argv) > 1 and sys.argv[1] == "--conta":
+        _main_conta()
+        return
+
+    if len(sys.argv) < 2:
+        print("Uso: python multi_contas.py <contas.json> [sinais.txt]")
+        sys.exit(1)
+
+    with open(sys.argv[1], "r", encoding="utf-8") as f:
+        contas = json.load(f)
+    orquestrador = OrquestradorContas(contas, sys.argv[2] if len(sys.argv) > 2 else None)
+
+    erros = orquestrador.conectar()
+    for nome, erro in erros.items():
+        print(f"[MULTI] {nome}: {'conectada' if erro is None else 'falha no login - ' + erro}")
+    if not orquestrador.iniciar():
+        print("[MULTI] Nenhuma conta conectada ou nenhum sinal para executar")
+        orquestrador.parar()
+        sys.exit(1)
+
+    print(f"[MULTI] Executando sinais em {len(orquestrador._ativas())} conta(s). Ctrl+C para parar.")
+    try:
+        while True:
+            time.sleep(60)
+            stats = orquestrador.estatisticas()["defasagem_entre_contas"]
+            if stats["count"]:
+                print(f"[MULTI] Defasagem entre contas: p50 {stats['p50']} ms, p99 {stats['p99']} ms, máx {stats['max']:.2f} ms")
+    except KeyboardInterrupt:
+        pass
+    finally:
+        orquestrador.parar()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,273 @@
+"""Module for IQ Option local order/position store."""
+
+import logging
+import threading
+import time
+from collections import defaultdict, deque
+from concurrent.futures import Future, InvalidStateError, TimeoutError
+
+from .timer_wheel import get_timer_wheel
+
+# events applied by the store
+EVENTS = ("position-changed", "order-changed", "option-opened", "option-closed",
+          "socket-option-opened", "socket-option-closed")
+
+_OPEN_EVENTS = ("option-opened", "socket-option-opened")
+_CLOSE_EVENTS = ("option-closed", "socket-option-closed")
+
+
+class OrderRecord(object):
+    """Last known state of one order and the raw events received for it."""
+
+    __slots__ = ("order_id", "position_id", "external_id", "instrument_type",
+                 "status", "events", "updated_at", "closed_at")
+
+    def __init__(self, order_id):
+        self.order_id = order_id
+        self.position_id = None
+        self.external_id = None
+        self.instrument_type = None
+        self.status = None
+        self.events = {}  # event name -> last message
+        self.updated_at = None
+        self.closed_at = None
+
+    @property
+    def closed(self):
+        return self.closed_at is not None
+
+    def event(self, name):
+        """Last ``msg`` received for the event ``name`` (None if not seen)."""
+        message = self.events.get(name)
+        return None if message is None else message["msg"]
+
+    def __repr__(self):
+        return "OrderRecord({} {} {})".format(
+            self.order_id, self.instrument_type, self.status)
+
+
+def has_event(name):
+    """Predicate for :meth:`OrderStore.wait_for`: the event ``name`` was received."""
+    return lambda record: name in record.events
+
+
+def is_closed(record):
+    """Predicate for :meth:`OrderStore.wait_for`: the order is closed."""
+    return record.closed
+
+
+class OrderStore(object):
+    """Single place where order and position events are applied.
+
+    Records are indexed by order id, position id and external id. Readers
+    get O(1) lookups, can subscribe to changes and can wait for a state
+    with a :class:`concurrent.futures.Future` instead of polling. Closed
+    records are evicted ``closed_ttl`` seconds after closing.
+    """
+
+    def __init__(self, closed_ttl=600, timer_wheel=None):
+        self.closed_ttl = closed_ttl
+        self._timer_wheel = timer_wheel
+        self._orders = {}
+        self._by_position = {}
+        self._by_external = {}
+        self._closed = deque()  # (closed_at, order_id) in closing order
+        self._waiters = defaultdict(list)  # order_id -> [(predicate, future)]
+        self._subscribers = {}  # token -> (order_id or None, callback)
+        self._next_token = 0
+        self._lock = threading.Lock()
+
+    def __len__(self):
+        return len(self._orders)
+
+    def __contains__(self, order_id):
+        return order_id in self._orders
+
+    # ____________________________EVENTS____________________________
+
+    def apply(self, message):
+        """Apply a websocket message, return the updated record (None if ignored)."""
+        name = message.get("name")
+        if name not in EVENTS:
+            return None
+        msg = message.get("msg") or {}
+        ids = self._extract_ids(name, message, msg)
+        if ids is None:
+            return None
+        order_id, position_id, external_id = ids
+
+        with self._lock:
+            record = self._lookup(order_id, position_id, external_id)
+            if record is None:
+                if order_id is None:
+                    return None
+                record = OrderRecord(order_id)
+                self._orders[order_id] = record
+            if position_id is not None and record.position_id is None:
+                record.position_id = position_id
+                self._by_position[position_id] = record
+            if external_id is not None and record.external_id is None:
+                record.external_id = external_id
+                self._by_external[external_id] = record
+            if msg.get("instrument_type") and record.instrument_type is None:
+                record.instrument_type = msg["instrument_type"]
+
+            record.events[name] = message
+            record.updated_at = time.time()
+            if name in _OPEN_EVENTS:
+                if record.status is None:
+                    record.status = "open"
+            elif name in _CLOSE_EVENTS:
+                record.status = "closed"
+            elif name == "position-changed" and msg.get("status"):
+                record.status = msg["status"]
+            if record.status == "closed" and record.closed_at is None:
+                record.closed_at = record.updated_at
+                self._closed.append((record.closed_at, record.order_id))
+
+            ready = self._pop_ready(record)
+            callbacks = [callback for key, callback in self._subscribers.values()
+                         if key is None or key == record.order_id]
+            self._evict(record.updated_at)
+
+        for future in ready:
+            try:
+                future.set_result(record)
+            except InvalidStateError:
+                pass
+        for callback in callbacks:
+            try:
+                callback(name, record)
+            except Exception:
+                logging.getLogger(__name__).exception('**error** order store subscriber')
+        return record
+
+    @staticmethod
+    def _extract_ids(name, message, msg):
+        # -> (order_id, position_id, external_id)
+        if name == "position-changed":
+            if msg.get("source") == "binary-options":
+                # external_id is the binary option id
+                option_id = int(msg["external_id"])
+                return option_id, msg.get("id"), option_id
+            order_ids = (msg.get("raw_event") or {}).get("order_ids")
+            order_id = int(order_ids[0]) if order_ids else None
+            return order_id, msg.get("id"), msg.get("external_id")
+        if name == "order-changed":
+            return msg.get("id"), msg.get("position_id"), None
+        if name in ("option-opened", "option-closed"):
+            return int(msg["option_id"]), None, None
+        return msg.get("id"), None, None
+
+    def _lookup(self, order_id, position_id, external_id):
+        if order_id is not None and order_id in self._orders:
+            return self._orders[order_id]
+        if position_id is not None and position_id in self._by_position:
+            return self._by_position[position_id]
+        if external_id is not None:
+            return self._by_external.get(external_id)
+        return None
+
+    def _pop_ready(self, record):
+        waiters = self._waiters.get(record.order_id)
+        if not waiters:
+            return []
+        ready = [future for predicate, future in waiters if predicate(record)]
+        waiters[:] = [(p, f) for p, f in waiters if f not in ready and not f.done()]
+        if not waiters:
+            del self._waiters[record.order_id]
+        return ready
+
+    def _evict(self, now):
+        while self._closed and now - self._closed[0][0] > self.closed_ttl:
+            _, order_id = self._closed.popleft()
+            record = self._orders.get(order_id)
+            if record is None or order_id in self._waiters:
+                continue
+            del self._orders[order_id]
+            if self._by_position.get(record.position_id) is record:
+                del self._by_position[record.position_id]
+            if self._by_external.get(record.external_id) is record:
+                del self._by_external[record.external_id]
+
+    # ____________________________READ______________________________
+
+    def get(self, order_id=None, position_id=None, external_id=None):
+        with self._lock:
+            if order_id is not None:
+                return self._orders.get(order_id)
+            if position_id is not None:
+                return self._by_position.get(position_id)
+            if external_id is not None:
+                return self._by_external.get(external_id)
+        return None
+
+    def open_orders(self):
+        with self._lock:
+            return [record for record in self._orders.values() if not record.closed]
+
+    def waiting(self):
+        """Futures still waiting for an order state (see :meth:`wait_for`)."""
+        with self._lock:
+            return sum(len(waiters) for waiters in self._waiters.values())
+
+    # ____________________________WAIT______________________________
+
+    def wait_for(self, order_id, predicate=None, timeout=None):
+        """Future resolved with the :class:`OrderRecord` once ``predicate(record)`` holds.
+
+        Without ``predicate`` the future resolves as soon as any event for
+        ``order_id`` is known. With ``timeout`` (seconds) the future fails
+        with :class:`concurrent.futures.TimeoutError`.
+        """
+        if predicate is None:
+            predicate = lambda record: True
+        future = Future()
+        with self._lock:
+            record = self._orders.get(order_id)
+            if record is None or not predicate(record):
+                self._waiters[order_id].append((predicate, future))
+                record = None
+        if record is not None:
+            future.set_result(record)
+            return future
+        # a cancelled or expired future leaves the waiting list right away
+        future.add_done_callback(lambda f: self._discard_waiter(order_id, f))
+        if timeout is not None:
+            wheel = self._timer_wheel or get_timer_wheel()
+            handle = wheel.schedule(timeout, self._expire_waiter, order_id, future)
+            future.add_done_callback(lambda _: handle.cancel())
+        return future
+
+    def _discard_waiter(self, order_id, future):
+        with self._lock:
+            waiters = self._waiters.get(order_id)
+            if waiters:
+                waiters[:] = [(p, f) for p, f in waiters if f is not future]
+                if not waiters:
+                    del self._waiters[order_id]
+
+    @staticmethod
+    def _expire_waiter(order_id, future):
+        try:
+            future.set_exception(TimeoutError("order {} wait timeout".format(order_id)))
+        except InvalidStateError:
+            pass
+
+    # ____________________________SUBSCRIBE_________________________
+
+    def subscribe(self, callback, order_id=None):
+        """Call ``callback(event_name, record)`` on every change (of ``order_id`` only if given).
+
+        Callbacks run on the websocket thread and must not block. Returns a
+        token for :meth:`unsubscribe`.
+        """
+        with self._lock:
+            self._next_token += 1
+            token = self._next_token
+            self._subscribers[token] = (order_id, callback)
+        return token
+
+    def unsubscribe(self, token):
+        with self._lock:
+            self._subscribers.pop(token, None)
@@ -0,0 +1,238 @@
+"""Module for IQ Option order latency tracing."""
+
+import threading
+import time
+from collections import OrderedDict, deque
+
+# stage name -> (start mark, end mark)
+STAGES = OrderedDict([
+    ("trigger_to_write", ("trigger", "socket_write")),
+    ("enqueue_to_write", ("enqueue", "socket_write")),
+    ("write_to_ack", ("socket_write", "ack")),
+    ("ack_to_open", ("ack", "opened")),
+    ("write_to_open", ("socket_write", "opened")),
+])
+
+# histogram upper bounds in milliseconds
+BUCKETS_MS = (1, 2, 5, 10, 20, 50, 100, 200, 500, 1000, 2000, 5000, float("inf"))
+
+
+class OrderTrace(object):
+    """Monotonic timestamps of one order from signal trigger to close."""
+
+    __slots__ = ("request_id", "order_id", "asset", "instrument_type",
+                 "trigger", "enqueue", "socket_write", "ack", "opened",
+                 "closed", "expired", "closed_wall")
+
+    def __init__(self, request_id, asset, instrument_type, trigger=None, expired=None):
+        now = time.monotonic()
+        self.request_id = str(request_id)
+        self.order_id = None
+        self.asset = asset
+        self.instrument_type = instrument_type
+        self.trigger = now if trigger is None else trigger
+        self.enqueue = now
+        self.socket_write = None
+        self.ack = None
+        self.opened = None
+        self.closed = None
+        self.expired = expired
+        self.closed_wall = None
+
+    def durations(self):
+        """Stage latencies in milliseconds for the marks already recorded."""
+        result = {}
+        for stage, (start, end) in STAGES.items():
+            t0 = getattr(self, start)
+            t1 = getattr(self, end)
+            if t0 is not None and t1 is not None:
+                result[stage] = (t1 - t0) * 1000.0
+        if self.expired is not None and self.closed_wall is not None:
+            # how late the server reported the close after the expiration
+            result["expiry_to_close"] = (self.closed_wall - self.expired) * 1000.0
+        return result
+
+    def to_dict(self):
+        return {
+            "request_id": self.request_id,
+            "order_id": self.order_id,
+            "asset": self.asset,
+            "instrument_type": self.instrument_type,
+            "durations_ms": self.durations(),
+        }
+
+
+class LatencyHistogram(object):
+    """Fixed-bucket histogram of latencies in milliseconds."""
+
+    __slots__ = ("counts", "count", "total", "min", "max")
+
+    def __init__(self):
+        self.counts = [0] * len(BUCKETS_MS)
+        self.count = 0
+        self.total = 0.0
+        self.min = None
+        self.max = None
+
+    def observe(self, value_ms):
+        for idx, bound in enumerate(BUCKETS_MS):
+            if value_ms <= bound:
+                self.counts[idx] += 1
+                break
+        self.count += 1
+        self.total += value_ms
+        self.min = value_ms if self.min is None else min(self.min, value_ms)
+        self.max = value_ms if self.max is None else max(self.max, value_ms)
+
+    def quantile(self, q):
+        """Upper bound of the bucket holding the q-quantile."""
+        if not self.count:
+            return None
+        rank = q * self.count
+        seen = 0
+        for idx, bound in enumerate(BUCKETS_MS):
+            seen += self.counts[idx]
+            if seen >= rank:
+                return self.max if bound == float("inf") else min(bound, self.max)
+        return self.max
+
+    def to_dict(self):
+        return {
+            "count": self.count,
+            "avg": (self.total / self.count) if self.count else None,
+            "min": self.min,
+            "max": self.max,
+            "p50": self.quantile(0.5),
+            "p90": self.quantile(0.9),
+            "p99": self.quantile(0.99),
+            "buckets": [[("+Inf" if b == float("inf") else b), c]
+                        for b, c in zip(BUCKETS_MS, self.counts)],
+        }
+
+
+class OrderTracer(object):
+    """Collects :class:`OrderTrace` records and aggregates them per asset and instrument."""
+
+    def __init__(self, max_traces=1000):
+        self.max_traces = max_traces
+        self._traces = OrderedDict()  # request_id -> OrderTrace
+        self._by_order_id = {}
+        self._by_asset = {}  # asset -> {stage: LatencyHistogram}
+        self._by_instrument = {}  # instrument_type -> {stage: LatencyHistogram}
+        self._batch_skew = LatencyHistogram()  # first to last write of batched orders
+        self._batches = deque(maxlen=100)
+        self._lock = threading.Lock()
+
+    def start(self, request_id, asset, instrument_type, trigger=None, expired=None):
+        trace = OrderTrace(request_id, asset, instrument_type, trigger, expired)
+        with self._lock:
+            self._traces[trace.request_id] = trace
+            while len(self._traces) > self.max_traces:
+                _, old = self._traces.popitem(last=False)
+                self._by_order_id.pop(old.order_id, None)
+        return trace
+
+    def mark(self, request_id, stage):
+        with self._lock:
+            trace = self._traces.get(str(request_id))
+            if trace is not None and getattr(trace, stage) is None:
+                setattr(trace, stage, time.monotonic())
+                self._observe(trace, stage)
+
+    def ack(self, request_id, order_id):
+        """Server answered the open request (``option`` / ``digital-option-placed``)."""
+        with self._lock:
+            trace = self._traces.get(str(request_id))
+            if trace is None or trace.ack is not None:
+                return
+            trace.ack = time.monotonic()
+            if order_id is not None:
+                trace.order_id = order_id
+                self._by_order_id[order_id] = trace
+            self._observe(trace, "ack")
+
+    def mark_order(self, order_id, stage):
+        """Record ``opened`` / ``closed`` for an order already acknowledged."""
+        with self._lock:
+            trace = self._by_order_id.get(order_id)
+            if trace is None or getattr(trace, stage) is not None:
+                return
+            setattr(trace, stage, time.monotonic())
+            if stage == "closed":
+                trace.closed_wall = time.time()
+            self._observe(trace, stage)
+
+    def observe_batch(self, report):
+        """Record the :func:`armed_order.batch_report` of an order batch."""
+        report = dict(report, time=time.time())
+        with self._lock:
+            self._batches.append(report)
+            if report["skew_ms"] is not None and report["sent"] > 1:
+                self._batch_skew.observe(report["skew_ms"])
+
+    def recent_batches(self, limit=20):
+        with self._lock:
+            batches = list(self._batches)[-limit:]
+        return list(reversed(batches))
+
+    def _observe(self, trace, mark):
+        durations = trace.durations()
+        for stage, (start, end) in STAGES.items():
+            if end == mark and stage in durations:
+                self._histogram(trace, stage).observe(durations[stage])
+        if mark == "closed" and "expiry_to_close" in durations:
+            self._histogram(trace, "expiry_to_close").observe(durations["expiry_to_close"])
+
+    def _histogram(self, trace, stage):
+        hist_asset = self._by_asset.setdefault(trace.asset, {})
+        hist_instrument = self._by_instrument.setdefault(trace.instrument_type, {})
+        return _MultiHistogram(
+            hist_asset.setdefault(stage, LatencyHistogram()),
+            hist_instrument.setdefault(stage, LatencyHistogram()))
+
+    def get_trace(self, request_id=None, order_id=None):
+        with self._lock:
+            if order_id is not None:
+                return self._by_order_id.get(order_id)
+            return self._traces.get(str(request_id))
+
+    def recent(self, limit=50):
+        with self._lock:
+            traces = list(self._traces.values())[-limit:]
+        return [trace.to_dict() for trace in reversed(traces)]
+
+    def snapshot(self, asset=None, instrument_type=None):
+        """Latency histograms as plain dicts, optionally filtered."""
+        with self._lock:
+            by_asset = {
+                name: {stage: hist.to_dict() for stage, hist in stages.items()}
+                for name, stages in self._by_asset.items()
+                if asset is None or name == asset
+            }
+            by_instrument = {
+                name: {stage: hist.to_dict() for stage, hist in stages.items()}
+                for name, stages in self._by_instrument.items()
+                if instrument_type is None or name == instrument_type
+            }
+            batch_skew = self._batch_skew.to_dict()
+        return {"by_asset": by_asset, "by_instrument": by_instrument,
+                "batch_skew": batch_skew}
+
+    def histograms(self):
+        """{instrument_type: {stage: (BUCKETS_MS, counts, total_ms)}}, copies for the metrics exporter."""
+        with self._lock:
+            return {
+                name: {stage: (BUCKETS_MS, list(hist.counts), hist.total) for stage, hist in stages.items()}
+                for name, stages in self._by_instrument.items()
+            }
+
+
+class _MultiHistogram(object):
+    __slots__ = ("_targets",)
+
+    def __init__(self, *targets):
+        self._targets = targets
+
+    def observe(self, value_ms):
+        for target in self._targets:
+            target.observe(value_ms)
@@ -0,0 +1,506 @@
+"""Module for IQ Option offline paper trading."""
+
+import hashlib
+import heapq
+import json
+import logging
+import math
+import os
+import threading
+import time
+from bisect import bisect_right
+from concurrent.futures import Future
+from itertools import count
+
+from . import constants as OP_code
+from .stable_api import IQ_Option
+
+PRACTICE_BALANCE_ID = 1
+REAL_BALANCE_ID = 2
+BALANCE_TYPES = {"REAL": 1, "PRACTICE": 4}
+
+
+class SimulatedClock(object):
+    """Wall clock that runs ``speed`` times faster than real time.
+
+    Exposes ``time()`` and ``wait(event, timeout)`` so it can drive the
+    signal scheduler (``AgendadorSinais(relogio=...)``).
+    """
+
+    def __init__(self, speed=1.0, start=None):
+        if speed <= 0:
+            raise ValueError("speed must be positive")
+        self.speed = float(speed)
+        self.start = time.time() if start is None else float(start)
+        self._origin = time.monotonic()
+
+    def time(self):
+        return self.start + (time.monotonic() - self._origin) * self.speed
+
+    def sleep(self, seconds):
+        if seconds > 0:
+            time.sleep(seconds / self.speed)
+
+    def wait(self, event, timeout):
+        return event.wait(None if timeout is None else max(0.0, timeout) / self.speed)
+
+
+# ____________________________MARKET DATA___________________________
+
+
+class RandomWalkMarket(object):
+    """Synthetic 1-minute candles, deterministic for a given ``seed``.
+
+    Every candle is derived from a hash of (seed, asset, minute), so any
+    instant can be asked in any order and two runs see the same market.
+    """
+
+    def __init__(self, seed=0, volatility=0.0004, base_price=1.0):
+        self.seed = seed
+        self.volatility = volatility
+        self.base_price = base_price
+
+    def _noise(self, active, minute, salt):
+        digest = hashlib.blake2b("{}:{}:{}:{}".format(self.seed, active, minute, salt).encode(),
+                                 digest_size=8).digest()
+        return int.from_bytes(digest, "big") / float(1 << 64) - 0.5
+
+    def _level(self, active, minute):
+        phase = (sum(active.encode()) % 97) / 97.0 * 2 * math.pi
+        return self.base_price * (1 + 0.01 * math.sin(minute / 240.0 + phase)
+                                  + 0.003 * math.sin(minute / 17.0 + 2 * phase))
+
+    def candle(self, active, start):
+        """1-minute candle starting at ``start`` (epoch, multiple of 60)."""
+        minute = int(start) // 60
+        open_ = self._level(active, minute) + self._noise(active, minute, "o") * self.volatility
+        close = self._level(active, minute + 1) + self._noise(active, minute + 1, "o") * self.volatility
+        spread = abs(self._noise(active, minute, "s")) * self.volatility
+        return {"from": minute * 60, "to": minute * 60 + 60, "open": open_, "close": close,
+                "min": min(open_, close) - spread, "max": max(open_, close) + spread,
+                "volume": int(abs(self._noise(active, minute, "v")) * 1000)}
+
+    def price(self, active, timestamp):
+        """Price at ``timestamp``: linear between the open and close of its minute."""
+        start = int(timestamp) // 60 * 60
+        candle = self.candle(active, start)
+        weight = (timestamp - start) / 60.0
+        return candle["open"] + (candle["close"] - candle["open"]) * weight
+
+
+class RecordedMarket(object):
+    """1-minute candles recorded from the service.
+
+    Load them with :meth:`from_jsonl` (one ``{"active", "from", "open",
+    "close", ...}`` object per line, see :func:`record_candles`) or
+    :meth:`from_cache` (the per-day ``.npz`` files of ``backtest.py``).
+    """
+
+    def __init__(self, candles=None):
+        self._candles = {}  # active -> {from: candle}
+        self._starts = {}  # active -> sorted starts
+        for active, candle in candles or ():
+            self.add(active, candle)
+
+    def add(self, active, candle):
+        self._candles.setdefault(active, {})[int(candle["from"])] = candle
+        self._starts.pop(active, None)
+
+    def _sorted(self, active):
+        starts = self._starts.get(active)
+        if starts is None:
+            starts = self._starts[active] = sorted(self._candles.get(active, ()))
+        return starts
+
+    @classmethod
+    def from_jsonl(cls, path):
+        market = cls()
+        with open(path, "r", encoding="utf-8") as f:
+            for line in f:
+                if line.strip():
+                    row = json.loads(line)
+                    market.add(row.pop("active"), row)
+        return market
+
+    @classmethod
+    def from_cache(cls, directory):
+        import numpy as np  # only needed for the backtest cache format
+
+        market = cls()
+        for folder in os.listdir(directory):
+            active, _, size = folder.rpartition("_")
+            if size != "60":
+                continue
+            for name in sorted(os.listdir(os.path.join(directory, folder))):
+                with np.load(os.path.join(directory, folder, name)) as data:
+                    for start, open_, close in zip(data["inicio"].tolist(), data["abertura"].tolist(),
+                                                   data["fechamento"].tolist()):
+                        market.add(active, {"from": start, "to": start + 60, "open": open_, "close": close,
+                                            "min": min(open_, close), "max": max(open_, close), "volume": 0})
+        return market
+
+    @property
+    def actives(self):
+        return list(self._candles)
+
+    def candle(self, active, start):
+        """Recorded candle starting at ``start``, or the last one before it (flat market on gaps)."""
+        candles = self._candles.get(active)
+        if not candles:
+            return None
+        candle = candles.get(int(start))
+        if candle is not None:
+            return candle
+        starts = self._sorted(active)
+        idx = bisect_right(starts, start) - 1
+        if idx < 0:
+            return None
+        last = candles[starts[idx]]
+        return {"from": int(start), "to": int(start) + 60, "open": last["close"], "close": last["close"],
+                "min": last["close"], "max": last["close"], "volume": 0}
+
+    def price(self, active, timestamp):
+        start = int(timestamp) // 60 * 60
+        candle = self.candle(active, start)
+        if candle is None:
+            return None
+        weight = (timestamp - start) / 60.0
+        return candle["open"] + (candle["close"] - candle["open"]) * weight
+
+
+def record_candles(api, actives, start, end, path):
+    """Append the 1-minute candles of ``actives`` in [start, end) to a JSONL file for :class:`RecordedMarket`."""
+    with open(path, "a", encoding="utf-8") as f:
+        for active in actives:
+            end_block = end
+            while end_block > start:
+                candles = api.get_candles(active, 60, 1000, end_block) or []
+                if not candles:
+                    break
+                for candle in candles:
+                    if start <= candle["from"] < end:
+                        f.write(json.dumps(dict(candle, active=active)) + "\n")
+                first = min(candle["from"] for candle in candles)
+                if first >= end_block:
+                    break
+                end_block = first
+
+
+# ____________________________PAPER CLIENT__________________________
+
+
+class _PaperSession(object):
+    """Stands in for :class:`IQOptionAPI`: only the state read by inherited methods."""
+
+    def __init__(self, client):
+        self.order_store = client.order_store
+        self.pending_orders = {}
+
+    def __getattr__(self, name):
+        raise NotImplementedError("{} is not available in paper trading".format(name))
+
+
+class PaperIQOption(IQ_Option):
+    """Offline drop-in for :class:`IQ_Option`.
+
+    Orders are filled locally against recorded or synthetic candles and
+    settled at expiration by a background thread driven by a
+    :class:`SimulatedClock`. The balance cache, order store and order
+    tracer are fed like the real client, so ``check_win_v4``,
+    ``check_win_async``, the stop loss and the latency stats work
+    unchanged.
+
+    Implemented: connect, logout, check_connect, change_balance,
+    get_balance*, get_balances, get_profile_ansyc, get_server_timestamp,
+    get_server_offset, buy, arm_buy, fire_armed, fire_armed_batch,
+    check_win_v4, check_win_async, get_option_result, get_betinfo,
+    get_optioninfo_v2, get_candles, start/stop_candles_stream and get_realtime_candles. Other
+    methods raise NotImplementedError.
+    """
+
+    def __init__(self, email=None, password=None, active_account_type="PRACTICE",
+                 market=None, clock=None, balance=10000.0, payout=0.8, currency="USD"):
+        super(PaperIQOption, self).__init__(email, password, active_account_type)
+        self.active_account_type = active_account_type
+        self.market = market or RandomWalkMarket()
+        self.clock = clock or SimulatedClock()
+        self.payout = payout
+        self.currency = currency
+        self.api = _PaperSession(self)
+        self._amounts = {PRACTICE_BALANCE_ID: float(balance), REAL_BALANCE_ID: float(balance)}
+        self._balance_id = PRACTICE_BALANCE_ID
+        self._option_ids = count(1)
+        self._open = []  # heap of (expired, option_id)
+        self._options = {}  # option_id -> option dict
+        self._streams = {}  # (active, size) -> maxdict
+        self._lock = threading.Lock()
+        self._wakeup = threading.Event()
+        self._thread = None
+        self._connected = False
+
+    # ____________________________SESSION_____________________________
+
+    def connect(self, sms_code=None):
+        self._connected = True
+        self.change_balance(self.active_account_type)
+        self.balance_cache.seed(self.get_balances()["msg"])
+        if self._thread is None or not self._thread.is_alive():
+            self._thread = threading.Thread(target=self._run, name="paper-settlement", daemon=True)
+            self._thread.start()
+        return True, None
+
+    def logout(self):
+        self._connected = False
+        self._wakeup.set()
+
+    def close(self, timeout=5):
+        self.logout()
+        super(PaperIQOption, self).close(timeout)
+        if self._thread is not None and self._thread is not threading.current_thread():
+            self._thread.join(timeout)
+
+    def check_connect(self):
+        return self._connected
+
+    def change_balance(self, Balance_MODE):
+        if Balance_MODE not in BALANCE_TYPES:
+            logging.error("ERROR doesn't have this mode")
+            return
+        self._balance_id = REAL_BALANCE_ID if Balance_MODE == "REAL" else PRACTICE_BALANCE_ID
+
+    def get_balance_id(self):
+        return self._balance_id
+
+    def get_balance_mode(self):
+        return "REAL" if self._balance_id == REAL_BALANCE_ID else "PRACTICE"
+
+    def _balance_entry(self, max_age=None):
+        entry = self.balance_cache.get(self._balance_id)
+        if entry is None:
+            self.balance_cache.seed(self.get_balances()["msg"])
+            entry = self.balance_cache.get(self._balance_id)
+        return entry
+
+    def _balance_rows(self):
+        return [{"id": balance_id, "type": 1 if balance_id == REAL_BALANCE_ID else 4,
+                 "amount": amount, "currency": self.currency}
+                for balance_id, amount in self._amounts.items()]
+
+    def get_balances(self):
+        with self._lock:
+            return {"msg": self._balance_rows()}
+
+    def get_profile_ansyc(self):
+        with self._lock:
+            return {"balances": self._balance_rows(), "currency": self.currency}
+
+    def get_server_timestamp(self):
+        return self.clock.time()
+
+    def get_server_offset(self):
+        # the simulated clock is both the local and the server clock
+        return 0.0
+
+    def _now(self):
+        return self.clock.time()
+
+    # ____________________________MARKET______________________________
+
+    def get_all_init_v2(self):
+        actives = {str(active_id): {"enabled": True, "is_suspended": False, "name": name,
+                                    "option": {"profit": {"commission": round((1 - self.payout) * 100)}}}
+                   for name, active_id in OP_code.ACTIVES.items()}
+        return {"turbo": {"actives": actives}, "binary": {"actives": actives}}
+
+    def get_candles(self, ACTIVES, interval, count, endtime):
+        """``count`` candles of ``interval`` seconds ending before ``endtime``, built from 1-minute candles."""
+        interval = int(interval)
+        if interval % 60:
+            logging.error('**error** paper get_candles supports multiples of 60 seconds')
+            return None
+        last = int(min(endtime, self.clock.time())) // interval * interval
+        candles = []
+        for start in range(last - (count - 1) * interval, last + interval, interval):
+            parts = [self.market.candle(ACTIVES, minute) for minute in range(start, start + interval, 60)]
+            parts = [part for part in parts if part is not None]
+            if not parts:
+                continue
+            candles.append({"id": start // interval, "from": start, "at": start * 10 ** 9,
+                            "to": start + interval, "open": parts[0]["open"], "close": parts[-1]["close"],
+                            "min": min(part["min"] for part in parts), "max": max(part["max"] for part in parts),
+                            "volume": sum(part.get("volume", 0) for part in parts)})
+        return candles
+
+    def start_candles_stream(self, ACTIVE, size, maxdict):
+        sizes = self.size if size == "all" else [size]
+        for s in sizes:
+            self._streams[(ACTIVE, s)] = maxdict
+
+    def stop_candles_stream(self, ACTIVE, size):
+        sizes = self.size if size == "all" else [size]
+        for s in sizes:
+            self._streams.pop((ACTIVE, s), None)
+
+    def get_realtime_candles(self, ACTIVE, size):
+        """Last ``maxdict`` candles up to the simulated now, the current one still open."""
+        if size == "all":
+            return {s: self.get_realtime_candles(ACTIVE, s) for s in self.size if (ACTIVE, s) in self._streams}
+        maxdict = self._streams.get((ACTIVE, size))
+        if maxdict is None:
+            logging.error('**error** get_realtime_candles() size=' + str(size) + ' can not get candle')
+            return False
+        now = self.clock.time()
+        candles = self.get_candles(ACTIVE, size, maxdict, now) or []
+        if candles:
+            current = candles[-1]
+            current["close"] = self.market.price(ACTIVE, now)
+        return {candle["from"]: candle for candle in candles}
+
+    # ____________________________ORDERS______________________________
+
+    def buy(self, price, ACTIVES, ACTION, expirations):
+        order = self._build_order(price, ACTIVES, ACTION, expirations)
+        future = self._send_order(order, self._new_request_id(), 5)
+        return self._wait_order(future, 5)
+
+    def _send_order(self, order, req_id, timeout, trigger_time=None):
+        # filled locally: the answer is known as soon as the order is "written"
+        order.request_id = req_id
+        self.order_tracer.start(
+            req_id, order.active,
+            "turbo-option" if order.option_type_id == 3 else "binary-option",
+            trigger=trigger_time)
+        order.sent_at = self._now()
+        self.order_tracer.mark(req_id, "socket_write")
+        future = Future()
+        future.set_result(self._open_option(order))
+        check, option_id = future.result()
+        if check:
+            self.order_tracer.ack(req_id, option_id)
+            self.order_tracer.mark_order(option_id, "opened")
+        return future
+
+    def _open_option(self, order):
+        if not self._connected:
+            return False, "not connected"
+        entry = self.market.price(order.active, order.sent_at)
+        if entry is None:
+            return False, "no market data for {}".format(order.active)
+        with self._lock:
+            balance_id = order.balance_id
+            if self._amounts.get(balance_id, 0.0) < order.price:
+                return False, "Insufficient funds"
+            self._amounts[balance_id] -= order.price
+            amount = self._amounts[balance_id]
+            option_id = next(self._option_ids)
+            option = {"id": option_id, "active": order.active, "active_id": order.active_id,
+                      "direction": order.direction, "amount": order.price, "value": entry,
+                      "created": order.sent_at, "expired": order.expired, "balance_id": balance_id,
+                      "payout": order.payout if order.payout is not None else self.payout}
+            self._options[option_id] = option
+            heapq.heappush(self._open, (order.expired, option_id))
+        self.balance_cache.apply_balance_changed({"id": balance_id, "amount": amount, "currency": self.currency})
+        self.order_store.apply({"name": "socket-option-opened", "msg": {
+            "id": option_id, "active_id": order.active_id, "amount": order.price,
+            "direction": order.direction, "value": entry, "expired": order.expired}})
+        self._wakeup.set()
+        return True, option_id
+
+    def _run(self):
+        while self._connected:
+            with self._lock:
+                next_expired = self._open[0][0] if self._open else None
+            now = self.clock.time()
+            if next_expired is None or next_expired > now:
+                self.clock.wait(self._wakeup, None if next_expired is None else next_expired - now)
+                self._wakeup.clear()
+                continue
+            self._settle_due(now)
+
+    def _settle_due(self, now):
+        while True:
+            with self._lock:
+                if not self._open or self._open[0][0] > now:
+                    return
+                _, option_id = heapq.heappop(self._open)
+                option = self._options[option_id]
+            try:
+                self._settle(option)
+            except Exception:
+                logging.exception('**error** paper settlement of option %s', option_id)
+
+    def _settle(self, option):
+        close = self.market.price(option["active"], option["expired"])
+        if close is None or close == option["value"]:
+            win, win_amount = "equal", option["amount"]
+        elif (close > option["value"]) == (option["direction"] == "call"):
+            win, win_amount = "win", round(option["amount"] * (1 + option["payout"]), 2)
+        else:
+            win, win_amount = "loose", 0.0
+        with self._lock:
+            self._amounts[option["balance_id"]] += win_amount
+            amount = self._amounts[option["balance_id"]]
+            option.update(win=win, win_amount=win_amount, close=close)
+        self.balance_cache.apply_balance_changed(
+            {"id": option["balance_id"], "amount": amount, "currency": self.currency})
+        self.order_store.apply({"name": "socket-option-closed", "msg": {
+            "id": option["id"], "active_id": option["active_id"], "win": win,
+            "sum": option["amount"], "win_amount": win_amount, "value": close,
+            "expired": option["expired"]}})
+        self.order_tracer.mark_order(option["id"], "closed")
+
+    def get_betinfo(self, id_number):
+        option = self._options.get(id_number)
+        if option is None or "win" not in option:
+            return False, None
+        profit = option["win_amount"]
+        return True, {"result": {"data": {str(id_number): {
+            "win": option["win"], "profit": profit, "deposit": option["amount"]}}}}
+
+    def get_optioninfo_v2_async(self, limit, timeout=None):
+        with self._lock:
+            closed = [option for option in self._options.values() if "win" in option]
+        closed.sort(key=lambda option: option["expired"], reverse=True)
+        future = Future()
+        future.set_result({"name": "options", "msg": {"closed_options": [
+            {"id": [option["id"]], "active_id": option["active_id"], "win": option["win"],
+             "win_amount": option["win_amount"], "amount": option["amount"],
+             "expired": option["expired"]}
+            for option in closed[:limit]]}})
+        return future
+
+    def check_win_async(self, id_number, timeout=None, retries=3):
+        # timeouts are given in simulated seconds
+        if timeout is not None:
+            timeout = timeout / self.clock.speed
+        return super(PaperIQOption, self).check_win_async(id_number, timeout, retries)
+
+    def wait(self, seconds):
+        """Sleep ``seconds`` of simulated time."""
+        self.clock.sleep(seconds)
+
+    def __repr__(self):
+        return "PaperIQOption(balance_id={}, open={})".format(self._balance_id, len(self._open))
+
+
+def paper_from_env(email=None, password=None, active_account_type="PRACTICE"):
+    """:class:`PaperIQOption` configured by ``IQ_OPTION_PAPER_*`` environment variables.
+
+    ``IQ_OPTION_PAPER_SPEED`` (clock speed), ``IQ_OPTION_PAPER_START`` (epoch
+    of the simulated start), ``IQ_OPTION_PAPER_BALANCE``,
+    ``IQ_OPTION_PAPER_PAYOUT``, ``IQ_OPTION_PAPER_SEED`` and
+    ``IQ_OPTION_PAPER_DATA`` (a JSONL recording or a ``cache_candles``
+    directory; synthetic candles otherwise).
+    """
+    data = os.getenv("IQ_OPTION_PAPER_DATA")
+    if data and os.path.isdir(data):
+        market = RecordedMarket.from_cache(data)
+    elif data:
+        market = RecordedMarket.from_jsonl(data)
+    else:
+        market = RandomWalkMarket(seed=int(os.getenv("IQ_OPTION_PAPER_SEED", "0")))
+    start = os.getenv("IQ_OPTION_PAPER_START")
+    clock = SimulatedClock(float(os.getenv("IQ_OPTION_PAPER_SPEED", "1")), float(start) if start else None)
+    return PaperIQOption(email, password, active_account_type, market=market, clock=clock,
+                         balance=float(os.getenv("IQ_OPTION_PAPER_BALANCE", "10000")),
+                         payout=float(os.getenv("IQ_OPTION_PAPER_PAYOUT", "0.8")))
@@ -0,0 +1,180 @@
+"""
+Registro de Logs do Bot (estruturado e sem bloqueio)
+Os logs do bot (execução de sinais, operações, Stop Loss, diário) vão para o
+logger `bot` e seus filhos (`bot.sinais`, `bot.stop_loss`, ...). Quem registra
+só coloca o registro numa fila (`QueueHandler`); um `QueueListener` em
+segundo plano escreve no terminal e num arquivo JSON Lines com rotação.
+Assim o envio de ordens e o tratamento de resultados nunca esperam stdout ou
+o disco.
+
+Cada linha do arquivo é um objeto JSON com horário, nível, logger, mensagem e
+os campos passados em `extra` (ex.: `session_id`, `order_id`, `asset`).
+
+Os logs exibidos nas páginas ficam em `LogsSessao`: uma deque limitada por
+sessão (os mais recentes primeiro), sem cópias de lista a cada registro.
+
+O arquivo é de um único processo: a rotação renomeia o arquivo por baixo de
+outros escritores. Processos que rodam juntos (as contas de multi_contas.py)
+usam cada um o seu (`arquivo_do_processo`).
+
+Variáveis de ambiente:
+    IQ_OPTION_LOG_FILE      Arquivo JSON Lines (padrão logs/bot.jsonl)
+    IQ_OPTION_LOG_MAX_MB    Tamanho de cada arquivo antes da rotação (padrão 10)
+    IQ_OPTION_LOG_BACKUPS   Arquivos antigos mantidos (padrão 5)
+    IQ_OPTION_LOG_LEVEL     Nível mínimo (padrão INFO)
+"""
+
+import atexit
+import json
+import logging
+import logging.handlers
+import os
+import queue
+import re
+import sys
+import threading
+from collections import deque
+from datetime import datetime
+from typing import Any, Deque, Dict, List, Optional
+
+CURRENT_DIR = os.path.dirname(os.path.abspath(__file__))
+
+# Atributos padrão de um LogRecord (o resto veio de `extra`)
+_ATRIBUTOS_PADRAO = set(logging.LogRecord("", 0, "", 0, "", (), None).__dict__) | {"message", "asctime"}
+
+_listener: Optional[logging.handlers.QueueListener] = None
+_lock = threading.Lock()
+
+
+def arquivo_padrao() -> str:
+    """Arquivo de log configurado (IQ_OPTION_LOG_FILE ou logs/bot.jsonl)."""
+    return os.getenv("IQ_OPTION_LOG_FILE") or os.path.join(CURRENT_DIR, "logs", "bot.jsonl")
+
+
+def arquivo_do_processo(nome: str) -> str:
+    """Arquivo próprio de um processo, ao lado do padrão (ex.: logs/bot.conta1.jsonl)."""
+    raiz, extensao = os.path.splitext(arquivo_padrao())
+    return raiz + "." + re.sub(r"[^\w.-]", "_", nome) + extensao
+
+
+class FormatadorJSON(logging.Formatter):
+    """Um objeto JSON por linha com os campos de `extra`."""
+
+    def format(self, record: logging.LogRecord) -> str:
+        dados: Dict[str, Any] = {
+            "timestamp": datetime.fromtimestamp(record.created).isoformat(),
+            "level": record.levelname,
+            "logger": record.name,
+            "message": record.getMessage(),
+        }
+        for chave, valor in record.__dict__.items():
+            if chave not in _ATRIBUTOS_PADRAO and not chave.startswith("_"):
+                dados[chave] = valor
+        if record.exc_info:
+            dados["exception"] = self.formatException(record.exc_info)
+        elif record.exc_text:
+            dados["exception"] = record.exc_text
+        return json.dumps(dados, ensure_ascii=False, default=str)
+
+
+def configurar_logs(arquivo: Optional[str] = None, console: bool = True) -> logging.Logger:
+    """
+    Liga o logger `bot` à fila e inicia o escritor em segundo plano (uma vez por processo).
+
+    Args:
+        arquivo: Arquivo JSON Lines (padrão IQ_OPTION_LOG_FILE ou logs/bot.jsonl)
+        console: Também escrever no terminal (texto)
+
+    Returns:
+        O logger `bot`
+    """
+    global _listener
+    logger = logging.getLogger("bot")
+    with _lock:
+        if _listener is not None:
+            return logger
+
+        arquivo = arquivo or arquivo_padrao()
+        os.makedirs(os.path.dirname(os.path.abspath(arquivo)), exist_ok=True)
+        try:
+            max_bytes = int(float(os.getenv("IQ_OPTION_LOG_MAX_MB", "10")) * 1024 * 1024)
+            backups = int(os.getenv("IQ_OPTION_LOG_BACKUPS", "5"))
+        except ValueError:
+            max_bytes, backups = 10 * 1024 * 1024, 5
+
+        # delay=True: processos que nunca registram nada (workers do gunicorn) não abrem o arquivo
+        arquivo_handler = logging.handlers.RotatingFileHandler(
+            arquivo, maxBytes=max_bytes, backupCount=backups, encoding="utf-8", delay=True
+        )
+        arquivo_handler.setFormatter(FormatadorJSON())
+        handlers: List[logging.Handler] = [arquivo_handler]
+        if console:
+            console_handler = logging.StreamHandler(sys.stdout)
+            console_handler.setFormatter(logging.Formatter("%(asctime)s [%(name)s] %(levelname)s %(message)s"))
+            handlers.append(console_handler)
+
+        fila: "queue.SimpleQueue[logging.LogRecord]" = queue.SimpleQueue()
+        logger.handlers = [logging.handlers.QueueHandler(fila)]
+        logger.setLevel(os.getenv("IQ_OPTION_LOG_LEVEL", "INFO").upper())
+        logger.propagate = False
+
+        _listener = logging.handlers.QueueListener(fila, *handlers, respect_handler_level=True)
+        _listener.start()
+        atexit.register(encerrar_logs)
+    return logger
+
+
+def encerrar_logs() -> None:
+    """Escreve os registros pendentes e para o escritor."""
+    global _listener
+    with _lock:
+        listener, _listener = _listener, None
+    if listener is not None:
+        listener.stop()
+        for handler in listener.handlers:
+            handler.close()
+
+
+class LogsSessao:
+    """Últimos logs de cada sessão para as páginas (deques limitadas, mais recentes primeiro)."""
+
+    def __init__(self, logger: logging.Logger, limite: int = 100) -> None:
+        self.logger = logger
+        self.limite = limite
+        self._logs: Dict[str, Deque[Dict[str, Any]]] = {}
+
+    def adicionar(self, session_id: str, message: str, log_type: str = "info", **campos: Any) -> Dict[str, Any]:
+        """
+        Guarda o log da sessão e o envia ao logger (não bloqueia).
+
+        Args:
+            session_id: ID da sessão
+            message: Mensagem do log
+            log_type: Tipo do log ('info', 'success', 'warning', 'error')
+            **campos: Campos estruturados do registro JSON (ex.: order_id, asset)
+
+        Returns:
+            A entrada exibida na página ({'timestamp', 'message', 'type'})
+        """
+        entrada = {
+            "timestamp": datetime.now().isoformat(),
+            "message": message,
+            "type": log_type,
+        }
+        logs = self._logs.get(session_id)
+        if logs is None:
+            logs = self._logs.setdefault(session_id, deque(maxlen=self.limite))
+        logs.appendleft(entrada)
+
+        nivel = {"warning": logging.WARNING, "error": logging.ERROR}.get(log_type, logging.INFO)
+        self.logger.log(nivel, message, extra={"session_id": session_id, "tipo": log_type, **campos})
+        return entrada
+
+    def listar(self, session_id: str) -> List[Dict[str, Any]]:
+        return list(self._logs.get(session_id, ()))
+
+    def remover(self, session_id: str) -> None:
+        self._logs.pop(session_id, None)
+
+    def __len__(self) -> int:
+        return len(self._logs)
@@ -0,0 +1,257 @@
+"""
+Agendador de Sinais
+Mantém os sinais em um min-heap ordenado pelo instante de disparo (horário do
+servidor) e dorme exatamente até o próximo evento, em vez de acordar a cada
+100 ms para varrer a lista inteira.
+
+Cada evento agrupa todos os sinais do mesmo instante, que são armados juntos
+`antecedencia` segundos antes e disparados juntos no instante alvo. O instante
+de um sinal é a sua hora (HH:MM ou HH:MM:SS) mais um deslocamento opcional em
+segundos (ex: -1 para disparar um segundo antes da virada do minuto). Sinais
+com data disparam só naquele dia; os demais, na próxima ocorrência da hora,
+e são reagendados para o dia seguinte a cada disparo.
+"""
+
+import heapq
+import itertools
+import threading
+import time
+from dataclasses import dataclass, field
+from datetime import datetime, timedelta
+from typing import Any, Callable, Dict, Iterable, List, Optional
+
+
+class RelogioLocal:
+    """Relógio do agendador: horário local e espera em tempo real."""
+
+    @staticmethod
+    def time() -> float:
+        return time.time()
+
+    @staticmethod
+    def wait(evento: threading.Event, timeout: Optional[float]) -> bool:
+        return evento.wait(timeout)
+
+
+def chave_padrao(sinal) -> Any:
+    """Identidade de um sinal entre recargas do arquivo."""
+    return (sinal.linha_original, str(sinal))
+
+
+@dataclass(order=True)
+class EventoSinais:
+    """Sinais que disparam no mesmo instante."""
+    instante: float  # epoch no horário do servidor
+    seq: int
+    sinais: List[Any] = field(default_factory=list, compare=False)
+    preparados: Dict[Any, Any] = field(default_factory=dict, compare=False)  # chave do sinal -> ordem armada
+    armado: bool = field(default=False, compare=False)
+
+    @property
+    def hora(self) -> str:
+        return datetime.fromtimestamp(self.instante).strftime("%H:%M:%S")
+
+
+class AgendadorSinais:
+    """
+    Agenda sinais por instante absoluto e chama os callbacks no momento certo.
+
+    Callbacks (executados no thread que chamou `executar`):
+        ao_armar(evento, alvo_local): prepara os sinais; pode preencher `evento.preparados`
+        ao_disparar(evento, alvo_local): envia as ordens do evento
+        ao_perder(evento, atraso): evento que passou da tolerância sem ser disparado
+    """
+
+    def __init__(
+        self,
+        ao_armar: Optional[Callable[[EventoSinais, float], None]],
+        ao_disparar: Callable[[EventoSinais, float], None],
+        *,
+        antecedencia: float = 10.0,
+        deslocamento: float = 0.0,
+        tolerancia: float = 2.0,
+        offset_servidor: Optional[Callable[[], float]] = None,
+        chave: Callable[[Any], Any] = chave_padrao,
+        ao_perder: Optional[Callable[[EventoSinais, float], None]] = None,
+        relogio: Optional[Any] = None,
+    ):
+        """
+        Args:
+            ao_armar: Callback de armação (None para não armar antecipadamente)
+            ao_disparar: Callback de disparo
+            antecedencia: Segundos antes do instante em que os sinais são armados
+            deslocamento: Segundos somados ao instante de todos os sinais
+            tolerancia: Atraso máximo (s) para ainda disparar um evento que já passou
+            offset_servidor: Função que retorna (horário do servidor - horário local) em segundos
+            chave: Identidade de um sinal (evita disparo duplicado após recarga)
+            ao_perder: Callback para eventos atrasados além da tolerância
+            relogio: Objeto com `time()` e `wait(evento, timeout)` (padrão: relógio local;
+                um relógio simulado acelera a execução, ex: PaperIQOption.clock)
+        """
+        self.ao_armar = ao_armar
+        self.ao_disparar = ao_disparar
+        self.antecedencia = float(antecedencia)
+        self.deslocamento = float(deslocamento)
+        self.tolerancia = float(tolerancia)
+        self.offset_servidor = offset_servidor or (lambda: 0.0)
+        self.chave = chave
+        self.ao_perder = ao_perder
+        self.relogio = relogio or RelogioLocal()
+
+        self._heap: List[EventoSinais] = []
+        self._seq = itertools.count()
+        self._disparados: Dict[Any, float] = {}  # (instante, chave) -> instante
+        self._lock = threading.Lock()
+        self._acordar = threading.Event()
+        self._parado = False
+
+    # ------------------------------------------------------------------
+    # Carga dos sinais
+    # ------------------------------------------------------------------
+
+    def instante_do_sinal(self, sinal, agora_servidor: Optional[float] = None) -> float:
+        """
+        Próxima ocorrência (epoch do servidor) da hora do sinal mais o deslocamento.
+
+        Sinais datados (`sinal.data`) ocorrem só naquele dia, mesmo que já tenha passado.
+        """
+        if agora_servidor is None:
+            agora_servidor = self.relogio.time() + self.offset_servidor()
+        partes = [int(p) for p in sinal.hora.split(':')]
+        h, m = partes[0], partes[1]
+        s = partes[2] if len(partes) > 2 else 0
+        data = getattr(sinal, 'data', None)
+        if data is not None:
+            return datetime(data.year, data.month, data.day, h, m, s).timestamp() + self.deslocamento
+        base = datetime.fromtimestamp(agora_servidor).replace(hour=h, minute=m, second=s, microsecond=0)
+        instante = base.timestamp() + self.deslocamento
+        if instante < agora_servidor - self.tolerancia:
+            instante = (base + timedelta(days=1)).timestamp() + self.deslocamento
+        return instante
+
+    def carregar(self, sinais: Iterable[Any]) -> int:
+        """
+        (Re)constrói o heap a partir da lista de sinais.
+
+        Eventos já armados mantêm as ordens preparadas dos sinais que continuam
+        no arquivo; sinais já disparados não são disparados de novo.
+
+        Returns:
+            int: Quantidade de eventos agendados
+        """
+        agora_servidor = self.relogio.time() + self.offset_servidor()
+        por_instante: Dict[float, EventoSinais] = {}
+        with self._lock:
+            antigos = {evento.instante: evento for evento in self._heap}
+            for sinal in sinais:
+                instante = self.instante_do_sinal(sinal, agora_servidor)
+                if instante < agora_servidor - self.tolerancia:
+                    continue  # sinal datado de um dia que já passou
+                if (instante, self.chave(sinal)) in self._disparados:
+                    continue
+                evento = por_instante.get(instante)
+                if evento is None:
+                    evento = por_instante[instante] = EventoSinais(instante, next(self._seq))
+                    antigo = antigos.get(instante)
+                    if antigo is not None:
+                        evento.armado = antigo.armado
+                        evento.preparados = antigo.preparados
+                evento.sinais.append(sinal)
+            for evento in por_instante.values():
+                chaves = {self.chave(s) for s in evento.sinais}
+                evento.preparados = {k: v for k, v in evento.preparados.items() if k in chaves}
+            self._heap = list(por_instante.values())
+            heapq.heapify(self._heap)
+            # Esquecer disparos antigos
+            limite = agora_servidor - 120
+            self._disparados = {k: v for k, v in self._disparados.items() if v >= limite}
+        self._acordar.set()
+        return len(self._heap)
+
+    def _reagendar_diarios(self, evento: EventoSinais):
+        """Reagenda para o dia seguinte os sinais sem data do evento (chamar com o lock)."""
+        # Um instante depois da tolerância, a próxima ocorrência da hora já é amanhã
+        depois = evento.instante + self.tolerancia + 1
+        existentes = {e.instante: e for e in self._heap}
+        for sinal in evento.sinais:
+            if getattr(sinal, 'data', None) is not None:
+                continue
+            instante = self.instante_do_sinal(sinal, depois)
+            novo = existentes.get(instante)
+            if novo is None:
+                novo = existentes[instante] = EventoSinais(instante, next(self._seq))
+                heapq.heappush(self._heap, novo)
+            chave = self.chave(sinal)
+            if all(self.chave(s) != chave for s in novo.sinais):
+                novo.sinais.append(sinal)
+
+    def proximos(self, quantidade: int = 1) -> List[EventoSinais]:
+        """Próximos eventos, em ordem de disparo."""
+        with self._lock:
+            return heapq.nsmallest(quantidade, self._heap)
+
+    def __len__(self) -> int:
+        return len(self._heap)
+
+    # ------------------------------------------------------------------
+    # Execução
+    # ------------------------------------------------------------------
+
+    def parar(self):
+        self._parado = True
+        self._acordar.set()
+
+    @property
+    def parado(self) -> bool:
+        return self._parado
+
+    def executar(
+        self,
+        recarregar: Optional[Callable[[], Optional[Iterable[Any]]]] = None,
+        intervalo_recarga: float = 60.0,
+    ):
+        """
+        Laço principal: dorme até o próximo evento (ou recarga) e dispara.
+
+        Args:
+            recarregar: Função que retorna a nova lista de sinais (None = sem mudança)
+            intervalo_recarga: Segundos entre chamadas de `recarregar`
+        """
+        proxima_recarga = self.relogio.time() + intervalo_recarga
+        while not self._parado:
+            agora = self.relogio.time()
+            if recarregar is not None and agora >= proxima_recarga:
+                sinais = recarregar()
+                if sinais is not None:
+                    self.carregar(sinais)
+                proxima_recarga = agora + intervalo_recarga
+                continue
+
+            with self._lock:
+                evento = self._heap[0] if self._heap else None
+
+            espera = proxima_recarga - agora if recarregar is not None else None
+            if evento is not None:
+                alvo_local = evento.instante - self.offset_servidor()
+                if agora >= alvo_local:
+                    with self._lock:
+                        if self._heap and self._heap[0] is evento:
+                            heapq.heappop(self._heap)
+                        for sinal in evento.sinais:
+                            self._disparados[(evento.instante, self.chave(sinal))] = evento.instante
+                        self._reagendar_diarios(evento)
+                    if agora - alvo_local <= self.tolerancia:
+                        self.ao_disparar(evento, alvo_local)
+                    elif self.ao_perder is not None:
+                        self.ao_perder(evento, agora - alvo_local)
+                    continue
+                if not evento.armado and agora >= alvo_local - self.antecedencia:
+                    evento.armado = True
+                    if self.ao_armar is not None:
+                        self.ao_armar(evento, alvo_local)
+                    continue
+                proximo = alvo_local if evento.armado else alvo_local - self.antecedencia
+                espera = proximo - agora if espera is None else min(espera, proximo - agora)
+
+            self.relogio.wait(self._acordar, espera)
+            self._acordar.clear()
@@ -5,35 +5,378 @@ Lê e processa sinais do arquivo sinais.txt
 Formato esperado (4 campos separados por ponto e vírgula):
 TIMEFRAME;ATIVO;HORA;DIREÇÃO
 
+Ou, para pacotes de vários dias, com a data na primeira coluna:
+DATA;TIMEFRAME;ATIVO;HORA;DIREÇÃO
+
 Exemplo:
 M1;EURUSD-OTC;19:00;CALL
 M5;EURUSD;14:30;PUT
+2024-05-20;M1;GBPUSD;09:15:30;PUT
+
+A hora também aceita segundos (HH:MM:SS) para disparos fora da virada do minuto.
+A data aceita AAAA-MM-DD ou DD/MM/AAAA; sinais sem data valem para todos os dias.
+
+O arquivo é relido só quando muda e apenas as linhas alteradas são validadas
+de novo; use `obter_processador` para compartilhar a mesma instância.
+Pacotes grandes podem ser validados em uma passada com `importar_sinais`,
+que lê linha a linha e devolve um relatório estruturado de erros.
 """
 
+import bisect
+import gc
+import heapq
+import itertools
 import os
-from datetime import datetime
-from typing import List, Dict, Optional
-from dataclasses import dataclass
+import sys
+import tempfile
+import threading
+import time
+from contextlib import contextmanager
+from dataclasses import dataclass, field
+from datetime import date, datetime
+from functools import lru_cache
+from typing import Any, Dict, Iterable, Iterator, List, Optional, Tuple, Union
 
 
-@dataclass
 class Sinal:
-    """Representa um sinal de trading."""
-    timeframe: str  # Ex: M1, M5, M15
-    ativo: str      # Ex: EURUSD, EURUSD-OTC
-    hora: str      # Ex: 19:00
-    direcao: str    # PUT ou CALL
-    linha_original: int  # Número da linha no arquivo (para debug)
+    """
+    Representa um sinal de trading.
+    
+    Usa `__slots__`; o parser reaproveita as mesmas strings de ativo,
+    timeframe, hora e direção entre sinais (pacotes com milhões de sinais
+    repetem poucos valores).
+    """
+    __slots__ = ('timeframe', 'ativo', 'hora', 'direcao', 'linha_original', 'data')
+    
+    def __init__(self, timeframe: str, ativo: str, hora: str, direcao: str,
+                 linha_original: int, data: Optional[date] = None):
+        self.timeframe = timeframe  # Ex: M1, M5, M15
+        self.ativo = ativo          # Ex: EURUSD, EURUSD-OTC
+        self.hora = hora            # Ex: 19:00 ou 19:00:30
+        self.direcao = direcao      # PUT ou CALL
+        self.linha_original = linha_original    # Número da linha no arquivo (para debug)
+        self.data = data                        # Dia do sinal (None = todos os dias)
+    
+    def _campos(self) -> tuple:
+        return (self.timeframe, self.ativo, self.hora, self.direcao, self.linha_original, self.data)
+    
+    def __eq__(self, other):
+        if other.__class__ is not self.__class__:
+            return NotImplemented
+        return self._campos() == other._campos()
+    
+    def __hash__(self):
+        return hash(self._campos())
     
     def __str__(self):
-        return f"{self.timeframe};{self.ativo};{self.hora};{self.direcao}"
+        texto = f"{self.timeframe};{self.ativo};{self.hora};{self.direcao}"
+        if self.data is not None:
+            return f"{self.data.isoformat()};{texto}"
+        return texto
     
     def __repr__(self):
         return f"Sinal(line={self.linha_original}, {self})"
+    
+    @property
+    def minuto(self) -> str:
+        """Hora normalizada em HH:MM (chave do índice por minuto)."""
+        return self.hora[:5]
+    
+    @property
+    def hora_completa(self) -> str:
+        """Hora normalizada em HH:MM:SS (ordenação)."""
+        return self.hora if len(self.hora) == 8 else self.hora + ':00'
+
+
+class ErroSinal:
+    """Erro de validação de uma linha do arquivo de sinais."""
+    __slots__ = ('linha', 'campo', 'mensagem', 'conteudo')
+    
+    def __init__(self, linha: int, campo: str, mensagem: str, conteudo: str):
+        self.linha = linha          # Número da linha no arquivo
+        self.campo = campo          # formato, data, timeframe, ativo, hora ou direcao
+        self.mensagem = mensagem    # Mensagem completa (a mesma de `get_erros`)
+        self.conteudo = conteudo    # Linha recebida
+    
+    def __str__(self):
+        return self.mensagem
+    
+    def __repr__(self):
+        return f"ErroSinal(line={self.linha}, {self.campo})"
+    
+    def to_dict(self) -> Dict[str, Any]:
+        return {'linha': self.linha, 'campo': self.campo, 'mensagem': self.mensagem, 'conteudo': self.conteudo}
+
+
+@contextmanager
+def _gc_pausado():
+    """
+    Pausa o coletor de ciclos durante cargas em lote.
+    
+    Sinais não formam ciclos; com milhões de objetos novos o coletor
+    rodaria várias coleções completas sem liberar nada.
+    """
+    ativo = gc.isenabled()
+    gc.disable()
+    try:
+        yield
+    finally:
+        if ativo:
+            gc.enable()
+
+
+# ----------------------------------------------------------------------
+# Validação de campos (cacheada: os valores se repetem muito nos pacotes)
+# ----------------------------------------------------------------------
+
+@lru_cache(maxsize=131072)  # cobre todas as horas HH:MM:SS de um dia
+def _normalizar_hora(hora: str) -> Optional[str]:
+    """HH:MM ou HH:MM:SS com zeros à esquerda, ou None se inválida."""
+    partes = hora.split(':')
+    if len(partes) not in (2, 3):
+        return None
+    try:
+        h, m = int(partes[0]), int(partes[1])
+        s = int(partes[2]) if len(partes) == 3 else 0
+    except ValueError:
+        return None
+    if h < 0 or h > 23 or m < 0 or m > 59 or s < 0 or s > 59:
+        return None
+    if len(partes) == 3:
+        return sys.intern(f"{h:02d}:{m:02d}:{s:02d}")
+    return sys.intern(f"{h:02d}:{m:02d}")
+
+
+@lru_cache(maxsize=131072)
+def _segundos_do_dia(hora: str) -> int:
+    """Segundos desde 00:00 de uma hora já normalizada."""
+    partes = hora.split(':')
+    return int(partes[0]) * 3600 + int(partes[1]) * 60 + (int(partes[2]) if len(partes) == 3 else 0)
+
+
+@lru_cache(maxsize=1024)
+def _normalizar_data(texto: str) -> Optional[date]:
+    for formato in ('%Y-%m-%d', '%d/%m/%Y'):
+        try:
+            return datetime.strptime(texto, formato).date()
+        except ValueError:
+            pass
+    return None
+
+
+@lru_cache(maxsize=256)
+def _normalizar_timeframe(timeframe: str) -> Tuple[Optional[str], Optional[str]]:
+    """(timeframe em maiúsculas, None) ou (None, motivo de ser inválido)."""
+    # Validar timeframe (deve começar com M e ter número)
+    if not timeframe.upper().startswith('M'):
+        return None, f"Timeframe invalido '{timeframe}'. Deve começar com 'M' (ex: M1, M5, M15)"
+    try:
+        if int(timeframe.upper()[1:]) <= 0:
+            return None, f"Timeframe invalido '{timeframe}'. Numero deve ser maior que 0"
+    except ValueError:
+        return None, f"Timeframe invalido '{timeframe}'. Formato deve ser M<numero>"
+    return sys.intern(timeframe.upper()), None
+
+
+@lru_cache(maxsize=4096)
+def _normalizar_ativo(ativo: str) -> str:
+    return sys.intern(ativo.upper())
+
+
+_DIRECOES = {'PUT': 'PUT', 'CALL': 'CALL'}
+
+
+def interpretar_linha(linha: str, num_linha: int,
+                      ativos_validos: Optional[Iterable[str]] = None) -> Tuple[Optional[Sinal], Optional[ErroSinal]]:
+    """
+    Valida uma linha (já sem espaços nas pontas, não vazia e não comentário).
+    
+    Args:
+        linha: Conteúdo da linha
+        num_linha: Número da linha no arquivo
+        ativos_validos: Nomes de ativos do catálogo (em maiúsculas); None = não verificar
+        
+    Returns:
+        Tuple[Sinal, ErroSinal]: (sinal, None) se válida, (None, erro) caso contrário
+    """
+    # Validar formato
+    campos = linha.split(';')
+    if ' ' in linha or '\t' in linha:
+        campos = [campo.strip() for campo in campos]
+    if len(campos) == 4:
+        data_texto = None
+        timeframe, ativo, hora, direcao = campos
+    elif len(campos) == 5:
+        data_texto, timeframe, ativo, hora, direcao = campos
+    else:
+        return None, ErroSinal(num_linha, 'formato',
+                               f"Linha {num_linha}: Formato invalido. "
+                               f"Esperado: TIMEFRAME;ATIVO;HORA;DIREÇÃO ou DATA;TIMEFRAME;ATIVO;HORA;DIREÇÃO. "
+                               f"Recebido: {linha}", linha)
+    
+    data = None
+    if data_texto is not None:
+        data = _normalizar_data(data_texto)
+        if data is None:
+            return None, ErroSinal(num_linha, 'data',
+                                   f"Linha {num_linha}: Data invalida '{data_texto}'. "
+                                   f"Formato esperado: AAAA-MM-DD ou DD/MM/AAAA", linha)
+    
+    timeframe, motivo = _normalizar_timeframe(timeframe)
+    if motivo:
+        return None, ErroSinal(num_linha, 'timeframe', f"Linha {num_linha}: {motivo}", linha)
+    
+    # Validar ativo (não pode estar vazio nem fora do catálogo)
+    if not ativo:
+        return None, ErroSinal(num_linha, 'ativo', f"Linha {num_linha}: Ativo nao pode estar vazio", linha)
+    ativo = _normalizar_ativo(ativo)
+    if ativos_validos is not None and ativo not in ativos_validos:
+        return None, ErroSinal(num_linha, 'ativo',
+                               f"Linha {num_linha}: Ativo '{ativo}' nao encontrado no catalogo", linha)
+    
+    # Validar hora (formato HH:MM ou HH:MM:SS)
+    hora_normalizada = _normalizar_hora(hora)
+    if hora_normalizada is None:
+        return None, ErroSinal(num_linha, 'hora',
+                               f"Linha {num_linha}: Hora invalida '{hora}'. "
+                               f"Formato esperado: HH:MM ou HH:MM:SS (ex: 19:00)", linha)
+    
+    # Validar direção
+    direcao_normalizada = _DIRECOES.get(direcao.upper())
+    if direcao_normalizada is None:
+        return None, ErroSinal(num_linha, 'direcao',
+                               f"Linha {num_linha}: Direcao invalida '{direcao.upper()}'. Deve ser 'PUT' ou 'CALL'", linha)
+    
+    return Sinal(timeframe, ativo, hora_normalizada, direcao_normalizada, num_linha, data), None
+
+
+# ----------------------------------------------------------------------
+# Importação em streaming
+# ----------------------------------------------------------------------
+
+@dataclass
+class RelatorioImportacao:
+    """Resultado de uma validação/importação em lote."""
+    sinais: List[Sinal] = field(default_factory=list)
+    erros: List[ErroSinal] = field(default_factory=list)  # até `limite_erros`
+    total_linhas: int = 0
+    ignoradas: int = 0  # vazias e comentários
+    total_erros: int = 0  # inclui os que passaram de `limite_erros`
+    erros_por_campo: Dict[str, int] = field(default_factory=dict)
+    datas: int = 0  # dias distintos entre os sinais datados
+    duracao: float = 0.0  # segundos
+    
+    @property
+    def validos(self) -> int:
+        return self.total_linhas - self.ignoradas - self.total_erros
+    
+    def to_dict(self, limite_erros: int = 100) -> Dict[str, Any]:
+        return {
+            'total_linhas': self.total_linhas,
+            'validos': self.validos,
+            'ignoradas': self.ignoradas,
+            'total_erros': self.total_erros,
+            'erros_por_campo': dict(self.erros_por_campo),
+            'datas': self.datas,
+            'duracao': round(self.duracao, 3),
+            'erros': [erro.to_dict() for erro in self.erros[:limite_erros]],
+        }
+
+
+def iterar_sinais(origem: Union[str, os.PathLike, Iterable[str]],
+                  ativos_validos: Optional[Iterable[str]] = None,
+                  relatorio: Optional[RelatorioImportacao] = None,
+                  limite_erros: int = 1000) -> Iterator[Sinal]:
+    """
+    Lê e valida sinais linha a linha, sem carregar o arquivo inteiro.
+    
+    Args:
+        origem: Caminho do arquivo ou iterável de linhas (ex: arquivo aberto)
+        ativos_validos: Catálogo de ativos; None = não verificar
+        relatorio: Recebe contagens e erros (opcional)
+        limite_erros: Máximo de erros guardados no relatório
+        
+    Yields:
+        Sinal: Cada sinal válido, na ordem do arquivo
+    """
+    if isinstance(origem, (str, os.PathLike)):
+        with open(origem, 'r', encoding='utf-8') as f:
+            yield from iterar_sinais(f, ativos_validos, relatorio, limite_erros)
+        return
+    
+    if relatorio is None:
+        relatorio = RelatorioImportacao()
+    catalogo = frozenset(a.upper() for a in ativos_validos) if ativos_validos is not None else None
+    datas = set()
+    
+    for num_linha, linha in enumerate(origem, start=1):
+        linha = linha.strip()
+        relatorio.total_linhas = num_linha
+        
+        # Ignorar linhas vazias e comentários
+        if not linha or linha[0] == '#':
+            relatorio.ignoradas += 1
+            continue
+        
+        sinal, erro = interpretar_linha(linha, num_linha, catalogo)
+        if erro is not None:
+            relatorio.total_erros += 1
+            relatorio.erros_por_campo[erro.campo] = relatorio.erros_por_campo.get(erro.campo, 0) + 1
+            if len(relatorio.erros) < limite_erros:
+                relatorio.erros.append(erro)
+            continue
+        
+        if sinal.data is not None:
+            datas.add(sinal.data)
+            relatorio.datas = len(datas)
+        yield sinal
+
+
+def importar_sinais(origem: Union[str, os.PathLike, Iterable[str]],
+                    ativos_validos: Optional[Iterable[str]] = None,
+                    limite_erros: int = 1000) -> RelatorioImportacao:
+    """
+    Valida um pacote de sinais em uma única passada.
+    
+    Returns:
+        RelatorioImportacao: Sinais válidos e relatório de erros
+    """
+    relatorio = RelatorioImportacao()
+    inicio = time.perf_counter()
+    with _gc_pausado():
+        relatorio.sinais = list(iterar_sinais(origem, ativos_validos, relatorio, limite_erros))
+    relatorio.duracao = time.perf_counter() - inicio
+    return relatorio
+
+
+def _primeiro(par):
+    return par[0]
+
+
+def _chaves_sinal(sinal: Sinal) -> Tuple[int, int]:
+    """
+    (chave do índice por minuto, chave de ordenação) de um sinal.
+    
+    Sem data: minuto/segundo do dia. Com data: contados desde o dia 1 do
+    calendário (`date.toordinal`), sempre maiores que os sem data.
+    """
+    segundos = _segundos_do_dia(sinal.hora)
+    if sinal.data is None:
+        return segundos // 60, segundos
+    dia = sinal.data.toordinal()
+    return dia * 1440 + segundos // 60, dia * 86400 + segundos
 
 
 class SinaisProcessor:
-    """Processa arquivo de sinais e valida os dados."""
+    """
+    Processa arquivo de sinais e valida os dados.
+    
+    O arquivo só é relido quando muda (mtime/tamanho) e, ao reler, apenas as
+    linhas novas ou alteradas são validadas de novo. Os sinais ficam
+    indexados por minuto e por ativo; adicionar/remover editam a lista em
+    memória e regravam o arquivo de forma atômica. `versao` é incrementada a
+    cada mudança, para quem precisa saber se deve reagendar.
+    """
     
     def __init__(self, arquivo_sinais: str = "sinais.txt"):
         """
@@ -45,102 +388,264 @@ class SinaisProcessor:
         self.arquivo_sinais = arquivo_sinais
         self.sinais: List[Sinal] = []
         self.erros: List[str] = []
+        self.versao = 0
+        
+        self._linhas: List[str] = []  # conteúdo do arquivo, linha a linha (sem '\n')
+        self._indices_sinais: List[int] = []  # índice em _linhas de cada sinal válido
+        self._cache_linhas: Dict[str, Sinal] = {}  # texto da linha -> sinal já validado
+        self._assinatura: Optional[Tuple[int, int]] = None  # (mtime_ns, tamanho) da última leitura
+        self._por_minuto: Dict[int, List[Sinal]] = {}  # chave de `_chaves_sinal`
+        self._por_ativo: Dict[str, List[Sinal]] = {}
+        # Ordenados por hora: sinais de todos os dias e sinais datados, separadamente
+        self._sem_data: List[Sinal] = []
+        self._chaves_sem_data: List[int] = []
+        self._com_data: List[Sinal] = []
+        self._chaves_com_data: List[int] = []
+        self._lock = threading.RLock()
+    
+    # ------------------------------------------------------------------
+    # Leitura
+    # ------------------------------------------------------------------
     
-    def carregar_sinais(self) -> bool:
+    def _assinatura_arquivo(self) -> Optional[Tuple[int, int]]:
+        try:
+            st = os.stat(self.arquivo_sinais)
+        except OSError:
+            return None
+        return (st.st_mtime_ns, st.st_size)
+    
+    def arquivo_mudou(self) -> bool:
+        """True se o arquivo mudou desde a última leitura (só um stat)."""
+        return self._assinatura_arquivo() != self._assinatura
+    
+    def carregar_sinais(self, forcar: bool = False) -> bool:
         """
-        Carrega e valida sinais do arquivo.
+        Carrega e valida sinais do arquivo (se ele mudou desde a última leitura).
+        
+        Args:
+            forcar: Reler mesmo que o arquivo não tenha mudado
         
         Returns:
             bool: True se carregou com sucesso, False caso contrário
         """
-        self.sinais = []
-        self.erros = []
-        
-        if not os.path.exists(self.arquivo_sinais):
-            self.erros.append(f"Arquivo '{self.arquivo_sinais}' nao encontrado!")
-            return False
-        
-        try:
-            with open(self.arquivo_sinais, 'r', encoding='utf-8') as f:
-                linhas = f.readlines()
-        except Exception as e:
-            self.erros.append(f"Erro ao ler arquivo: {e}")
-            return False
+        with self._lock:
+            assinatura = self._assinatura_arquivo()
+            if assinatura is None:
+                self._limpar()
+                self.erros = [f"Arquivo '{self.arquivo_sinais}' nao encontrado!"]
+                return False
+            
+            if forcar or assinatura != self._assinatura:
+                try:
+                    with open(self.arquivo_sinais, 'r', encoding='utf-8') as f:
+                        linhas = f.read().splitlines()
+                except Exception as e:
+                    self.erros = [f"Erro ao ler arquivo: {e}"]
+                    return False
+                self._assinatura = assinatura
+                anteriores = len(self._linhas)
+                if (not forcar and anteriores and len(linhas) > anteriores
+                        and linhas[:anteriores] == self._linhas):
+                    # Só linhas novas no final (caso comum): valida e indexa apenas elas
+                    self._acrescentar_linhas(linhas, anteriores)
+                elif forcar or linhas != self._linhas:
+                    self._processar_linhas(linhas)
+            
+            return len(self.sinais) > 0 or len(self.erros) == 0
+    
+    def _limpar(self):
+        if self._assinatura is not None or self.sinais:
+            self._assinatura = None
+            self._processar_linhas([])
+    
+    def _processar_linhas_sem_gc(self, linhas: List[str]):
+        """Valida as linhas, reaproveitando as que já estavam no arquivo."""
+        cache = self._cache_linhas
+        novo_cache: Dict[str, Sinal] = {}
+        sinais: List[Sinal] = []
+        indices: List[int] = []
+        erros: List[str] = []
         
-        # Processar cada linha
-        for num_linha, linha in enumerate(linhas, start=1):
-            linha = linha.strip()
+        for indice, bruta in enumerate(linhas):
+            num_linha = indice + 1
+            linha = bruta.strip()
             
             # Ignorar linhas vazias e comentários
-            if not linha or linha.startswith('#'):
-                continue
-            
-            # Validar formato
-            campos = linha.split(';')
-            if len(campos) != 4:
-                self.erros.append(f"Linha {num_linha}: Formato invalido. "
-                                 f"Esperado: TIMEFRAME;ATIVO;HORA;DIREÇÃO. "
-                                 f"Recebido: {linha}")
+            if not linha or linha[0] == '#':
                 continue
             
-            timeframe, ativo, hora, direcao = [campo.strip() for campo in campos]
-            
-            # Validar campos
-            erro_validacao = self._validar_sinal(timeframe, ativo, hora, direcao, num_linha)
-            if erro_validacao:
-                self.erros.append(erro_validacao)
-                continue
+            sinal = cache.get(linha)
+            if sinal is None:
+                sinal, erro = interpretar_linha(linha, num_linha)
+                if erro:
+                    erros.append(erro.mensagem)
+                    continue
+            elif sinal.linha_original != num_linha:
+                # Linha inalterada que mudou de posição: não validar de novo
+                sinal = Sinal(sinal.timeframe, sinal.ativo, sinal.hora, sinal.direcao, num_linha, sinal.data)
             
-            # Criar sinal válido
-            sinal = Sinal(
-                timeframe=timeframe.upper(),
-                ativo=ativo.upper(),
-                hora=hora,
-                direcao=direcao.upper(),
-                linha_original=num_linha
-            )
-            self.sinais.append(sinal)
+            novo_cache[linha] = sinal
+            sinais.append(sinal)
+            indices.append(indice)
         
-        return len(self.sinais) > 0 or len(self.erros) == 0
+        self._linhas = linhas
+        self._cache_linhas = novo_cache
+        self._definir_sinais(sinais, indices)
+        self.erros = erros
     
-    def _validar_sinal(self, timeframe: str, ativo: str, hora: str, direcao: str, num_linha: int) -> Optional[str]:
-        """
-        Valida os campos de um sinal.
-        
-        Returns:
-            str: Mensagem de erro se inválido, None se válido
-        """
-        # Validar timeframe (deve começar com M e ter número)
-        if not timeframe.upper().startswith('M'):
-            return f"Linha {num_linha}: Timeframe invalido '{timeframe}'. Deve começar com 'M' (ex: M1, M5, M15)"
+    def _processar_linhas(self, linhas: List[str]):
+        with _gc_pausado():
+            self._processar_linhas_sem_gc(linhas)
+    
+    def _acrescentar_linhas(self, linhas: List[str], inicio: int):
+        """Valida só as linhas a partir de `inicio` (as anteriores não mudaram)."""
+        novos: List[Sinal] = []
+        indices: List[int] = []
+        erros: List[str] = []
+        with _gc_pausado():
+            for indice in range(inicio, len(linhas)):
+                linha = linhas[indice].strip()
+                if not linha or linha[0] == '#':
+                    continue
+                sinal, erro = interpretar_linha(linha, indice + 1)
+                if erro:
+                    erros.append(erro.mensagem)
+                    continue
+                self._cache_linhas[linha] = sinal
+                novos.append(sinal)
+                indices.append(indice)
+            self._linhas = linhas
+            if erros:
+                self.erros = self.erros + erros
+            self._indexar_novos(novos, indices)
+    
+    def _indexar_novos(self, novos: List[Sinal], indices: List[int]):
+        """Acrescenta sinais do final do arquivo aos índices, sem reconstruí-los."""
+        if len(novos) > max(1000, len(self.sinais) // 10):
+            # Muitos sinais novos: reordenar tudo sai mais barato que inserir um a um
+            self._definir_sinais(self.sinais + novos, self._indices_sinais + indices)
+            return
+        for sinal in novos:
+            minuto, ordem = _chaves_sinal(sinal)
+            self._por_minuto.setdefault(minuto, []).append(sinal)
+            self._por_ativo.setdefault(sinal.ativo, []).append(sinal)
+            if sinal.data is None:
+                chaves, ordenados = self._chaves_sem_data, self._sem_data
+            else:
+                chaves, ordenados = self._chaves_com_data, self._com_data
+            posicao = bisect.bisect_right(chaves, ordem)
+            chaves.insert(posicao, ordem)
+            ordenados.insert(posicao, sinal)
+        self.sinais = self.sinais + novos
+        self._indices_sinais = self._indices_sinais + indices
+        self.versao += 1
+    
+    def _definir_sinais(self, sinais: List[Sinal], indices: List[int]):
+        """Troca a lista de sinais e reconstrói os índices."""
+        por_minuto: Dict[int, List[Sinal]] = {}
+        por_ativo: Dict[str, List[Sinal]] = {}
+        sem_data: List[Tuple[int, Sinal]] = []
+        com_data: List[Tuple[int, Sinal]] = []
+        for sinal in sinais:
+            minuto, ordem = _chaves_sinal(sinal)
+            por_minuto.setdefault(minuto, []).append(sinal)
+            por_ativo.setdefault(sinal.ativo, []).append(sinal)
+            (sem_data if sinal.data is None else com_data).append((ordem, sinal))
+        sem_data.sort(key=_primeiro)
+        com_data.sort(key=_primeiro)
         
+        self.sinais = sinais
+        self._indices_sinais = indices
+        self._por_minuto = por_minuto
+        self._por_ativo = por_ativo
+        self._chaves_sem_data = [ordem for ordem, _ in sem_data]
+        self._sem_data = [sinal for _, sinal in sem_data]
+        self._chaves_com_data = [ordem for ordem, _ in com_data]
+        self._com_data = [sinal for _, sinal in com_data]
+        self.versao += 1
+    
+    # ------------------------------------------------------------------
+    # Edição (em memória + gravação atômica)
+    # ------------------------------------------------------------------
+    
+    def _gravar(self, linhas: List[str]):
+        """Grava o arquivo de forma atômica (arquivo temporário + rename)."""
+        diretorio = os.path.dirname(os.path.abspath(self.arquivo_sinais))
+        fd, temporario = tempfile.mkstemp(prefix='.sinais-', suffix='.tmp', dir=diretorio)
         try:
-            tf_num = int(timeframe.upper()[1:])
-            if tf_num <= 0:
-                return f"Linha {num_linha}: Timeframe invalido '{timeframe}'. Numero deve ser maior que 0"
-        except ValueError:
-            return f"Linha {num_linha}: Timeframe invalido '{timeframe}'. Formato deve ser M<numero>"
+            if os.path.exists(self.arquivo_sinais):
+                os.chmod(temporario, os.stat(self.arquivo_sinais).st_mode & 0o777)
+            with os.fdopen(fd, 'w', encoding='utf-8') as f:
+                f.write('\n'.join(linhas))
+                if linhas:
+                    f.write('\n')
+                f.flush()
+                os.fsync(f.fileno())
+            os.replace(temporario, self.arquivo_sinais)
+        except BaseException:
+            try:
+                os.unlink(temporario)
+            except OSError:
+                pass
+            raise
+        self._assinatura = self._assinatura_arquivo()
+    
+    def adicionar_sinal(self, timeframe: str, ativo: str, hora: str, direcao: str,
+                        data: Optional[str] = None) -> Tuple[Optional[Sinal], Optional[str]]:
+        """
+        Valida e acrescenta um sinal ao final do arquivo.
         
-        # Validar ativo (não pode estar vazio)
-        if not ativo:
-            return f"Linha {num_linha}: Ativo nao pode estar vazio"
+        Args:
+            data: Dia do sinal (AAAA-MM-DD ou DD/MM/AAAA); None = todos os dias
         
-        # Validar hora (formato HH:MM)
-        try:
-            hora_parts = hora.split(':')
-            if len(hora_parts) != 2:
-                raise ValueError
-            h, m = int(hora_parts[0]), int(hora_parts[1])
-            if h < 0 or h > 23 or m < 0 or m > 59:
-                raise ValueError
-        except (ValueError, IndexError):
-            return f"Linha {num_linha}: Hora invalida '{hora}'. Formato esperado: HH:MM (ex: 19:00)"
+        Returns:
+            Tuple[Sinal, str]: (sinal adicionado, None) ou (None, mensagem de erro)
+        """
+        with self._lock:
+            self.carregar_sinais()
+            linha = f"{timeframe};{ativo};{hora};{direcao}".strip()
+            if data:
+                linha = f"{data};{linha}"
+            sinal, erro = interpretar_linha(linha, len(self._linhas) + 1)
+            if erro:
+                return None, erro.mensagem
+            
+            linhas = self._linhas + [linha]
+            self._gravar(linhas)
+            self._linhas = linhas
+            self._cache_linhas[linha] = sinal
+            self._indexar_novos([sinal], [len(linhas) - 1])
+            return sinal, None
+    
+    def remover_sinal(self, indice: int) -> Optional[Sinal]:
+        """
+        Remove o sinal de posição `indice` (ordem de `obter_todos_sinais`).
         
-        # Validar direção
-        if direcao.upper() not in ['PUT', 'CALL']:
-            return f"Linha {num_linha}: Direcao invalida '{direcao}'. Deve ser 'PUT' ou 'CALL'"
+        Comentários e demais linhas do arquivo são preservados.
         
-        return None  # Válido
+        Returns:
+            Sinal: O sinal removido, ou None se o índice for inválido
+        """
+        with self._lock:
+            self.carregar_sinais()
+            if not 0 <= indice < len(self.sinais):
+                return None
+            
+            removido = self.sinais[indice]
+            linha_removida = self._indices_sinais[indice]
+            linhas = self._linhas[:linha_removida] + self._linhas[linha_removida + 1:]
+            self._gravar(linhas)
+            # As linhas seguintes sobem uma posição
+            self._processar_linhas(linhas)
+            return removido
+    
+    def salvar_conteudo(self, conteudo: str) -> bool:
+        """Substitui o conteúdo do arquivo (gravação atômica) e recarrega."""
+        with self._lock:
+            linhas = conteudo.splitlines()
+            self._gravar(linhas)
+            self._processar_linhas(linhas)
+            return len(self.sinais) > 0 or len(self.erros) == 0
     
     def obter_sinais_para_hora(self, hora_atual: Optional[datetime] = None) -> List[Sinal]:
         """
@@ -155,37 +660,45 @@ class SinaisProcessor:
         if hora_atual is None:
             hora_atual = datetime.now()
         
-        hora_str = hora_atual.strftime("%H:%M")
-        sinais_agora = []
-        
-        for sinal in self.sinais:
-            if sinal.hora == hora_str:
-                sinais_agora.append(sinal)
-        
+        minuto = hora_atual.hour * 60 + hora_atual.minute
+        sinais_agora = self._por_minuto.get(minuto, []) + \
+            self._por_minuto.get(hora_atual.date().toordinal() * 1440 + minuto, [])
+        sinais_agora.sort(key=lambda s: s.linha_original)
         return sinais_agora
     
+    def obter_sinais_do_ativo(self, ativo: str) -> List[Sinal]:
+        """Retorna os sinais de um ativo, na ordem do arquivo."""
+        return list(self._por_ativo.get(ativo.upper(), ()))
+    
     def obter_proximos_sinais(self, quantidade: int = 5) -> List[Sinal]:
         """
         Retorna os próximos N sinais ordenados por hora.
         
+        Sinais sem data contam como sendo de hoje; sinais datados de outros
+        dias entram na ordem cronológica.
+        
         Args:
             quantidade: Quantidade de sinais a retornar
             
         Returns:
             List[Sinal]: Próximos sinais ordenados
         """
-        hora_atual = datetime.now().strftime("%H:%M")
-        
-        # Filtrar sinais futuros
-        sinais_futuros = []
-        for sinal in self.sinais:
-            if sinal.hora >= hora_atual:
-                sinais_futuros.append(sinal)
+        agora = datetime.now()
+        hoje = agora.date().toordinal() * 86400
+        inicio_minuto = agora.hour * 3600 + agora.minute * 60
         
-        # Ordenar por hora
-        sinais_futuros.sort(key=lambda x: x.hora)
-        
-        return sinais_futuros[:quantidade]
+        with self._lock:
+            sem_data, chaves_sem_data = self._sem_data, self._chaves_sem_data
+            com_data, chaves_com_data = self._com_data, self._chaves_com_data
+            i = bisect.bisect_left(chaves_sem_data, inicio_minuto)
+            j = bisect.bisect_left(chaves_com_data, hoje + inicio_minuto)
+            
+            proximos = heapq.merge(
+                ((hoje + chaves_sem_data[k], sem_data[k]) for k in range(i, len(sem_data))),
+                ((chaves_com_data[k], com_data[k]) for k in range(j, len(com_data))),
+                key=_primeiro,
+            )
+            return [sinal for _, sinal in itertools.islice(proximos, quantidade)]
     
     def obter_todos_sinais(self) -> List[Sinal]:
         """Retorna todos os sinais carregados."""
@@ -203,12 +716,14 @@ class SinaisProcessor:
             bool: True se criado com sucesso
         """
         exemplo = """# Arquivo de Sinais - Formato
-# Use apenas 4 campos separados por ponto e virgula:
+# Use 4 campos separados por ponto e virgula:
 # TIMEFRAME;ATIVO;HORA;DIREÇÃO
 #
 # Timeframes validos: M1, M5, M15, M30, H1, etc
 # Direcoes validas: PUT ou CALL
-# Formato de hora: HH:MM (ex: 19:00)
+# Formato de hora: HH:MM ou HH:MM:SS (ex: 19:00)
+# Para sinais de um dia especifico, use a data na primeira coluna:
+# DATA;TIMEFRAME;ATIVO;HORA;DIREÇÃO (ex: 2024-05-20;M1;EURUSD;19:00;CALL)
 
 M1;EURUSD-OTC;19:00;CALL
 M5;EURUSD;14:30;PUT
@@ -216,10 +731,29 @@ M1;GBPUSD-OTC;20:00;CALL
 M5;EURUSD;15:45;PUT
 """
         try:
-            with open(self.arquivo_sinais, 'w', encoding='utf-8') as f:
-                f.write(exemplo)
+            with self._lock:
+                self._gravar(exemplo.splitlines())
             return True
         except Exception as e:
             self.erros.append(f"Erro ao criar arquivo exemplo: {e}")
             return False
 
+
+
+_processadores: Dict[str, SinaisProcessor] = {}
+_processadores_lock = threading.Lock()
+
+
+def obter_processador(arquivo_sinais: str) -> SinaisProcessor:
+    """
+    Retorna o processador compartilhado de um arquivo de sinais.
+    
+    Páginas, API e execução usam a mesma instância: o arquivo é lido uma vez
+    e relido só quando muda.
+    """
+    caminho = os.path.abspath(arquivo_sinais)
+    with _processadores_lock:
+        processador = _processadores.get(caminho)
+        if processador is None:
+            processador = _processadores[caminho] = SinaisProcessor(caminho)
+        return processador
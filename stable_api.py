@@ -10,10 +10,18 @@ import operator
 from . import global_value as global_value
 from collections import defaultdict
 from collections import deque
+from collections import OrderedDict
+from concurrent.futures import Future, InvalidStateError, ThreadPoolExecutor, TimeoutError
+from itertools import count
 from .expiration import get_expiration_time, get_remaning_time
+from .armed_order import ArmedOrder, batch_report
+from .order_trace import OrderTracer
+from .order_store import OrderStore, has_event
+from .balance_cache import BalanceCache
+from .timer_wheel import get_timer_wheel
+from . import metrics
 from .version_control import api_version
 from datetime import datetime, timedelta
-from random import randint
 
 
 def nested_dict(n, type):
@@ -44,6 +52,38 @@ class IQ_Option:
         self.SESSION_HEADER = {
             "User-Agent": r"Mozilla/5.0 (X11; Linux x86_64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/66.0.3359.139 Safari/537.36"}
         self.SESSION_COOKIE = {}
+        # cache of get-initialization-data used when arming orders
+        self.init_data_ttl = 30
+        self._init_data_cache = None
+        self._init_data_cache_time = 0
+        self._init_data_lock = threading.Lock()
+        # survives reconnects, shared with every IQOptionAPI created by connect()
+        self.order_tracer = OrderTracer()
+        # order/position state survives reconnections
+        self.order_store = OrderStore()
+        # balances updated by balance-changed, reads do not hit the server
+        self.balance_cache = BalanceCache()
+        # get-balances answers land in api.balances_raw: one request at a time
+        self._balances_lock = threading.Lock()
+        self.balance_timeout = 10
+        # unique request ids for order correlation, timeouts on the shared wheel
+        self._request_ids = count(int(time.time() * 1000) % 10 ** 9)
+        self.timer_wheel = get_timer_wheel()
+        # options past their deadline without socket-option-closed, settled
+        # together by one get-options query (see _reconcile_overdue)
+        self.reconcile_delay = 0.5
+        self.reconcile_interval = 5
+        self.reconcile_limit = 100
+        self._overdue = {}  # option id -> [future, retries left]
+        # blocking readers give up after this (seconds) when the order store
+        # has no record: unknown id, or closed and evicted after closed_ttl
+        self.order_wait_timeout = 30
+        self.check_win_grace = 60
+        self._overdue_lock = threading.Lock()
+        self._reconcile_handle = None
+        # get-options is sent from here, never from the timer wheel thread
+        self._reconcile_executor = None
+        self._connected_before = False
         #
         # --start
         # self.connect()
@@ -54,6 +94,10 @@ class IQ_Option:
     def get_server_timestamp(self):
         return self.api.timesync.server_timestamp
 
+    def get_server_offset(self):
+        # server clock - local clock (seconds)
+        return self.api.timesync.offset
+
     def re_subscribe_stream(self):
         try:
             for ac in self.subscribe_candle:
@@ -87,6 +131,9 @@ class IQ_Option:
 
         self.api = IQOptionAPI(
             "iqoption.com", self.email, self.password)
+        self.api.order_tracer = self.order_tracer
+        self.api.order_store = self.order_store
+        self.api.balance_cache = self.balance_cache
         check = None
 
         # 2FA--
@@ -134,6 +181,7 @@ class IQ_Option:
 
             self.order_changed_all("subscribeMessage")
             self.api.setOptions(1, True)
+            self.balance_cache.start(self._refresh_balances)
 
             """
             self.api.subscribe_position_changed(
@@ -156,6 +204,10 @@ class IQ_Option:
             """
 
             # self.get_balance_id()
+            metrics.ws_connects.inc()
+            if self._connected_before:
+                metrics.ws_reconnects.inc()
+            self._connected_before = True
             return True, None
         else:
             if json.loads(reason)['code'] == 'verify':
@@ -432,10 +484,8 @@ class IQ_Option:
                 self.connect()"""
 
     def get_currency(self):
-        balances_raw = self.get_balances()
-        for balance in balances_raw["msg"]:
-            if balance["id"] == global_value.balance_id:
-                return balance["currency"]
+        entry = self._balance_entry()
+        return entry.currency if entry is not None else None
 
     def get_balance_id(self):
         return global_value.balance_id
@@ -453,19 +503,55 @@ class IQ_Option:
             time.sleep(self.suspend)
         return self.api.profile.balance"""
 
-    def get_balance(self):
+    def get_balance(self, max_age=None):
+        """Balance of the current account from the local cache.
 
-        balances_raw = self.get_balances()
-        for balance in balances_raw["msg"]:
-            if balance["id"] == global_value.balance_id:
-                return balance["amount"]
+        The cache is seeded on first use and kept up to date by
+        ``balance-changed``; pass ``max_age`` (seconds) to force a server
+        round trip when the cached value is older. The round trip waits at
+        most ``balance_timeout`` seconds, then the cached value (or None) is
+        returned.
+        """
+        entry = self._balance_entry(max_age)
+        return entry.amount if entry is not None else None
+
+    def get_balance_info(self):
+        """Cached balance of the current account with its ``updated_at`` / ``age`` / ``source``."""
+        entry = self._balance_entry()
+        return entry.to_dict() if entry is not None else None
+
+    def _balance_entry(self, max_age=None):
+        entry = self.balance_cache.get(global_value.balance_id)
+        if entry is None or (max_age is not None and entry.age > max_age):
+            self._refresh_balances(self.balance_timeout)  # the "balances" answer seeds the cache
+            entry = self.balance_cache.get(global_value.balance_id)
+        return entry
 
     def get_balances(self):
-        self.api.balances_raw = None
-        self.api.get_balances()
-        while self.api.balances_raw == None:
-            pass
-        return self.api.balances_raw
+        with self._balances_lock:
+            self.api.balances_raw = None
+            self.api.get_balances()
+            while self.api.balances_raw == None:
+                pass
+            return self.api.balances_raw
+
+    def _refresh_balances(self, timeout=10):
+        # cache seeding and background reconcile: never wait forever
+        start = time.time()
+        if not self._balances_lock.acquire(timeout=timeout):
+            logging.error('**warning** get-balances busy')
+            return None
+        try:
+            self.api.balances_raw = None
+            self.api.get_balances()
+            while self.api.balances_raw is None:
+                if time.time() - start > timeout:
+                    logging.error('**warning** get-balances time out')
+                    return None
+                time.sleep(0.01)
+            return self.api.balances_raw
+        finally:
+            self._balances_lock.release()
 
     def get_balance_mode(self):
         # self.api.profile.balance_type=None
@@ -805,15 +891,182 @@ class IQ_Option:
         # Function by kkagill ( https://github.com/Lu-Yi-Hsun/iqoptionapi/issues/196 | https://github.com/kkagill )
         # Function only work with Options!
 
-    def check_win_v4(self, id_number):
-        while True:
+    def check_win_v4(self, id_number, timeout=None):
+        """``(win, profit)`` of an option, waiting for it to close.
+
+        An option the store does not know (closed before its ``closed_ttl``)
+        is looked up with get-options. ``timeout`` (seconds) defaults to the
+        option's remaining time plus ``check_win_grace``; past it the option
+        is reconciled like :meth:`check_win_async` and TimeoutError is raised
+        if no result is found.
+        """
+        result = self.get_option_result(id_number)
+        if result is not None:
+            return result
+        record = self.api.order_store.get(id_number)
+        if record is None:
+            result = self._query_closed_option(id_number)
+            if result is not None:
+                return result
+        if timeout is None:
+            opened = record.event("socket-option-opened") if record is not None else None
+            if opened is not None and opened.get("expired"):
+                timeout = max(0, opened["expired"] - self.get_server_timestamp()) + self.check_win_grace
+            else:
+                timeout = self.order_wait_timeout + self.check_win_grace
+        return self.check_win_async(id_number, timeout=timeout).result()
+
+    def _query_closed_option(self, id_number):
+        # (win, profit) from the last closed options, None if not among them
+        try:
+            answer = self.get_optioninfo_v2_async(
+                self.reconcile_limit, timeout=self.reconcile_interval).result()
+        except Exception:
+            logging.exception('**warning** get-options for option %s', id_number)
+            return None
+        option = self._closed_options(answer).get(id_number)
+        if option is None or not option.get("win"):
+            return None
+        return self._closed_option_result(option)
+
+    @staticmethod
+    def _closed_options(answer):
+        # get-options answer -> {option id: closed option}
+        closed = {}
+        for option in answer.get("msg", {}).get("closed_options", []):
+            option_id = option["id"][0] if isinstance(option["id"], list) else option["id"]
+            closed[option_id] = option
+        return closed
+
+    @staticmethod
+    def _option_result(msg):
+        # socket-option-closed msg -> (win, profit)
+        return msg['win'], (0 if msg['win'] == 'equal' else float(msg['sum']) * -1 if msg['win'] == 'loose' else float(msg['win_amount']) - float(msg['sum']))
+
+    def get_option_result(self, id_number):
+        """``(win, profit)`` if the option already closed, None otherwise. Never blocks."""
+        record = self.api.order_store.get(id_number)
+        if record is None or "socket-option-closed" not in record.events:
+            return None
+        return self._option_result(record.event("socket-option-closed"))
+
+    def check_win_async(self, id_number, timeout=None, retries=3):
+        """Future resolved with ``(win, profit)`` when the option closes.
+
+        The result is pushed by ``socket-option-closed``, no thread waits
+        for it. With ``timeout`` (seconds, expiration included) an option
+        still open by then joins the account's overdue batch, reconciled by
+        a single ``get-options`` query every ``reconcile_interval`` seconds
+        and retried ``retries`` times before failing with TimeoutError.
+        """
+        future = Future()
+        closed = self.api.order_store.wait_for(id_number, has_event("socket-option-closed"))
+
+        def on_closed(done):
+            if done.cancelled() or done.exception() is not None:
+                return
             try:
-                if self.api.socket_option_closed[id_number] != None:
-                    break
-            except:
+                future.set_result(self._option_result(done.result().event("socket-option-closed")))
+            except InvalidStateError:
                 pass
-        x = self.api.socket_option_closed[id_number]
-        return x['msg']['win'], (0 if x['msg']['win'] == 'equal' else float(x['msg']['sum']) * -1 if x['msg']['win'] == 'loose' else float(x['msg']['win_amount']) - float(x['msg']['sum']))
+
+        closed.add_done_callback(on_closed)
+        future.add_done_callback(lambda _: closed.cancel())
+        if timeout is not None:
+            handle = self.timer_wheel.schedule(
+                timeout, self._mark_overdue, id_number, future, retries)
+            future.add_done_callback(lambda _: handle.cancel())
+        return future
+
+    def overdue_count(self):
+        """Options past their deadline still waiting for the batched reconciliation."""
+        with self._overdue_lock:
+            return len(self._overdue)
+
+    def _mark_overdue(self, id_number, future, retries):
+        # timer wheel callback: options overdue within reconcile_delay share a query
+        if future.done():
+            return
+        with self._overdue_lock:
+            self._overdue[id_number] = [future, retries]
+            if self._reconcile_handle is None:
+                self._reconcile_handle = self.timer_wheel.schedule(
+                    self.reconcile_delay, self._submit_reconcile)
+
+    def _submit_reconcile(self):
+        # timer wheel callback: sending waits for the websocket write lock, so
+        # the query runs on the reconcile thread
+        with self._overdue_lock:
+            if self._reconcile_executor is None:
+                self._reconcile_executor = ThreadPoolExecutor(
+                    max_workers=1, thread_name_prefix="iqoption-reconcile")
+            executor = self._reconcile_executor
+        try:
+            executor.submit(self._reconcile_overdue)
+        except RuntimeError:
+            pass  # closed
+
+    def _reconcile_overdue(self):
+        # one get-options request for every overdue option; the answer (or its
+        # timeout) settles them, no thread waits for it
+        with self._overdue_lock:
+            self._reconcile_handle = None
+            self._overdue = {id_number: entry for id_number, entry in self._overdue.items()
+                             if not entry[0].done()}
+            ids = list(self._overdue)
+        if not ids:
+            return
+        try:
+            answer = self.get_optioninfo_v2_async(
+                max(self.reconcile_limit, len(ids)), timeout=self.reconcile_interval)
+        except Exception:
+            logging.exception('**warning** reconcile %d options', len(ids))
+            answer = Future()
+            answer.set_exception(ConnectionError("get-options not sent"))
+        answer.add_done_callback(lambda done: self._settle_overdue(ids, done))
+
+    def _settle_overdue(self, ids, answer):
+        closed = {}
+        if not answer.cancelled() and answer.exception() is None:
+            closed = self._closed_options(answer.result())
+        results, expired = [], []
+        with self._overdue_lock:
+            for id_number in ids:
+                entry = self._overdue.get(id_number)
+                if entry is None:
+                    continue
+                future, retries = entry
+                option = closed.get(id_number)
+                if future.done():
+                    del self._overdue[id_number]
+                elif option is not None and option.get("win"):
+                    del self._overdue[id_number]
+                    results.append((future, self._closed_option_result(option)))
+                elif retries > 0:
+                    entry[1] = retries - 1
+                else:
+                    del self._overdue[id_number]
+                    expired.append((id_number, future))
+            if self._overdue and self._reconcile_handle is None:
+                self._reconcile_handle = self.timer_wheel.schedule(
+                    self.reconcile_interval, self._submit_reconcile)
+        for future, result in results:
+            try:
+                future.set_result(result)
+            except InvalidStateError:
+                pass
+        for id_number, future in expired:
+            try:
+                future.set_exception(TimeoutError("option {} result not received".format(id_number)))
+            except InvalidStateError:
+                pass
+
+    @staticmethod
+    def _closed_option_result(option):
+        # closed_options item of get-options -> (win, profit)
+        if option["win"] == "equal":
+            return option["win"], 0
+        return option["win"], float(option["win_amount"]) - float(option["amount"])
 
     def check_win_v3(self, id_number):
         while True:
@@ -858,38 +1111,81 @@ class IQ_Option:
         return self.api.api_game_getoptions_result
 
     def get_optioninfo_v2(self, limit):
-        self.api.get_options_v2_data = None
-        self.api.get_options_v2(limit, "binary,turbo")
-        while self.api.get_options_v2_data == None:
-            pass
+        return self.get_optioninfo_v2_async(limit).result()
+
+    def get_optioninfo_v2_async(self, limit, timeout=None):
+        """Future of the ``options`` answer: the last ``limit`` binary/turbo options.
+
+        Resolved by ws/received/options.py; with ``timeout`` (seconds) it
+        fails with TimeoutError if no answer arrives.
+        """
+        api = self.api
+        future = Future()
+        request_id = self._new_request_id()
+        waiter = [request_id, int(limit), future]
+        with api.options_v2_lock:
+            api.options_v2_waiters.append(waiter)
+        if timeout is not None:
+            def expire():
+                with api.options_v2_lock:
+                    if waiter not in api.options_v2_waiters:
+                        return
+                    api.options_v2_waiters.remove(waiter)
+                try:
+                    future.set_exception(TimeoutError("get-options answer not received"))
+                except InvalidStateError:
+                    pass
 
-        return self.api.get_options_v2_data
+            handle = self.timer_wheel.schedule(timeout, expire)
+            future.add_done_callback(lambda _: handle.cancel())
+        api.get_options_v2(limit, "binary,turbo", request_id)
+        return future
 
     # __________________________BUY__________________________
 
     # __________________FOR OPTION____________________________
 
     def buy_multi(self, price, ACTIVES, ACTION, expirations):
-        self.api.buy_multi_option = {}
         if len(price) == len(ACTIVES) == len(ACTION) == len(expirations):
-            buy_len = len(price)
-            for idx in range(buy_len):
-                self.api.buyv3(
-                    price[idx], OP_code.ACTIVES[ACTIVES[idx]], ACTION[idx], expirations[idx], idx)
-            while len(self.api.buy_multi_option) < buy_len:
-                pass
             buy_id = []
-            for key in sorted(self.api.buy_multi_option.keys()):
-                try:
-                    value = self.api.buy_multi_option[str(key)]
-                    buy_id.append(value["id"])
-                except:
-                    buy_id.append(None)
-
+            futures = self.buy_multi_async(price, ACTIVES, ACTION, expirations)
+            for future in futures.values():
+                check, value = future.result()
+                buy_id.append(value if check else None)
             return buy_id
         else:
             logging.error('buy_multi error please input all same len')
 
+    def buy_multi_async(self, price, ACTIVES, ACTION, expirations, timeout=5):
+        """Send N binary option orders back-to-back without waiting between them.
+
+        Returns an ordered ``{request_id: Future}`` dict. Each future resolves
+        to ``(True, order_id)`` or ``(False, error_message)``, including
+        ``"timeout"`` when the server does not answer in ``timeout`` seconds.
+        Safe to call from many threads: every order has its own request id.
+        """
+        if not len(price) == len(ACTIVES) == len(ACTION) == len(expirations):
+            logging.error('buy_multi_async error please input all same len')
+            return None
+        orders = []
+        for idx in range(len(price)):
+            if ACTIVES[idx] not in OP_code.ACTIVES:
+                orders.append((None, "Asset {} not found".format(ACTIVES[idx])))
+                continue
+            order = self._build_order(price[idx], ACTIVES[idx], ACTION[idx], expirations[idx])
+            orders.append((order, None))
+
+        futures = OrderedDict()
+        for order, error in orders:
+            req_id = self._new_request_id()
+            if order is None:
+                future = Future()
+                future.set_result((False, error))
+                futures[req_id] = future
+                continue
+            futures[req_id] = self._send_order(order, req_id, timeout)
+        return futures
+
     def get_remaning(self, duration):
         for remaning in get_remaning_time(self.api.timesync.server_timestamp):
             if remaning[0] == duration:
@@ -898,66 +1194,177 @@ class IQ_Option:
         return "ERROR duration"
 
     def buy_by_raw_expirations(self, price, active, direction, option, expired):
-
-        self.api.buy_multi_option = {}
-        self.api.buy_successful = None
-        req_id = "buyraw"
-        try:
-            self.api.buy_multi_option[req_id]["id"] = None
-        except:
-            pass
+        req_id = self._new_request_id()
+        future = self._register_order(req_id, 5)
         self.api.buyv3_by_raw_expired(
             price, OP_code.ACTIVES[active], direction, option, expired, request_id=req_id)
-        start_t = time.time()
-        id = None
-        self.api.result = None
-        while self.api.result == None or id == None:
-            try:
-                if "message" in self.api.buy_multi_option[req_id].keys():
-                    logging.error(
-                        '**warning** buy' + str(self.api.buy_multi_option[req_id]["message"]))
-                    return False, self.api.buy_multi_option[req_id]["message"]
-            except:
-                pass
-            try:
-                id = self.api.buy_multi_option[req_id]["id"]
-            except:
-                pass
-            if time.time() - start_t >= 5:
-                logging.error('**warning** buy late 5 sec')
-                return False, None
-
-        return self.api.result, self.api.buy_multi_option[req_id]["id"]
+        check, value = self._wait_order(future, 5)
+        if not check and value is not None:
+            logging.error('**warning** buy' + str(value))
+        return check, value
 
     def buy(self, price, ACTIVES, ACTION, expirations):
-        self.api.buy_multi_option = {}
-        self.api.buy_successful = None
-        # req_id = "buy"
-        req_id = str(randint(0, 10000))
-        try:
-            self.api.buy_multi_option[req_id]["id"] = None
-        except:
-            pass
+        req_id = self._new_request_id()
+        future = self._register_order(req_id, 5)
+        self.order_tracer.start(req_id, ACTIVES, "binary-option")
         self.api.buyv3(
             float(price), OP_code.ACTIVES[ACTIVES], str(ACTION), int(expirations), req_id)
-        start_t = time.time()
-        id = None
-        self.api.result = None
-        while self.api.result == None or id == None:
+        self.order_tracer.mark(req_id, "socket_write")
+        return self._wait_order(future, 5)
+
+    # __________________ORDER CORRELATION____________________
+
+    def _new_request_id(self):
+        # itertools.count is atomic under the GIL: unique ids across threads
+        return str(next(self._request_ids))
+
+    def _register_order(self, req_id, timeout):
+        # the "option" answer resolves the future (ws/received/option.py),
+        # the shared timer wheel resolves it with "timeout" otherwise
+        api = self.api
+        future = Future()
+        api.pending_orders[req_id] = future
+
+        def expire():
+            if api.pending_orders.pop(req_id, None) is not None:
+                try:
+                    future.set_result((False, "timeout"))
+                except InvalidStateError:
+                    pass
+
+        handle = self.timer_wheel.schedule(timeout, expire)
+        future.add_done_callback(lambda _: handle.cancel())
+        return future
+
+    def _wait_order(self, future, timeout):
+        check, value = future.result(timeout + 1)
+        if not check and value == "timeout":
+            logging.error('**warning** buy late ' + str(timeout) + ' sec')
+            return False, None
+        return check, value
+
+    def _now(self):
+        # local clock of order timestamps (a simulated clock in paper trading)
+        return time.time()
+
+    def _build_order(self, price, ACTIVES, ACTION, expirations, target_timestamp=None):
+        now = self._now()
+        if target_timestamp is None:
+            target_timestamp = now
+        target_server = target_timestamp + self.get_server_offset()
+        exp, idx = get_expiration_time(
+            int(target_server), int(expirations), now=target_server)
+        option_type_id = 3 if idx < 5 else 1  # turbo / binary
+        return ArmedOrder(ACTIVES, OP_code.ACTIVES[ACTIVES], price, str(ACTION),
+                          expirations, option_type_id, exp,
+                          self.get_balance_id(), target_timestamp)
+
+    def _send_order(self, order, req_id, timeout, trigger_time=None):
+        order.request_id = req_id
+        future = self._register_order(req_id, timeout)
+        trace = self.order_tracer.start(
+            req_id, order.active,
+            "turbo-option" if order.option_type_id == 3 else "binary-option",
+            trigger=trigger_time)
+        self.api.send_websocket_raw(order.frame(req_id))
+        order.sent_at = self._now()
+        self.order_tracer.mark(req_id, "socket_write")
+        trace.expired = order.expired - (self.api.timesync.server_timestamp - order.sent_at)
+        return future
+
+    # __________________PRE-ARMED ORDERS______________________
+
+    def _init_data_stale(self):
+        return self._init_data_cache is None or time.time() - self._init_data_cache_time > self.init_data_ttl
+
+    def get_init_data_cached(self):
+        # get-initialization-data is heavy, reuse it for init_data_ttl seconds;
+        # concurrent arm_buy calls share one refresh (the answer has a single slot)
+        if self._init_data_stale():
+            with self._init_data_lock:
+                if self._init_data_stale():
+                    data = self.get_all_init_v2()
+                    if data is None:
+                        return self._init_data_cache
+                    self._init_data_cache = data
+                    self._init_data_cache_time = time.time()
+        return self._init_data_cache
+
+    def arm_buy(self, price, ACTIVES, ACTION, expirations, target_timestamp=None):
+        """Resolve a binary option order ahead of the instant it must be sent.
+
+        Validates that the asset is open, reads its payout, computes the
+        expiration for ``target_timestamp`` (local epoch, default: now) and
+        pre-serializes the open-option frame. Returns ``(True, ArmedOrder)``
+        or ``(False, reason)``; send it later with :meth:`fire_armed`.
+        """
+        if ACTIVES not in OP_code.ACTIVES:
+            logging.error('arm_buy asset {} not found in constants'.format(ACTIVES))
+            return False, "Asset {} not found".format(ACTIVES)
+
+        armed = self._build_order(price, ACTIVES, ACTION, expirations, target_timestamp)
+        option = "turbo" if armed.option_type_id == 3 else "binary"
+
+        init_data = self.get_init_data_cached()
+        if init_data:
             try:
-                if "message" in self.api.buy_multi_option[req_id].keys():
-                    return False, self.api.buy_multi_option[req_id]["message"]
-            except:
-                pass
+                active = init_data[option]["actives"][str(armed.active_id)]
+            except (KeyError, TypeError):
+                return False, "Asset {} not available for {}".format(ACTIVES, option)
+            if not active.get("enabled") or active.get("is_suspended"):
+                return False, "Asset {} is closed".format(ACTIVES)
             try:
-                id = self.api.buy_multi_option[req_id]["id"]
-            except:
-                pass
-            if time.time() - start_t >= 5:
-                logging.error('**warning** buy late 5 sec')
-                return False, None
+                armed.payout = (100.0 - active["option"]["profit"]["commission"]) / 100.0
+            except (KeyError, TypeError):
+                armed.payout = None
+        else:
+            logging.error('**warning** arm_buy without initialization data, asset state not checked')
 
-        return self.api.result, self.api.buy_multi_option[req_id]["id"]
+        return True, armed
+
+    def fire_armed(self, armed, timeout=5, trigger_time=None):
+        """Send an :class:`ArmedOrder` and wait for the server answer like :meth:`buy`.
+
+        ``trigger_time`` is the ``time.monotonic()`` instant the signal fired,
+        used as the first mark of the order latency trace.
+        """
+        future = self._send_order(armed, self._new_request_id(), timeout, trigger_time)
+        return self._wait_order(future, timeout)
+
+    def fire_armed_batch(self, orders, timeout=5, max_delay=None, trigger_time=None):
+        """Pipeline several :class:`ArmedOrder` on the socket in one go.
+
+        Every frame is written back-to-back from the calling thread, without
+        waiting for any answer; answers are matched by request id as they
+        arrive. With ``max_delay`` (seconds) an order whose target instant
+        is further in the past when its turn comes is not sent.
+
+        Returns a list of futures in ``orders`` order, each resolving to
+        ``(True, order_id)`` or ``(False, reason)`` where reason is the
+        server message, ``"timeout"`` or ``"late"`` (not sent). The batch
+        skew is recorded in the order tracer, see :meth:`batch_report`.
+        """
+        futures = []
+        for armed in orders:
+            if max_delay is not None and self._now() - armed.target_timestamp > max_delay:
+                future = Future()
+                future.set_result((False, "late"))
+                futures.append(future)
+                continue
+            try:
+                future = self._send_order(armed, self._new_request_id(), timeout, trigger_time)
+            except Exception as exc:
+                # keep the batch going: report the failure on this order only
+                future = Future()
+                future.set_exception(exc)
+            futures.append(future)
+        self.order_tracer.observe_batch(batch_report(orders))
+        return futures
+
+    @staticmethod
+    def batch_report(orders):
+        """Send skew of orders fired by :meth:`fire_armed_batch` (see :func:`armed_order.batch_report`)."""
+        return batch_report(orders)
 
     def sell_option(self, options_ids):
         self.api.sell_option(options_ids)
@@ -1095,7 +1502,10 @@ class IQ_Option:
                         "PT" + str(duration) + "M" + action + "SPT"
         # self.api.digital_option_placed_id = None
 
+        trigger = time.monotonic()
         request_id = self.api.place_digital_option(instrument_id, amount)
+        self.order_tracer.start(request_id, active, "digital-option", trigger=trigger)
+        self.order_tracer.mark(request_id, "socket_write")
 
         while self.api.digital_option_placed_id.get(request_id) == None:
             pass
@@ -1217,10 +1627,13 @@ class IQ_Option:
 
     def close_digital_option(self, position_id):
         self.api.result = None
-        while self.get_async_order(position_id)["position-changed"] == {}:
-            pass
-        position_changed = self.get_async_order(
-            position_id)["position-changed"]["msg"]
+        try:
+            position_changed = self.api.order_store.wait_for(
+                position_id, has_event("position-changed"),
+                self.order_wait_timeout).result().event("position-changed")
+        except TimeoutError:
+            # unknown order, or closed long ago (evicted from the store)
+            return False
         self.api.close_digital_option(position_changed["external_id"])
         while self.api.result == None:
             pass
@@ -1238,11 +1651,13 @@ class IQ_Option:
                     return data["msg"]["position"]["pnl_realized"] - data["msg"]["position"]["buy_amount"]
 
     def check_win_digital_v2(self, buy_order_id):
-
-        while self.get_async_order(buy_order_id)["position-changed"] == {}:
-            pass
-        order_data = self.get_async_order(
-            buy_order_id)["position-changed"]["msg"]
+        try:
+            order_data = self.api.order_store.wait_for(
+                buy_order_id, has_event("position-changed"),
+                self.order_wait_timeout).result().event("position-changed")
+        except TimeoutError:
+            # unknown order, or closed long ago (evicted from the store)
+            return False, None
         if order_data != None:
             if order_data["status"] == "closed":
                 if order_data["close_reason"] == "expired":
@@ -1339,7 +1754,16 @@ class IQ_Option:
 
     def get_async_order(self, buy_order_id):
         # name': 'position-changed', 'microserviceName': "portfolio"/"digital-options"
-        return self.api.order_async[buy_order_id]
+        record = self.api.order_store.get(buy_order_id)
+        return defaultdict(dict, record.events if record is not None else {})
+
+    def get_order_record(self, order_id=None, position_id=None, external_id=None):
+        """Last known :class:`OrderRecord` of an order (None if no event was received)."""
+        return self.api.order_store.get(order_id, position_id, external_id)
+
+    def wait_order_state(self, order_id, predicate=None, timeout=None):
+        """Future resolved with the :class:`OrderRecord` once ``predicate(record)`` holds."""
+        return self.api.order_store.wait_for(order_id, predicate, timeout)
 
     def get_order(self, buy_order_id):
         # self.api.order_data["status"]
@@ -1592,6 +2016,26 @@ class IQ_Option:
     def logout(self):
         self.api.logout()
 
+    def close(self, timeout=5):
+        """Close the websocket and stop the background threads; connect() opens them again."""
+        metrics.untrack_client(self)
+        self.balance_cache.stop(timeout)
+        with self._overdue_lock:
+            if self._reconcile_handle is not None:
+                self._reconcile_handle.cancel()
+                self._reconcile_handle = None
+            executor, self._reconcile_executor = self._reconcile_executor, None
+        if executor is not None:
+            executor.shutdown(wait=False)
+        try:
+            self.api.websocket.close()
+            thread = self.api.websocket_thread
+        except Exception:
+            # never connected, or no websocket at all (paper trading)
+            return
+        if thread is not threading.current_thread():
+            thread.join(timeout)
+
     def buy_digital_spot_v2(self, active, amount, action, duration):
         action = action.lower()
 
@@ -1625,7 +2069,10 @@ class IQ_Option:
             "00T" + str(duration) + "M" + action + "SPT"
         logger = logging.getLogger(__name__)
         logger.info(instrument_id)
+        trigger = time.monotonic()
         request_id = self.api.place_digital_option_v2(instrument_id, active_id, amount)
+        self.order_tracer.start(request_id, active, "digital-option", trigger=trigger)
+        self.order_tracer.mark(request_id, "socket_write")
 
         while self.api.digital_option_placed_id.get(request_id) is None:
             pass
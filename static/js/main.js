@@ -168,6 +168,49 @@ function showNotification(message, type = 'info') {
     }, 5000);
 }
 
+// ========== EVENTOS EM TEMPO REAL (SSE) ==========
+
+// Conecta ao canal /api/eventos da sessão e chama handlers[tipo](dados) a cada evento
+// (balance, trade, log, sinais_status, stop_loss, reset). O navegador reconecta sozinho
+// e o servidor reenvia o que foi perdido. Sem EventSource, ou se o canal for recusado,
+// volta ao polling: `fallback` é chamado a cada `intervalo` ms.
+function conectarEventos(handlers, fallback = null, intervalo = 5000) {
+    let polling = null;
+    const iniciarPolling = () => {
+        if (fallback && !polling) {
+            fallback();
+            polling = setInterval(fallback, intervalo);
+        }
+    };
+    
+    if (!window.EventSource) {
+        iniciarPolling();
+        return null;
+    }
+    
+    const fonte = new EventSource('/api/eventos');
+    Object.keys(handlers).forEach((tipo) => {
+        fonte.addEventListener(tipo, (event) => {
+            let dados = {};
+            try {
+                dados = JSON.parse(event.data);
+            } catch (error) {
+                console.error('Evento inválido:', tipo, error);
+                return;
+            }
+            handlers[tipo](dados);
+        });
+    });
+    fonte.onerror = () => {
+        // CLOSED: o servidor recusou o canal (ex.: 401); CONNECTING: reconexão automática
+        if (fonte.readyState === EventSource.CLOSED) {
+            iniciarPolling();
+        }
+    };
+    window.addEventListener('beforeunload', () => fonte.close());
+    return fonte;
+}
+
 // Verificar conexão periodicamente
 if (window.IS_LOGGED_IN === true || window.IS_LOGGED_IN === 'true') {
     setInterval(async () => {
@@ -5,18 +5,24 @@ Este módulo garante que NUNCA o usuário perca mais do que foi estabelecido.
 AVISO CRÍTICO: O Stop Loss é IMPRESCINDÍVEL e deve ser monitorado em todas as operações.
 """
 
+import logging
 import os
-import time
+import queue
 import threading
-from typing import Optional, Callable
+from typing import Any, Dict, Optional, Callable
+
+# Registros vão para a fila do logger `bot` (registro_logs.py): nunca esperam o terminal
+logger = logging.getLogger("bot.stop_loss")
 
 
 class StopLossProtection:
     """
     Classe de proteção de Stop Loss com prioridade máxima.
     
-    Esta classe monitora continuamente o saldo e FORÇA a parada imediata
-    quando o stop loss é atingido, independente de qualquer outra condição.
+    O saldo é atualizado pelos eventos da API (balance-changed e eventos de
+    posição) através do StopLossScheduler; não há thread de polling nem ida ao
+    servidor em can_operate(). O valor das operações pendentes cujo débito
+    ainda não apareceu no saldo é contado como exposição.
     """
     
     def __init__(self, initial_balance: float, stop_loss_percent: float, api=None, check_interval: float = 0.5):
@@ -26,8 +32,8 @@ class StopLossProtection:
         Args:
             initial_balance: Saldo inicial da conta (baseline)
             stop_loss_percent: Porcentagem de perda máxima permitida (ex: 5.0 para 5%)
-            api: Instância da API IQ Option (opcional, para verificar saldo automaticamente)
-            check_interval: Intervalo de verificação em segundos (padrão: 0.5s)
+            api: Instância da API IQ Option (opcional, para receber eventos de saldo e posições)
+            check_interval: Mantido por compatibilidade; o monitoramento é orientado a eventos
         """
         if stop_loss_percent <= 0 or stop_loss_percent >= 100:
             raise ValueError("Stop Loss deve estar entre 0% e 100%")
@@ -45,57 +51,48 @@ class StopLossProtection:
         self.is_triggered = False  # Se o stop loss foi acionado
         self.current_balance = self.initial_balance
         self.loss_percent = 0.0
+        self.balance_id = None  # Conta acompanhada (definida ao registrar no scheduler)
+        
+        # Operações pendentes: {order_id: [valor, aberta, refletida_no_saldo]}
+        self._pending: Dict[Any, list] = {}
+        self._unreflected = 0.0  # Soma dos valores ainda não debitados no saldo
+        self._exposure = 0.0  # Soma dos valores de todas as operações pendentes
         
         # Callback para quando stop loss for acionado
         self.on_stop_loss_triggered: Optional[Callable] = None
         
-        # Thread de monitoramento
-        self._monitor_thread: Optional[threading.Thread] = None
-        self._stop_monitoring = False
+        self._scheduler: Optional["StopLossScheduler"] = None
         self._lock = threading.Lock()
         
-        print(f"=== STOP LOSS PROTECTION ATIVADO ===")
-        print(f"Saldo Inicial: ${self.initial_balance:.2f}")
-        print(f"Stop Loss: {self.stop_loss_percent}%")
-        print(f"Saldo Minimo Permitido: ${self.minimum_balance:.2f}")
-        print(f"ATENCAO: Nenhuma operacao sera permitida se o saldo cair abaixo de ${self.minimum_balance:.2f}")
-        print("=" * 50)
-    
-    def start_monitoring(self):
-        """Inicia o monitoramento contínuo do saldo."""
+        logger.info(
+            "=== STOP LOSS PROTECTION ATIVADO ===\n"
+            f"Saldo Inicial: ${self.initial_balance:.2f}\n"
+            f"Stop Loss: {self.stop_loss_percent}%\n"
+            f"Saldo Minimo Permitido: ${self.minimum_balance:.2f}\n"
+            f"ATENCAO: Nenhuma operacao sera permitida se o saldo cair abaixo de ${self.minimum_balance:.2f}",
+            extra=self._campos_log(),
+        )
+    
+    def start_monitoring(self, scheduler: Optional["StopLossScheduler"] = None):
+        """Registra a proteção no scheduler compartilhado (eventos de saldo e posições)."""
         if self.is_active:
-            print("AVISO: Monitoramento ja esta ativo!")
+            logger.warning("AVISO: Monitoramento ja esta ativo!")
             return
         
+        self._scheduler = scheduler or get_stop_loss_scheduler()
+        self._scheduler.register(self)
         self.is_active = True
-        self._stop_monitoring = False
-        self._monitor_thread = threading.Thread(target=self._monitor_balance, daemon=True)
-        self._monitor_thread.start()
-        print("Monitoramento de Stop Loss INICIADO (prioridade maxima)")
+        logger.info("Monitoramento de Stop Loss INICIADO (prioridade maxima)")
     
     def stop_monitoring(self):
         """Para o monitoramento."""
         if not self.is_active:
             return
         
-        self._stop_monitoring = True
-        if self._monitor_thread:
-            self._monitor_thread.join(timeout=2.0)
+        if self._scheduler:
+            self._scheduler.unregister(self)
         self.is_active = False
-        print("Monitoramento de Stop Loss PARADO")
-    
-    def _monitor_balance(self):
-        """Loop interno de monitoramento (executa em thread separada)."""
-        while not self._stop_monitoring and not self.is_triggered:
-            try:
-                # Verificar se stop loss foi atingido (saldo atualizado externamente)
-                self._check_stop_loss()
-
-                time.sleep(self.check_interval)
-
-            except Exception as e:
-                print(f"ERRO no monitoramento: {e}")
-                time.sleep(self.check_interval)
+        logger.info("Monitoramento de Stop Loss PARADO")
     
     def update_balance(self, new_balance: float):
         """
@@ -114,73 +111,142 @@ class StopLossProtection:
             loss = self.initial_balance - self.current_balance
             self.loss_percent = (loss / self.initial_balance) * 100.0
             
+            # Débitos das operações já abertas estão refletidos neste saldo
+            for pending in self._pending.values():
+                if pending[1] and not pending[2]:
+                    pending[2] = True
+                    self._unreflected -= pending[0]
+            
             # Verificar se stop loss foi atingido
-            return self._check_stop_loss()
+            triggered_now = self._check_stop_loss()
+        
+        if triggered_now:
+            self._notify_trigger()
+        return self.is_triggered
 
     def _check_stop_loss(self) -> bool:
         """
-        Verifica se o stop loss foi atingido.
+        Verifica se o stop loss foi atingido (chamado com o lock adquirido).
         
         Returns:
-            bool: True se stop loss foi acionado
+            bool: True se o stop loss foi acionado agora
         """
         if self.is_triggered:
-            return True
+            return False
         
         if self.current_balance < self.minimum_balance:
-            self._trigger_stop_loss()
+            self.is_triggered = True
             return True
         
         return False
     
+    def _notify_trigger(self):
+        # Banner e callback fora do lock (no thread do scheduler, se houver)
+        if self._scheduler:
+            self._scheduler.notify(self)
+        else:
+            self._trigger_stop_loss()
+    
     def _trigger_stop_loss(self):
-        """Aciona o stop loss e força a parada imediata."""
+        """Exibe o aviso de stop loss acionado e executa o callback."""
+        logger.critical(
+            "*** STOP LOSS ACIONADO - PRIORIDADE MAXIMA ***\n"
+            f"Saldo Inicial: ${self.initial_balance:.2f}\n"
+            f"Saldo Atual: ${self.current_balance:.2f}\n"
+            f"Perda: ${self.initial_balance - self.current_balance:.2f} ({self.loss_percent:.2f}%)\n"
+            f"Limite de Stop Loss: {self.stop_loss_percent}% (${self.minimum_balance:.2f})\n"
+            "*** TODAS AS OPERACOES FORAM PARADAS AUTOMATICAMENTE ***\n"
+            "*** O ROBO NAO PERMITIRA NENHUMA OPERACAO ADICIONAL ***",
+            extra=self._campos_log(),
+        )
+        
+        # Executar callback se definido
+        if self.on_stop_loss_triggered:
+            try:
+                self.on_stop_loss_triggered(self)
+            except Exception:
+                logger.exception("ERRO no callback de stop loss")
+    
+    def _campos_log(self) -> Dict[str, Any]:
+        """Campos estruturados dos registros de log desta proteção."""
+        return {
+            "balance_id": self.balance_id,
+            "initial_balance": self.initial_balance,
+            "current_balance": self.current_balance,
+            "minimum_balance": self.minimum_balance,
+            "loss_percent": round(self.loss_percent, 4),
+        }
+    
+    # ------------------------------------------------------------------
+    # Operações pendentes (exposição)
+    # ------------------------------------------------------------------
+    
+    def add_pending(self, order_id: Any, amount: float):
+        """Registra uma operação enviada; seu valor conta como exposição até o fechamento."""
+        amount = float(amount)
         with self._lock:
-            if self.is_triggered:
-                return  # Já foi acionado
-            
-            self.is_triggered = True
-            
-            print("\n" + "=" * 70)
-            print("*** STOP LOSS ACIONADO - PRIORIDADE MAXIMA ***")
-            print("=" * 70)
-            print(f"Saldo Inicial: ${self.initial_balance:.2f}")
-            print(f"Saldo Atual: ${self.current_balance:.2f}")
-            print(f"Perda: ${self.initial_balance - self.current_balance:.2f} ({self.loss_percent:.2f}%)")
-            print(f"Limite de Stop Loss: {self.stop_loss_percent}% (${self.minimum_balance:.2f})")
-            print("=" * 70)
-            print("*** TODAS AS OPERACOES FORAM PARADAS AUTOMATICAMENTE ***")
-            print("*** O ROBO NAO PERMITIRA NENHUMA OPERACAO ADICIONAL ***")
-            print("=" * 70 + "\n")
-            
-            # Executar callback se definido
-            if self.on_stop_loss_triggered:
-                try:
-                    self.on_stop_loss_triggered(self)
-                except Exception as e:
-                    print(f"ERRO no callback de stop loss: {e}")
-    
-    def can_operate(self) -> bool:
+            if order_id in self._pending:
+                return
+            self._pending[order_id] = [amount, False, False]
+            self._unreflected += amount
+            self._exposure += amount
+    
+    def mark_opened(self, order_id: Any):
+        """Operação aberta no servidor: o próximo saldo recebido já inclui o débito."""
+        with self._lock:
+            pending = self._pending.get(order_id)
+            if pending is not None:
+                pending[1] = True
+    
+    def release_pending(self, order_id: Any):
+        """Operação fechada: deixa de contar como exposição."""
+        with self._lock:
+            pending = self._pending.pop(order_id, None)
+            if pending is None:
+                return
+            self._exposure -= pending[0]
+            if not pending[2]:
+                self._unreflected -= pending[0]
+    
+    @property
+    def pending_exposure(self) -> float:
+        """Soma dos valores das operações pendentes."""
+        return self._exposure
+    
+    # ------------------------------------------------------------------
+    # Eventos (chamados pelo StopLossScheduler no thread do websocket)
+    # ------------------------------------------------------------------
+    
+    def _on_balance(self, entry):
+        if self.balance_id is not None and entry.id != self.balance_id:
+            return
+        if entry.amount is not None:
+            self.update_balance(entry.amount)
+    
+    def _on_order_event(self, name, record):
+        if record.order_id not in self._pending:
+            return
+        if record.closed:
+            self.release_pending(record.order_id)
+        elif record.status == "open":
+            self.mark_opened(record.order_id)
+    
+    def can_operate(self, amount: float = 0.0) -> bool:
         """
-        Verifica se é seguro operar (stop loss não foi acionado).
+        Verifica se é seguro operar, em O(1) a partir do estado local.
+        
+        Args:
+            amount: Valor da operação que se pretende abrir (opcional)
         
         Returns:
-            bool: True se pode operar, False se stop loss foi acionado
+            bool: True se pode operar, False se stop loss foi acionado ou se o
+            saldo menos a exposição ainda não debitada e o novo valor ficaria
+            abaixo do mínimo
         """
         if self.is_triggered:
             return False
         
-        # Verificação extra antes de permitir operação
-        if self.api:
-            try:
-                current = float(self.api.get_balance())
-                if current < self.minimum_balance:
-                    self.update_balance(current)
-                    return False
-            except:
-                pass
-        
-        return not self.is_triggered
+        return self.current_balance - self._unreflected - amount >= self.minimum_balance
     
     def calculate_safe_entry_value(self, entry_percent: Optional[float] = None, entry_fixed: Optional[float] = None) -> float:
         """
@@ -203,8 +269,8 @@ class StopLossProtection:
         else:
             return 0.0
         
-        # Garantir que não exceda o saldo disponível
-        available_balance = self.current_balance - self.minimum_balance
+        # Garantir que não exceda o saldo disponível (descontando a exposição ainda não debitada)
+        available_balance = self.current_balance - self._unreflected - self.minimum_balance
         safe_value = min(value, available_balance * 0.8)  # Usar no máximo 80% do disponível
         
         return max(0.0, safe_value)
@@ -225,10 +291,85 @@ class StopLossProtection:
                 "minimum_balance": self.minimum_balance,
                 "stop_loss_percent": self.stop_loss_percent,
                 "loss_percent": self.loss_percent,
+                "pending_trades": len(self._pending),
+                "pending_exposure": self._exposure,
                 "can_operate": self.can_operate()
             }
 
 
+class StopLossScheduler:
+    """
+    Distribui eventos de saldo e posições para várias proteções de Stop Loss.
+    
+    Um único thread atende todas as sessões: ele só acorda para exibir o aviso
+    de stop loss acionado e executar os callbacks, fora do thread do websocket.
+    """
+    
+    def __init__(self):
+        self._subscriptions: Dict[int, list] = {}  # id(proteção) -> [(origem, token)]
+        self._queue: "queue.Queue[StopLossProtection]" = queue.Queue()
+        self._thread: Optional[threading.Thread] = None
+        self._lock = threading.Lock()
+    
+    def register(self, protection: StopLossProtection):
+        """Assina os eventos da API da proteção (cache de saldo e ordens)."""
+        api = protection.api
+        subscriptions = []
+        if api is not None:
+            try:
+                protection.balance_id = api.get_balance_id()
+            except Exception:
+                protection.balance_id = None
+            balance_cache = getattr(api, "balance_cache", None)
+            if balance_cache is not None:
+                subscriptions.append((balance_cache, balance_cache.subscribe(protection._on_balance)))
+            order_store = getattr(api, "order_store", None)
+            if order_store is not None:
+                subscriptions.append((order_store, order_store.subscribe(protection._on_order_event)))
+        with self._lock:
+            self._subscriptions[id(protection)] = subscriptions
+            self._ensure_thread()
+    
+    def unregister(self, protection: StopLossProtection):
+        with self._lock:
+            subscriptions = self._subscriptions.pop(id(protection), [])
+        for source, token in subscriptions:
+            source.unsubscribe(token)
+    
+    def notify(self, protection: StopLossProtection):
+        self._queue.put(protection)
+    
+    @property
+    def sessions(self) -> int:
+        return len(self._subscriptions)
+    
+    def _ensure_thread(self):
+        if self._thread is None or not self._thread.is_alive():
+            self._thread = threading.Thread(target=self._run, name="stop-loss-scheduler", daemon=True)
+            self._thread.start()
+    
+    def _run(self):
+        while True:
+            protection = self._queue.get()
+            try:
+                protection._trigger_stop_loss()
+            except Exception:
+                logger.exception("ERRO no monitoramento")
+
+
+_scheduler: Optional[StopLossScheduler] = None
+_scheduler_lock = threading.Lock()
+
+
+def get_stop_loss_scheduler() -> StopLossScheduler:
+    """Scheduler único do processo, compartilhado por todas as sessões."""
+    global _scheduler
+    with _scheduler_lock:
+        if _scheduler is None:
+            _scheduler = StopLossScheduler()
+        return _scheduler
+
+
 def create_stop_loss_protection(
     api,
     stop_loss_percent: Optional[float] = None,
@@ -254,7 +395,7 @@ def create_stop_loss_protection(
         try:
             stop_loss_percent = float(stop_loss_str)
         except ValueError:
-            print(f"ERRO: Stop Loss invalido na variavel IQ_OPTION_STOP_LOSS: {stop_loss_str}")
+            logger.error(f"ERRO: Stop Loss invalido na variavel IQ_OPTION_STOP_LOSS: {stop_loss_str}")
             stop_loss_percent = 5.0  # Padrão de segurança
     
     # Obter saldo inicial
@@ -262,21 +403,21 @@ def create_stop_loss_protection(
         try:
             initial_balance = float(api.get_balance())
         except Exception as e:
-            print(f"ERRO: Nao foi possivel obter saldo inicial: {e}")
+            logger.error(f"ERRO: Nao foi possivel obter saldo inicial: {e}")
             return None
     else:
         if initial_balance is None:
             raise ValueError("initial_balance deve ser informado quando auto_fetch_balance=False")
     
     if initial_balance <= 0:
-        print("ERRO: Saldo inicial deve ser maior que zero!")
+        logger.error("ERRO: Saldo inicial deve ser maior que zero!")
         return None
     
     # Criar proteção
     protection = StopLossProtection(
         initial_balance=initial_balance,
         stop_loss_percent=stop_loss_percent,
-        api=api if auto_fetch_balance else None,
+        api=api,
         check_interval=0.5
     )
     
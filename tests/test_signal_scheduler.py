@@ -0,0 +1,70 @@
+"""Agendador de sinais com relógio simulado atravessando a meia-noite."""
+
+import importlib.util
+import os
+from datetime import datetime
+
+_caminho = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "signal_scheduler.py")
+_spec = importlib.util.spec_from_file_location("signal_scheduler", _caminho)
+signal_scheduler = importlib.util.module_from_spec(_spec)
+_spec.loader.exec_module(signal_scheduler)
+
+
+class RelogioFalso:
+    """Avança o tempo pelo `timeout` de cada espera."""
+
+    def __init__(self, inicio, fim, agendador=None):
+        self.agora = inicio
+        self.fim = fim
+        self.agendador = agendador
+
+    def time(self):
+        return self.agora
+
+    def wait(self, evento, timeout):
+        if timeout is None or self.agora + timeout >= self.fim:
+            self.agora = self.fim
+            self.agendador.parar()
+            return False
+        self.agora += timeout
+        return False
+
+
+class Sinal:
+    def __init__(self, hora, data=None):
+        self.hora = hora
+        self.data = data
+        self.linha_original = hora
+
+    def __str__(self):
+        return self.hora
+
+
+def _executar(sinais, dias, recarregar=None):
+    inicio = datetime(2026, 3, 1, 9, 0).timestamp()
+    relogio = RelogioFalso(inicio, inicio + dias * 86400)
+    disparos = []
+    agendador = signal_scheduler.AgendadorSinais(
+        None, lambda evento, alvo: disparos.append(datetime.fromtimestamp(alvo)), relogio=relogio)
+    relogio.agendador = agendador
+    agendador.carregar(sinais)
+    agendador.executar(recarregar=recarregar)
+    return agendador, disparos
+
+
+def test_sinal_diario_dispara_todo_dia():
+    # recarregar retorna None: o arquivo não mudou, nenhuma recarga do heap
+    agendador, disparos = _executar([Sinal("10:00")], dias=3, recarregar=lambda: None)
+    assert [(d.day, d.hour, d.minute) for d in disparos] == [(1, 10, 0), (2, 10, 0), (3, 10, 0)]
+    assert [e.hora for e in agendador.proximos()] == ["10:00:00"]
+
+
+def test_sinal_antes_da_meia_noite():
+    _, disparos = _executar([Sinal("23:59:30"), Sinal("00:00:10")], dias=2, recarregar=lambda: None)
+    assert [(d.day, d.hour) for d in disparos] == [(1, 23), (2, 0), (2, 23), (3, 0)]
+
+
+def test_sinal_datado_nao_se_repete():
+    _, disparos = _executar([Sinal("10:00", data=datetime(2026, 3, 1).date())], dias=3)
+    assert len(disparos) == 1
+    assert len(_executar([], dias=1)[0]) == 0
@@ -0,0 +1,104 @@
+"""Module for IQ Option timer wheel."""
+
+import logging
+import math
+import threading
+import time
+
+
+class TimerHandle(object):
+    """Handle returned by :meth:`TimerWheel.schedule`."""
+
+    __slots__ = ("target_tick", "callback", "args", "cancelled")
+
+    def __init__(self, target_tick, callback, args):
+        self.target_tick = target_tick
+        self.callback = callback
+        self.args = args
+        self.cancelled = False
+
+    def cancel(self):
+        self.cancelled = True
+
+
+class TimerWheel(object):
+    """Hashed timing wheel served by a single daemon thread.
+
+    Timers are bucketed by tick (``tick`` seconds) into ``slots`` lists, so
+    scheduling and cancelling are O(1) whatever the number of pending
+    timers. The thread sleeps on a condition while no timer is pending.
+    Callbacks run on the wheel thread and must not block: hand any network
+    work to another thread.
+    """
+
+    def __init__(self, tick=0.05, slots=512, name="iqoption-timer-wheel"):
+        self.tick = float(tick)
+        self.name = name
+        self._slots = [[] for _ in range(slots)]
+        self._tick_no = 0
+        self._base = time.monotonic()
+        self._count = 0
+        self._cond = threading.Condition()
+        self._thread = None
+
+    def __len__(self):
+        return self._count
+
+    def schedule(self, delay, callback, *args):
+        """Run ``callback(*args)`` after ``delay`` seconds."""
+        with self._cond:
+            now = time.monotonic()
+            if self._count == 0:
+                # wheel was idle: re-anchor the tick clock to now
+                self._base = now - self._tick_no * self.tick
+            target = int(math.ceil((now + max(0.0, delay) - self._base) / self.tick))
+            target = max(target, self._tick_no + 1)
+            handle = TimerHandle(target, callback, args)
+            self._slots[target % len(self._slots)].append(handle)
+            self._count += 1
+            self._ensure_thread()
+            self._cond.notify()
+        return handle
+
+    def _ensure_thread(self):
+        if self._thread is None or not self._thread.is_alive():
+            self._thread = threading.Thread(target=self._run, name=self.name)
+            self._thread.daemon = True
+            self._thread.start()
+
+    def _run(self):
+        while True:
+            with self._cond:
+                while self._count == 0:
+                    self._cond.wait()
+                    self._base = time.monotonic() - self._tick_no * self.tick
+                delay = self._base + (self._tick_no + 1) * self.tick - time.monotonic()
+                if delay > 0:
+                    self._cond.wait(delay)
+                    continue
+                self._tick_no += 1
+                slot = self._slots[self._tick_no % len(self._slots)]
+                due = [h for h in slot if h.target_tick <= self._tick_no]
+                if due:
+                    slot[:] = [h for h in slot if h.target_tick > self._tick_no]
+                    self._count -= len(due)
+            for handle in due:
+                if handle.cancelled:
+                    continue
+                try:
+                    handle.callback(*handle.args)
+                except Exception:
+                    logging.getLogger(__name__).exception('**error** timer wheel callback')
+
+
+_default_wheel = None
+_default_lock = threading.Lock()
+
+
+def get_timer_wheel():
+    """Process wide :class:`TimerWheel` shared by every connection."""
+    global _default_wheel
+    with _default_lock:
+        if _default_wheel is None:
+            _default_wheel = TimerWheel()
+        return _default_wheel
@@ -0,0 +1,357 @@
+"""
+Varredura de Parâmetros do Bot
+Testa em paralelo combinações de `stop_loss`, `stop_win`, `entry_type`,
+`entry_value` e `gale` (os campos do `BotConfig`) sobre um pacote de sinais e
+as velas do backtest, e ordena as configurações.
+
+As velas são lidas e os resultados de todos os sinais (até o maior Gale da
+grade) são resolvidos uma única vez no processo principal. As colunas dos
+sinais e a matriz de resultados vão para blocos de memória compartilhada
+(`multiprocessing.shared_memory`): cada processo do `ProcessPoolExecutor` os
+mapeia ao iniciar e as tarefas recebem só a configuração, sem copiar arrays.
+
+Uso:
+    python varredura.py sinais.txt --inicio 2024-05-20 --fim 2024-05-24 \\
+        --grade gale=0,1,2 --grade entry_value=1,2,5 --grade stop_loss=5,10,20
+
+Métricas por configuração: lucro, taxa de acerto, drawdown máximo, lucro /
+drawdown e risco de ruína (aproximação de difusão sobre o lucro por operação).
+"""
+
+import argparse
+import csv
+import itertools
+import math
+import os
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor
+from dataclasses import dataclass, fields, replace
+from datetime import date, timedelta
+from multiprocessing import shared_memory
+from typing import Any, Dict, List, Optional, Sequence, Tuple
+
+import importlib.util
+
+CURRENT_DIR = os.path.dirname(os.path.abspath(__file__))
+
+backtest_path = os.path.join(CURRENT_DIR, "backtest.py")
+spec_backtest = importlib.util.spec_from_file_location("backtest", backtest_path)
+backtest_module = importlib.util.module_from_spec(spec_backtest)
+sys.modules.setdefault("backtest", backtest_module)  # dataclasses resolvem anotações pelo módulo
+spec_backtest.loader.exec_module(backtest_module)
+np = backtest_module.np
+CacheCandles = backtest_module.CacheCandles
+ConfigBacktest = backtest_module.ConfigBacktest
+SinaisVetorizados = backtest_module.SinaisVetorizados
+importar_sinais = backtest_module.importar_sinais
+resolver_resultados = backtest_module.resolver_resultados
+simular = backtest_module.simular
+vetorizar_sinais = backtest_module.vetorizar_sinais
+
+# Parâmetros aceitos na grade e conversão dos valores
+PARAMETROS = {
+    "stop_loss": float,
+    "stop_win": float,
+    "entry_type": lambda valor: valor.upper(),
+    "entry_value": float,
+    "gale": int,
+}
+
+# Critérios de ordenação: (chave do resumo, maior é melhor)
+CRITERIOS = {
+    "lucro_drawdown": ("lucro_drawdown", True),
+    "lucro": ("lucro", True),
+    "taxa_acerto": ("taxa_acerto", True),
+    "drawdown": ("drawdown_maximo_percent", False),
+    "risco_ruina": ("risco_ruina", False),
+}
+
+# Colunas das sinais compartilhadas com os processos
+COLUNAS = ("ativo", "entrada", "expiracao", "call", "hora")
+
+
+# ---------------------------------------------------------------------------
+# Grade de parâmetros
+# ---------------------------------------------------------------------------
+
+
+def interpretar_grade(especificacoes: Sequence[str]) -> Dict[str, List[Any]]:
+    """
+    Converte `["gale=0,1,2", "entry_value=1,2"]` em `{"gale": [0, 1, 2], ...}`.
+
+    Raises:
+        ValueError: Parâmetro desconhecido ou valor inválido
+    """
+    grade: Dict[str, List[Any]] = {}
+    for especificacao in especificacoes:
+        nome, separador, valores = especificacao.partition("=")
+        nome = nome.strip().lower()
+        if not separador or nome not in PARAMETROS:
+            raise ValueError(f"Parâmetro inválido na grade: {especificacao!r} (use {', '.join(PARAMETROS)})")
+        converter = PARAMETROS[nome]
+        grade[nome] = [converter(valor.strip()) for valor in valores.split(",") if valor.strip()]
+        if not grade[nome]:
+            raise ValueError(f"Nenhum valor para {nome}")
+    return grade
+
+
+def combinacoes(grade: Dict[str, List[Any]], base: ConfigBacktest) -> List[ConfigBacktest]:
+    """Produto cartesiano da grade aplicado sobre a configuração base."""
+    nomes = list(grade)
+    return [replace(base, **dict(zip(nomes, valores))) for valores in itertools.product(*(grade[n] for n in nomes))]
+
+
+# ---------------------------------------------------------------------------
+# Memória compartilhada
+# ---------------------------------------------------------------------------
+
+
+@dataclass
+class ArrayCompartilhado:
+    """Descritor (picklável) de um array NumPy num bloco de memória compartilhada."""
+
+    nome: str
+    forma: Tuple[int, ...]
+    tipo: str
+
+    @classmethod
+    def criar(cls, array: "np.ndarray") -> Tuple["ArrayCompartilhado", shared_memory.SharedMemory]:
+        bloco = shared_memory.SharedMemory(create=True, size=max(1, array.nbytes))
+        destino = np.ndarray(array.shape, dtype=array.dtype, buffer=bloco.buf)
+        destino[...] = array
+        return cls(bloco.name, tuple(array.shape), array.dtype.str), bloco
+
+    def abrir(self) -> Tuple["np.ndarray", shared_memory.SharedMemory]:
+        bloco = shared_memory.SharedMemory(name=self.nome)
+        array = np.ndarray(self.forma, dtype=np.dtype(self.tipo), buffer=bloco.buf)
+        array.flags.writeable = False
+        return array, bloco
+
+
+class DadosCompartilhados:
+    """Sinais vetorizados e matriz de resultados publicados em memória compartilhada."""
+
+    def __init__(self, sinais: SinaisVetorizados, resultados: "np.ndarray") -> None:
+        self._blocos: List[shared_memory.SharedMemory] = []
+        descritores = {}
+        try:
+            for nome in COLUNAS:
+                descritores[nome] = self._publicar(getattr(sinais, nome))
+            descritores["resultados"] = self._publicar(resultados)
+        except Exception:
+            self.fechar()
+            raise
+        # O que vai para cada processo uma única vez (no initializer)
+        self.descritor = {"ativos": list(sinais.ativos), "arrays": descritores}
+
+    def _publicar(self, array: "np.ndarray") -> ArrayCompartilhado:
+        descritor, bloco = ArrayCompartilhado.criar(np.ascontiguousarray(array))
+        self._blocos.append(bloco)
+        return descritor
+
+    def fechar(self) -> None:
+        for bloco in self._blocos:
+            bloco.close()
+            try:
+                bloco.unlink()
+            except FileNotFoundError:
+                pass
+        self._blocos = []
+
+    def __enter__(self) -> "DadosCompartilhados":
+        return self
+
+    def __exit__(self, *exc: Any) -> None:
+        self.fechar()
+
+
+# Estado de cada processo do pool (preenchido por _iniciar_processo)
+_DADOS: Dict[str, Any] = {}
+
+
+def _iniciar_processo(descritor: Dict[str, Any]) -> None:
+    arrays = {}
+    blocos = []
+    for nome, compartilhado in descritor["arrays"].items():
+        arrays[nome], bloco = compartilhado.abrir()
+        blocos.append(bloco)  # mantém o mapeamento vivo enquanto o processo existir
+    _DADOS["blocos"] = blocos
+    _DADOS["resultados"] = arrays.pop("resultados")
+    _DADOS["sinais"] = SinaisVetorizados(ativos=descritor["ativos"], texto=[], **arrays)
+
+
+# ---------------------------------------------------------------------------
+# Métricas
+# ---------------------------------------------------------------------------
+
+
+def risco_ruina(lucros: "np.ndarray", capital: float) -> Optional[float]:
+    """
+    Probabilidade de perder `capital` com operações iid com a média e a
+    variância de `lucros` (aproximação de difusão: exp(-2 * média * capital / variância)).
+    """
+    if len(lucros) < 2 or capital <= 0:
+        return None
+    media = float(lucros.mean())
+    variancia = float(lucros.var(ddof=1))
+    if media <= 0:
+        return 1.0
+    if variancia == 0:
+        return 0.0
+    return min(1.0, math.exp(-2.0 * media * capital / variancia))
+
+
+def avaliar(sinais: SinaisVetorizados, resultados: "np.ndarray", config: ConfigBacktest) -> Dict[str, Any]:
+    """Simula uma configuração e resume as métricas da varredura."""
+    resultado = simular(sinais, resultados, config)
+    resumo = resultado.resumo()
+    capital = config.saldo_inicial * (config.stop_loss / 100.0 if config.stop_loss > 0 else 1.0)
+    ruina = risco_ruina(resultado.operacao_lucro, capital)
+    queda = resumo["drawdown_maximo"]
+    linha = {campo.name: getattr(config, campo.name) for campo in fields(config) if campo.name in PARAMETROS}
+    linha.update({
+        "operacoes": resumo["operacoes"],
+        "gales": resumo["gales"],
+        "taxa_acerto": round(resumo["taxa_acerto"], 2) if resumo["taxa_acerto"] is not None else None,
+        "lucro": resumo["lucro"],
+        "drawdown_maximo": queda,
+        "drawdown_maximo_percent": resumo["drawdown_maximo_percent"],
+        "lucro_drawdown": round(resumo["lucro"] / queda, 3) if queda else None,
+        "risco_ruina": round(ruina, 4) if ruina is not None else None,
+        "stop_loss_acionado": resumo["stop_loss_acionado"] is not None,
+        "stop_win_atingido": resumo["stop_win_atingido"] is not None,
+    })
+    return linha
+
+
+def _avaliar_no_processo(config: ConfigBacktest) -> Dict[str, Any]:
+    return avaliar(_DADOS["sinais"], _DADOS["resultados"], config)
+
+
+def ordenar(linhas: List[Dict[str, Any]], criterio: str = "lucro_drawdown") -> List[Dict[str, Any]]:
+    """Ordena pelo critério (valores ausentes por último) e numera as posições."""
+    chave, maior_melhor = CRITERIOS[criterio]
+
+    def ordem(linha):
+        valor = linha.get(chave)
+        if valor is None:
+            return (1, 0.0)
+        return (0, -valor if maior_melhor else valor)
+
+    ordenadas = sorted(linhas, key=ordem)
+    for posicao, linha in enumerate(ordenadas, 1):
+        linha["posicao"] = posicao
+    return ordenadas
+
+
+# ---------------------------------------------------------------------------
+# Execução
+# ---------------------------------------------------------------------------
+
+
+def executar_varredura(
+    origem: Any,
+    dias: Sequence[date],
+    grade: Dict[str, List[Any]],
+    base: Optional[ConfigBacktest] = None,
+    cache: Optional[CacheCandles] = None,
+    processos: Optional[int] = None,
+    criterio: str = "lucro_drawdown",
+) -> List[Dict[str, Any]]:
+    """
+    Avalia todas as combinações da grade e devolve a tabela ordenada.
+
+    Args:
+        origem: Caminho do arquivo, linhas de sinais ou lista de `Sinal`
+        dias: Dias em que os sinais sem data são aplicados
+        grade: Valores por parâmetro (`interpretar_grade`)
+        base: Valores dos parâmetros fora da grade (saldo, payout...)
+        cache: Fonte das velas (padrão: cache local sem API)
+        processos: Tamanho do pool (padrão: número de CPUs); 1 roda no próprio processo
+        criterio: Chave de `CRITERIOS`
+    """
+    configs = combinacoes(grade, base or ConfigBacktest())
+    if isinstance(origem, (list, tuple)) and origem and not isinstance(origem[0], str):
+        sinais = list(origem)
+    else:
+        sinais = importar_sinais(origem).sinais
+    vetorizados = vetorizar_sinais(sinais, dias)
+    # Uma única resolução, até o maior Gale: cada configuração usa as colunas que precisa
+    resultados = resolver_resultados(vetorizados, cache or CacheCandles(), max(c.gale for c in configs))
+
+    processos = processos or os.cpu_count() or 1
+    if processos == 1 or len(configs) == 1:
+        linhas = [avaliar(vetorizados, resultados, config) for config in configs]
+    else:
+        with DadosCompartilhados(vetorizados, resultados) as dados, ProcessPoolExecutor(
+            max_workers=processos, initializer=_iniciar_processo, initargs=(dados.descritor,)
+        ) as executor:
+            lote = max(1, len(configs) // (processos * 4))
+            linhas = list(executor.map(_avaliar_no_processo, configs, chunksize=lote))
+    return ordenar(linhas, criterio)
+
+
+def salvar_csv(linhas: List[Dict[str, Any]], caminho: str) -> None:
+    if not linhas:
+        return
+    colunas = ["posicao"] + [coluna for coluna in linhas[0] if coluna != "posicao"]
+    with open(caminho, "w", encoding="utf-8", newline="") as f:
+        escritor = csv.DictWriter(f, fieldnames=colunas, delimiter=";")
+        escritor.writeheader()
+        escritor.writerows(linhas)
+
+
+def _formatar(valor: Any, casas: int = 2) -> str:
+    if valor is None:
+        return "-"
+    if isinstance(valor, float):
+        return f"{valor:.{casas}f}"
+    return str(valor)
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Varredura de parâmetros do bot sobre um pacote de sinais")
+    parser.add_argument("sinais", help="Arquivo de sinais")
+    parser.add_argument("--inicio", type=date.fromisoformat, default=date.today() - timedelta(days=1))
+    parser.add_argument("--fim", type=date.fromisoformat, default=None)
+    parser.add_argument("--grade", action="append", default=[],
+                        help="parametro=v1,v2,... (stop_loss, stop_win, entry_type, entry_value, gale); repetível")
+    parser.add_argument("--saldo", type=float, default=1000.0)
+    parser.add_argument("--payout", type=float, default=0.8)
+    parser.add_argument("--cache", default=None, help="Diretório do cache de velas")
+    parser.add_argument("--processos", type=int, default=None)
+    parser.add_argument("--ordenar", default="lucro_drawdown", choices=tuple(CRITERIOS))
+    parser.add_argument("--top", type=int, default=20, help="Linhas exibidas")
+    parser.add_argument("--csv", default=None, help="Salva a tabela completa em CSV")
+    args = parser.parse_args()
+
+    try:
+        grade = interpretar_grade(args.grade or ["gale=0,1,2"])
+    except ValueError as e:
+        print(e)
+        sys.exit(1)
+
+    inicio = time.perf_counter()
+    base = ConfigBacktest(saldo_inicial=args.saldo, payout=args.payout)
+    dias = [args.inicio + timedelta(days=d) for d in range(((args.fim or args.inicio) - args.inicio).days + 1)]
+    linhas = executar_varredura(args.sinais, dias, grade, base, CacheCandles(args.cache),
+                                args.processos, args.ordenar)
+    duracao = time.perf_counter() - inicio
+
+    colunas = list(PARAMETROS) + ["operacoes", "taxa_acerto", "lucro", "drawdown_maximo_percent",
+                                  "lucro_drawdown", "risco_ruina"]
+    titulos = ["#", "stop_loss", "stop_win", "tipo", "valor", "gale", "ops", "acerto%", "lucro", "dd%", "lucro/dd", "ruina"]
+    print("  ".join(f"{titulo:>10}" for titulo in titulos))
+    for linha in linhas[:args.top]:
+        valores = [str(linha["posicao"])] + [_formatar(linha[coluna], 4 if coluna == "risco_ruina" else 2)
+                                              for coluna in colunas]
+        print("  ".join(f"{valor:>10}" for valor in valores))
+    print(f"\n{len(linhas)} configuração(ões) em {duracao:.2f}s")
+    if args.csv:
+        salvar_csv(linhas, args.csv)
+        print(f"Tabela salva em {args.csv}")
+
+
+if __name__ == "__main__":
+    main()
@@ -18,7 +18,7 @@ class Get_options(Base):
  
 class Get_options_v2(Base):
     name = "sendMessage"
-    def __call__(self,limit,instrument_type):    
+    def __call__(self,limit,instrument_type,request_id=""):
         data = {
             "name":"get-options" ,
             "body":{
@@ -27,4 +27,4 @@ class Get_options_v2(Base):
                 "user_balance_id":int(global_value.balance_id)
                 }
         }
-        self.send_websocket_request(self.name, data)
\ No newline at end of file
+        self.send_websocket_request(self.name, data, request_id)
\ No newline at end of file
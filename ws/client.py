@@ -2,9 +2,11 @@
 
 import json
 import logging
+import time
 import websocket
 import iqoptionapi.constants as OP_code
 import iqoptionapi.global_value as global_value
+import iqoptionapi.metrics as metrics
 from threading import Thread
 from iqoptionapi.ws.received.technical_indicators import technical_indicators
 from iqoptionapi.ws.received.time_sync import time_sync
@@ -15,6 +17,7 @@ from iqoptionapi.ws.received.balance_changed import balance_changed
 from iqoptionapi.ws.received.candles import candles
 from iqoptionapi.ws.received.buy_complete import buy_complete
 from iqoptionapi.ws.received.option import option
+from iqoptionapi.ws.received.options import options
 from iqoptionapi.ws.received.position_history import position_history
 from iqoptionapi.ws.received.list_info_data import list_info_data
 from iqoptionapi.ws.received.candle_generated import candle_generated_realtime
@@ -27,6 +30,7 @@ from iqoptionapi.ws.received.underlying_list import underlying_list
 from iqoptionapi.ws.received.instruments import instruments
 from iqoptionapi.ws.received.financial_information import financial_information
 from iqoptionapi.ws.received.position_changed import position_changed
+from iqoptionapi.ws.received.order_changed import order_changed
 from iqoptionapi.ws.received.option_opened import option_opened
 from iqoptionapi.ws.received.option_closed import option_closed
 from iqoptionapi.ws.received.top_assets_updated import top_assets_updated
@@ -106,7 +110,7 @@ class WebsocketClient(object):
         logger.debug(message)
 
         message = json.loads(str(message))
-
+        started = time.perf_counter()
 
         technical_indicators(self.api, message, self.api_dict_clean)
         time_sync(self.api, message)
@@ -117,6 +121,7 @@ class WebsocketClient(object):
         candles(self.api, message)
         buy_complete(self.api, message)
         option(self.api, message)
+        options(self.api, message)
         position_history(self.api, message)
         list_info_data(self.api, message)
         candle_generated_realtime(self.api, message, self.dict_queue_add)
@@ -129,6 +134,7 @@ class WebsocketClient(object):
         instruments(self.api, message)
         financial_information(self.api, message)
         position_changed(self.api, message)
+        order_changed(self.api, message)
         option_opened(self.api, message)
         option_closed(self.api, message)
         top_assets_updated(self.api, message)
@@ -165,6 +171,9 @@ class WebsocketClient(object):
         users_availability(self.api, message)
         client_price_generated(self.api, message)
 
+        name = message.get("name", "")
+        metrics.ws_frames_received.inc(name)
+        metrics.ws_handler_seconds.observe(time.perf_counter() - started, name)
         global_value.ssl_Mutual_exclusion = False
 
     @staticmethod
@@ -174,6 +183,7 @@ class WebsocketClient(object):
         logger.error(error)
         global_value.websocket_error_reason = str(error)
         global_value.check_websocket_if_error = True
+        metrics.ws_errors.inc()
 
     @staticmethod
     def on_open(wss):  # pylint: disable=unused-argument
@@ -188,3 +198,4 @@ class WebsocketClient(object):
         logger = logging.getLogger(__name__)
         logger.debug("Websocket connection closed.")
         global_value.check_websocket_if_connect = 0
+        metrics.ws_disconnects.inc()
@@ -13,6 +13,7 @@ class TimeSync(Base):
         super(TimeSync, self).__init__()
         self.__name = "timeSync"
         self.__server_timestamp = time.time()
+        self.__received_at = None
         self.__expiration_time = 1
 
     @property
@@ -31,6 +32,18 @@ class TimeSync(Base):
     def server_timestamp(self, timestamp):
         """Method to set server timestamp."""
         self.__server_timestamp = timestamp
+        self.__received_at = time.time()
+
+    @property
+    def offset(self):
+        """Property to get server clock minus local clock, in seconds.
+
+        Measured at the reception of the last timeSync, so it does not lag
+        behind between two server updates like ``server_timestamp`` does.
+        """
+        if self.__received_at is None:
+            return 0.0
+        return self.__server_timestamp / 1000 - self.__received_at
 
     @property
     def server_datetime(self):
@@ -3,6 +3,7 @@
 def balance_changed(api, message):
     if message['name'] == 'balance-changed':
         balance = message['msg']['current_balance']
+        api.balance_cache.apply_balance_changed(balance)
         # if self.api.get_active_account_type() == balance['type']:
         try:
             api.profile.balance = balance["amount"]
@@ -2,4 +2,5 @@
 
 def balances(api, message):
     if message["name"] == "balances":
-        api.balances_raw = message
\ No newline at end of file
+        api.balance_cache.seed(message["msg"])
+        api.balances_raw = message
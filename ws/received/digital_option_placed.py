@@ -6,8 +6,10 @@ def digital_option_placed(api, message, api_dict_clean):
             api_dict_clean(api.digital_option_placed_id)
             api.digital_option_placed_id[message["request_id"]
                                                 ] = message["msg"]["id"]
+            api.order_tracer.ack(message["request_id"], message["msg"]["id"])
         else:
             api.digital_option_placed_id[message["request_id"]] = {
                 "code": "error_place_digital_order",
                 "message": message["msg"]["message"]
-            }
\ No newline at end of file
+            }
+            api.order_tracer.ack(message["request_id"], None)
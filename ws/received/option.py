@@ -1,5 +1,28 @@
 """Module for IQ option websocket."""
+import logging
+from concurrent.futures import InvalidStateError
+
 
 def option(api, message):
     if message["name"] == "option":
-        api.buy_multi_option[str(message["request_id"])] = message["msg"]
\ No newline at end of file
+        request_id = str(message["request_id"])
+        msg = message["msg"]
+        api.order_tracer.ack(request_id, msg.get("id"))
+        future = api.pending_orders.pop(request_id, None)
+        if future is None:
+            # no waiter left (answer after the buy timeout): the option may be open anyway
+            if "message" in msg:
+                logging.warning('**warning** late option answer for request %s: %s',
+                                request_id, msg["message"])
+            else:
+                logging.warning('**warning** option %s opened after its buy request %s timed out',
+                                msg.get("id"), request_id)
+            return
+        if "message" in msg:
+            result = (False, msg["message"])
+        else:
+            result = (True, msg["id"])
+        try:
+            future.set_result(result)
+        except InvalidStateError:
+            pass
@@ -2,6 +2,7 @@
 
 def option_closed(api, message):
     if message["name"] == "option-closed":
-        api.order_async[int(message["msg"]["option_id"])][message["name"]] = message
+        api.order_store.apply(message)
+        api.order_tracer.mark_order(int(message["msg"]["option_id"]), "closed")
         if message["microserviceName"] == "binary-options":
-            api.order_binary[message["msg"]["option_id"]] = message['msg']
\ No newline at end of file
+            api.order_binary[message["msg"]["option_id"]] = message['msg']
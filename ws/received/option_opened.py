@@ -2,4 +2,5 @@
 
 def option_opened(api, message):
     if message["name"] == "option-opened":
-        api.order_async[int(message["msg"]["option_id"])][message["name"]] = message
\ No newline at end of file
+        api.order_store.apply(message)
+        api.order_tracer.mark_order(int(message["msg"]["option_id"]), "opened")
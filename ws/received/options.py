@@ -1,5 +1,23 @@
 """Module for IQ option websocket."""
+from concurrent.futures import InvalidStateError
 
-def option(api, message):
+
+def options(api, message):
     if message["name"] == "options":
-        api.get_options_v2_data = message
\ No newline at end of file
+        api.get_options_v2_data = message
+        request_id = str(message.get("request_id", ""))
+        closed = len((message.get("msg") or {}).get("closed_options", []))
+        with api.options_v2_lock:
+            # limit of the request answered (by request_id); an answer of
+            # unknown origin only covers the limits it is long enough for
+            covered = next((limit for rid, limit, _ in api.options_v2_waiters if rid == request_id), None)
+            if covered is None:
+                covered = closed
+            ready = [waiter for waiter in api.options_v2_waiters
+                     if waiter[0] == request_id or waiter[1] <= covered]
+            api.options_v2_waiters[:] = [waiter for waiter in api.options_v2_waiters if waiter not in ready]
+        for _, _, future in ready:
+            try:
+                future.set_result(message)
+            except InvalidStateError:
+                pass
@@ -0,0 +1,5 @@
+"""Module for IQ option websocket."""
+
+def order_changed(api, message):
+    if message["name"] == "order-changed":
+        api.order_store.apply(message)
@@ -2,9 +2,16 @@
 
 def position_changed(api, message):
     if message["name"] == "position-changed":
+        # a balance-changed should follow, the cache reconciles if it does not
+        api.balance_cache.mark_dirty(message["msg"].get("user_balance_id"))
         if message["microserviceName"] == "portfolio" and (message["msg"]["source"] == "digital-options") or message["msg"]["source"] == "trading":
-            api.order_async[int(message["msg"]["raw_event"]["order_ids"][0])][message["name"]] = message
+            order_id = int(message["msg"]["raw_event"]["order_ids"][0])
+            api.order_store.apply(message)
+            if message["msg"].get("status") == "open":
+                api.order_tracer.mark_order(order_id, "opened")
+            elif message["msg"].get("status") == "closed":
+                api.order_tracer.mark_order(order_id, "closed")
         elif message["microserviceName"] == "portfolio" and message["msg"]["source"] == "binary-options":
-            api.order_async[int(message["msg"]["external_id"])][message["name"]] = message
+            api.order_store.apply(message)
         else:
-            api.position_changed = message
\ No newline at end of file
+            api.position_changed = message
@@ -3,4 +3,5 @@
 def socket_option_closed(api, message):
     if message["name"] == "socket-option-closed":
         id = message["msg"]["id"]
-        api.socket_option_closed[id] = message
\ No newline at end of file
+        api.order_store.apply(message)
+        api.order_tracer.mark_order(id, "closed")
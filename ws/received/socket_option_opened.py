@@ -3,4 +3,6 @@
 def socket_option_opened(api, message):
     if message["name"] == "socket-option-opened":
         id = message["msg"]["id"]
-        api.socket_option_opened[id] = message
\ No newline at end of file
+        api.socket_option_opened[id] = message
+        api.order_store.apply(message)
+        api.order_tracer.mark_order(id, "opened")